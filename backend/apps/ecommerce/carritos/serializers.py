@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from apps.medios import url_medio
 from .models import Carrito, ItemCarrito
 from ..productos.models import ProductoVariante
 
@@ -24,12 +25,16 @@ class CartProductVariantSerializer(serializers.ModelSerializer):
         )
 
     def get_imagen_url(self, obj):
-        if obj.imagen_variante and hasattr(obj.imagen_variante, 'url'):
-            return obj.imagen_variante.url
-        # Fallback a la galería del producto principal si no hay imagen de variante
-        imagen_principal = obj.producto.imagenes.filter(es_principal=True).first()
-        if imagen_principal:
-            return imagen_principal.imagen.url
+        imagen_variante = url_medio(obj.imagen_variante)
+        if imagen_variante:
+            return imagen_variante
+        # Fallback a la galería del producto principal si no hay imagen de variante.
+        # Las vistas la traen prefetcheada (catalogo.lineas_con_variante); si no, una consulta
+        principales = getattr(obj.producto, 'imagenes_principales', None)
+        if principales is None:
+            principales = obj.producto.imagenes.filter(es_principal=True).order_by('id')[:1]
+        if principales:
+            return url_medio(principales[0].imagen)
         return None
 
 class ItemCarritoSerializer(serializers.ModelSerializer):
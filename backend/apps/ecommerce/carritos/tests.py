@@ -1,3 +1,94 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from apps.medios import url_medio
+from ..productos.models import ImagenProducto, ProductoVariante
+from ..productos.tests import CloudinaryLocal, crear_catalogo
+from .models import Carrito, ItemCarrito
+
+LINEAS = (1, 10, 50)
+
+
+def crear_variantes(prefijo):
+    """
+    Una variante por producto, una más que el carrito más grande. La mitad con
+    imagen propia; algunos productos sin imagen principal (imagen_url = None).
+    """
+    productos = crear_catalogo(prefijo, LINEAS[-1] + 1, 1)
+    variantes = list(ProductoVariante.objects.filter(producto__in=productos).order_by('id'))
+    for variante in variantes[::2]:
+        variante.imagen_variante = f'{prefijo}/variante-{variante.pk}'
+        variante.save()
+    ImagenProducto.objects.filter(producto__in=productos[1::10]).update(es_principal=False)
+    return variantes
+
+
+def imagen_esperada(variante):
+    """imagen_url sin prefetch: la de la variante o la principal del producto."""
+    if url_medio(variante.imagen_variante):
+        return url_medio(variante.imagen_variante)
+    principal = variante.producto.imagenes.filter(es_principal=True).order_by('id').first()
+    return url_medio(principal.imagen) if principal else None
+
+
+class LineasCarritoTests(CloudinaryLocal, TestCase):
+    """
+    Ver el carrito y añadir, cambiar o quitar una línea devuelven el carrito
+    entero (cargar_items): las mismas consultas con 1, 10 o 50 líneas.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = get_user_model().objects.create(email='cliente@example.com')
+        cls.variantes = crear_variantes('cr')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def llenar(self, lineas):
+        carrito, _ = Carrito.objects.get_or_create(usuario=self.usuario)
+        carrito.items.all().delete()
+        return ItemCarrito.objects.bulk_create([
+            ItemCarrito(carrito=carrito, variante=v, cantidad=1) for v in self.variantes[:lineas]
+        ])
+
+    def comprobar_con_cada_tamaño(self, peticion, consultas, cambio=0):
+        """`cambio`: líneas que añade (1) o quita (-1) la petición; el carrito devuelto tiene 1, 10 o 50."""
+        for lineas in LINEAS:
+            with self.subTest(lineas=lineas):
+                items = self.llenar(lineas - cambio)
+                with self.assertNumQueries(consultas):
+                    respuesta = peticion(items)
+                self.assertLess(respuesta.status_code, 300, respuesta.content)
+                self.assertEqual(len(respuesta.json()['items']), lineas)
+
+    def test_ver_carrito(self):
+        self.comprobar_con_cada_tamaño(lambda items: self.client.get(reverse('cart-detail')), 3)
+
+    def test_añadir_linea(self):
+        nueva = self.variantes[-1]
+        self.comprobar_con_cada_tamaño(
+            lambda items: self.client.post(reverse('cart-item-list'), {'variante_id': nueva.pk, 'cantidad': 1}),
+            9, cambio=1)
+
+    def test_cambiar_cantidad(self):
+        self.comprobar_con_cada_tamaño(
+            lambda items: self.client.patch(reverse('cart-item-detail', args=[items[0].pk]), {'cantidad': 2}), 8)
+
+    def test_quitar_linea(self):
+        self.comprobar_con_cada_tamaño(
+            lambda items: self.client.delete(reverse('cart-item-detail', args=[items[0].pk])), 6, cambio=-1)
 
-# Create your tests here.
+    def test_imagenes_y_total_como_sin_prefetch(self):
+        self.llenar(LINEAS[-1])
+        datos = self.client.get(reverse('cart-detail')).json()
+        por_id = ProductoVariante.objects.in_bulk([v.pk for v in self.variantes])
+        urls = [linea['variante']['imagen_url'] for linea in datos['items']]
+        self.assertEqual(urls, [imagen_esperada(por_id[l['variante']['id']]) for l in datos['items']])
+        self.assertIn(None, urls)
+        self.assertEqual(Decimal(datos['total_carrito']), sum(Decimal(l['subtotal']) for l in datos['items']))
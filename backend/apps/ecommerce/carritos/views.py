@@ -1,6 +1,8 @@
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import viewsets, permissions, status, mixins
 from rest_framework.response import Response
 from .models import Carrito, ItemCarrito
+from ..productos.catalogo import lineas_con_variante
 from .serializers import (
     CarritoSerializer, 
     ItemCarritoSerializer, 
@@ -75,6 +77,18 @@ def get_or_create_cart(request):
     return cart
 
 
+def cargar_items(cart):
+    """
+    Prefetchea los items del carrito con su variante, producto e imagen
+    principal (catalogo.lineas_con_variante): CarritoSerializer y
+    total_carrito no lanzan consultas por línea.
+    """
+    prefetch_related_objects(
+        [cart], Prefetch('items', queryset=lineas_con_variante(ItemCarrito.objects.all()))
+    )
+    return cart
+
+
 # --- ViewSets ---
 class CartViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -91,7 +105,7 @@ class CartViewSet(viewsets.ReadOnlyModelViewSet):
         Devuelve el carrito del usuario (autenticado o anónimo).
         """
         # La función de ayuda hace todo el trabajo pesado
-        cart = get_or_create_cart(request)
+        cart = cargar_items(get_or_create_cart(request))
         serializer = self.get_serializer(cart)
         return Response(serializer.data)
 
@@ -152,7 +166,7 @@ Filtra los items para que solo pertenezcan al carrito del usuario actual.
             existing_item.save()
         
         # Devolver el estado del carrito completo y actualizado
-        cart_serializer = CarritoSerializer(cart)
+        cart_serializer = CarritoSerializer(cargar_items(cart))
         return Response(cart_serializer.data, status=status.HTTP_201_CREATED)
 
     def update(self, request, *args, **kwargs):
@@ -174,7 +188,7 @@ Filtra los items para que solo pertenezcan al carrito del usuario actual.
             self.perform_destroy(instance)
             # Devolver el estado del carrito actualizado
             cart = get_or_create_cart(request)
-            cart_serializer = CarritoSerializer(cart)
+            cart_serializer = CarritoSerializer(cargar_items(cart))
             return Response(cart_serializer.data, status=status.HTTP_200_OK)
         else:
             # El 'validate' del AddItemCarritoSerializer ya comprobó el stock
@@ -182,7 +196,7 @@ Filtra los items para que solo pertenezcan al carrito del usuario actual.
             
         # Devolver el estado del carrito completo y actualizado
         cart = get_or_create_cart(request)
-        cart_serializer = CarritoSerializer(cart)
+        cart_serializer = CarritoSerializer(cargar_items(cart))
         return Response(cart_serializer.data)
 
     def destroy(self, request, *args, **kwargs):
@@ -194,5 +208,5 @@ Filtra los items para que solo pertenezcan al carrito del usuario actual.
         
         # Devolver el estado del carrito actualizado
         cart = get_or_create_cart(request)
-        cart_serializer = CarritoSerializer(cart)
+        cart_serializer = CarritoSerializer(cargar_items(cart))
         return Response(cart_serializer.data, status=status.HTTP_200_OK)
\ No newline at end of file
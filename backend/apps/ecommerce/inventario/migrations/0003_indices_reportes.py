@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0002_almacen_capacidad'),
+        ('productos', '0003_imagenproducto_productos_i_product_d1dc58_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stock',
+            index=models.Index(fields=['cantidad'], name='inventario__cantida_6a3b29_idx'),
+        ),
+    ]
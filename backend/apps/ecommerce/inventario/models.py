@@ -1,5 +1,5 @@
 # /ecommerce/inventario/models.py
-from django.db import models
+from django.db import models, transaction
 from ..productos.models import ProductoVariante 
 
 class Almacen(models.Model):
@@ -33,6 +33,20 @@ class Stock(models.Model):
         verbose_name = "Registro de Stock"
         verbose_name_plural = "Registros de Stock"
         unique_together = ('variante', 'almacen')
+        indexes = [
+            # Reporte de inventario bajo (WHERE cantidad <= 10)
+            models.Index(fields=['cantidad']),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Las señales recalculan stock_disponible / en_stock (productos/agregados.py)
+        # en la misma transacción que el cambio de stock
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
 
     def __str__(self):
         return f"{self.cantidad} de {self.variante.sku} en {self.almacen.nombre}"
\ No newline at end of file
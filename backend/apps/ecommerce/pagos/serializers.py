@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from apps.medios import url_medio
 from .models import Pago
 from ..pedidos.models import Pedido
 
@@ -25,9 +26,7 @@ class PagoSerializer(serializers.ModelSerializer):
         )
     
     def get_comprobante_qr_url(self, obj):
-        if obj.comprobante_qr and hasattr(obj.comprobante_qr, 'url'):
-            return obj.comprobante_qr.url
-        return None
+        return url_medio(obj.comprobante_qr)
 
 
 # --- Serializadores de ESCRITURA ---
@@ -138,9 +137,7 @@ class AdminPagoSerializer(serializers.ModelSerializer):
         }
     
     def get_comprobante_qr_url(self, obj):
-        if obj.comprobante_qr and hasattr(obj.comprobante_qr, 'url'):
-            return obj.comprobante_qr.url
-        return None
+        return url_medio(obj.comprobante_qr)
 
 
 class AdminPagoCreateSerializer(serializers.ModelSerializer):
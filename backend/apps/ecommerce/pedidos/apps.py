@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class PedidosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.ecommerce.pedidos'
+
+    def ready(self):
+        try:
+            import apps.ecommerce.pedidos.signals
+        except ImportError:
+            pass
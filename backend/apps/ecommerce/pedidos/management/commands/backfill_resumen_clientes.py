@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from apps.ecommerce.pedidos.models import Pedido, ResumenCliente
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye por lotes la tabla ResumenCliente (primera compra y acumulados por cliente)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Cantidad de emails de clientes procesados por transacción')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        emails_pagados = Pedido.objects.filter(
+            estado__in=ResumenCliente.ESTADOS_PAGADOS
+        ).values_list('email_cliente', flat=True).order_by('email_cliente').distinct()
+
+        self.stdout.write('👥 Reconstruyendo resumen de clientes...')
+
+        ultimo_email = ''
+        procesados = 0
+        while True:
+            # Paginación por clave (email > último) para no cargar todos los emails en memoria
+            lote = list(emails_pagados.filter(email_cliente__gt=ultimo_email)[:batch_size])
+            if not lote:
+                break
+            procesados += ResumenCliente.recalcular(lote)
+            ultimo_email = lote[-1]
+            self.stdout.write(f'  ✓ {procesados} clientes procesados (hasta {ultimo_email})')
+
+        # Clientes que ya no tienen ningún pedido pagado
+        huerfanos, _ = ResumenCliente.objects.exclude(
+            email_cliente__in=emails_pagados
+        ).delete()
+        if huerfanos:
+            self.stdout.write(self.style.WARNING(f'  ⚠ {huerfanos} resúmenes sin pedidos pagados eliminados'))
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Resumen de clientes reconstruido: {procesados} clientes'))
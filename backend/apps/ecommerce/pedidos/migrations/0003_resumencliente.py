@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0002_remove_pedido_direccion_envio_alter_pedido_estado_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenCliente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email_cliente', models.EmailField(max_length=254, unique=True)),
+                ('fecha_primera_compra', models.DateTimeField()),
+                ('fecha_ultima_compra', models.DateTimeField()),
+                ('total_pedidos', models.PositiveIntegerField(default=0)),
+                ('gasto_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Resumen de Cliente',
+                'verbose_name_plural': 'Resúmenes de Clientes',
+                'indexes': [models.Index(fields=['fecha_primera_compra'], name='pedidos_res_fecha_p_37ed2a_idx'), models.Index(fields=['fecha_ultima_compra'], name='pedidos_res_fecha_u_7f8930_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0003_resumencliente'),
+        ('productos', '0003_imagenproducto_productos_i_product_d1dc58_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='itempedido',
+            index=models.Index(fields=['pedido'], include=('variante', 'cantidad', 'precio_unitario'), name='itempedido_pedido_cov_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['estado', 'creado_en'], name='pedidos_ped_estado_9aed44_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(condition=models.Q(('estado__in', ['PAGADO', 'ENVIADO', 'ENTREGADO'])), fields=['creado_en'], name='pedido_pagado_creado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['usuario', '-creado_en'], name='pedidos_ped_usuario_d9d2d6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['email_cliente', 'creado_en'], name='pedidos_ped_email_c_0007f3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['-creado_en'], name='pedidos_ped_creado__9e8b13_idx'),
+        ),
+    ]
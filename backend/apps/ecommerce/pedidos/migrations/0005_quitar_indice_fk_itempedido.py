@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0004_indices_reportes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='itempedido',
+            name='pedido',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='items', to='pedidos.pedido'),
+        ),
+    ]
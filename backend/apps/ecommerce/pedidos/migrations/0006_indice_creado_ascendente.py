@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 20:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0005_quitar_indice_fk_itempedido'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='pedido',
+            name='pedidos_ped_creado__9e8b13_idx',
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['creado_en'], name='pedidos_ped_creado__40a529_idx'),
+        ),
+    ]
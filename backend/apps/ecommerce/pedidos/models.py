@@ -1,5 +1,6 @@
 # ecommerce/pedidos/models.py
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Min, Max, Count, Sum
 from django.conf import settings
 from apps.ecommerce.productos.models import ProductoVariante
 import uuid
@@ -62,13 +63,29 @@ class Pedido(models.Model):
         verbose_name = "Pedido"
         verbose_name_plural = "Pedidos"
         ordering = ('-creado_en',)
+        indexes = [
+            # Reportes: WHERE creado_en BETWEEN ... AND estado IN (...)
+            models.Index(fields=['estado', 'creado_en']),
+            # Reportes de ventas: solo pedidos pagados, por fecha
+            models.Index(
+                fields=['creado_en'],
+                name='pedido_pagado_creado_idx',
+                condition=models.Q(estado__in=['PAGADO', 'ENVIADO', 'ENTREGADO']),
+            ),
+            # Historial del cliente y resumen de clientes
+            models.Index(fields=['usuario', '-creado_en']),
+            models.Index(fields=['email_cliente', 'creado_en']),
+            # Listado del admin (ordering por -creado_en): Postgres lo recorre hacia atrás
+            models.Index(fields=['creado_en']),
+        ]
 
     def __str__(self):
         return f"Pedido {self.id} - {self.email_cliente}"
 
 class ItemPedido(models.Model):
     """Los productos específicos comprados en un pedido."""
-    pedido = models.ForeignKey(Pedido, on_delete=models.CASCADE, related_name='items')
+    # Sin índice propio: itempedido_pedido_cov_idx (Meta.indexes) empieza por pedido_id
+    pedido = models.ForeignKey(Pedido, on_delete=models.CASCADE, related_name='items', db_index=False)
     variante = models.ForeignKey(ProductoVariante, on_delete=models.PROTECT,
                                  help_text="Usamos PROTECT para no borrar items de pedidos pasados")
     cantidad = models.PositiveIntegerField()
@@ -78,6 +95,15 @@ class ItemPedido(models.Model):
     class Meta:
         verbose_name = "Item de Pedido"
         verbose_name_plural = "Items de Pedido"
+        indexes = [
+            # JOIN pedido -> items de los reportes de productos/categorías.
+            # Cubre las columnas leídas: permite un Index Only Scan sin tocar la tabla.
+            models.Index(
+                fields=['pedido'],
+                include=['variante', 'cantidad', 'precio_unitario'],
+                name='itempedido_pedido_cov_idx',
+            ),
+        ]
         
     def __str__(self):
         return f"{self.cantidad} x {self.variante.producto.nombre} en Pedido {self.pedido.id}"
@@ -86,3 +112,113 @@ class ItemPedido(models.Model):
     def subtotal(self):
         return self.cantidad * self.precio_unitario
 
+
+
+class ResumenCliente(models.Model):
+    """
+    Tabla mantenida con la PRIMERA compra y el acumulado de cada cliente
+    (por email_cliente). Solo cuenta pedidos en estados pagados.
+    Se actualiza desde signals.py cuando un pedido entra o sale de un
+    estado pagado, y se reconstruye con `backfill_resumen_clientes`.
+    El microservicio de reportes la usa para las métricas de toda la
+    historia (primera compra, valor de vida); las acotadas a un rango
+    agregan pedidos_pedido dentro del rango.
+    """
+    ESTADOS_PAGADOS = (
+        Pedido.EstadoPedido.PAGADO,
+        Pedido.EstadoPedido.ENVIADO,
+        Pedido.EstadoPedido.ENTREGADO,
+    )
+
+    email_cliente = models.EmailField(unique=True)
+    fecha_primera_compra = models.DateTimeField()
+    fecha_ultima_compra = models.DateTimeField()
+    total_pedidos = models.PositiveIntegerField(default=0)
+    gasto_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Resumen de Cliente"
+        verbose_name_plural = "Resúmenes de Clientes"
+        indexes = [
+            models.Index(fields=['fecha_primera_compra']),
+            models.Index(fields=['fecha_ultima_compra']),
+        ]
+
+    def __str__(self):
+        return f"{self.email_cliente} - {self.total_pedidos} pedidos"
+
+    @classmethod
+    def registrar_pedido(cls, pedido):
+        """
+        Suma un pedido que acaba de pasar a un estado pagado al resumen
+        de su cliente (crea la fila si es su primera compra).
+        """
+        with transaction.atomic():
+            resumen, creado = cls.objects.select_for_update().get_or_create(
+                email_cliente=pedido.email_cliente,
+                defaults={
+                    'fecha_primera_compra': pedido.creado_en,
+                    'fecha_ultima_compra': pedido.creado_en,
+                    'total_pedidos': 1,
+                    'gasto_total': pedido.total_pedido,
+                }
+            )
+            if not creado:
+                resumen.fecha_primera_compra = min(resumen.fecha_primera_compra, pedido.creado_en)
+                resumen.fecha_ultima_compra = max(resumen.fecha_ultima_compra, pedido.creado_en)
+                resumen.total_pedidos += 1
+                resumen.gasto_total += pedido.total_pedido
+                resumen.save()
+        return resumen
+
+    @classmethod
+    def recalcular(cls, emails):
+        """
+        Recalcula desde pedidos_pedido el resumen de los emails indicados.
+        Se usa cuando un pedido SALE de un estado pagado (ej. se cancela)
+        y en el backfill por lotes. Los emails sin compras pagadas se borran.
+        """
+        emails = list(emails)
+        if not emails:
+            return 0
+
+        agregados = Pedido.objects.filter(
+            email_cliente__in=emails,
+            estado__in=cls.ESTADOS_PAGADOS
+        ).values('email_cliente').annotate(
+            primera=Min('creado_en'),
+            ultima=Max('creado_en'),
+            cantidad=Count('id'),
+            gasto=Sum('total_pedido'),
+        ).order_by()
+
+        resumenes = [
+            cls(
+                email_cliente=fila['email_cliente'],
+                fecha_primera_compra=fila['primera'],
+                fecha_ultima_compra=fila['ultima'],
+                total_pedidos=fila['cantidad'],
+                gasto_total=fila['gasto'] or 0,
+            )
+            for fila in agregados
+        ]
+
+        with transaction.atomic():
+            con_compras = {r.email_cliente for r in resumenes}
+            cls.objects.filter(email_cliente__in=emails).exclude(
+                email_cliente__in=con_compras
+            ).delete()
+            cls.objects.bulk_create(
+                resumenes,
+                update_conflicts=True,
+                unique_fields=['email_cliente'],
+                update_fields=[
+                    'fecha_primera_compra',
+                    'fecha_ultima_compra',
+                    'total_pedidos',
+                    'gasto_total',
+                    'actualizado_en',
+                ],
+            )
+        return len(resumenes)
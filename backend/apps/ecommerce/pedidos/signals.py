@@ -0,0 +1,37 @@
+# en backend/apps/ecommerce/pedidos/signals.py
+
+from django.db.models.signals import pre_save, post_save
+from django.dispatch import receiver
+from .models import Pedido, ResumenCliente
+
+
+@receiver(pre_save, sender=Pedido)
+def guardar_estado_anterior(sender, instance, **kwargs):
+    """
+    Guarda el estado que tenía el pedido en la BD antes de este save(),
+    para saber en post_save si hubo una transición de estado.
+    """
+    if instance._state.adding:
+        instance._estado_anterior = None
+        return
+    instance._estado_anterior = Pedido.objects.filter(
+        pk=instance.pk
+    ).values_list('estado', flat=True).first()
+
+
+@receiver(post_save, sender=Pedido)
+def actualizar_resumen_cliente(sender, instance, **kwargs):
+    """
+    Mantiene la tabla ResumenCliente al día:
+    - Si el pedido ENTRA en un estado pagado, se suma al resumen del cliente.
+    - Si SALE de un estado pagado (ej. se cancela), se recalcula su resumen.
+    Las transiciones entre estados pagados (PAGADO -> ENVIADO) no cambian nada.
+    """
+    anterior = getattr(instance, '_estado_anterior', None)
+    era_pagado = anterior in ResumenCliente.ESTADOS_PAGADOS
+    es_pagado = instance.estado in ResumenCliente.ESTADOS_PAGADOS
+
+    if es_pagado and not era_pagado:
+        ResumenCliente.registrar_pedido(instance)
+    elif era_pagado and not es_pagado:
+        ResumenCliente.recalcular([instance.email_cliente])
@@ -1,3 +1,209 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from apps.usuarios.models import Address
+from ..carritos.models import Carrito, ItemCarrito
+from ..carritos.tests import LINEAS, crear_variantes, imagen_esperada
+from ..inventario.models import Stock
+from ..pagos.models import Pago
+from ..productos.models import ProductoVariante
+from ..productos.tests import CloudinaryLocal
+from .models import DireccionPedido, ItemPedido, Pedido, ResumenCliente
+
+PEDIDOS = 3
+
+
+class LineasPedidoTests(CloudinaryLocal, TestCase):
+    """
+    Listados y detalle de pedidos (cliente y admin) salen de
+    pedidos_con_detalle: las mismas consultas con 1, 10 o 50 líneas por pedido.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = get_user_model().objects.create(email='cliente@example.com', first_name='Ana')
+        cls.admin = get_user_model().objects.create(email='admin@example.com', is_staff=True, is_superuser=True)
+        cls.variantes = crear_variantes('pd')
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def crear_pedidos(self, lineas):
+        Pedido.objects.all().delete()
+        for _ in range(PEDIDOS):
+            pedido = Pedido.objects.create(usuario=self.usuario, email_cliente=self.usuario.email,
+                                           total_pedido=Decimal('10'))
+            DireccionPedido.objects.create(pedido=pedido, calle_direccion='Calle 1', ciudad='Lima',
+                                           region_estado='Lima', pais='PE', codigo_postal='15001')
+            Pago.objects.create(pedido=pedido, monto=Decimal('10'))
+            ItemPedido.objects.bulk_create([
+                ItemPedido(pedido=pedido, variante=v, cantidad=1, precio_unitario=v.precio)
+                for v in self.variantes[:lineas]
+            ])
+        return pedido
+
+    def comprobar_con_cada_tamaño(self, url, consultas, admin=False):
+        self.client.force_authenticate(self.admin if admin else self.usuario)
+        for lineas in LINEAS:
+            with self.subTest(lineas=lineas):
+                pedido = self.crear_pedidos(lineas)
+                with self.assertNumQueries(consultas):
+                    respuesta = self.client.get(url(pedido))
+                self.assertEqual(respuesta.status_code, 200)
+                datos = respuesta.json()
+                if 'results' in datos:
+                    self.assertEqual(len(datos['results']), PEDIDOS)
+                    datos = datos['results'][0]
+                elif isinstance(datos, list):
+                    self.assertEqual(len(datos), PEDIDOS)
+                    datos = datos[0]
+                self.assertEqual(len(datos['items']), lineas)
+
+    def test_pedidos_del_cliente(self):
+        self.comprobar_con_cada_tamaño(lambda p: reverse('pedido-cliente-list'), 5)
+
+    def test_pedido_del_cliente(self):
+        self.comprobar_con_cada_tamaño(lambda p: reverse('pedido-cliente-detail', args=[p.pk]), 4)
+
+    def test_pedidos_admin(self):
+        self.comprobar_con_cada_tamaño(lambda p: reverse('admin-pedido-list'), 5, admin=True)
+
+    def test_pedido_admin(self):
+        self.comprobar_con_cada_tamaño(lambda p: reverse('admin-pedido-detail', args=[p.pk]), 4, admin=True)
+
+    def test_imagenes_como_sin_prefetch(self):
+        pedido = self.crear_pedidos(LINEAS[-1])
+        self.client.force_authenticate(self.admin)
+        lineas = self.client.get(reverse('admin-pedido-detail', args=[pedido.pk])).json()['items']
+        por_id = ProductoVariante.objects.in_bulk([v.pk for v in self.variantes])
+        urls = [linea['variante']['imagen_url'] for linea in lineas]
+        self.assertEqual(urls, [imagen_esperada(por_id[l['variante']['id']]) for l in lineas])
+        self.assertIn(None, urls)
+
+
+class CrearPedidoTests(CloudinaryLocal, TestCase):
+    """
+    PedidoCreateView descuenta el stock línea a línea (bloqueo por variante),
+    pero la respuesta (pedidos_con_detalle) no añade consultas por línea.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = get_user_model().objects.create(email='cliente@example.com', first_name='Ana')
+        cls.direccion = Address.objects.create(user=cls.usuario, street_address='Calle 1', city='Lima',
+                                               state='Lima', country='PE', postal_code='15001')
+        cls.variantes = crear_variantes('cp')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def consultas_al_crear(self, lineas):
+        Stock.objects.update(cantidad=5)
+        carrito, _ = Carrito.objects.get_or_create(usuario=self.usuario)
+        ItemCarrito.objects.bulk_create([
+            ItemCarrito(carrito=carrito, variante=v, cantidad=1) for v in self.variantes[:lineas]
+        ])
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.post(reverse('pedido-crear'), {'direccion_id': self.direccion.pk})
+        self.assertEqual(respuesta.status_code, 201, respuesta.content)
+        self.assertEqual(len(respuesta.json()['items']), lineas)
+        return [consulta['sql'] for consulta in consultas.captured_queries]
+
+    def test_respuesta_sin_consultas_por_linea(self):
+        for lineas in LINEAS:
+            with self.subTest(lineas=lineas):
+                sql = self.consultas_al_crear(lineas)
+                # Lo que viene después de borrar el carrito es la respuesta: pedido, líneas, imágenes y pagos
+                fin = max(i for i, s in enumerate(sql) if s.startswith('DELETE FROM "carritos_carrito"'))
+                respuesta = [s for s in sql[fin + 1:] if 'SAVEPOINT' not in s]
+                self.assertEqual(len(respuesta), 4, respuesta)
+
+
+class ResumenClienteTests(TestCase):
+    """
+    signals.py mantiene ResumenCliente en las transiciones de estado; el
+    backfill lo reconstruye desde pedidos_pedido.
+    """
+    PAGADO = Pedido.EstadoPedido.PAGADO
+
+    def pedido(self, email, total, estado=Pedido.EstadoPedido.PENDIENTE):
+        return Pedido.objects.create(email_cliente=email, total_pedido=Decimal(total), estado=estado)
+
+    def cambiar(self, pedido, estado):
+        pedido.estado = estado
+        pedido.save()
+
+    def resumen(self, email='ana@example.com'):
+        return ResumenCliente.objects.filter(email_cliente=email).first()
+
+    def test_pagar_suma_al_resumen(self):
+        primero = self.pedido('ana@example.com', '10.00')
+        self.assertIsNone(self.resumen())
+        self.cambiar(primero, self.PAGADO)
+        segundo = self.pedido('ana@example.com', '15.50', estado=self.PAGADO)
+        resumen = self.resumen()
+        self.assertEqual((resumen.total_pedidos, resumen.gasto_total), (2, Decimal('25.50')))
+        self.assertEqual(resumen.fecha_primera_compra, primero.creado_en)
+        self.assertEqual(resumen.fecha_ultima_compra, segundo.creado_en)
+
+    def test_entre_estados_pagados_y_guardados_repetidos_no_cuentan_dos_veces(self):
+        pedido = self.pedido('ana@example.com', '10.00', estado=self.PAGADO)
+        self.cambiar(pedido, Pedido.EstadoPedido.ENVIADO)
+        self.cambiar(pedido, Pedido.EstadoPedido.ENTREGADO)
+        pedido.save()
+        # Una instancia cargada de la BD: _estado_anterior se lee en pre_save
+        Pedido.objects.get(pk=pedido.pk).save()
+        self.assertEqual(self.resumen().total_pedidos, 1)
+
+    def test_cancelar_un_pedido_pagado_recalcula(self):
+        primero = self.pedido('ana@example.com', '10.00', estado=self.PAGADO)
+        segundo = self.pedido('ana@example.com', '20.00', estado=self.PAGADO)
+        self.cambiar(segundo, Pedido.EstadoPedido.CANCELADO)
+        resumen = self.resumen()
+        self.assertEqual((resumen.total_pedidos, resumen.gasto_total), (1, Decimal('10.00')))
+        self.assertEqual(resumen.fecha_ultima_compra, primero.creado_en)
+
+        self.cambiar(Pedido.objects.get(pk=primero.pk), Pedido.EstadoPedido.CANCELADO)
+        self.assertIsNone(self.resumen())
+
+    def test_cancelar_un_pedido_sin_pagar_no_toca_el_resumen(self):
+        self.pedido('ana@example.com', '10.00', estado=self.PAGADO)
+        self.cambiar(self.pedido('ana@example.com', '99.00'), Pedido.EstadoPedido.CANCELADO)
+        self.assertEqual(self.resumen().gasto_total, Decimal('10.00'))
+
+    def test_backfill_reconstruye_desde_los_pedidos(self):
+        fechas = {}
+        for email, total, estado, dia in (
+            ('ana@example.com', '10.00', 'PAGADO', 1), ('ana@example.com', '30.00', 'ENTREGADO', 9),
+            ('ana@example.com', '50.00', 'CANCELADO', 12), ('beto@example.com', '7.00', 'ENVIADO', 3),
+            ('carla@example.com', '5.00', 'PENDIENTE', 4),
+        ):
+            pedido = self.pedido(email, total)
+            fecha = datetime(2024, 3, dia, tzinfo=timezone.utc)
+            # update(): sin señales, como los datos que había antes de la tabla
+            Pedido.objects.filter(pk=pedido.pk).update(estado=estado, creado_en=fecha)
+            fechas.setdefault(email, []).append(fecha)
+        ResumenCliente.objects.all().delete()
+        antes = fechas['beto@example.com'][0]
+        ResumenCliente.objects.create(email_cliente='huerfano@example.com', fecha_primera_compra=antes,
+                                      fecha_ultima_compra=antes, total_pedidos=1, gasto_total=1)
+
+        call_command('backfill_resumen_clientes', batch_size=1, stdout=StringIO())
 
-# Create your tests here.
+        filas = {r.email_cliente: r for r in ResumenCliente.objects.all()}
+        self.assertEqual(set(filas), {'ana@example.com', 'beto@example.com'})
+        ana = filas['ana@example.com']
+        self.assertEqual((ana.total_pedidos, ana.gasto_total), (2, Decimal('40.00')))
+        self.assertEqual((ana.fecha_primera_compra, ana.fecha_ultima_compra),
+                         (fechas['ana@example.com'][0], fechas['ana@example.com'][1]))
+        self.assertEqual(filas['beto@example.com'].gasto_total, Decimal('7.00'))
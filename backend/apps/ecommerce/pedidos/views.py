@@ -1,5 +1,5 @@
 from django.db import transaction # ¡Para transacciones atómicas!
-from django.db.models import F  # Para actualizaciones atómicas
+from django.db.models import F, Prefetch  # F: actualizaciones atómicas
 from rest_framework import viewsets, generics, permissions, status
 from rest_framework.response import Response
 from .models import Pedido, ItemPedido, DireccionPedido
@@ -13,6 +13,19 @@ from apps.ecommerce.carritos.views import get_or_create_cart
 from apps.ecommerce.carritos.models import ItemCarrito
 from apps.usuarios.models import Address as DireccionUsuario
 from apps.ecommerce.inventario.models import Stock
+from apps.ecommerce.productos.catalogo import lineas_con_variante
+
+
+def pedidos_con_detalle(pedidos):
+    """
+    Pedidos listos para PedidoSerializer / AdminPedidoSerializer: dirección
+    (JOIN), pagos y líneas con su variante, producto e imagen principal
+    prefetcheados. Consultas fijas, haya los pedidos y líneas que haya.
+    """
+    return pedidos.select_related('direccion_envio').prefetch_related(
+        Prefetch('items', queryset=lineas_con_variante(ItemPedido.objects.all())),
+        'pagos'
+    )
 
 
 # --- Vistas para el Cliente (Autenticado) ---
@@ -125,7 +138,7 @@ class PedidoCreateView(generics.CreateAPIView):
             )
         
         # 4. Devolver el pedido recién creado
-        read_serializer = PedidoSerializer(pedido)
+        read_serializer = PedidoSerializer(pedidos_con_detalle(Pedido.objects.filter(pk=pedido.pk)).get())
         return Response(read_serializer.data, status=status.HTTP_201_CREATED)
 
 # --- Vistas del Cliente y Admin (Estas se quedan igual) ---
@@ -138,13 +151,13 @@ class PedidoClienteViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Pedido.objects.filter(usuario=self.request.user)
+        return pedidos_con_detalle(Pedido.objects.filter(usuario=self.request.user))
 
 class AdminPedidoViewSet(viewsets.ModelViewSet):
     """
     (ADMIN) ViewSet para gestionar TODOS los pedidos con paginación.
     """
-    queryset = Pedido.objects.all().select_related('usuario').prefetch_related('items__variante__producto', 'pagos').order_by('-creado_en')
+    queryset = pedidos_con_detalle(Pedido.objects.select_related('usuario')).order_by('-creado_en')
     permission_classes = [permissions.IsAdminUser]
     
     def get_serializer_class(self):
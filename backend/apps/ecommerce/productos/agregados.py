@@ -0,0 +1,115 @@
+# productos/agregados.py
+"""
+Columnas desnormalizadas del catálogo, para ordenar, filtrar e indexar en SQL:
+
+- ProductoVariante.precio_efectivo: precio_oferta si la hay (y no es 0), si
+  no precio; lo mismo que ItemCarrito.precio_final.
+- ProductoVariante.stock_disponible: suma del stock en todos los almacenes
+  (lo mismo que stock_total).
+- Producto.precio_min: el menor precio_efectivo de sus variantes activas
+  (None si no tiene ninguna) y Producto.en_stock: alguna variante activa
+  con stock.
+
+Las señales (signals.py) los recalculan en la misma transacción que el
+cambio de stock, de precio, de variantes o cualquier save() del producto
+(que escribe todas sus columnas), con UPDATE ... SET = (subconsulta):
+siempre el valor real, sin ir sumando deltas. Antes se bloquea la fila del
+producto (select_for_update), así dos transacciones que tocan el mismo
+producto no se pisan: la segunda recalcula cuando la primera ya confirmó.
+
+queryset.update() y bulk_create() no disparan señales: quien los use debe
+llamar a actualizar_productos() (con_variantes=True si no rellenó las
+columnas de las variantes). El comando reconciliar_agregados encuentra y
+corrige cualquier desajuste.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, NullIf
+
+from .models import Producto, ProductoVariante
+from ..inventario.models import Stock
+
+# En SQL, lo mismo que precio_efectivo() (0 cuenta como sin oferta)
+PRECIO_EFECTIVO = Coalesce(NullIf('precio_oferta', Value(Decimal(0))), 'precio')
+
+
+def precio_efectivo(precio, precio_oferta):
+    return precio_oferta or precio
+
+
+def stock_sumado():
+    """Expresión: stock total de la variante (OuterRef) en todos los almacenes."""
+    return Coalesce(
+        Subquery(
+            Stock.objects.filter(variante=OuterRef('pk')).order_by().values('variante')
+            .annotate(total=Sum('cantidad')).values('total')
+        ),
+        0,
+    )
+
+
+def agregados_producto():
+    """Expresiones de precio_min y en_stock del producto (OuterRef) según sus variantes activas."""
+    activas = ProductoVariante.objects.filter(producto=OuterRef('pk'), activo=True)
+    return {
+        'precio_min': Subquery(activas.order_by('precio_efectivo').values('precio_efectivo')[:1]),
+        'en_stock': Exists(activas.filter(stock_disponible__gt=0)),
+    }
+
+
+def _bloquear(productos):
+    # Una sentencia aparte: el UPDATE que viene después ve lo que confirmó quien tenía el bloqueo
+    list(productos.select_for_update(of=('self',)).order_by('pk').values_list('pk', flat=True))
+
+
+def actualizar_variantes(variante_ids):
+    """Recalcula las variantes indicadas (precio y stock) y los productos a los que pertenecen."""
+    variante_ids = list(variante_ids)
+    with transaction.atomic():
+        productos = Producto.objects.filter(variantes__id__in=variante_ids)
+        _bloquear(productos)
+        ProductoVariante.objects.filter(pk__in=variante_ids).update(
+            precio_efectivo=PRECIO_EFECTIVO, stock_disponible=stock_sumado()
+        )
+        Producto.objects.filter(pk__in=productos.values('pk')).update(**agregados_producto())
+
+
+def actualizar_productos(producto_ids, con_variantes=False):
+    """Recalcula precio_min / en_stock de los productos (y antes sus variantes, si con_variantes)."""
+    producto_ids = list(producto_ids)
+    with transaction.atomic():
+        _bloquear(Producto.objects.filter(pk__in=producto_ids))
+        if con_variantes:
+            ProductoVariante.objects.filter(producto_id__in=producto_ids).update(
+                precio_efectivo=PRECIO_EFECTIVO, stock_disponible=stock_sumado()
+            )
+        Producto.objects.filter(pk__in=producto_ids).update(**agregados_producto())
+
+
+def desajustes(desde=0, tamano=1000):
+    """
+    Compara las columnas guardadas con su valor real para los productos con
+    id > desde (un lote de `tamano`). Devuelve (ids de productos del lote,
+    ids de productos con algún desajuste en ellos o en sus variantes).
+    """
+    ids = list(Producto.objects.filter(pk__gt=desde).order_by('pk').values_list('pk', flat=True)[:tamano])
+    if not ids:
+        return [], set()
+    variantes = ProductoVariante.objects.filter(producto_id__in=ids).annotate(
+        _precio=PRECIO_EFECTIVO, _stock=stock_sumado()
+    ).values_list('producto_id', 'precio_efectivo', '_precio', 'stock_disponible', '_stock')
+    malos = {
+        producto for producto, precio, real_precio, stock, real_stock in variantes
+        if precio != real_precio or stock != real_stock
+    }
+    reales = agregados_producto()
+    productos = Producto.objects.filter(pk__in=ids).annotate(
+        _precio_min=reales['precio_min'], _en_stock=reales['en_stock']
+    ).values_list('pk', 'precio_min', '_precio_min', 'en_stock', '_en_stock')
+    malos |= {
+        pk for pk, precio_min, real_precio_min, en_stock, real_en_stock in productos
+        if precio_min != real_precio_min or en_stock != real_en_stock
+    }
+    return ids, malos
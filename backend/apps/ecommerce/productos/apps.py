@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ProductosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.ecommerce.productos'
+
+    def ready(self):
+        try:
+            import apps.ecommerce.productos.signals
+        except ImportError:
+            pass
@@ -0,0 +1,89 @@
+# productos/arbol.py
+"""
+Árbol de categorías del menú público.
+
+Se cargan TODAS las categorías en una sola consulta, se agrupan por padre en
+memoria y el CategoriaSerializer de siempre anida los hijos desde ese mapa
+(sin una consulta por nodo). El árbol serializado se guarda en la caché.
+
+La clave de la caché lleva un sello leído de la BD (número de categorías y
+último Categoria.actualizado_en), como Producto.version en los fragmentos:
+una alta, cambio o baja hecha en CUALQUIER proceso cambia el sello, así
+ningún worker sirve un menú viejo aunque la caché sea la LocMemCache de cada
+proceso. Comprobarlo es una consulta agregada por petición.
+
+Junto al árbol se cachea su huella (md5 del JSON). La huella y el último
+actualizado_en son el ETag y el Last-Modified del menú (condicional.py): un
+GET condicional con la caché caliente solo hace la consulta del sello. Ambos
+dependen solo de la BD, iguales en todos los procesos.
+"""
+import hashlib
+import json
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .models import Categoria
+
+CLAVE_CACHE_ARBOL = 'productos:arbol_categorias:v3'
+
+
+def cargar_categorias():
+    """
+    Una consulta: devuelve (raíces, hijos_por_padre) con los objetos Categoria.
+    Se ordena por id, igual que CategoriaSerializer.get_hijos sin mapa.
+    """
+    raices = []
+    hijos_por_padre = defaultdict(list)
+    for categoria in Categoria.objects.order_by('id'):
+        if categoria.padre_id is None:
+            raices.append(categoria)
+        else:
+            hijos_por_padre[categoria.padre_id].append(categoria)
+    return raices, hijos_por_padre
+
+
+def construir_arbol():
+    """Lista de categorías raíz serializadas con sus 'hijos' anidados."""
+    from .serializers import CategoriaSerializer
+
+    raices, hijos_por_padre = cargar_categorias()
+    return CategoriaSerializer(raices, many=True, context={'hijos_por_padre': hijos_por_padre}).data
+
+
+def sello_arbol():
+    """
+    (número de categorías, último actualizado_en) en una consulta. Cambia con
+    cualquier save(), delete() o bulk_create(); quien use queryset.update()
+    debe mover actualizado_en también.
+    """
+    sello = Categoria.objects.aggregate(total=Count('id'), ultimo=Max('actualizado_en'))
+    return sello['total'], sello['ultimo']
+
+
+def _clave(sello):
+    total, ultimo = sello
+    return f"{CLAVE_CACHE_ARBOL}:{total}:{ultimo.timestamp() if ultimo else 0}"
+
+
+def entrada_arbol():
+    """
+    {'arbol', 'huella', 'modificado'} del árbol vigente: de la caché si el
+    sello no cambió, si no se construye (una consulta más).
+    """
+    sello = sello_arbol()
+    clave = _clave(sello)
+    entrada = cache.get(clave)
+    if entrada is None:
+        arbol = construir_arbol()
+        huella = hashlib.md5(json.dumps(arbol, sort_keys=True, default=str).encode()).hexdigest()
+        entrada = {'arbol': arbol, 'huella': huella, 'modificado': sello[1]}
+        cache.set(clave, entrada, settings.CATALOGO_CACHE_TTL)
+    return entrada
+
+
+def invalidar_arbol():
+    """Descarta el árbol cacheado en ESTE proceso (fuerza a reconstruirlo, p. ej. en benchmarks)."""
+    cache.delete(_clave(sello_arbol()))
@@ -0,0 +1,346 @@
+# productos/busqueda.py
+"""
+Búsqueda de productos (GET /api/productos/buscar/?q=...).
+
+Dos backends con la misma interfaz (BackendBusqueda), según
+settings.BUSQUEDA_BACKEND:
+
+- 'memoria'  IndiceInvertido: token -> {producto_id: peso} en cada proceso.
+- 'postgres' BusquedaPostgres: tabla ProductoBusqueda con un tsvector
+             ponderado y, si el servidor trae pg_trgm, trigramas que
+             toleran errores de tipeo.
+
+Los dos indexan solo productos activos, normalizan igual (minúsculas, sin
+tildes, sin palabras vacías), ponderan nombre > categorías > valores de
+atributo > descripción y aceptan prefijos en la última palabra ("cami").
+
+El índice en memoria se mantiene al día como todos los de indices.py: en
+la consulta solo se reindexan los productos anotados en ProductoCambio
+desde la última sincronización. La tabla de Postgres no se toca al buscar:
+la actualiza el proceso que hizo el cambio, al confirmarse la transacción
+(reindexar_cambios, desde signals.py), y el comando reindexar_busqueda la
+concilia entera.
+"""
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+from django.db import connection
+from django.db.models import F, Q
+
+from .indices import IndiceVersionado, lotes_activos, purgar_cambios
+from .models import Producto, ProductoBusqueda, ProductoVariante
+
+PALABRAS_VACIAS = {
+    'a', 'al', 'con', 'de', 'del', 'el', 'en', 'la', 'las', 'lo', 'los',
+    'para', 'por', 'sin', 'un', 'una', 'unos', 'unas', 'y', 'o',
+}
+# Peso de cada campo en la relevancia (en Postgres: A, B, C, D)
+PESOS = {'nombre': 3.0, 'categorias': 2.0, 'valores': 1.5, 'descripcion': 1.0}
+# Una coincidencia por prefijo puntúa algo menos que la palabra exacta
+FACTOR_PREFIJO = 0.8
+MAX_EXPANSIONES_PREFIJO = 200
+LOTE = 1000
+
+_PALABRA = re.compile(r'\w+')
+
+
+def normalizar(texto):
+    """Minúsculas y sin tildes: 'Algodón' -> 'algodon'."""
+    texto = unicodedata.normalize('NFKD', texto or '').lower()
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+
+def tokenizar(texto):
+    return [t for t in _PALABRA.findall(normalizar(texto)) if t not in PALABRAS_VACIAS]
+
+
+def documentos(ids=None):
+    """
+    Genera un dict por producto ACTIVO con sus textos a indexar:
+    id, version, nombre, categorias (migas de pan), valores, descripcion.
+    Dos consultas por lote: productos y valores de sus variantes activas.
+    """
+    for productos in lotes_activos(ids, LOTE):
+        yield from _documentos_lote(productos)
+
+
+def _documentos_lote(productos):
+    filas = list(productos.values_list('id', 'version', 'nombre', 'descripcion', 'categoria__nombre_completo'))
+    valores = defaultdict(set)
+    relacion = ProductoVariante.valores.through.objects.filter(
+        productovariante__producto_id__in=[fila[0] for fila in filas],
+        productovariante__activo=True,
+    )
+    for producto_id, valor in relacion.values_list('productovariante__producto_id', 'valoratributo__valor'):
+        valores[producto_id].add(valor)
+    for producto_id, version, nombre, descripcion, categorias in filas:
+        yield {
+            'id': producto_id,
+            'version': version,
+            'nombre': nombre,
+            'categorias': categorias or '',
+            'valores': ' '.join(sorted(valores[producto_id])),
+            'descripcion': descripcion,
+        }
+
+
+class BackendBusqueda(IndiceVersionado):
+    """Interfaz común: buscar() devuelve ids de producto ordenados por relevancia."""
+
+    nombre = ''
+
+    def buscar(self, consulta, limite=None):
+        tokens = tokenizar(consulta)
+        if not tokens:
+            return []
+        self._sincronizar_si_toca()
+        return self._buscar(tokens, limite or settings.BUSQUEDA_MAX_RESULTADOS)
+
+    def _buscar(self, tokens, limite):
+        raise NotImplementedError
+
+
+class IndiceInvertido(BackendBusqueda):
+    """
+    Índice invertido en memoria. Relevancia: para cada palabra de la
+    consulta, peso del campo x idf; todas las palabras deben aparecer (AND).
+    """
+
+    nombre = 'memoria'
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.RLock()
+        self._postings = {}       # token -> {producto_id: peso}
+        self._tokens_doc = {}     # producto_id -> tokens (para desindexar)
+        self._versiones = {}      # producto_id -> Producto.version indexada
+        self._vocabulario = None  # Tokens ordenados para los prefijos (perezoso)
+
+    # --- Mantenimiento ---
+
+    @staticmethod
+    def _pesos(documento):
+        pesos = defaultdict(float)
+        for campo, peso in PESOS.items():
+            for token in set(tokenizar(documento[campo])):
+                pesos[token] += peso
+        return pesos
+
+    def _indexar(self, documento):
+        producto_id = documento['id']
+        self._desindexar(producto_id)
+        pesos = self._pesos(documento)
+        for token, peso in pesos.items():
+            self._postings.setdefault(token, {})[producto_id] = peso
+        self._tokens_doc[producto_id] = tuple(pesos)
+        self._versiones[producto_id] = documento['version']
+        self._vocabulario = None
+
+    def _desindexar(self, producto_id):
+        for token in self._tokens_doc.pop(producto_id, ()):
+            posting = self._postings[token]
+            posting.pop(producto_id, None)
+            if not posting:
+                del self._postings[token]
+        self._versiones.pop(producto_id, None)
+        self._vocabulario = None
+
+    def reconstruir(self):
+        documentos_catalogo = list(documentos())
+        with self._lock:
+            self._postings, self._tokens_doc, self._versiones = {}, {}, {}
+            for documento in documentos_catalogo:
+                self._indexar(documento)
+        return len(documentos_catalogo)
+
+    def actualizar(self, ids):
+        actuales = dict(Producto.objects.filter(id__in=ids, activo=True).values_list('id', 'version'))
+        cambiados = [i for i, version in actuales.items() if self._versiones.get(i) != version]
+        borrados = [i for i in ids if i not in actuales and i in self._versiones]
+        nuevos = list(documentos(cambiados)) if cambiados else []
+        with self._lock:
+            for producto_id in borrados:
+                self._desindexar(producto_id)
+            for documento in nuevos:
+                self._indexar(documento)
+        return len(nuevos) + len(borrados)
+
+    # --- Consulta ---
+
+    def _terminos(self, token, prefijo):
+        if not prefijo:
+            return [token] if token in self._postings else []
+        if self._vocabulario is None:
+            self._vocabulario = sorted(self._postings)
+        terminos = []
+        for termino in self._vocabulario[bisect_left(self._vocabulario, token):]:
+            if not termino.startswith(token) or len(terminos) >= MAX_EXPANSIONES_PREFIJO:
+                break
+            terminos.append(termino)
+        return terminos
+
+    def _buscar(self, tokens, limite):
+        with self._lock:
+            total = len(self._versiones) or 1
+            puntuaciones = None
+            for posicion, token in enumerate(tokens):
+                parcial = {}
+                for termino in self._terminos(token, prefijo=posicion == len(tokens) - 1):
+                    posting = self._postings[termino]
+                    idf = math.log(1 + total / len(posting))
+                    factor = idf if termino == token else idf * FACTOR_PREFIJO
+                    for producto_id, peso in posting.items():
+                        puntos = peso * factor
+                        if puntos > parcial.get(producto_id, 0.0):
+                            parcial[producto_id] = puntos
+                if puntuaciones is None:
+                    puntuaciones = parcial
+                else:
+                    puntuaciones = {i: p + parcial[i] for i, p in puntuaciones.items() if i in parcial}
+                if not puntuaciones:
+                    return []
+        # A igual relevancia, primero los más nuevos (id mayor)
+        mejores = heapq.nlargest(limite, puntuaciones.items(), key=lambda item: (item[1], item[0]))
+        return [producto_id for producto_id, _ in mejores]
+
+    def estadisticas(self):
+        with self._lock:
+            return {'productos': len(self._versiones), 'tokens': len(self._postings)}
+
+
+class BusquedaPostgres(BackendBusqueda):
+    """
+    Full-text (tsvector 'simple' ponderado, prefijo en la última palabra) y,
+    para errores de tipeo, similitud de trigramas sobre nombre + categorías + valores.
+    """
+
+    nombre = 'postgres'
+    # ts_rank espera los pesos en orden D, C, B, A
+    PESOS_RANGO = [PESOS[campo] / PESOS['nombre'] for campo in ('descripcion', 'valores', 'categorias', 'nombre')]
+
+    def __init__(self):
+        super().__init__()
+        self._trigramas = None
+
+    @property
+    def trigramas(self) -> bool:
+        """pg_trgm es contrib: si el servidor no lo tiene se busca sin tolerancia a erratas."""
+        if self._trigramas is None:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+                self._trigramas = cursor.fetchone() is not None
+        return self._trigramas
+
+    def _guardar(self, documentos_lote):
+        filas = [
+            ProductoBusqueda(
+                producto_id=d['id'],
+                version=d['version'],
+                nombre=normalizar(d['nombre']),
+                categorias=normalizar(d['categorias']),
+                valores=normalizar(d['valores']),
+                descripcion=normalizar(d['descripcion']),
+                texto=normalizar(f"{d['nombre']} {d['categorias']} {d['valores']}"),
+            )
+            for d in documentos_lote
+        ]
+        if not filas:
+            return 0
+        campos = ['version', 'nombre', 'categorias', 'valores', 'descripcion', 'texto']
+        ProductoBusqueda.objects.bulk_create(filas, update_conflicts=True, unique_fields=['producto'],
+                                             update_fields=campos)
+        ProductoBusqueda.objects.filter(producto_id__in=[f.producto_id for f in filas]).update(
+            vector=SearchVector('nombre', weight='A', config='simple')
+            + SearchVector('categorias', weight='B', config='simple')
+            + SearchVector('valores', weight='C', config='simple')
+            + SearchVector('descripcion', weight='D', config='simple')
+        )
+        return len(filas)
+
+    def _guardar_por_lotes(self, docs):
+        total, lote = 0, []
+        for documento in docs:
+            lote.append(documento)
+            if len(lote) >= LOTE:
+                total += self._guardar(lote)
+                lote = []
+        return total + self._guardar(lote)
+
+    def _sincronizar_si_toca(self):
+        """La tabla ya está al día (reindexar_cambios): buscar no reindexa nada."""
+
+    def reconstruir(self):
+        ProductoBusqueda.objects.all().delete()
+        return self._guardar_por_lotes(documentos())
+
+    def actualizar(self, ids):
+        borrados, _ = ProductoBusqueda.objects.filter(producto_id__in=ids, producto__activo=False).delete()
+        desfasados = list(
+            Producto.objects.filter(id__in=ids, activo=True)
+            .filter(Q(busqueda__isnull=True) | ~Q(busqueda__version=F('version')))
+            .values_list('id', flat=True)
+        )
+        purgar_cambios()
+        return borrados + (self._guardar_por_lotes(documentos(desfasados)) if desfasados else 0)
+
+    def sincronizar(self, forzar=False):
+        """Concilia la tabla entera con el catálogo (comando reindexar_busqueda)."""
+        borrados, _ = ProductoBusqueda.objects.filter(producto__activo=False).delete()
+        desfasados = list(
+            Producto.objects.filter(activo=True)
+            .filter(Q(busqueda__isnull=True) | ~Q(busqueda__version=F('version')))
+            .values_list('id', flat=True)
+        )
+        return borrados + (self._guardar_por_lotes(documentos(desfasados)) if desfasados else 0)
+
+    def _buscar(self, tokens, limite):
+        # Los tokens solo tienen caracteres \w: se pueden pasar como tsquery 'raw'
+        consulta = SearchQuery(' & '.join(tokens[:-1] + [f'{tokens[-1]}:*']), search_type='raw', config='simple')
+        resultados = ProductoBusqueda.objects.annotate(
+            rango=SearchRank(F('vector'), consulta, weights=self.PESOS_RANGO),
+        )
+        if self.trigramas:
+            texto = ' '.join(tokens)
+            resultados = (
+                resultados
+                .filter(Q(vector=consulta) | Q(texto__trigram_word_similar=texto))
+                .annotate(similitud=TrigramWordSimilarity(texto, 'texto'))
+                .order_by('-rango', '-similitud', '-producto_id')
+            )
+        else:
+            resultados = resultados.filter(vector=consulta).order_by('-rango', '-producto_id')
+        return list(resultados.values_list('producto_id', flat=True)[:limite])
+
+
+BACKENDS = {backend.nombre: backend for backend in (IndiceInvertido, BusquedaPostgres)}
+
+
+def reindexar_cambios(ids):
+    """
+    Al confirmarse un cambio de productos (signals.py): con el backend
+    Postgres actualiza sus filas en ProductoBusqueda; el índice en memoria
+    se sincroniza solo en la próxima búsqueda.
+    """
+    if settings.BUSQUEDA_BACKEND == BusquedaPostgres.nombre:
+        obtener_backend().actualizar(ids)
+
+_backend = None
+_lock_backend = threading.Lock()
+
+
+def obtener_backend():
+    """Backend configurado en BUSQUEDA_BACKEND (uno por proceso)."""
+    global _backend
+    if _backend is None:
+        with _lock_backend:
+            if _backend is None:
+                _backend = BACKENDS[settings.BUSQUEDA_BACKEND]()
+    return _backend
+
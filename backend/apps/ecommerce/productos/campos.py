@@ -0,0 +1,100 @@
+# productos/campos.py
+"""
+Campos a la carta en los serializadores del catálogo:
+
+    ?fields=id,nombre,variantes.precio   solo esos campos (con '.' se entra
+                                         en los anidados; 'variantes' solo
+                                         los trae enteros)
+    ?expand=variantes,imagenes_galeria   añade campos pesados que el
+                                         serializador no trae por defecto
+                                         (Meta.expandibles)
+
+Los nombres desconocidos se ignoran. Solo aplica en lecturas (GET/HEAD):
+al crear o editar el serializador valida y responde con todos sus campos.
+
+Los fragmentos cacheados (fragmentos.py) se guardan SIEMPRE completos y se
+recortan con recortar() al responder, así una petición con ?fields= no
+ensucia la caché de las demás.
+"""
+from rest_framework import serializers
+
+METODOS_LECTURA = ('GET', 'HEAD')
+
+
+def _lista(parametros, nombre):
+    return [v.strip() for valor in parametros.getlist(nombre) for v in valor.split(',') if v.strip()]
+
+
+def campos_pedidos(request):
+    """
+    Árbol de ?fields= ({'id': None, 'variantes': {'precio': None}}, None =
+    el campo entero) o None si no se pidió o no es una lectura.
+    """
+    if request is None or request.method not in METODOS_LECTURA:
+        return None
+    rutas = _lista(request.query_params, 'fields')
+    if not rutas:
+        return None
+    arbol = {}
+    for ruta in rutas:
+        nodo = arbol
+        *padres, hoja = ruta.split('.')
+        for padre in padres:
+            if padre in nodo and nodo[padre] is None:
+                break  # Ya se pidió entero
+            nodo = nodo.setdefault(padre, {})
+        else:
+            nodo[hoja] = None
+    return arbol
+
+
+def expansiones_pedidas(request):
+    if request is None or request.method not in METODOS_LECTURA:
+        return []
+    return _lista(request.query_params, 'expand')
+
+
+def recortar(datos, arbol):
+    """Copia de `datos` (dict o lista de dicts serializados) con solo los campos del árbol."""
+    if not arbol:
+        return datos
+    if isinstance(datos, list):
+        return [recortar(item, arbol) for item in datos]
+    if not isinstance(datos, dict):
+        return datos
+    return {clave: recortar(valor, arbol[clave]) for clave, valor in datos.items() if clave in arbol}
+
+
+def _recortar_serializador(serializador, arbol):
+    for nombre in list(serializador.fields):
+        if nombre not in arbol:
+            serializador.fields.pop(nombre)
+        elif arbol[nombre]:
+            anidado = serializador.fields[nombre]
+            anidado = getattr(anidado, 'child', anidado)
+            if isinstance(anidado, serializers.BaseSerializer):
+                _recortar_serializador(anidado, arbol[nombre])
+
+
+class CamposDinamicosMixin:
+    """
+    Aplica ?fields= y ?expand= de la petición del contexto al serializador
+    raíz (también a cada hijo de many=True). Los anidados se recortan desde
+    su padre. Con context['completo'] se ignoran (fragmentos cacheados).
+
+    Meta.expandibles: {'nombre': función que devuelve el campo}.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        contexto = kwargs.get('context') or {}
+        request = contexto.get('request')
+        if request is None or contexto.get('completo'):
+            return
+        expandibles = getattr(self.Meta, 'expandibles', {})
+        for nombre in expansiones_pedidas(request):
+            if nombre in expandibles and nombre not in self.fields:
+                self.fields[nombre] = expandibles[nombre]()
+        arbol = campos_pedidos(request)
+        if arbol:
+            _recortar_serializador(self, arbol)
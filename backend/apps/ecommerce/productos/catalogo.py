@@ -0,0 +1,109 @@
+# productos/catalogo.py
+"""
+Capa de consultas del catálogo.
+
+Todas las vistas que serializan productos o variantes (catálogo público,
+detalle y admin) construyen sus querysets aquí, así cargan lo mismo y en
+el mismo número de consultas, sin importar cuántos productos/variantes
+haya en la página:
+
+    productos + categoría (JOIN)
+    atributos, variantes, valores + atributo (JOIN), stock + almacén (JOIN), imágenes
+
+El stock por almacén llega prefetcheado y ProductoVariante.stock_total lo
+suma en memoria en lugar de lanzar un aggregate por variante.
+
+productos_resumen() es la versión para la rejilla del catálogo
+(ProductoResumenSerializer): una sola consulta con el rango de precios,
+la disponibilidad y la imagen principal. precio_min y en_stock son columnas
+de Producto (agregados.py); precio_max y la imagen se calculan en SQL.
+
+lineas_con_variante() carga las líneas de carrito y de pedido
+(CartProductVariantSerializer) con su variante, producto e imagen principal.
+"""
+from django.db.models import OuterRef, Prefetch, Subquery
+
+from .models import Producto, ProductoVariante, ValorAtributo, ImagenProducto
+
+
+def variantes_catalogo(variantes=None):
+    """Variantes con sus valores y su stock por almacén ya cargados."""
+    if variantes is None:
+        variantes = ProductoVariante.objects.all()
+    return variantes.prefetch_related(
+        Prefetch(
+            'valores',
+            queryset=ValorAtributo.objects.select_related('atributo')
+        ),
+        'stock_records__almacen'
+    )
+
+
+def productos_catalogo(productos=None, variantes=None):
+    """
+    Productos listos para ProductoSerializer.
+    productos: queryset base (ej. solo activos); variantes: qué variantes
+    anidar (ej. solo activas). Por defecto, todos/todas.
+    """
+    if productos is None:
+        productos = Producto.objects.all()
+    return productos.select_related(
+        'categoria'
+    ).prefetch_related(
+        'atributos',
+        Prefetch('variantes', queryset=variantes_catalogo(variantes)),
+        Prefetch(
+            'imagenes',
+            queryset=ImagenProducto.objects.order_by('-es_principal')
+        )
+    )
+
+
+def productos_resumen(productos=None, expandir=()):
+    """
+    Productos listos para ProductoResumenSerializer, solo con variantes activas:
+    precio_max (el precio efectivo más alto) e imagen_principal anotados en
+    la misma consulta; precio_min y en_stock ya vienen en la fila.
+    expandir: campos de ?expand= que hay que prefetchear (variantes,
+    imagenes_galeria, atributos).
+    """
+    if productos is None:
+        productos = Producto.objects.all()
+    productos = productos.select_related('categoria').annotate(
+        precio_max=Subquery(
+            ProductoVariante.objects.filter(producto=OuterRef('pk'), activo=True)
+            .order_by('-precio_efectivo').values('precio_efectivo')[:1]
+        ),
+        imagen_principal=Subquery(
+            ImagenProducto.objects.filter(producto=OuterRef('pk'))
+            .order_by('-es_principal', 'id').values('imagen')[:1],
+            output_field=ImagenProducto._meta.get_field('imagen'),
+        ),
+    )
+    if 'variantes' in expandir:
+        productos = productos.prefetch_related(
+            Prefetch('variantes', queryset=variantes_catalogo(ProductoVariante.objects.filter(activo=True)))
+        )
+    if 'imagenes_galeria' in expandir:
+        productos = productos.prefetch_related(
+            Prefetch('imagenes', queryset=ImagenProducto.objects.order_by('-es_principal'))
+        )
+    if 'atributos' in expandir:
+        productos = productos.prefetch_related('atributos')
+    return productos
+
+
+def lineas_con_variante(lineas):
+    """
+    Líneas de carrito o de pedido (queryset de ItemCarrito / ItemPedido)
+    listas para CartProductVariantSerializer: variante y producto en el mismo
+    JOIN y la imagen principal de cada producto prefetcheada en
+    producto.imagenes_principales. Dos consultas, haya las líneas que haya.
+    """
+    return lineas.select_related('variante__producto').prefetch_related(
+        Prefetch(
+            'variante__producto__imagenes',
+            queryset=ImagenProducto.objects.filter(es_principal=True).order_by('id'),
+            to_attr='imagenes_principales'
+        )
+    )
@@ -0,0 +1,41 @@
+# productos/condicional.py
+"""
+GET condicional (ETag / Last-Modified) para el catálogo público.
+
+La vista obtiene la versión de lo que va a devolver con algo barato (el id,
+la versión y actualizado_en del producto, o la huella del árbol de
+categorías cacheado) ANTES de serializar. Si el cliente manda
+If-None-Match / If-Modified-Since y siguen valiendo, se responde 304 sin
+cuerpo; si no, la respuesta normal lleva ETag y Last-Modified para la
+próxima vez.
+
+Los ETag son débiles (W/"..."): la misma versión sale igual en JSON que en
+la API navegable. Incluyen la query string, que cambia la representación
+(?fields=, ?page=...).
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def etag_debil(request, *version):
+    """ETag débil a partir de las partes de la versión y de la query string."""
+    partes = (*version, request.META.get('QUERY_STRING', ''))
+    return 'W/"%s"' % hashlib.md5('|'.join(map(str, partes)).encode()).hexdigest()
+
+
+def no_modificado(request, etag, modificado=None):
+    """Respuesta 304 (o 412) si el cliente ya tiene esta versión; si no, None."""
+    return get_conditional_response(
+        request, etag=etag, last_modified=int(modificado.timestamp()) if modificado else None
+    )
+
+
+def con_validadores(respuesta, etag, modificado=None):
+    """Añade ETag y Last-Modified a una respuesta 200 o 304."""
+    if respuesta.status_code in (200, 304):
+        respuesta['ETag'] = etag
+        if modificado:
+            respuesta['Last-Modified'] = http_date(modificado.timestamp())
+    return respuesta
@@ -0,0 +1,371 @@
+# productos/facetas.py
+"""
+Catálogo filtrado por facetas con conteos precalculados
+(GET /api/productos/facetas/?categoria=hombre&talla=M,L&color=rojo&precio=25-50).
+
+IndiceFacetas guarda en la memoria de cada proceso un bitset (un int de
+Python, un bit por producto) por cada valor de atributo, rango de precio y
+categoría. Filtrar es hacer OR/AND de enteros y contar es int.bit_count():
+ninguna consulta GROUP BY por faceta en cada petición.
+
+- Dentro de una faceta los valores se combinan con OR y entre facetas con
+  AND. Los conteos de una faceta aplican los filtros de las DEMÁS, así se ve
+  cuántos productos habría al marcar otro valor de la misma faceta.
+- Un producto tiene un valor o un rango de precio si lo tiene alguna de sus
+  variantes ACTIVAS (talla=M&color=rojo: alguna variante M y alguna roja).
+  El precio es el efectivo de la variante (el de oferta si lo tiene).
+- Los bits siguen el orden de creación de los productos: el bit más alto es
+  el más nuevo, y el listado sale en el orden de /productos/ (-creado_en)
+  sin ordenar nada.
+
+Se mantiene al día como los demás índices de indices.py: solo se reindexan
+los productos anotados en ProductoCambio.
+"""
+import threading
+from bisect import bisect_right
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.text import slugify
+
+from .busqueda import normalizar
+from .indices import IndiceVersionado, lotes_activos
+from .models import Atributo, Categoria, Producto, ProductoVariante, ValorAtributo
+
+LOTE = 1000
+# Parámetros de la lista y del filtrado que no pueden ser el nombre de un atributo
+PARAMETROS_RESERVADOS = {
+    'categoria', 'precio', 'disponible', 'page', 'page_size', 'format', 'fields', 'expand', 'vista',
+    'orden', 'cursor', 'paginacion', 'total',
+}
+# Bits a 1 de cada byte: al paginar se saltan bytes enteros
+_UNOS = bytes(bin(i).count('1') for i in range(256))
+
+
+def rangos_precio():
+    """[(clave, mínimo, máximo)]: '0-25', '25-50', ..., '200-' (sin máximo)."""
+    limites = [0] + list(settings.FACETAS_RANGOS_PRECIO)
+    rangos = [(f'{minimo}-{maximo}', minimo, maximo) for minimo, maximo in zip(limites, limites[1:])]
+    rangos.append((f'{limites[-1]}-', limites[-1], None))
+    return rangos
+
+
+def documentos_facetas(ids=None):
+    """
+    Genera un dict por producto ACTIVO: id, version, creado_en, categoria_id
+    y los valores y rangos de precio de sus variantes activas.
+    Tres consultas por lote: productos, precios y valores de las variantes.
+    """
+    limites = settings.FACETAS_RANGOS_PRECIO
+    for productos in lotes_activos(ids, LOTE):
+        filas = list(productos.values_list('id', 'version', 'creado_en', 'categoria_id'))
+        lote = [fila[0] for fila in filas]
+        valores, rangos = defaultdict(set), defaultdict(set)
+        variantes = ProductoVariante.objects.filter(producto_id__in=lote, activo=True)
+        for producto_id, precio in variantes.values_list('producto_id', 'precio_efectivo'):
+            rangos[producto_id].add(bisect_right(limites, precio))
+        relacion = ProductoVariante.valores.through.objects.filter(
+            productovariante__producto_id__in=lote, productovariante__activo=True,
+        )
+        for producto_id, valor_id in relacion.values_list('productovariante__producto_id', 'valoratributo_id'):
+            valores[producto_id].add(valor_id)
+        for producto_id, version, creado_en, categoria_id in filas:
+            yield {
+                'id': producto_id,
+                'version': version,
+                'creado_en': creado_en,
+                'categoria_id': categoria_id,
+                'valores': valores[producto_id],
+                'rangos': rangos[producto_id],
+            }
+
+
+def _claves(documento):
+    return frozenset(
+        [('categoria', documento['categoria_id'])]
+        + [('valor', valor_id) for valor_id in documento['valores']]
+        + [('precio', rango) for rango in documento['rangos']]
+    )
+
+
+def _orden(documento):
+    return documento['creado_en'], documento['id']
+
+
+def _bitset(posiciones):
+    bits = bytearray(max(posiciones, default=-1) // 8 + 1)
+    for posicion in posiciones:
+        bits[posicion >> 3] |= 1 << (posicion & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def _bits_desde_arriba(bits, saltar, cuantos):
+    """Posiciones de los bits a 1 de mayor a menor, saltando los `saltar` primeros."""
+    posiciones = []
+    if cuantos <= 0:
+        return posiciones
+    datos = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+    for indice in range(len(datos) - 1, -1, -1):
+        byte = datos[indice]
+        if not byte:
+            continue
+        if saltar >= _UNOS[byte]:
+            saltar -= _UNOS[byte]
+            continue
+        for bit in range(7, -1, -1):
+            if not byte >> bit & 1:
+                continue
+            if saltar:
+                saltar -= 1
+                continue
+            posiciones.append(indice * 8 + bit)
+            if len(posiciones) == cuantos:
+                return posiciones
+    return posiciones
+
+
+class ResultadoFacetas:
+    """
+    Ids de los productos filtrados, del más nuevo al más viejo, como
+    secuencia perezosa: el paginador de DRF solo pide len() y un corte,
+    así que solo se decodifican los bits de la página.
+    """
+
+    def __init__(self, bits, ids):
+        self._bits, self._ids = bits, ids
+        self._total = bits.bit_count()
+
+    def __len__(self):
+        return self._total
+
+    def __getitem__(self, corte):
+        if not isinstance(corte, slice):
+            return self[corte:corte + 1][0]
+        inicio, fin, _ = corte.indices(self._total)
+        return [self._ids[posicion] for posicion in _bits_desde_arriba(self._bits, inicio, fin - inicio)]
+
+
+class IndiceFacetas(IndiceVersionado):
+    """Bitsets por valor de atributo, rango de precio y categoría."""
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.RLock()
+        self._bits = {}          # clave -> bitset
+        self._activos = 0        # Bitset de todos los productos indexados
+        self._ids = []           # bit -> producto_id
+        self._posiciones = {}    # producto_id -> bit (se conserva al desactivar)
+        self._claves_doc = {}    # producto_id -> claves (para desindexar)
+        self._versiones = {}     # producto_id -> Producto.version indexada
+        self._ultimo = None      # (creado_en, id) del bit más alto
+        self._meta = None
+
+    # --- Mantenimiento ---
+
+    @staticmethod
+    def _cargar_meta():
+        """Atributos, valores y categorías: tablas pequeñas, se leen enteras."""
+        atributos = []
+        for atributo in Atributo.objects.order_by('nombre').values('id', 'nombre'):
+            parametro = slugify(atributo['nombre'])
+            if not parametro or parametro in PARAMETROS_RESERVADOS:
+                parametro = f"atributo-{atributo['id']}"
+            atributos.append({**atributo, 'parametro': parametro, 'valores': []})
+        por_atributo = {atributo['id']: atributo for atributo in atributos}
+        for valor in ValorAtributo.objects.order_by('id').values('id', 'atributo_id', 'valor'):
+            por_atributo[valor['atributo_id']]['valores'].append(valor)
+        categorias = list(Categoria.objects.order_by('id').values('id', 'nombre', 'slug', 'ruta', 'padre_id'))
+        return {
+            'atributos': atributos,
+            'categorias': categorias,
+            'categorias_por_ruta': sorted((c['ruta'], c['id']) for c in categorias),
+        }
+
+    def _indexar(self, documento):
+        producto_id = documento['id']
+        bit = 1 << self._posiciones[producto_id]
+        self._quitar_bits(producto_id, bit)
+        claves = _claves(documento)
+        for clave in claves:
+            self._bits[clave] = self._bits.get(clave, 0) | bit
+        self._claves_doc[producto_id] = claves
+        self._versiones[producto_id] = documento['version']
+        self._activos |= bit
+
+    def _desindexar(self, producto_id):
+        bit = 1 << self._posiciones[producto_id]
+        self._quitar_bits(producto_id, bit)
+        self._versiones.pop(producto_id, None)
+        self._activos &= ~bit
+
+    def _quitar_bits(self, producto_id, bit):
+        for clave in self._claves_doc.pop(producto_id, ()):
+            restantes = self._bits[clave] & ~bit
+            if restantes:
+                self._bits[clave] = restantes
+            else:
+                del self._bits[clave]
+
+    def reconstruir(self):
+        meta = self._cargar_meta()
+        docs = sorted(documentos_facetas(), key=_orden)
+        posiciones_por_clave = defaultdict(list)
+        for posicion, documento in enumerate(docs):
+            for clave in _claves(documento):
+                posiciones_por_clave[clave].append(posicion)
+        with self._lock:
+            self._bits = {clave: _bitset(posiciones) for clave, posiciones in posiciones_por_clave.items()}
+            self._activos = (1 << len(docs)) - 1
+            self._ids = [documento['id'] for documento in docs]
+            self._posiciones = {producto_id: posicion for posicion, producto_id in enumerate(self._ids)}
+            self._claves_doc = {documento['id']: _claves(documento) for documento in docs}
+            self._versiones = {documento['id']: documento['version'] for documento in docs}
+            self._ultimo = _orden(docs[-1]) if docs else None
+            self._meta = meta
+        return len(docs)
+
+    def actualizar(self, ids):
+        actuales = dict(Producto.objects.filter(id__in=ids, activo=True).values_list('id', 'version'))
+        cambiados = [i for i, version in actuales.items() if self._versiones.get(i) != version]
+        borrados = [i for i in ids if i not in actuales and i in self._versiones]
+        if not (cambiados or borrados):
+            return 0
+        nuevos = list(documentos_facetas(cambiados)) if cambiados else []
+        altas = sorted((d for d in nuevos if d['id'] not in self._posiciones), key=_orden)
+        if altas and self._ultimo is not None and _orden(altas[0]) < self._ultimo:
+            # Un alta más vieja que el último bit rompería el orden: se reordena todo
+            return self.reconstruir()
+        meta = self._cargar_meta()
+        with self._lock:
+            for producto_id in borrados:
+                self._desindexar(producto_id)
+            for documento in altas:
+                self._posiciones[documento['id']] = len(self._ids)
+                self._ids.append(documento['id'])
+                self._ultimo = _orden(documento)
+            for documento in nuevos:
+                self._indexar(documento)
+            self._meta = meta
+        return len(nuevos) + len(borrados)
+
+    # --- Consulta ---
+
+    @staticmethod
+    def _valores_pedidos(parametros, nombre):
+        """?talla=M,L y ?talla=M&talla=L valen lo mismo."""
+        return [v.strip() for valor in parametros.getlist(nombre) for v in valor.split(',') if v.strip()]
+
+    def _subarbol(self, ruta):
+        """Bitset de los productos de la categoría con esa ruta y de sus descendientes."""
+        bits = 0
+        categorias = self._meta['categorias_por_ruta']
+        for ruta_categoria, categoria_id in categorias[bisect_right(categorias, (ruta, -1)):]:
+            if not ruta_categoria.startswith(ruta):
+                break
+            bits |= self._bits.get(('categoria', categoria_id), 0)
+        return bits
+
+    def consultar(self, parametros):
+        """
+        parametros: QueryDict de la petición. Devuelve (ResultadoFacetas, facetas),
+        donde facetas trae el conteo de cada categoría, rango de precio y valor.
+        """
+        self._sincronizar_si_toca()
+        with self._lock:
+            meta, activos = self._meta, self._activos
+            seleccion = {}  # faceta -> bitset (OR de los valores elegidos)
+
+            categoria = None
+            pedida = parametros.get('categoria')
+            if pedida:
+                categoria = next((c for c in meta['categorias'] if c['slug'] == pedida or str(c['id']) == pedida),
+                                 None)
+                seleccion['categoria'] = self._subarbol(categoria['ruta']) if categoria else 0
+
+            rangos = rangos_precio()
+            precios_pedidos = set(self._valores_pedidos(parametros, 'precio'))
+            if precios_pedidos:
+                seleccion['precio'] = 0
+                for indice, (clave, _, _) in enumerate(rangos):
+                    if clave in precios_pedidos:
+                        seleccion['precio'] |= self._bits.get(('precio', indice), 0)
+
+            elegidos = {}  # atributo_id -> ids de valor elegidos
+            for atributo in meta['atributos']:
+                pedidos = {normalizar(v) for v in self._valores_pedidos(parametros, atributo['parametro'])}
+                if not pedidos:
+                    continue
+                elegidos[atributo['id']] = {
+                    valor['id'] for valor in atributo['valores']
+                    if normalizar(valor['valor']) in pedidos or str(valor['id']) in pedidos
+                }
+                seleccion[atributo['id']] = 0
+                for valor_id in elegidos[atributo['id']]:
+                    seleccion[atributo['id']] |= self._bits.get(('valor', valor_id), 0)
+
+            def base(excepto):
+                bits = activos
+                for faceta, bits_faceta in seleccion.items():
+                    if faceta != excepto:
+                        bits &= bits_faceta
+                return bits
+
+            # Categorías: las hijas de la elegida (o las raíces), con todo su subárbol
+            base_categoria = base('categoria')
+            padre_id = categoria['id'] if categoria else None
+            facetas_categorias = []
+            for hija in meta['categorias']:
+                if hija['padre_id'] != padre_id:
+                    continue
+                cantidad = (base_categoria & self._subarbol(hija['ruta'])).bit_count()
+                if cantidad:
+                    facetas_categorias.append(
+                        {'id': hija['id'], 'nombre': hija['nombre'], 'slug': hija['slug'], 'cantidad': cantidad}
+                    )
+
+            base_precio = base('precio')
+            facetas_precio = []
+            for indice, (clave, minimo, maximo) in enumerate(rangos):
+                cantidad = (base_precio & self._bits.get(('precio', indice), 0)).bit_count()
+                if cantidad or clave in precios_pedidos:
+                    facetas_precio.append({'valor': clave, 'min': minimo, 'max': maximo, 'cantidad': cantidad,
+                                           'seleccionado': clave in precios_pedidos})
+
+            facetas_atributos = []
+            for atributo in meta['atributos']:
+                base_atributo = base(atributo['id'])
+                marcados = elegidos.get(atributo['id'], set())
+                valores = []
+                for valor in atributo['valores']:
+                    cantidad = (base_atributo & self._bits.get(('valor', valor['id']), 0)).bit_count()
+                    if cantidad or valor['id'] in marcados:
+                        valores.append({'id': valor['id'], 'valor': valor['valor'], 'cantidad': cantidad,
+                                        'seleccionado': valor['id'] in marcados})
+                if valores:
+                    facetas_atributos.append({'id': atributo['id'], 'nombre': atributo['nombre'],
+                                              'parametro': atributo['parametro'], 'valores': valores})
+
+            resultado = ResultadoFacetas(base(None), self._ids)
+        return resultado, {
+            'categorias': facetas_categorias,
+            'precio': facetas_precio,
+            'atributos': facetas_atributos,
+        }
+
+    def estadisticas(self):
+        with self._lock:
+            return {'productos': len(self._versiones), 'bitsets': len(self._bits)}
+
+
+_indice = None
+_lock_indice = threading.Lock()
+
+
+def obtener_indice_facetas():
+    """Índice de facetas del proceso (se carga en la primera consulta)."""
+    global _indice
+    if _indice is None:
+        with _lock_indice:
+            if _indice is None:
+                _indice = IndiceFacetas()
+    return _indice
@@ -0,0 +1,117 @@
+# productos/fragmentos.py
+"""
+Caché de fragmentos serializados del catálogo público.
+
+Cada producto se serializa (ProductoSerializer con variantes activas) una
+vez por versión y se guarda en una LRU acotada en memoria, con clave
+(id, Producto.version). Las páginas del listado y el detalle se montan con
+esos fragmentos y solo se serializan los que faltan o cambiaron de versión,
+en una única tanda de consultas (catalogo.py).
+
+Producto.version vive en la BD y lo suben las señales (signals.py) cuando
+cambia el producto, sus variantes, stock, imágenes o lo que anida, así que
+todos los procesos detectan el cambio al leer la página, aunque la LRU sea
+local a cada uno.
+"""
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from django.conf import settings
+
+from .campos import recortar
+from .catalogo import productos_catalogo
+from .models import Producto, ProductoVariante
+
+
+class CacheFragmentos:
+    """LRU de producto_id -> (version, datos serializados), acotada a max_entradas."""
+
+    def __init__(self, max_entradas: int):
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.expulsiones = 0
+
+    def obtener(self, producto_id, version) -> Optional[dict]:
+        with self._lock:
+            entrada = self._entradas.get(producto_id)
+            if entrada is None or entrada[0] != version:
+                self.fallos += 1
+                return None
+            self._entradas.move_to_end(producto_id)
+            self.aciertos += 1
+            return entrada[1]
+
+    def guardar(self, producto_id, version, datos):
+        with self._lock:
+            self._entradas[producto_id] = (version, datos)
+            self._entradas.move_to_end(producto_id)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+                self.expulsiones += 1
+
+    def descartar(self, producto_id):
+        with self._lock:
+            self._entradas.pop(producto_id, None)
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+            self.aciertos = self.fallos = self.expulsiones = 0
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'entradas': len(self._entradas),
+                'max_entradas': self.max_entradas,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'expulsiones': self.expulsiones,
+            }
+
+
+fragmentos = CacheFragmentos(settings.CATALOGO_FRAGMENTOS_MAX)
+
+
+def productos_ligeros(productos):
+    """
+    Solo lo necesario para paginar y buscar fragmentos: id, versión,
+    creado_en y precio_min (las claves del cursor de paginacion.py) y
+    actualizado_en (el Last-Modified del detalle, condicional.py).
+    """
+    return productos.only('id', 'version', 'creado_en', 'precio_min', 'actualizado_en')
+
+
+def serializar_productos_publicos(productos, context=None, campos=None):
+    """
+    Lista de productos serializados (vista pública: solo variantes activas),
+    en el mismo orden que `productos` (objetos con id y version).
+    campos: árbol de ?fields= (campos.campos_pedidos); los fragmentos se
+    cachean completos y se recortan al devolverlos.
+    """
+    from .serializers import ProductoSerializer
+
+    # Sin ?fields= / ?expand=: lo que se cachea vale para cualquier petición
+    context = {**(context or {}), 'completo': True}
+    datos, faltan = {}, {}
+    for producto in productos:
+        fragmento = fragmentos.obtener(producto.id, producto.version)
+        if fragmento is None:
+            faltan[producto.id] = producto.version
+        else:
+            datos[producto.id] = fragmento
+
+    if faltan:
+        # Se carga DESPUÉS de leer las versiones: el fragmento nunca es más
+        # viejo que la versión con la que se guarda.
+        completos = productos_catalogo(
+            Producto.objects.filter(id__in=faltan), ProductoVariante.objects.filter(activo=True)
+        )
+        for producto, fragmento in zip(completos, ProductoSerializer(completos, many=True, context=context).data):
+            fragmentos.guardar(producto.id, faltan[producto.id], fragmento)
+            datos[producto.id] = fragmento
+
+    return [recortar(datos[producto.id], campos) for producto in productos if producto.id in datos]
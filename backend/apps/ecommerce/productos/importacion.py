@@ -0,0 +1,543 @@
+# productos/importacion.py
+"""
+Importación y exportación masiva del catálogo (admin).
+
+Formato (CSV o XLSX), una fila por variante; es el mismo que produce la
+exportación. La importación solo CREA: un archivo exportado vale de
+plantilla o para copiar el catálogo a otra instalación, pero en la misma BD
+sus SKUs ya existen y cada fila da error (no se actualiza por SKU):
+
+    producto, slug, categoria, descripcion, activo, sku, precio, precio_oferta,
+    variante_activa, <Atributo>..., stock, stock:<Almacén>...
+
+- Las filas con el mismo slug (o, sin slug, con el mismo nombre) son
+  variantes de un mismo producto; sus datos (nombre, categoría, descripción,
+  activo) se toman de la primera fila. Si el slug ya existe en la BD, las
+  variantes se AÑADEN a ese producto, siempre que no repitan una
+  combinación de atributos que ya tenga (como en matriz.py).
+- categoria: slug o id de una categoría existente.
+- Una columna por atributo (Talla, Color...) con el valor de la variante. Los
+  atributos deben existir; los valores nuevos se crean.
+- stock va al almacén 'Principal' (como stock_inicial del serializador);
+  stock:<nombre> a un almacén existente.
+- sku vacío: se genera como en ProductoVariante.save().
+- Una fila sin ningún dato de variante crea solo el producto.
+
+Todo el archivo se valida ANTES de escribir (validar()); con cualquier
+error no se importa nada y se devuelven los errores (fila, columna,
+mensaje). Después importar() escribe por lotes de productos, cada lote en
+su transacción y con bulk_create: productos, atributos (M2M), variantes,
+valores (M2M) y stock. bulk_create no dispara señales: las variantes se
+crean con sus columnas desnormalizadas ya calculadas y al final de cada
+lote se recalculan los agregados de los productos (agregados.py) y se
+llama a signals.nueva_version() para que la caché de fragmentos y los
+índices (búsqueda, facetas) vean los cambios.
+"""
+import codecs
+import csv
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.core.validators import validate_slug
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .agregados import actualizar_productos, precio_efectivo
+from .catalogo import variantes_catalogo
+from .models import (
+    Atributo, Categoria, ImportacionProgreso, Producto, ProductoVariante, ValorAtributo, generar_sku,
+)
+from .signals import nueva_version
+from ..inventario.models import Almacen, Stock
+
+COLUMNAS_PRODUCTO = ('producto', 'slug', 'categoria', 'descripcion', 'activo')
+COLUMNAS_VARIANTE = ('sku', 'precio', 'precio_oferta', 'variante_activa')
+COLUMNAS_OBLIGATORIAS = ('producto', 'categoria', 'precio')
+PREFIJO_STOCK = 'stock:'
+ALMACEN_PRINCIPAL = 'Principal'
+MAX_ERRORES = 200
+TROZO_CONSULTA = 500  # Máximo de valores por IN (...) al comprobar slugs y SKUs
+PROGRESO_TTL = 60 * 60  # Segundos que se guarda el progreso de una importación
+
+VERDADERO = {'1', 'si', 'sí', 's', 'x', 'true', 'verdadero', 'yes'}
+FALSO = {'0', 'no', 'n', 'false', 'falso'}
+
+
+class ImportacionInvalida(Exception):
+    """El archivo no se puede importar; errores: lista de {fila, columna, mensaje}."""
+
+    def __init__(self, errores):
+        super().__init__(f'{len(errores)} errores en el archivo')
+        self.errores = errores
+
+
+class ImportacionInterrumpida(Exception):
+    """
+    Falló un lote de importar(). Los anteriores ya están confirmados:
+    hechos (productos) y resumen cuentan solo esos.
+    """
+
+    def __init__(self, error, hechos, total, resumen):
+        super().__init__(f'La importación se detuvo tras {hechos} de {total} productos: {error}')
+        self.hechos, self.total, self.resumen = hechos, total, resumen
+
+
+# --- Lectura ---
+def _texto(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, bool):
+        return 'si' if valor else 'no'
+    if isinstance(valor, float):  # Celdas numéricas de Excel: 19.9, no 19.900000000000002
+        return f'{valor:.6f}'.rstrip('0').rstrip('.')
+    return str(valor).strip()
+
+
+def leer_archivo(archivo, formato=None):
+    """
+    (cabecera, filas) de un CSV (UTF-8, con o sin BOM) o XLSX (primera hoja).
+    filas es un iterador de (número de fila, {columna: texto}) que se salta
+    las filas vacías; el archivo se lee en streaming.
+    """
+    formato = (formato or getattr(archivo, 'name', '').rsplit('.', 1)[-1]).lower()
+    if formato == 'xlsx':
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ImportacionInvalida([_error(None, None, 'Para importar XLSX hace falta instalar openpyxl')])
+        try:
+            filas = load_workbook(archivo, read_only=True, data_only=True).active.iter_rows(values_only=True)
+        except Exception as e:
+            raise ImportacionInvalida([_error(None, None, f'No es un XLSX válido: {e}')])
+    elif formato == 'csv':
+        filas = csv.reader(codecs.iterdecode(archivo, 'utf-8-sig'))
+    else:
+        raise ImportacionInvalida([_error(None, None, 'Formato no soportado: usa .csv o .xlsx')])
+
+    try:
+        cabecera = [_texto(c) for c in next(filas, [])]
+    except UnicodeDecodeError:
+        raise ImportacionInvalida([_error(1, None, 'El CSV debe estar en UTF-8')])
+
+    def iterar():
+        numero = 1
+        try:
+            for numero, valores in enumerate(filas, start=2):
+                fila = {columna: _texto(valor) for columna, valor in zip(cabecera, valores) if columna}
+                if any(fila.values()):
+                    yield numero, fila
+        except UnicodeDecodeError:
+            raise ImportacionInvalida([_error(numero + 1, None, 'El CSV debe estar en UTF-8')])
+
+    return cabecera, iterar()
+
+
+# --- Validación ---
+def _error(fila, columna, mensaje):
+    return {'fila': fila, 'columna': columna, 'mensaje': mensaje}
+
+
+def _booleano(texto, defecto=True):
+    if not texto:
+        return defecto
+    if texto.lower() in VERDADERO:
+        return True
+    if texto.lower() in FALSO:
+        return False
+    raise ValueError('Debe ser si/no')
+
+
+def _precio(texto):
+    try:
+        valor = Decimal(texto.replace(',', '.'))
+    except InvalidOperation:
+        raise ValueError(f"'{texto}' no es un número")
+    if not valor.is_finite() or valor < 0 or valor >= Decimal('1e8') or valor.as_tuple().exponent < -2:
+        raise ValueError('Debe ser un importe positivo con como mucho 2 decimales')
+    return valor.quantize(Decimal('0.01'))
+
+
+def _cantidad(texto):
+    try:
+        valor = int(texto)
+    except ValueError:
+        raise ValueError(f"'{texto}' no es un número entero")
+    if valor < 0:
+        raise ValueError('No puede ser negativo')
+    return valor
+
+
+def _trozos(valores):
+    valores = list(valores)
+    for inicio in range(0, len(valores), TROZO_CONSULTA):
+        yield valores[inicio:inicio + TROZO_CONSULTA]
+
+
+def validar(cabecera, filas):
+    """
+    Valida todas las filas y devuelve el plan de importación: lista de
+    productos (dicts) con sus variantes. Lanza ImportacionInvalida con todos
+    los errores encontrados (hasta MAX_ERRORES).
+    """
+    errores = []
+
+    def error(fila, columna, mensaje):
+        if len(errores) < MAX_ERRORES:
+            errores.append(_error(fila, columna, mensaje))
+
+    # --- Cabecera ---
+    for columna in COLUMNAS_OBLIGATORIAS:
+        if columna not in cabecera:
+            error(1, columna, 'Falta la columna')
+    atributos = {a.nombre.lower(): a for a in Atributo.objects.all()}
+    almacenes = dict(Almacen.objects.values_list('nombre', 'id'))
+    columnas_atributo, columnas_stock = [], {}
+    for columna in cabecera:
+        if not columna or columna in COLUMNAS_PRODUCTO or columna in COLUMNAS_VARIANTE:
+            continue
+        if columna == 'stock':
+            columnas_stock[columna] = ALMACEN_PRINCIPAL
+        elif columna.startswith(PREFIJO_STOCK):
+            almacen = columna[len(PREFIJO_STOCK):].strip()
+            if almacen not in almacenes:
+                error(1, columna, f"No existe el almacén '{almacen}'")
+            columnas_stock[columna] = almacen
+        elif columna.lower() in atributos:
+            columnas_atributo.append(columna)
+        else:
+            error(1, columna, f"No existe el atributo '{columna}' (créalo antes o quita la columna)")
+    if errores:
+        raise ImportacionInvalida(errores)
+
+    # --- Filas ---
+    productos = {}
+    skus = {}
+    for numero, fila in filas:
+        clave = fila.get('slug') or fila.get('producto')
+        if not clave:
+            error(numero, 'producto', 'Falta el nombre (o el slug) del producto')
+            continue
+        producto = productos.get(clave)
+        if producto is None:
+            producto = productos[clave] = {
+                'fila': numero, 'slug': fila.get('slug', ''), 'nombre': fila.get('producto', ''),
+                'categoria': fila.get('categoria', ''), 'descripcion': fila.get('descripcion', ''),
+                'activo': True, 'atributos': set(), 'variantes': [], 'combinaciones': set(),
+            }
+            try:
+                producto['activo'] = _booleano(fila.get('activo'))
+            except ValueError as e:
+                error(numero, 'activo', str(e))
+
+        columnas_variante = [*COLUMNAS_VARIANTE, *columnas_atributo, *columnas_stock]
+        if not any(fila.get(c) for c in columnas_variante):
+            continue  # Fila solo de producto
+
+        variante = {'fila': numero, 'sku': fila.get('sku', ''), 'precio': None, 'precio_oferta': None,
+                    'activo': True, 'valores': [], 'stock': {}}
+        if not fila.get('precio'):
+            error(numero, 'precio', 'Falta el precio')
+        for columna in ('precio', 'precio_oferta'):
+            if fila.get(columna):
+                try:
+                    variante[columna] = _precio(fila[columna])
+                except ValueError as e:
+                    error(numero, columna, str(e))
+        try:
+            variante['activo'] = _booleano(fila.get('variante_activa'))
+        except ValueError as e:
+            error(numero, 'variante_activa', str(e))
+
+        if variante['sku']:
+            if len(variante['sku']) > 100:
+                error(numero, 'sku', 'Máximo 100 caracteres')
+            elif variante['sku'] in skus:
+                error(numero, 'sku', f"SKU repetido (ya está en la fila {skus[variante['sku']]})")
+            skus.setdefault(variante['sku'], numero)
+
+        for columna in columnas_atributo:
+            valor = fila.get(columna)
+            if not valor:
+                continue
+            if len(valor) > 100:
+                error(numero, columna, 'Máximo 100 caracteres')
+            atributo = atributos[columna.lower()]
+            variante['valores'].append((atributo.id, valor))
+            producto['atributos'].add(atributo.id)
+        combinacion = frozenset((a, v.lower()) for a, v in variante['valores'])
+        if combinacion and combinacion in producto['combinaciones']:
+            error(numero, None, 'Combinación de atributos repetida en el mismo producto')
+        producto['combinaciones'].add(combinacion)
+
+        for columna, almacen in columnas_stock.items():
+            if fila.get(columna):
+                try:
+                    variante['stock'][almacen] = _cantidad(fila[columna])
+                except ValueError as e:
+                    error(numero, columna, str(e))
+        producto['variantes'].append(variante)
+
+    # --- Contra la BD: productos existentes, categorías y SKUs ya usados ---
+    existentes = {}
+    for trozo in _trozos(p['slug'] for p in productos.values() if p['slug']):
+        existentes.update(Producto.objects.filter(slug__in=trozo).values_list('slug', 'id'))
+    categorias = dict(Categoria.objects.values_list('slug', 'id'))
+    ids_categoria = set(categorias.values())
+    for producto in productos.values():
+        producto['existente'] = existentes.get(producto['slug'])
+        if producto['existente']:
+            continue
+        numero = producto['fila']
+        if not producto['nombre']:
+            error(numero, 'producto', f"Falta el nombre: no existe ningún producto con slug '{producto['slug']}'")
+        elif len(producto['nombre']) > 255:
+            error(numero, 'producto', 'Máximo 255 caracteres')
+        if producto['slug']:
+            try:
+                validate_slug(producto['slug'])
+            except ValidationError:
+                error(numero, 'slug', 'Solo letras, números, guiones y guiones bajos')
+        texto = producto['categoria']
+        producto['categoria'] = categorias.get(texto) or (int(texto) if texto.isdigit() and int(texto) in ids_categoria else None)
+        if producto['categoria'] is None:
+            error(numero, 'categoria', f"No existe la categoría '{texto}'" if texto else 'Falta la categoría')
+    for trozo in _trozos(skus):
+        for sku in ProductoVariante.objects.filter(sku__in=trozo).values_list('sku', flat=True):
+            error(skus[sku], 'sku', f"Ya existe una variante con el SKU '{sku}'")
+    combinaciones = _combinaciones_existentes(existentes.values())
+    for producto in productos.values():
+        existentes_producto = combinaciones.get(producto['existente'])
+        if not existentes_producto:
+            continue
+        for variante in producto['variantes']:
+            combinacion = frozenset((a, v.lower()) for a, v in variante['valores'])
+            atributos_fila = {a for a, _ in combinacion}
+            if combinacion and any(frozenset(c for c in existente if c[0] in atributos_fila) == combinacion
+                                   for existente in existentes_producto):
+                error(variante['fila'], None, 'El producto ya tiene una variante con esa combinación de atributos')
+
+    if errores:
+        raise ImportacionInvalida(errores)
+    return list(productos.values())
+
+
+def _combinaciones_existentes(productos):
+    """{producto_id: [frozenset de (atributo_id, valor en minúsculas)]}, una por variante."""
+    Valores = ProductoVariante.valores.through
+    por_variante = {}
+    for trozo in _trozos(productos):
+        filas = Valores.objects.filter(productovariante__producto_id__in=trozo).values_list(
+            'productovariante__producto_id', 'productovariante_id', 'valoratributo__atributo_id',
+            'valoratributo__valor',
+        )
+        for producto_id, variante_id, atributo_id, valor in filas:
+            por_variante.setdefault((producto_id, variante_id), set()).add((atributo_id, valor.lower()))
+    combinaciones = {}
+    for (producto_id, _), valores in por_variante.items():
+        combinaciones.setdefault(producto_id, []).append(frozenset(valores))
+    return combinaciones
+
+
+# --- Escritura ---
+def _valores_atributo(plan):
+    """{(atributo_id, valor en minúsculas): id}, creando los valores que falten."""
+    pedidos = {(a, v.lower()): v for p in plan for var in p['variantes'] for a, v in var['valores']}
+    if not pedidos:
+        return {}, 0
+
+    def cargar():
+        return {
+            (a, v.lower()): pk for pk, a, v in
+            ValorAtributo.objects.filter(atributo_id__in={a for a, _ in pedidos}).values_list('id', 'atributo_id', 'valor')
+        }
+
+    existentes = cargar()
+    nuevos = [ValorAtributo(atributo_id=a, valor=v) for (a, clave), v in pedidos.items() if (a, clave) not in existentes]
+    if nuevos:
+        ValorAtributo.objects.bulk_create(nuevos, ignore_conflicts=True)
+        existentes = cargar()
+    return existentes, len(nuevos)
+
+
+def _almacenes(plan):
+    nombres = {almacen for p in plan for v in p['variantes'] for almacen in v['stock']}
+    if ALMACEN_PRINCIPAL in nombres:
+        Almacen.objects.get_or_create(nombre=ALMACEN_PRINCIPAL, defaults={'activo': True})
+    return dict(Almacen.objects.filter(nombre__in=nombres).values_list('nombre', 'id'))
+
+
+def _importar_lote(grupo, valores, almacenes, resumen):
+    nuevos = []
+    for producto in grupo:
+        if producto['existente']:
+            continue
+        slug = producto['slug'] or slugify(f"{producto['nombre']}-{uuid.uuid4().hex[:6]}")
+        nuevos.append(Producto(
+            categoria_id=producto['categoria'], nombre=producto['nombre'], slug=slug,
+            descripcion=producto['descripcion'], activo=producto['activo'],
+        ))
+    Producto.objects.bulk_create(nuevos)
+    if nuevos and nuevos[0].pk is None:  # Backends sin RETURNING
+        por_slug = dict(Producto.objects.filter(slug__in=[p.slug for p in nuevos]).values_list('slug', 'id'))
+        for nuevo in nuevos:
+            nuevo.pk = por_slug[nuevo.slug]
+    creados = iter(nuevos)
+    ids, slugs = [], {}
+    for producto in grupo:
+        if producto['existente']:
+            ids.append(producto['existente'])
+        else:
+            nuevo = next(creados)
+            ids.append(nuevo.pk)
+            slugs[nuevo.pk] = nuevo.slug
+    if any(producto['existente'] for producto in grupo):
+        slugs.update(Producto.objects.filter(id__in=ids).exclude(id__in=slugs).values_list('id', 'slug'))
+
+    Atributos = Producto.atributos.through
+    Atributos.objects.bulk_create([
+        Atributos(producto_id=pk, atributo_id=atributo)
+        for pk, producto in zip(ids, grupo) for atributo in producto['atributos']
+    ], ignore_conflicts=True)
+
+    variantes = []
+    for pk, producto in zip(ids, grupo):
+        for datos in producto['variantes']:
+            sku = datos['sku'] or generar_sku(slugs[pk])
+            variante = ProductoVariante(
+                producto_id=pk, sku=sku, precio=datos['precio'],
+                precio_oferta=datos['precio_oferta'], activo=datos['activo'],
+                precio_efectivo=precio_efectivo(datos['precio'], datos['precio_oferta']),
+                stock_disponible=sum(datos['stock'].values()),
+            )
+            variante.datos = datos
+            variantes.append(variante)
+    ProductoVariante.objects.bulk_create(variantes)
+    if variantes and variantes[0].pk is None:
+        por_sku = {}
+        for trozo in _trozos(v.sku for v in variantes):
+            por_sku.update(ProductoVariante.objects.filter(sku__in=trozo).values_list('sku', 'pk'))
+        for variante in variantes:
+            variante.pk = por_sku[variante.sku]
+
+    Valores = ProductoVariante.valores.through
+    Valores.objects.bulk_create([
+        Valores(productovariante_id=v.pk, valoratributo_id=valores[(a, valor.lower())])
+        for v in variantes for a, valor in v.datos['valores']
+    ])
+    registros = [
+        Stock(variante_id=v.pk, almacen_id=almacenes[almacen], cantidad=cantidad)
+        for v in variantes for almacen, cantidad in v.datos['stock'].items()
+    ]
+    Stock.objects.bulk_create(registros)
+
+    actualizar_productos(ids)
+    nueva_version(Producto.objects.filter(id__in=ids))
+    resumen['productos_creados'] += len(nuevos)
+    resumen['productos_ampliados'] += len(grupo) - len(nuevos)
+    resumen['variantes'] += len(variantes)
+    resumen['registros_stock'] += len(registros)
+
+
+def importar(plan, lote=200, progreso=None):
+    """
+    Escribe el plan de validar() por lotes de `lote` productos, cada uno en
+    su propia transacción. progreso(hechos, total) se llama tras cada lote
+    (en productos). Devuelve un resumen con lo creado; si falla un lote lanza
+    ImportacionInterrumpida con lo que quedó confirmado.
+    """
+    inicio = time.perf_counter()
+    valores, valores_creados = _valores_atributo(plan)
+    almacenes = _almacenes(plan)
+    resumen = {
+        'productos_creados': 0, 'productos_ampliados': 0, 'variantes': 0,
+        'valores_creados': valores_creados, 'registros_stock': 0, 'lotes': 0,
+    }
+    total = len(plan)
+    for desde in range(0, total, lote):
+        confirmado = dict(resumen)
+        try:
+            with transaction.atomic():
+                _importar_lote(plan[desde:desde + lote], valores, almacenes, resumen)
+        except Exception as e:
+            confirmado['segundos'] = round(time.perf_counter() - inicio, 3)
+            raise ImportacionInterrumpida(e, desde, total, confirmado) from e
+        resumen['lotes'] += 1
+        if progreso:
+            progreso(min(desde + lote, total), total)
+    resumen['segundos'] = round(time.perf_counter() - inicio, 3)
+    return resumen
+
+
+# --- Progreso (para consultarlo desde otra petición, en cualquier worker) ---
+def guardar_progreso(usuario, importacion, estado, **datos):
+    """Cada llamada se confirma sola (fuera de los lotes): otro worker la ve enseguida."""
+    if estado == 'validando':
+        limite = timezone.now() - timedelta(seconds=PROGRESO_TTL)
+        ImportacionProgreso.objects.filter(actualizado_en__lt=limite).delete()
+    ImportacionProgreso.objects.update_or_create(
+        usuario=usuario, clave=importacion, defaults={'estado': estado, 'datos': datos}
+    )
+
+
+def obtener_progreso(usuario, importacion):
+    limite = timezone.now() - timedelta(seconds=PROGRESO_TTL)
+    progreso = ImportacionProgreso.objects.filter(
+        usuario=usuario, clave=importacion, actualizado_en__gte=limite
+    ).first()
+    if progreso is None:
+        return None
+    return {'importacion': importacion, 'estado': progreso.estado, **progreso.datos}
+
+
+# --- Exportación ---
+def _si_no(valor):
+    return 'si' if valor else 'no'
+
+
+def exportar_filas(productos=None, tamano=200):
+    """
+    Generador con la cabecera y las filas (listas de texto) del catálogo en
+    el formato de importación. Lee por lotes de `tamano` productos en orden
+    de id (paginación por clave), así que la memoria no crece con el catálogo.
+    """
+    if productos is None:
+        productos = Producto.objects.all()
+    atributos = list(Atributo.objects.order_by('nombre').values_list('id', 'nombre'))
+    almacenes = list(Almacen.objects.order_by('nombre').values_list('id', 'nombre'))
+    yield [*COLUMNAS_PRODUCTO, *COLUMNAS_VARIANTE,
+           *(nombre for _, nombre in atributos), *(PREFIJO_STOCK + nombre for _, nombre in almacenes)]
+
+    ultimo = 0
+    while True:
+        ids = list(productos.filter(id__gt=ultimo).order_by('id').values_list('id', flat=True)[:tamano])
+        if not ids:
+            return
+        ultimo = ids[-1]
+        lote = Producto.objects.filter(id__in=ids).order_by('id').select_related('categoria').prefetch_related(
+            Prefetch('variantes', queryset=variantes_catalogo(ProductoVariante.objects.order_by('id')))
+        )
+        for producto in lote:
+            datos_producto = [producto.nombre, producto.slug, producto.categoria.slug,
+                              producto.descripcion, _si_no(producto.activo)]
+            variantes = producto.variantes.all()
+            if not variantes:
+                yield datos_producto + [''] * (len(COLUMNAS_VARIANTE) + len(atributos) + len(almacenes))
+                continue
+            for variante in variantes:
+                valores, stock = {}, {}
+                for valor in variante.valores.all():
+                    valores.setdefault(valor.atributo_id, valor.valor)
+                for registro in variante.stock_records.all():
+                    stock[registro.almacen_id] = str(registro.cantidad)
+                yield [
+                    *datos_producto, variante.sku, str(variante.precio),
+                    '' if variante.precio_oferta is None else str(variante.precio_oferta),
+                    _si_no(variante.activo),
+                    *(valores.get(pk, '') for pk, _ in atributos),
+                    *(stock.get(pk, '') for pk, _ in almacenes),
+                ]
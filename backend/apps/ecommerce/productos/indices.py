@@ -0,0 +1,125 @@
+# productos/indices.py
+"""
+Base de los índices del catálogo que viven en la memoria de cada proceso
+(búsqueda en busqueda.py, facetas en facetas.py).
+
+Todos se mantienen al día igual: signals.nueva_version() anota en
+ProductoCambio cada producto al que sube la versión, las señales marcan
+los índices del proceso como pendientes al confirmarse la transacción
+(marcar_pendientes) y cada BUSQUEDA_SINCRONIZACION_S se comprueba si otro
+proceso cambió algo. Sincronizar lee solo las anotaciones nuevas (índice
+sobre creado_en) y la subclase reindexa esos productos si su versión no
+coincide: el coste va con los cambios, no con el tamaño del catálogo.
+
+Una transacción anota sus cambios antes de confirmarse, así que cada
+sincronización vuelve a leer MARGEN_CAMBIOS hacia atrás. Las anotaciones
+de más de BUSQUEDA_CAMBIOS_RETENCION_S se borran; un proceso que lleva más
+que eso sin sincronizar reconstruye su índice entero.
+"""
+import threading
+import time
+import weakref
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Producto, ProductoCambio
+
+# Cuánto puede tardar en confirmarse una transacción que ya anotó sus cambios
+# (más el desfase de reloj entre servidores)
+MARGEN_CAMBIOS = timedelta(seconds=60)
+
+_indices = weakref.WeakSet()
+_ultima_purga = None
+
+
+def productos_cambiados(desde):
+    """Ids de los productos anotados en ProductoCambio desde `desde`."""
+    return set(ProductoCambio.objects.filter(creado_en__gte=desde).values_list('producto_id', flat=True))
+
+
+def purgar_cambios():
+    """Borra las anotaciones caducadas (como mucho una vez por MARGEN_CAMBIOS en cada proceso)."""
+    global _ultima_purga
+    ahora = timezone.now()
+    if _ultima_purga is not None and ahora - _ultima_purga < MARGEN_CAMBIOS:
+        return
+    _ultima_purga = ahora
+    retencion = timedelta(seconds=settings.BUSQUEDA_CAMBIOS_RETENCION_S)
+    ProductoCambio.objects.filter(creado_en__lt=ahora - retencion).delete()
+
+
+def lotes_activos(ids=None, tamano=1000):
+    """Querysets de productos ACTIVOS por lotes de `tamano`: todos o solo los de `ids`."""
+    productos = Producto.objects.filter(activo=True).order_by('id')
+    if ids is not None:
+        ids = list(ids)
+        for inicio in range(0, len(ids), tamano):
+            yield productos.filter(id__in=ids[inicio:inicio + tamano])
+        return
+    ultimo = 0
+    while True:
+        lote = list(productos.filter(id__gt=ultimo)[:tamano].values_list('id', flat=True))
+        if not lote:
+            return
+        yield productos.filter(id__in=lote)
+        ultimo = lote[-1]
+
+
+def marcar_pendientes():
+    """Llamado desde signals.py (on_commit) cuando cambia el catálogo."""
+    for indice in list(_indices):
+        indice.marcar_pendiente()
+
+
+class IndiceVersionado:
+    """Sincronización perezosa (en la próxima consulta) y a prueba de hilos."""
+
+    def __init__(self):
+        self._lock_sincronizacion = threading.Lock()
+        self._pendiente = True  # El índice aún no se ha cargado
+        self._ultima_sincronizacion = 0.0
+        self._desde = None      # Anotaciones de ProductoCambio ya leídas hasta aquí (menos el margen)
+        _indices.add(self)
+
+    def marcar_pendiente(self):
+        """Algo cambió en este proceso: la próxima consulta sincroniza."""
+        self._pendiente = True
+
+    def _sincronizar_si_toca(self):
+        vencida = time.monotonic() - self._ultima_sincronizacion >= settings.BUSQUEDA_SINCRONIZACION_S
+        if not (self._pendiente or vencida):
+            return
+        with self._lock_sincronizacion:
+            vencida = time.monotonic() - self._ultima_sincronizacion >= settings.BUSQUEDA_SINCRONIZACION_S
+            if not (self._pendiente or vencida):
+                return  # Otro hilo sincronizó mientras esperábamos
+            self._pendiente = False
+            self.sincronizar()
+            self._ultima_sincronizacion = time.monotonic()
+
+    def sincronizar(self, forzar=False):
+        """
+        Reindexa los productos anotados en ProductoCambio desde la última
+        sincronización. La primera vez, con forzar o si las anotaciones
+        pendientes ya se purgaron, reconstruye todo. Devuelve cuántos.
+        """
+        ahora = timezone.now()
+        retencion = timedelta(seconds=settings.BUSQUEDA_CAMBIOS_RETENCION_S)
+        if forzar or self._desde is None or self._desde < ahora - retencion:
+            total = self.reconstruir()
+        else:
+            ids = productos_cambiados(self._desde)
+            total = self.actualizar(ids) if ids else 0
+        self._desde = ahora - MARGEN_CAMBIOS
+        purgar_cambios()
+        return total
+
+    def actualizar(self, ids):
+        """Reindexa (o saca, si ya no están activos) los productos `ids`. Devuelve cuántos cambió."""
+        raise NotImplementedError
+
+    def reconstruir(self):
+        """Vuelve a indexar todo el catálogo. Devuelve cuántos productos."""
+        raise NotImplementedError
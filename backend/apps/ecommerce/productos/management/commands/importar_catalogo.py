@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.ecommerce.productos.importacion import (
+    ImportacionInterrumpida, ImportacionInvalida, importar, leer_archivo, validar,
+)
+
+
+class Command(BaseCommand):
+    help = 'Importa productos y variantes desde un CSV o XLSX (mismo formato que /admin/exportar/)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta al .csv o .xlsx')
+        parser.add_argument('--validar', action='store_true', help='Solo validar, sin escribir nada')
+        parser.add_argument('--lote', type=int, default=200, help='Productos por transacción (200)')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['archivo'], 'rb') as archivo:
+                plan = validar(*leer_archivo(archivo, options['archivo'].rsplit('.', 1)[-1]))
+        except OSError as e:
+            raise CommandError(f'No se puede leer el archivo: {e}')
+        except ImportacionInvalida as e:
+            for error in e.errores:
+                columna = f" [{error['columna']}]" if error['columna'] else ''
+                self.stdout.write(self.style.ERROR(f"❌ Fila {error['fila']}{columna}: {error['mensaje']}"))
+            raise CommandError(f'{len(e.errores)} errores: no se importó nada')
+
+        variantes = sum(len(p['variantes']) for p in plan)
+        self.stdout.write(f'✓ Archivo válido: {len(plan)} productos, {variantes} variantes')
+        if options['validar']:
+            return
+
+        def progreso(hechos, total):
+            self.stdout.write(f'  {hechos}/{total} productos ({hechos * 100 // total}%)')
+
+        try:
+            resumen = importar(plan, lote=options['lote'], progreso=progreso)
+        except ImportacionInterrumpida as e:
+            raise CommandError(f'{e} (los {e.hechos} primeros productos quedaron importados)')
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {resumen['productos_creados']} productos nuevos, {resumen['productos_ampliados']} ampliados, "
+            f"{resumen['variantes']} variantes en {resumen['segundos']:.1f}s "
+            f"({resumen['variantes'] / max(resumen['segundos'], 0.001):.0f} variantes/s)"
+        ))
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from apps.ecommerce.productos.agregados import actualizar_productos, desajustes
+from apps.ecommerce.productos.models import Producto
+from apps.ecommerce.productos.signals import nueva_version
+
+
+class Command(BaseCommand):
+    help = ('Recalcula precio_efectivo / stock_disponible de las variantes y precio_min / en_stock de los '
+            'productos que no cuadren (tras cambios con update()/bulk_create() o SQL a mano)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--comprobar', action='store_true',
+                            help='Solo informar de los desajustes, sin corregirlos')
+        parser.add_argument('--lote', type=int, default=1000,
+                            help='Productos revisados por consulta (por defecto 1000)')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        revisados, malos, desde = 0, [], 0
+        while True:
+            ids, lote = desajustes(desde, options['lote'])
+            if not ids:
+                break
+            revisados += len(ids)
+            desde = ids[-1]
+            if lote and not options['comprobar']:
+                with transaction.atomic():
+                    actualizar_productos(lote, con_variantes=True)
+                    # Precio y stock van en los fragmentos cacheados
+                    nueva_version(Producto.objects.filter(pk__in=lote))
+            malos.extend(sorted(lote))
+        segundos = time.perf_counter() - inicio
+
+        if not malos:
+            self.stdout.write(self.style.SUCCESS(f'✅ {revisados} productos revisados en {segundos:.1f}s: todo cuadra'))
+            return
+        muestra = ', '.join(str(pk) for pk in malos[:20]) + (' ...' if len(malos) > 20 else '')
+        if options['comprobar']:
+            self.stdout.write(self.style.WARNING(
+                f'⚠️  {len(malos)} de {revisados} productos con columnas desajustadas: {muestra}'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'✅ {len(malos)} de {revisados} productos corregidos en {segundos:.1f}s: {muestra}'
+            ))
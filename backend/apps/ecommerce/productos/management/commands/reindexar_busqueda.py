@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from apps.ecommerce.productos.busqueda import BACKENDS, obtener_backend
+
+
+class Command(BaseCommand):
+    help = 'Reindexa la búsqueda de productos (tras importaciones masivas o cambios con update()/bulk_create())'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backend', choices=sorted(BACKENDS),
+                            help='Backend a reindexar (por defecto BUSQUEDA_BACKEND)')
+        parser.add_argument('--completo', action='store_true',
+                            help='Reconstruir todo en lugar de solo los productos con versión cambiada')
+
+    def handle(self, *args, **options):
+        backend = BACKENDS[options['backend']]() if options['backend'] else obtener_backend()
+        self.stdout.write(f'🔎 Backend de búsqueda: {backend.nombre}')
+
+        inicio = time.perf_counter()
+        if options['completo']:
+            total = backend.reconstruir()
+        else:
+            total = backend.sincronizar(forzar=True)
+        segundos = time.perf_counter() - inicio
+
+        self.stdout.write(self.style.SUCCESS(f'✅ {total} productos reindexados en {segundos:.1f}s'))
+        if backend.nombre == 'memoria':
+            self.stdout.write(self.style.WARNING(
+                '⚠️  El índice en memoria es de cada proceso: los servidores en marcha '
+                'se sincronizan solos cada BUSQUEDA_SINCRONIZACION_S segundos'
+            ))
@@ -0,0 +1,93 @@
+# productos/matriz.py
+"""
+Generación de la matriz de variantes de un producto (admin).
+
+A partir de una lista de valores por atributo (ej. Talla: S, M, L y
+Color: Rojo, Azul) se crean todas las combinaciones (producto cartesiano)
+con el mismo precio y stock inicial, en una transacción y con bulk_create
+para las variantes, la tabla intermedia de valores y el Stock.
+
+Es idempotente: las combinaciones que el producto ya tiene no se tocan. Una
+variante existente cuenta si, mirando solo los atributos pedidos, tiene
+exactamente esos valores (una 'M / Rojo / Algodón' ya cubre 'M / Rojo').
+La fila del producto se bloquea (select_for_update) mientras se genera, así
+dos peticiones a la vez no duplican combinaciones.
+"""
+import itertools
+import math
+
+from django.db import transaction
+
+from .agregados import actualizar_productos, precio_efectivo
+from .models import Producto, ProductoVariante, generar_sku
+from .signals import nueva_version
+from ..inventario.models import Almacen, Stock
+
+ALMACEN_PRINCIPAL = 'Principal'
+
+
+def combinaciones_existentes(producto_id, atributos):
+    """Combinaciones (frozenset de ids de valor) que ya tiene el producto, solo con los `atributos` pedidos."""
+    Valores = ProductoVariante.valores.through
+    por_variante = {}
+    filas = Valores.objects.filter(
+        productovariante__producto_id=producto_id, valoratributo__atributo_id__in=atributos,
+    ).values_list('productovariante_id', 'valoratributo_id')
+    for variante, valor in filas:
+        por_variante.setdefault(variante, set()).add(valor)
+    return {frozenset(valores) for valores in por_variante.values()}
+
+
+def generar_variantes(producto, grupos, precio, precio_oferta=None, stock_inicial=0, activo=True):
+    """
+    Crea las variantes que falten del producto cartesiano de `grupos` (una
+    lista de ValorAtributo por atributo). stock_inicial va al almacén
+    'Principal', como en ProductoVarianteSerializer. Devuelve (variantes
+    creadas, número de combinaciones que ya existían).
+    """
+    atributos = [grupo[0].atributo_id for grupo in grupos]
+    with transaction.atomic():
+        Producto.objects.select_for_update().filter(pk=producto.pk).values_list('pk').first()
+        existentes = combinaciones_existentes(producto.pk, atributos)
+        pendientes = [
+            combinacion for combinacion in itertools.product(*grupos)
+            if frozenset(valor.pk for valor in combinacion) not in existentes
+        ]
+        repetidas = math.prod(len(grupo) for grupo in grupos) - len(pendientes)
+        if not pendientes:
+            return [], repetidas
+
+        Atributos = Producto.atributos.through
+        Atributos.objects.bulk_create(
+            [Atributos(producto_id=producto.pk, atributo_id=atributo) for atributo in atributos],
+            ignore_conflicts=True,
+        )
+
+        variantes = [
+            ProductoVariante(producto=producto, sku=generar_sku(producto.slug), precio=precio,
+                             precio_oferta=precio_oferta, activo=activo,
+                             precio_efectivo=precio_efectivo(precio, precio_oferta), stock_disponible=stock_inicial)
+            for _ in pendientes
+        ]
+        ProductoVariante.objects.bulk_create(variantes)
+        if variantes[0].pk is None:  # Backends sin RETURNING
+            por_sku = dict(ProductoVariante.objects.filter(
+                sku__in=[v.sku for v in variantes]).values_list('sku', 'pk'))
+            for variante in variantes:
+                variante.pk = por_sku[variante.sku]
+
+        Valores = ProductoVariante.valores.through
+        Valores.objects.bulk_create([
+            Valores(productovariante_id=variante.pk, valoratributo_id=valor.pk)
+            for variante, combinacion in zip(variantes, pendientes) for valor in combinacion
+        ])
+        if stock_inicial:
+            almacen, _ = Almacen.objects.get_or_create(nombre=ALMACEN_PRINCIPAL, defaults={'activo': True})
+            Stock.objects.bulk_create([
+                Stock(variante_id=variante.pk, almacen=almacen, cantidad=stock_inicial) for variante in variantes
+            ])
+
+        # bulk_create no dispara señales
+        actualizar_productos([producto.pk])
+        nueva_version(Producto.objects.filter(pk=producto.pk))
+    return variantes, repetidas
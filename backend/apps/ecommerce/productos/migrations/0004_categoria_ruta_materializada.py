@@ -0,0 +1,53 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:14
+
+from django.db import migrations, models
+
+
+def calcular_rutas(apps, schema_editor):
+    """Rellena ruta/profundidad/nombre_completo recorriendo el árbol desde las raíces."""
+    Categoria = apps.get_model('productos', 'Categoria')
+    categorias = list(Categoria.objects.all())
+    hijos_por_padre = {}
+    for categoria in categorias:
+        hijos_por_padre.setdefault(categoria.padre_id, []).append(categoria)
+
+    pendientes = [(raiz, None) for raiz in hijos_por_padre.get(None, [])]
+    while pendientes:
+        categoria, padre = pendientes.pop()
+        if padre is None:
+            categoria.ruta = f'{categoria.pk}/'
+            categoria.profundidad = 0
+            categoria.nombre_completo = categoria.nombre
+        else:
+            categoria.ruta = f'{padre.ruta}{categoria.pk}/'
+            categoria.profundidad = padre.profundidad + 1
+            categoria.nombre_completo = f'{padre.nombre_completo} > {categoria.nombre}'
+        pendientes.extend((hijo, categoria) for hijo in hijos_por_padre.get(categoria.pk, []))
+
+    Categoria.objects.bulk_update(categorias, ['ruta', 'profundidad', 'nombre_completo'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0003_imagenproducto_productos_i_product_d1dc58_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categoria',
+            name='nombre_completo',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='categoria',
+            name='profundidad',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='categoria',
+            name='ruta',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=1000),
+        ),
+        migrations.RunPython(calcular_rutas, migrations.RunPython.noop),
+    ]
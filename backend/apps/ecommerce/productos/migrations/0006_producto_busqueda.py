@@ -0,0 +1,68 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:20
+
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+INDICE_VECTOR = (
+    "CREATE INDEX IF NOT EXISTS productos_busqueda_vector_gin "
+    "ON productos_productobusqueda USING gin (vector)"
+)
+INDICES_TRIGRAMAS = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS productos_busqueda_texto_trgm "
+    "ON productos_productobusqueda USING gin (texto gin_trgm_ops)",
+]
+
+
+def crear_indices_postgres(apps, schema_editor):
+    """
+    GIN de tsvector y de trigramas: solo existen en Postgres (en SQLite no se
+    crean). Si el servidor no trae pg_trgm (contrib) se crea solo el de
+    tsvector y la búsqueda funciona sin tolerancia a erratas.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(INDICE_VECTOR)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        disponible = cursor.fetchone() is not None
+    if disponible:
+        for sentencia in INDICES_TRIGRAMAS:
+            schema_editor.execute(sentencia)
+
+
+def borrar_indices_postgres(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS productos_busqueda_vector_gin")
+    schema_editor.execute("DROP INDEX IF EXISTS productos_busqueda_texto_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0005_producto_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductoBusqueda',
+            fields=[
+                ('producto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='busqueda', serialize=False, to='productos.producto')),
+                ('version', models.PositiveIntegerField(help_text='Producto.version indexada')),
+                ('nombre', models.TextField()),
+                ('categorias', models.TextField(blank=True)),
+                ('valores', models.TextField(blank=True)),
+                ('descripcion', models.TextField(blank=True)),
+                ('texto', models.TextField(help_text='Nombre + categorías + valores, para la similitud por trigramas')),
+                ('vector', django.contrib.postgres.search.SearchVectorField(null=True)),
+            ],
+            options={
+                'verbose_name': 'Documento de Búsqueda',
+                'verbose_name_plural': 'Documentos de Búsqueda',
+            },
+        ),
+        migrations.RunPython(crear_indices_postgres, borrar_indices_postgres),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0006_producto_busqueda'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='producto',
+            name='productos_p_activo_63a45a_idx',
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['activo', '-creado_en', '-id'], name='productos_p_activo_0e5c93_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['-creado_en', '-id'], name='productos_p_creado__b6cf72_idx'),
+        ),
+    ]
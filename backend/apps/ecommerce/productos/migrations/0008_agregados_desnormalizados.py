@@ -0,0 +1,64 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:02
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, NullIf
+
+
+def rellenar_agregados(apps, schema_editor):
+    """Calcula las columnas nuevas de todo el catálogo (lo mismo que agregados.actualizar_productos)."""
+    Producto = apps.get_model('productos', 'Producto')
+    ProductoVariante = apps.get_model('productos', 'ProductoVariante')
+    Stock = apps.get_model('inventario', 'Stock')
+    stock = Stock.objects.filter(variante=OuterRef('pk')).order_by().values('variante')
+    ProductoVariante.objects.update(
+        precio_efectivo=Coalesce(NullIf('precio_oferta', Value(Decimal(0))), 'precio'),
+        stock_disponible=Coalesce(Subquery(stock.annotate(total=Sum('cantidad')).values('total')), 0),
+    )
+    activas = ProductoVariante.objects.filter(producto=OuterRef('pk'), activo=True)
+    Producto.objects.update(
+        precio_min=Subquery(activas.order_by('precio_efectivo').values('precio_efectivo')[:1]),
+        en_stock=Exists(activas.filter(stock_disponible__gt=0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0007_producto_indices_cursor'),
+        ('inventario', '0003_indices_reportes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='en_stock',
+            field=models.BooleanField(default=False, editable=False, help_text='Alguna variante activa tiene stock'),
+        ),
+        migrations.AddField(
+            model_name='producto',
+            name='precio_min',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, help_text='Menor precio efectivo de las variantes activas', max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='productovariante',
+            name='precio_efectivo',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='productovariante',
+            name='stock_disponible',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['activo', 'precio_min', 'id'], name='productos_p_activo_5c583a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['activo', 'en_stock', '-creado_en', '-id'], name='productos_p_activo_699bfd_idx'),
+        ),
+        migrations.RunPython(rellenar_agregados, migrations.RunPython.noop),
+    ]
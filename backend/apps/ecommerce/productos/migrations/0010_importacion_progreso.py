@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0009_categoria_actualizado_en'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportacionProgreso',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=64)),
+                ('estado', models.CharField(max_length=20)),
+                ('datos', models.JSONField(blank=True, default=dict, help_text='hechos/total, resumen o errores')),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='importaciones', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Progreso de Importación',
+                'verbose_name_plural': 'Progreso de Importaciones',
+                'unique_together': {('usuario', 'clave')},
+            },
+        ),
+    ]
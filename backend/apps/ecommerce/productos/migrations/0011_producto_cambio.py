@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-19 20:16
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0010_importacion_progreso'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductoCambio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('producto_id', models.PositiveIntegerField()),
+                ('creado_en', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Cambio de Producto',
+                'verbose_name_plural': 'Cambios de Productos',
+            },
+        ),
+    ]
@@ -1,8 +1,12 @@
 # productos/models.py
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
 from django.utils.text import slugify
 from cloudinary.models import CloudinaryField 
-from django.db.models import Sum
+from django.db.models import Sum, F, Value
+from django.db.models.functions import Concat, Substr
+from django.contrib.postgres.search import SearchVectorField
 import uuid 
 
 # --- Categorías ---
@@ -23,6 +27,16 @@ class Categoria(models.Model):
     descripcion = models.TextField(blank=True)
     imagen = CloudinaryField('categoria_imagen', blank=True, null=True)
 
+    # --- Ruta materializada (se mantiene sola en save()) ---
+    # ruta: ids desde la raíz, ej. '1/4/9/'. El subárbol de una categoría son
+    # las filas cuya ruta empieza por la suya (una consulta con índice).
+    ruta = models.CharField(max_length=1000, blank=True, editable=False, db_index=True)
+    profundidad = models.PositiveSmallIntegerField(default=0, editable=False)
+    # Migas de pan precalculadas: 'Hombre > Ropa > Camisas'
+    nombre_completo = models.TextField(blank=True, editable=False)
+    # Sello del árbol cacheado del menú (arbol.py), junto al número de categorías
+    actualizado_en = models.DateTimeField(auto_now=True)
+
     class Meta:
         verbose_name = "Categoría"
         verbose_name_plural = "Categorías"
@@ -37,16 +51,83 @@ class Categoria(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.nombre)
-        super().save(*args, **kwargs)
+
+        padre = None
+        if self.padre_id is not None:
+            padre = Categoria.objects.values('ruta', 'nombre_completo', 'profundidad').get(pk=self.padre_id)
+        anterior = None
+        if self.pk is not None:
+            anterior = Categoria.objects.filter(pk=self.pk).values('ruta', 'nombre_completo', 'profundidad').first()
+            if anterior and anterior['ruta'] and padre and padre['ruta'].startswith(anterior['ruta']):
+                raise ValueError("Una categoría no puede moverse dentro de su propio subárbol.")
+
+        with transaction.atomic():
+            if self.pk is None:
+                # El id forma parte de la ruta: primero se inserta
+                super().save(*args, **kwargs)
+                self._calcular_ruta(padre)
+                Categoria.objects.filter(pk=self.pk).update(
+                    ruta=self.ruta, profundidad=self.profundidad, nombre_completo=self.nombre_completo
+                )
+                return
+
+            self._calcular_ruta(padre)
+            # El subárbol se reescribe ANTES de guardar: así, cuando salta
+            # post_save, toda la rama ya tiene la ruta nueva (ver signals.py)
+            if anterior and anterior['ruta'] and (
+                anterior['ruta'] != self.ruta or anterior['nombre_completo'] != self.nombre_completo
+            ):
+                self._propagar_a_descendientes(anterior)
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {
+                    *kwargs['update_fields'], 'ruta', 'profundidad', 'nombre_completo', 'actualizado_en'
+                }
+            super().save(*args, **kwargs)
+
+    def _calcular_ruta(self, padre):
+        """padre: dict con ruta/nombre_completo/profundidad del padre, o None."""
+        if padre is None:
+            self.ruta = f'{self.pk}/'
+            self.profundidad = 0
+            self.nombre_completo = self.nombre
+        else:
+            self.ruta = f"{padre['ruta']}{self.pk}/"
+            self.profundidad = padre['profundidad'] + 1
+            self.nombre_completo = f"{padre['nombre_completo']} > {self.nombre}"
+
+    def _propagar_a_descendientes(self, anterior):
+        """
+        Al mover o renombrar, reescribe en un solo UPDATE el prefijo de la
+        ruta y de las migas de pan de todo el subárbol.
+        """
+        Categoria.objects.filter(ruta__startswith=anterior['ruta']).exclude(pk=self.pk).update(
+            ruta=Concat(
+                Value(self.ruta), Substr('ruta', len(anterior['ruta']) + 1),
+                output_field=models.CharField(),
+            ),
+            nombre_completo=Concat(
+                Value(self.nombre_completo), Substr('nombre_completo', len(anterior['nombre_completo']) + 1),
+                output_field=models.TextField(),
+            ),
+            profundidad=F('profundidad') + (self.profundidad - anterior['profundidad']),
+        )
+
+    # --- Consultas sobre el árbol (una consulta cada una) ---
+    def descendientes(self, incluir_propia=False):
+        """Todas las categorías del subárbol (hijos, nietos...)."""
+        subarbol = Categoria.objects.filter(ruta__startswith=self.ruta)
+        return subarbol if incluir_propia else subarbol.exclude(pk=self.pk)
+
+    def ancestros(self, incluir_propia=False):
+        """Desde la raíz hasta el padre (o hasta ella misma), en orden."""
+        ids = [int(i) for i in self.ruta.split('/') if i]
+        if not incluir_propia:
+            ids = ids[:-1]
+        return Categoria.objects.filter(id__in=ids).order_by('profundidad')
 
     def __str__(self):
         # Muestra la ruta completa: Hombre > Ropa > Camisas
-        full_path = [self.nombre]
-        k = self.padre
-        while k is not None:
-            full_path.append(k.nombre)
-            k = k.padre
-        return ' > '.join(full_path[::-1])
+        return self.nombre_completo or self.nombre
     
 
 # --- Atributos (Talla, Color, etc.) ---
@@ -98,25 +179,54 @@ class Producto(models.Model):
                                  help_text="Visible en la tienda")
     creado_en = models.DateTimeField(auto_now_add=True)
     actualizado_en = models.DateTimeField(auto_now=True)
+    # Sello de versión de la caché de fragmentos (fragmentos.py): las señales
+    # lo suben con F('version') + 1 cuando cambia el producto o lo que anida.
+    version = models.PositiveIntegerField(default=1, editable=False)
+    # Agregados de las variantes ACTIVAS, para ordenar y filtrar en SQL
+    # (agregados.py): las señales los recalculan, no se escriben a mano.
+    precio_min = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, editable=False,
+                                     help_text="Menor precio efectivo de las variantes activas")
+    en_stock = models.BooleanField(default=False, editable=False,
+                                   help_text="Alguna variante activa tiene stock")
+
+    # Columnas que calcula la BD (signals.py, agregados.py): save() las relee al terminar
+    CAMPOS_CALCULADOS = ('version', 'precio_min', 'en_stock')
 
     class Meta:
         verbose_name = "Producto"
         verbose_name_plural = "Productos"
         ordering = ('-creado_en',)
         indexes = [
-            models.Index(fields=['activo', '-creado_en']),
+            # Paginación por cursor (paginacion.py): (creado_en, id) de más nuevo a más viejo
+            models.Index(fields=['activo', '-creado_en', '-id']),
+            models.Index(fields=['-creado_en', '-id']),
             models.Index(fields=['categoria', 'activo']),
             models.Index(fields=['slug']),
+            # Orden por precio (?orden=precio) y filtro ?disponible=true del catálogo
+            models.Index(fields=['activo', 'precio_min', 'id']),
+            models.Index(fields=['activo', 'en_stock', '-creado_en', '-id']),
         ]
 
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(f"{self.nombre}-{uuid.uuid4().hex[:6]}")
-        super().save(*args, **kwargs)
+        if not self._state.adding:
+            # La versión solo sube (signals.nueva_version): una instancia cargada
+            # antes de otro cambio no la devuelve a su valor viejo
+            self.version = F('version')
+        # La señal post_save recalcula precio_min / en_stock (agregados.py) y sube la versión
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+        self.refresh_from_db(fields=self.CAMPOS_CALCULADOS)
 
     def __str__(self):
         return self.nombre
 
+def generar_sku(slug):
+    """SKU por defecto de una variante: el slug del producto en mayúsculas y 8 caracteres aleatorios."""
+    return f"{slug.upper()[:90]}-{uuid.uuid4().hex[:8].upper()}"  # Cabe en max_length=100
+
+
 class ProductoVariante(models.Model):
     """
     La unidad vendible (SKU). Esto es lo que tiene precio y stock.
@@ -141,6 +251,12 @@ class ProductoVariante(models.Model):
     activo = models.BooleanField(default=True, 
                                  help_text="Esta variante específica está a la venta")
 
+    # --- Desnormalizados (agregados.py) ---
+    # precio_oferta si la hay, si no precio (como ItemCarrito.precio_final); lo recalculan las señales
+    precio_efectivo = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
+    # Suma del stock en todos los almacenes (como stock_total); lo recalculan las señales de Stock
+    stock_disponible = models.PositiveIntegerField(default=0, editable=False)
+
     class Meta:
         verbose_name = "Variante de Producto"
         verbose_name_plural = "Variantes de Producto"
@@ -151,9 +267,20 @@ class ProductoVariante(models.Model):
         ]
 
     def save(self, *args, **kwargs):
+        from .agregados import precio_efectivo
         if not self.sku:
-            self.sku = f"{self.producto.slug.upper()}-{uuid.uuid4().hex[:8].upper()}"
-        super().save(*args, **kwargs)
+            self.sku = generar_sku(self.producto.slug)
+        self.precio_efectivo = precio_efectivo(self.precio, self.precio_oferta)
+        # La señal post_save recalcula en la BD precio_efectivo y stock_disponible
+        # (aunque no vayan en update_fields o la instancia traiga un stock viejo)
+        # y los agregados del producto, en la misma transacción
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+        self.refresh_from_db(fields=['stock_disponible'])
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
 
     def __str__(self):
         # Genera un nombre descriptivo: "Camisa de Lino (Azul, M)"
@@ -165,7 +292,12 @@ class ProductoVariante(models.Model):
         """
         Calcula y devuelve el stock total de esta variante
         sumando el stock de TODOS los almacenes.
+        Si las filas de stock ya vienen prefetcheadas (ver catalogo.py) se
+        suman en memoria; si no, se hace el aggregate en la BD.
         """
+        prefetcheados = getattr(self, '_prefetched_objects_cache', {})
+        if 'stock_records' in prefetcheados:
+            return sum(stock.cantidad for stock in prefetcheados['stock_records'])
         total = self.stock_records.aggregate(
             total_stock=Sum('cantidad')
         )['total_stock']
@@ -190,4 +322,61 @@ class ImagenProducto(models.Model):
         ordering = ['-es_principal'] # La principal primero
         indexes = [
             models.Index(fields=['producto', '-es_principal']),
-        ]
\ No newline at end of file
+        ]
+
+
+class ProductoBusqueda(models.Model):
+    """
+    Documento de búsqueda de un producto para el backend Postgres (busqueda.py).
+    Los textos se guardan ya normalizados (minúsculas, sin tildes) y 'vector'
+    los pondera: nombre (A), categorías (B), valores de atributo (C), descripción (D).
+    Los índices GIN (tsvector y trigramas) se crean en la migración solo en Postgres.
+    """
+    producto = models.OneToOneField(Producto, on_delete=models.CASCADE, primary_key=True,
+                                    related_name='busqueda')
+    version = models.PositiveIntegerField(help_text="Producto.version indexada")
+    nombre = models.TextField()
+    categorias = models.TextField(blank=True)
+    valores = models.TextField(blank=True)
+    descripcion = models.TextField(blank=True)
+    texto = models.TextField(help_text="Nombre + categorías + valores, para la similitud por trigramas")
+    vector = SearchVectorField(null=True)
+
+    class Meta:
+        verbose_name = "Documento de Búsqueda"
+        verbose_name_plural = "Documentos de Búsqueda"
+
+
+class ProductoCambio(models.Model):
+    """
+    Registro de productos cambiados: signals.nueva_version() anota cada
+    producto al subirle la versión (y al borrarlo). Los índices en memoria
+    (indices.py) leen solo las filas nuevas desde su última sincronización
+    en lugar de comparar las versiones de todo el catálogo.
+    """
+    # Sin FK: la fila tiene que sobrevivir al borrado del producto
+    producto_id = models.PositiveIntegerField()
+    creado_en = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        verbose_name = "Cambio de Producto"
+        verbose_name_plural = "Cambios de Productos"
+
+
+class ImportacionProgreso(models.Model):
+    """
+    Estado de una importación masiva (importacion.py). Va en la BD y no en la
+    caché de cada proceso: cualquier worker lo devuelve mientras otro importa.
+    La clave la elige el cliente (o se genera) y es única por usuario.
+    """
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                                related_name='importaciones')
+    clave = models.CharField(max_length=64)
+    estado = models.CharField(max_length=20)
+    datos = models.JSONField(default=dict, blank=True, help_text="hechos/total, resumen o errores")
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Progreso de Importación"
+        verbose_name_plural = "Progreso de Importaciones"
+        unique_together = ('usuario', 'clave')
@@ -0,0 +1,219 @@
+# productos/paginacion.py
+"""
+Paginación del catálogo.
+
+ProductoPagination (páginas numeradas) hace un COUNT(*) en cada petición y
+las páginas profundas usan OFFSET, que recorre y descarta todas las filas
+anteriores. CatalogoPagination añade un modo por cursor (keyset) sobre
+(creado_en, id), el mismo orden que -creado_en con el id como desempate:
+
+    WHERE (creado_en, id) < (los del último producto visto)
+    ORDER BY creado_en DESC, id DESC LIMIT n + 1
+
+El índice (activo, -creado_en, -id) de Producto resuelve esa consulta igual
+en la página 1 que en la 1000. Sin COUNT: con ?total=aproximado se añade
+la estimación del planificador (Postgres) o un COUNT cacheado (otras BD).
+
+?orden=precio / ?orden=-precio ordena por Producto.precio_min (columna
+desnormalizada, agregados.py) con el índice (activo, precio_min, id); el
+cursor funciona igual sobre (precio_min, id). Los productos sin variantes
+activas (precio_min NULL) no salen en esos órdenes.
+"""
+import base64
+import hashlib
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class ProductoPagination(PageNumberPagination):
+    """Paginación personalizada para productos."""
+    page_size = 12
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+# ?orden= -> (campo de Producto, descendente); el id desempata en el mismo sentido
+ORDENES_CATALOGO = {
+    'nuevos': ('creado_en', True),
+    'precio': ('precio_min', False),
+    '-precio': ('precio_min', True),
+}
+ORDEN_POR_DEFECTO = 'nuevos'
+
+
+def orden_catalogo(request):
+    """El ?orden= pedido, o el de por defecto si falta o no se conoce."""
+    orden = request.query_params.get('orden')
+    return orden if orden in ORDENES_CATALOGO else ORDEN_POR_DEFECTO
+
+
+def ordenar_catalogo(productos, orden):
+    """Ordena por el campo de `orden` y el id; si el campo admite NULL, deja fuera esas filas."""
+    campo, descendente = ORDENES_CATALOGO[orden]
+    if productos.model._meta.get_field(campo).null:
+        productos = productos.filter(**{f'{campo}__isnull': False})
+    return productos.order_by(*(f'-{c}' if descendente else c for c in (campo, 'id')))
+
+
+def estimar_total(queryset):
+    """
+    Total aproximado sin recorrer las filas: en Postgres, las filas que
+    estima el planificador (EXPLAIN); en otras BD, un COUNT cacheado
+    CATALOGO_CACHE_TTL segundos.
+    """
+    conexion = connections[queryset.db]
+    queryset = queryset.order_by()
+    if conexion.vendor == 'postgresql':
+        sql, params = queryset.query.sql_with_params()
+        with conexion.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+    clave = 'productos:total:' + hashlib.md5(str(queryset.query).encode()).hexdigest()
+    total = cache.get(clave)
+    if total is None:
+        total = queryset.count()
+        cache.set(clave, total, settings.CATALOGO_CACHE_TTL)
+    return total
+
+
+class CursorCatalogoPagination(BasePagination):
+    """
+    Paginación por cursor (keyset) sobre (campo, id) según ?orden=: por
+    defecto (creado_en, id), de más nuevo a más viejo. El cursor es opaco
+    (base64 del orden, el valor del campo, el id y el sentido) y cada
+    respuesta trae los enlaces 'next' y 'previous' ya armados.
+    """
+    page_size = 12
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Cursor inválido'
+
+    def get_page_size(self, request):
+        try:
+            pedido = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(pedido, self.max_page_size) if pedido > 0 else self.page_size
+
+    # --- Cursor ---
+
+    def _codificar(self, producto, atras=False):
+        valor = getattr(producto, self.campo)
+        valor = valor.isoformat() if hasattr(valor, 'isoformat') else str(valor)
+        datos = json.dumps([self.orden, valor, producto.pk, int(atras)])
+        codigo = base64.urlsafe_b64encode(datos.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, codigo)
+
+    def _decodificar(self, codigo, modelo):
+        if not codigo:
+            return None
+        try:
+            orden, valor, pk, atras = json.loads(base64.urlsafe_b64decode(codigo.encode()))
+            # Un cursor de otro ?orden= no vale: su valor es de otro campo
+            if orden != self.orden:
+                raise ValueError
+            return modelo._meta.get_field(self.campo).to_python(valor), int(pk), bool(atras)
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    # --- Paginación ---
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = remove_query_param(request.build_absolute_uri(), 'page')
+        self.orden = orden_catalogo(request)
+        self.campo, descendente = ORDENES_CATALOGO[self.orden]
+        tamano = self.get_page_size(request)
+        cursor = self._decodificar(request.query_params.get(self.cursor_query_param), queryset.model)
+        self.total_aproximado = (
+            estimar_total(queryset) if request.query_params.get('total') == 'aproximado' else None
+        )
+
+        atras = cursor is not None and cursor[2]
+        if cursor is None:
+            productos = ordenar_catalogo(queryset, self.orden)
+        else:
+            valor, pk, _ = cursor
+            # Hacia atrás se recorre en el sentido contrario y luego se da la vuelta a la página
+            baja = descendente != atras
+            op = 'lt' if baja else 'gt'
+            campo = self.campo
+            # campo__lte / __gte redundante: acota el rango del índice
+            productos = queryset.filter(
+                Q(**{f'{campo}__{op}': valor}) | Q(**{campo: valor, f'id__{op}': pk}), **{f'{campo}__{op}e': valor}
+            ).order_by(*(f'-{c}' if baja else c for c in (campo, 'id')))
+
+        filas = list(productos[:tamano + 1])
+        hay_mas = len(filas) > tamano
+        filas = filas[:tamano]
+        if atras:
+            filas.reverse()
+            hay_siguiente, hay_anterior = True, hay_mas
+        else:
+            hay_siguiente, hay_anterior = hay_mas, cursor is not None
+
+        self.siguiente = self._codificar(filas[-1]) if hay_siguiente and filas else None
+        self.anterior = self._codificar(filas[0], atras=True) if hay_anterior and filas else None
+        if not filas and cursor is not None:
+            # Página vacía (se borró lo que venía): se puede volver desde el mismo punto
+            punto = queryset.model(pk=cursor[1], **{self.campo: cursor[0]})
+            self.siguiente = self._codificar(punto) if atras else None
+            self.anterior = None if atras else self._codificar(punto, atras=True)
+        return filas
+
+    def get_paginated_response(self, data):
+        respuesta = OrderedDict([('next', self.siguiente), ('previous', self.anterior), ('results', data)])
+        if self.total_aproximado is not None:
+            respuesta['total_aproximado'] = self.total_aproximado
+        return Response(respuesta)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'total_aproximado': {'type': 'integer'},
+                'results': schema,
+            },
+        }
+
+
+class CatalogoPagination(ProductoPagination):
+    """
+    Páginas numeradas por defecto (lo que usa el frontend hoy). Con ?cursor=
+    o ?paginacion=cursor (primera página) pasa a CursorCatalogoPagination,
+    pensada para el scroll infinito de la tienda.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor = None
+        if self.usa_cursor(request):
+            self.cursor = CursorCatalogoPagination()
+            return self.cursor.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    @staticmethod
+    def usa_cursor(request):
+        parametros = request.query_params
+        return CursorCatalogoPagination.cursor_query_param in parametros or parametros.get('paginacion') == 'cursor'
+
+    def get_paginated_response(self, data):
+        if self.cursor is not None:
+            return self.cursor.get_paginated_response(data)
+        return super().get_paginated_response(data)
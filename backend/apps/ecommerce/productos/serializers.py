@@ -1,4 +1,8 @@
+import math
+
+from django.conf import settings
 from rest_framework import serializers
+from apps.medios import url_medio, urls_responsive
 from .models import (
     Categoria, 
     Atributo, 
@@ -8,6 +12,7 @@ from .models import (
     ImagenProducto
 )
 from ..inventario.serializers import StockSerializer
+from .campos import CamposDinamicosMixin
 
 class CategoriaSimpleSerializer(serializers.ModelSerializer):
     """
@@ -16,7 +21,7 @@ class CategoriaSimpleSerializer(serializers.ModelSerializer):
     """
     class Meta:
         model = Categoria
-        fields = ('id', 'nombre', 'slug') # Solo los campos básicos
+        fields = ('id', 'nombre', 'slug', 'nombre_completo') # Campos básicos + migas de pan
 
 
 # --- Serializadores Base ---
@@ -42,16 +47,28 @@ class CategoriaSerializer(serializers.ModelSerializer):
         )
 
     def get_hijos(self, obj):
-        """Devuelve los hijos serializados."""
-        hijos = Categoria.objects.filter(padre=obj)
+        """
+        Devuelve los hijos serializados.
+        Si el contexto trae 'hijos_por_padre' (ver arbol.py) se usan los hijos
+        ya cargados en memoria en lugar de una consulta por nodo.
+        """
+        hijos_por_padre = self.context.get('hijos_por_padre')
+        if hijos_por_padre is not None:
+            hijos = hijos_por_padre.get(obj.id, [])
+        else:
+            hijos = Categoria.objects.filter(padre=obj).order_by('id')
         serializer = CategoriaSerializer(hijos, many=True, context=self.context)
         return serializer.data
 
+    def validate_padre(self, padre):
+        """Impide mover una categoría dentro de su propio subárbol."""
+        if padre is not None and self.instance is not None and padre.ruta.startswith(self.instance.ruta):
+            raise serializers.ValidationError("Una categoría no puede ser hija de sí misma ni de sus descendientes.")
+        return padre
+
     def get_imagen_url(self, obj):
         """Devuelve la URL de la imagen de Cloudinary."""
-        if obj.imagen and hasattr(obj.imagen, 'url'):
-            return obj.imagen.url
-        return None
+        return url_medio(obj.imagen)
 
 class AtributoSerializer(serializers.ModelSerializer):
     class Meta:
@@ -76,15 +93,14 @@ class ImagenProductoSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'imagen_url')
 
     def get_imagen_url(self, obj):
-        if obj.imagen and hasattr(obj.imagen, 'url'):
-            return obj.imagen.url
-        return None
+        return url_medio(obj.imagen)
 
 
 # --- Serializadores de Producto y Variante (El Núcleo) ---
-class ProductoVarianteSerializer(serializers.ModelSerializer):
+class ProductoVarianteSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """
     Serializador para la Variante (el SKU vendible).
+    Admite ?fields= (ver campos.py).
     """
     # --- Campos de Lectura (Anidados) ---
     valores = ValorAtributoSerializer(many=True, read_only=True)
@@ -122,6 +138,7 @@ class ProductoVarianteSerializer(serializers.ModelSerializer):
             'precio', 
             'precio_oferta', 
             'activo',
+            'precio_efectivo',      # precio_oferta si la hay, si no precio
             'stock_total',          # La @property (Ej: 60)
             'stock_records',        # Lista de stock por almacén
             'imagen_variante',      # Campo para subir la imagen
@@ -130,12 +147,10 @@ class ProductoVarianteSerializer(serializers.ModelSerializer):
             'valores_ids',          # Lista de IDs [1, 5] para escritura
             'stock_inicial',        # Stock inicial (solo para creación)
         )
-        read_only_fields = ('id', 'sku', 'stock_total', 'stock_records', 'imagen_variante_url')
+        read_only_fields = ('id', 'sku', 'precio_efectivo', 'stock_total', 'stock_records', 'imagen_variante_url')
         
     def get_imagen_variante_url(self, obj):
-        if obj.imagen_variante and hasattr(obj.imagen_variante, 'url'):
-            return obj.imagen_variante.url
-        return None
+        return url_medio(obj.imagen_variante)
     
     def create(self, validated_data):
         from ..inventario.models import Stock, Almacen
@@ -163,10 +178,11 @@ class ProductoVarianteSerializer(serializers.ModelSerializer):
         
         return variante
 
-class ProductoSerializer(serializers.ModelSerializer):
+class ProductoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """
     Serializador principal para el Producto (la plantilla).
     Anida toda la información relevante para el frontend.
+    Admite ?fields= (ver campos.py).
     """
     # --- Campos Anidados (Solo Lectura) ---
     categoria = CategoriaSimpleSerializer(read_only=True)
@@ -205,6 +221,8 @@ class ProductoSerializer(serializers.ModelSerializer):
             'activo',
             'creado_en',
             'actualizado_en',
+            'precio_min',           # Precio efectivo más bajo de las variantes activas
+            'en_stock',             # Alguna variante activa con stock
             'categoria',            # Objeto de categoría (lectura)
             'atributos',            # Lista de atributos (lectura)
             'imagenes_galeria',     # Lista de imágenes de galería (lectura)
@@ -212,4 +230,88 @@ class ProductoSerializer(serializers.ModelSerializer):
             'categoria_id',         # ID para escritura
             'atributos_ids',        # Lista de IDs para escritura
         )
-        read_only_fields = ('id', 'slug', 'creado_en', 'actualizado_en')
\ No newline at end of file
+        read_only_fields = ('id', 'slug', 'creado_en', 'actualizado_en', 'precio_min', 'en_stock')
+
+
+class ProductoResumenSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    """
+    Versión compacta para la rejilla del catálogo (?vista=resumen): nombre,
+    rango de precios, imagen principal y si hay stock. precio_max e
+    imagen_principal vienen anotados por catalogo.productos_resumen().
+    Con ?expand= se añaden variantes, imagenes_galeria, atributos o
+    imagen_tamanos (apps/medios.py).
+    """
+    categoria = CategoriaSimpleSerializer(read_only=True)
+    precio_min = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    precio_max = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    disponible = serializers.BooleanField(source='en_stock', read_only=True)
+    imagen_principal = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Producto
+        fields = (
+            'id',
+            'nombre',
+            'slug',
+            'categoria',
+            'precio_min',           # Precio más bajo de las variantes activas (oferta incluida)
+            'precio_max',
+            'disponible',           # Alguna variante activa con stock
+            'imagen_principal',     # URL de la imagen principal (o la primera)
+        )
+        read_only_fields = fields
+        expandibles = {
+            'variantes': lambda: ProductoVarianteSerializer(many=True, read_only=True),
+            'imagenes_galeria': lambda: ImagenProductoSerializer(many=True, read_only=True, source='imagenes'),
+            'atributos': lambda: AtributoSerializer(many=True, read_only=True),
+            # URLs responsive de la imagen principal (miniatura, tarjeta, detalle)
+            'imagen_tamanos': lambda: serializers.SerializerMethodField(),
+        }
+
+    def get_imagen_principal(self, obj):
+        return url_medio(getattr(obj, 'imagen_principal', None))
+
+    def get_imagen_tamanos(self, obj):
+        return urls_responsive(getattr(obj, 'imagen_principal', None))
+
+
+class GenerarVariantesSerializer(serializers.Serializer):
+    """
+    Entrada de la matriz de variantes (matriz.py): una lista de IDs de
+    ValorAtributo por atributo, ej. [[tallas...], [colores...]], y los datos
+    comunes de todas las variantes que se creen.
+    """
+    valores = serializers.ListField(
+        child=serializers.ListField(child=serializers.IntegerField(), allow_empty=False),
+        allow_empty=False,
+        help_text="IDs de valores agrupados por atributo: [[1, 2, 3], [7, 8]]"
+    )
+    precio = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+    precio_oferta = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0,
+                                             required=False, allow_null=True)
+    stock_inicial = serializers.IntegerField(required=False, default=0, min_value=0,
+                                             help_text="Stock de cada variante nueva en el almacén principal")
+    activo = serializers.BooleanField(required=False, default=True)
+
+    def validate_valores(self, ids):
+        # Todos los valores en una sola consulta
+        por_id = ValorAtributo.objects.select_related('atributo').in_bulk({i for grupo in ids for i in grupo})
+        faltan = sorted({i for grupo in ids for i in grupo} - set(por_id))
+        if faltan:
+            raise serializers.ValidationError(f"No existen los valores de atributo {faltan}.")
+        # Sin duplicados dentro de cada lista (mismo orden)
+        grupos = [[por_id[i] for i in dict.fromkeys(grupo)] for grupo in ids]
+        vistos = set()
+        for grupo in grupos:
+            atributos = {valor.atributo_id for valor in grupo}
+            if len(atributos) > 1:
+                raise serializers.ValidationError("Cada lista debe tener valores de un solo atributo.")
+            if atributos & vistos:
+                raise serializers.ValidationError(f"El atributo '{grupo[0].atributo.nombre}' aparece en dos listas.")
+            vistos |= atributos
+        total = math.prod(len(grupo) for grupo in grupos)
+        if total > settings.MATRIZ_VARIANTES_MAX:
+            raise serializers.ValidationError(
+                f"{total} combinaciones: el máximo por petición es {settings.MATRIZ_VARIANTES_MAX}."
+            )
+        return grupos
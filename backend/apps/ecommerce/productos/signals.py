@@ -0,0 +1,141 @@
+# en backend/apps/ecommerce/productos/signals.py
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import Categoria, Atributo, ValorAtributo, Producto, ProductoCambio, ProductoVariante, ImagenProducto
+from ..inventario.models import Almacen, Stock
+from .agregados import actualizar_productos, actualizar_variantes
+from .busqueda import reindexar_cambios
+from .fragmentos import fragmentos
+from .indices import marcar_pendientes
+
+
+def nueva_version(productos):
+    """
+    Sube Producto.version de los productos indicados (queryset) para que sus
+    fragmentos cacheados y su entrada en los índices (búsqueda, facetas) dejen de
+    valer en TODOS los procesos.
+    También mueve actualizado_en: es el Last-Modified del detalle público
+    (condicional.py) y debe cambiar con variantes, stock e imágenes.
+    Ojo: queryset.update() y bulk_create() no disparan señales; quien cambie
+    el catálogo así debe llamar a esta función a mano.
+    """
+    ids = set(productos.values_list('pk', flat=True))
+    if ids:
+        productos.update(version=F('version') + 1, actualizado_en=timezone.now())
+        anotar_cambios(ids)
+
+
+def anotar_cambios(ids):
+    """
+    Anota los productos en ProductoCambio: los índices en memoria (búsqueda,
+    facetas) reindexan solo esos en la próxima consulta. Al confirmarse, la
+    búsqueda en Postgres actualiza sus filas (busqueda.reindexar_cambios).
+    """
+    ProductoCambio.objects.bulk_create([ProductoCambio(producto_id=producto_id) for producto_id in ids])
+    transaction.on_commit(marcar_pendientes)
+    transaction.on_commit(lambda: reindexar_cambios(ids), robust=True)
+
+
+# El árbol cacheado del menú no necesita señal: su clave lleva el sello de
+# Categoria (número y último actualizado_en), ver arbol.py.
+
+
+@receiver(post_save, sender=Categoria)
+def invalidar_productos_categoria(sender, instance, created, **kwargs):
+    """Las migas de pan (nombre_completo) van dentro de los productos del subárbol."""
+    if not created:
+        nueva_version(Producto.objects.filter(categoria__ruta__startswith=instance.ruta))
+
+
+@receiver(post_save, sender=Producto)
+def invalidar_producto(sender, instance, **kwargs):
+    """save() escribe todas las columnas: precio_min / en_stock se recalculan de sus variantes."""
+    actualizar_productos([instance.pk])
+    nueva_version(Producto.objects.filter(pk=instance.pk))
+
+
+@receiver(post_delete, sender=Producto)
+def descartar_producto(sender, instance, **kwargs):
+    fragmentos.descartar(instance.pk)
+    anotar_cambios({instance.pk})
+
+
+@receiver(post_save, sender=ImagenProducto)
+@receiver(post_delete, sender=ImagenProducto)
+def invalidar_producto_de_imagen(sender, instance, **kwargs):
+    """Las imágenes van anidadas en el fragmento de su producto."""
+    if instance.producto_id is not None:
+        nueva_version(Producto.objects.filter(pk=instance.producto_id))
+
+
+@receiver(post_save, sender=ProductoVariante)
+def actualizar_producto_de_variante(sender, instance, **kwargs):
+    """
+    Precio, activo o una variante nueva cambian precio_efectivo, precio_min y
+    en_stock (agregados.py); la variante va anidada en el fragmento del producto.
+    """
+    actualizar_variantes([instance.pk])
+    nueva_version(Producto.objects.filter(pk=instance.producto_id))
+
+
+@receiver(post_delete, sender=ProductoVariante)
+def actualizar_producto_sin_variante(sender, instance, **kwargs):
+    actualizar_productos([instance.producto_id])
+    nueva_version(Producto.objects.filter(pk=instance.producto_id))
+
+
+@receiver(post_save, sender=Stock)
+@receiver(post_delete, sender=Stock)
+def actualizar_producto_de_stock(sender, instance, **kwargs):
+    """
+    stock_disponible de la variante y en_stock de su producto (agregados.py);
+    stock_records y stock_total de la variante van en el fragmento.
+    """
+    actualizar_variantes([instance.variante_id])
+    nueva_version(Producto.objects.filter(variantes__id=instance.variante_id))
+
+
+@receiver(post_save, sender=Almacen)
+def invalidar_productos_almacen(sender, instance, created, **kwargs):
+    if not created:
+        nueva_version(Producto.objects.filter(variantes__stock_records__almacen=instance))
+
+
+@receiver(post_save, sender=Atributo)
+def invalidar_productos_atributo(sender, instance, created, **kwargs):
+    if not created:
+        nueva_version(Producto.objects.filter(atributos=instance))
+
+
+@receiver(post_save, sender=ValorAtributo)
+def invalidar_productos_valor(sender, instance, created, **kwargs):
+    if not created:
+        nueva_version(Producto.objects.filter(variantes__valores=instance))
+
+
+@receiver(m2m_changed, sender=Producto.atributos.through)
+def invalidar_atributos_producto(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        nueva_version(Producto.objects.filter(pk=instance.pk))
+    elif action == 'pre_clear':
+        nueva_version(Producto.objects.filter(atributos=instance))
+    else:
+        nueva_version(Producto.objects.filter(pk__in=pk_set))
+
+
+@receiver(m2m_changed, sender=ProductoVariante.valores.through)
+def invalidar_valores_variante(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        nueva_version(Producto.objects.filter(pk=instance.producto_id))
+    elif action == 'pre_clear':
+        nueva_version(Producto.objects.filter(variantes__valores=instance))
+    else:
+        nueva_version(Producto.objects.filter(variantes__id__in=pk_set))
@@ -1,3 +1,978 @@
-from django.test import TestCase
+import csv
+import io
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import cloudinary
+from cloudinary import CloudinaryResource
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import Sum
+from django.http import QueryDict
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import urlencode
+from django.utils.text import slugify
+from rest_framework.test import APIClient
+
+from apps import medios
+from ..inventario.models import Almacen, Stock
+from . import busqueda, importacion, views
+from .agregados import desajustes
+from .facetas import IndiceFacetas
+from .fragmentos import CacheFragmentos, fragmentos
+from .importacion import ImportacionInvalida, exportar_filas, importar, leer_archivo, validar
+from .indices import MARGEN_CAMBIOS
+from .models import (
+    Atributo, Categoria, ImagenProducto, ImportacionProgreso, Producto, ProductoCambio, ProductoVariante,
+    ValorAtributo,
+)
+from .serializers import CategoriaSerializer
+from .signals import nueva_version
+
+
+def crear_arbol(prefijo, raices, hijos, nietos):
+    for r in range(raices):
+        raiz = Categoria.objects.create(nombre=f'{prefijo} {r}')
+        for h in range(hijos):
+            hijo = Categoria.objects.create(nombre=f'{prefijo} {r}.{h}', padre=raiz)
+            for n in range(nietos):
+                Categoria.objects.create(nombre=f'{prefijo} {r}.{h}.{n}', padre=hijo)
+
+
+class CategoriasPublicasTests(TestCase):
+    """GET /api/productos/categorias/: árbol cacheado con sello de la BD (arbol.py)."""
+
+    url = reverse('public-categorias')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        crear_arbol('Ropa', 3, 3, 2)
+
+    def respuesta_recursiva(self):
+        """Lo que devolvía la vista antes: raíces + una consulta por nodo."""
+        raices = Categoria.objects.filter(padre__isnull=True).order_by('id')
+        return CategoriaSerializer(raices, many=True).data
+
+    def test_respuesta_igual_a_la_recursiva(self):
+        datos = self.client.get(self.url).json()
+        esperado = self.respuesta_recursiva()
+        self.assertEqual(datos['count'], len(esperado))
+        self.assertEqual(datos['results'], esperado)
+
+    def test_consultas_fijas_sin_importar_el_tamaño(self):
+        for forma in ((2, 2, 2), (5, 4, 3)):
+            crear_arbol(f'Más {forma}', *forma)
+            # Sello + carga del árbol al reconstruirlo; solo el sello con la caché caliente
+            with self.assertNumQueries(2):
+                self.client.get(self.url)
+            with self.assertNumQueries(1):
+                self.client.get(self.url)
+
+    def test_304_con_la_consulta_del_sello(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(1):
+            respuesta = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+
+    def test_cambio_hecho_por_otro_proceso(self):
+        # Nada toca la caché de este proceso: solo cambia la fila en la BD
+        self.client.get(self.url)
+        raiz = Categoria.objects.filter(padre__isnull=True).order_by('id').first()
+        Categoria.objects.filter(pk=raiz.pk).update(nombre='Renombrada', actualizado_en=timezone.now())
+        datos = self.client.get(self.url).json()
+        self.assertEqual(datos['results'][0]['nombre'], 'Renombrada')
+
+    def test_guardar_y_borrar_cambian_el_arbol(self):
+        primera = self.client.get(self.url)
+        hoja = Categoria.objects.get(nombre='Ropa 0.0.0')
+        hoja.nombre = 'Ropa hoja renombrada'
+        hoja.save()
+        respuesta = self.client.get(self.url, HTTP_IF_NONE_MATCH=primera['ETag'])
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('Ropa hoja renombrada', str(respuesta.json()['results']))
+
+        hoja.delete()
+        self.assertNotIn('Ropa hoja renombrada', str(self.client.get(self.url).json()['results']))
+        self.assertEqual(self.client.get(self.url).json()['results'], self.respuesta_recursiva())
+
+
+def crear_catalogo(prefijo, productos, variantes, almacenes=2):
+    """Productos con `variantes` combinaciones Talla x Color, stock en cada almacén y una imagen."""
+    categoria = Categoria.objects.create(nombre=f'{prefijo} categoría')
+    talla, _ = Atributo.objects.get_or_create(nombre='Talla')
+    color, _ = Atributo.objects.get_or_create(nombre='Color')
+    tallas = [ValorAtributo.objects.get_or_create(atributo=talla, valor=v)[0] for v in ('S', 'M', 'L', 'XL')]
+    colores = [ValorAtributo.objects.get_or_create(atributo=color, valor=v)[0] for v in ('Negro', 'Blanco', 'Rojo',
+                                                                                           'Azul', 'Verde')]
+    lista_almacenes = [Almacen.objects.get_or_create(nombre=f'{prefijo} almacén {i}')[0] for i in range(almacenes)]
+    combinaciones = [(t, c) for t in tallas for c in colores]
+    creados = []
+    for i in range(productos):
+        producto = Producto.objects.create(categoria=categoria, nombre=f'{prefijo} producto {i}',
+                                           slug=f'{prefijo}-producto-{i}')
+        producto.atributos.add(talla, color)
+        for n, combinacion in enumerate(combinaciones[:variantes]):
+            variante = ProductoVariante.objects.create(producto=producto, sku=f'{prefijo}-{i}-{n}'.upper(),
+                                                       precio=10 + n)
+            variante.valores.add(*combinacion)
+            for almacen in lista_almacenes:
+                Stock.objects.create(variante=variante, almacen=almacen, cantidad=n + 1)
+        ImagenProducto.objects.create(producto=producto, imagen=f'{prefijo}/{producto.slug}', es_principal=True)
+        creados.append(producto)
+    return creados
+
+
+class CloudinaryLocal:
+    """Las URLs de Cloudinary se generan en local; sin credenciales basta un nombre."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.cloud_name = cloudinary.config().cloud_name
+        cloudinary.config(cloud_name=cls.cloud_name or 'pruebas')
+
+    @classmethod
+    def tearDownClass(cls):
+        cloudinary.config(cloud_name=cls.cloud_name)
+        super().tearDownClass()
+
+
+class ConsultasCatalogoTests(CloudinaryLocal, TestCase):
+    """
+    Cada vista del catálogo hace el MISMO número de consultas con un catálogo
+    pequeño y con uno grande: stock_total y el resto de relaciones no escalan
+    con las filas (catalogo.py). La caché de fragmentos se vacía antes de
+    cada petición: se mide el camino en frío.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create(email='admin@example.com', is_staff=True, is_superuser=True)
+
+    def pedir(self, url, consultas, admin=False):
+        fragmentos.limpiar()
+        self.client.force_authenticate(self.admin if admin else None)
+        with self.assertNumQueries(consultas):
+            respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()
+
+    def comprobar_en_ambos_tamaños(self, url, consultas, admin=False):
+        for prefijo, productos, variantes in (('pq', 2, 2), ('gr', 8, 12)):
+            with self.subTest(catalogo=f'{productos}x{variantes}'):
+                crear_catalogo(prefijo, productos, variantes)
+                self.pedir(url(prefijo), consultas, admin)
+
+    def test_lista_publica(self):
+        self.comprobar_en_ambos_tamaños(lambda p: reverse('public-productos') + '?page_size=12', 9)
+
+    def test_detalle_publico(self):
+        self.comprobar_en_ambos_tamaños(
+            lambda p: reverse('public-producto-detalle', args=[f'{p}-producto-1']), 8)
+
+    def test_admin_productos(self):
+        self.comprobar_en_ambos_tamaños(
+            lambda p: reverse('admin-producto-list') + '?page_size=12', 8, admin=True)
+
+    def test_admin_variantes(self):
+        self.comprobar_en_ambos_tamaños(lambda p: reverse('admin-variante-list'), 5, admin=True)
+
+    def test_stock_total_coincide_con_el_aggregate(self):
+        crear_catalogo('st', 3, 4)
+        datos = self.pedir(reverse('admin-variante-list'), 5, admin=True)
+        variantes = datos['results'] if isinstance(datos, dict) else datos
+        reales = dict(ProductoVariante.objects.annotate(total=Sum('stock_records__cantidad'))
+                      .values_list('id', 'total'))
+        self.assertEqual(len(variantes), 12)
+        for variante in variantes:
+            self.assertEqual(variante['stock_total'], reales[variante['id']] or 0)
+
+
+class FragmentosCatalogoTests(CloudinaryLocal, TestCase):
+    """
+    Con la caché de fragmentos caliente la página no vuelve a serializar ni
+    a cargar relaciones; un cambio sube Producto.version y el fragmento se
+    rehace (fragmentos.py, signals.py).
+    """
+    url = reverse('public-productos') + '?page_size=12'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.productos = crear_catalogo('fr', 4, 3)
+
+    def setUp(self):
+        fragmentos.limpiar()
+        self.client = APIClient()
+
+    def detalle(self, producto):
+        return self.client.get(reverse('public-producto-detalle', args=[producto.slug])).json()
+
+    def test_pagina_caliente_sin_serializar(self):
+        fria = self.client.get(self.url).json()
+        # COUNT y la página de ids/versiones; nada de relaciones
+        with self.assertNumQueries(2):
+            caliente = self.client.get(self.url).json()
+        self.assertEqual(caliente, fria)
+        self.assertEqual(fragmentos.estadisticas()['aciertos'], len(self.productos))
+
+    def test_cambios_anidados_rehacen_el_fragmento(self):
+        producto = self.productos[0]
+        self.detalle(producto)
+        variante = producto.variantes.order_by('id').first()
+        variante.precio = 99
+        variante.save()
+        stock = Stock.objects.filter(variante=variante).first()
+        stock.cantidad += 5
+        stock.save()
+
+        datos = self.detalle(producto)
+        por_id = {v['id']: v for v in datos['variantes']}
+        self.assertEqual(float(por_id[variante.id]['precio']), 99)
+        self.assertEqual(por_id[variante.id]['stock_total'],
+                         Stock.objects.filter(variante=variante).aggregate(t=Sum('cantidad'))['t'])
+
+        # Lo que quedó en caché es lo mismo que serializar en frío
+        fragmentos.limpiar()
+        self.assertEqual(self.detalle(producto), datos)
+
+    def test_variante_desactivada_sale_del_fragmento(self):
+        producto = self.productos[1]
+        variante = producto.variantes.order_by('id').first()
+        self.detalle(producto)
+        variante.activo = False
+        variante.save()
+        ids = [v['id'] for v in self.detalle(producto)['variantes']]
+        self.assertNotIn(variante.id, ids)
+        self.assertEqual(len(ids), 2)
+
+    def test_lru_acotada_y_por_version(self):
+        cache_lru = CacheFragmentos(max_entradas=2)
+        for producto_id in (1, 2):
+            cache_lru.guardar(producto_id, 1, {'id': producto_id})
+        cache_lru.obtener(1, 1)
+        cache_lru.guardar(3, 1, {'id': 3})
+        # Sale la menos usada (2), no la primera en entrar
+        self.assertIsNone(cache_lru.obtener(2, 1))
+        self.assertEqual(cache_lru.obtener(1, 1), {'id': 1})
+        self.assertIsNone(cache_lru.obtener(1, 2))
+        self.assertEqual(cache_lru.estadisticas()['expulsiones'], 1)
+
+
+class CursorCatalogoTests(CloudinaryLocal, TestCase):
+    """
+    ?paginacion=cursor recorre el catálogo por (campo, id) sin saltarse ni
+    repetir productos, aunque muchos empaten en precio_min o entren
+    productos nuevos a mitad del recorrido (paginacion.py).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.productos = crear_catalogo('cu', 7, 2)
+        # Dos productos más baratos; los demás empatan en precio_min = 10
+        for producto in cls.productos[2::3]:
+            for variante in producto.variantes.all():
+                variante.precio = 5
+                variante.save()
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def url(self, orden, **extra):
+        consulta = '&'.join(f'{k}={v}' for k, v in {'paginacion': 'cursor', 'orden': orden, 'page_size': 3,
+                                                      **extra}.items())
+        return f"{reverse('public-productos')}?{consulta}"
+
+    def recorrer(self, url, enlace='next'):
+        paginas = []
+        while url:
+            datos = self.client.get(url).json()
+            paginas.append([producto['id'] for producto in datos['results']])
+            url = datos[enlace]
+        return paginas
+
+    def esperado(self, *orden):
+        return list(Producto.objects.filter(activo=True).order_by(*orden).values_list('id', flat=True))
+
+    def test_empates_en_precio_sin_saltos_ni_repetidos(self):
+        for orden, campos in (('precio', ('precio_min', 'id')), ('-precio', ('-precio_min', '-id'))):
+            with self.subTest(orden=orden):
+                paginas = self.recorrer(self.url(orden))
+                self.assertEqual([len(p) for p in paginas], [3, 3, 1])
+                self.assertEqual(sum(paginas, []), self.esperado(*campos))
+
+    def test_hacia_atras_devuelve_las_mismas_paginas(self):
+        paginas = self.recorrer(self.url('precio'))
+        datos = self.client.get(self.url('precio')).json()
+        while datos['next']:
+            datos = self.client.get(datos['next']).json()
+        self.assertEqual(self.recorrer(datos['previous'], 'previous'), paginas[-2::-1])
+
+    def test_producto_nuevo_durante_el_recorrido(self):
+        primera = self.client.get(self.url('nuevos')).json()
+        crear_catalogo('cu-nuevo', 1, 1)
+        resto = self.recorrer(primera['next'])
+        vistos = [p['id'] for p in primera['results']] + sum(resto, [])
+        # El nuevo queda antes del cursor: ni aparece ni desplaza a los demás
+        self.assertEqual(vistos, self.esperado('-creado_en', '-id')[1:])
+
+    def test_sin_count_y_mismas_consultas_en_cualquier_pagina(self):
+        consultas = []
+        url = self.url('precio')
+        while url:
+            fragmentos.limpiar()
+            with CaptureQueriesContext(connection) as capturadas:
+                url = self.client.get(url).json()['next']
+            consultas.append([c['sql'] for c in capturadas.captured_queries])
+        self.assertEqual(len({len(sql) for sql in consultas}), 1, consultas)
+        self.assertFalse([sql for sql in sum(consultas, []) if 'COUNT(' in sql.upper()])
+
+    def test_cursor_invalido_o_de_otro_orden(self):
+        siguiente = self.client.get(self.url('precio')).json()['next']
+        cursor = siguiente.split('cursor=')[1].split('&')[0]
+        self.assertEqual(self.client.get(self.url('-precio', cursor=cursor)).status_code, 404)
+        self.assertEqual(self.client.get(self.url('precio', cursor='no-es-base64')).status_code, 404)
+
+
+class CamposCatalogoTests(CloudinaryLocal, TestCase):
+    """
+    ?vista=resumen (rejilla compacta) y ?fields= / ?expand= (campos.py): la
+    respuesta lleva solo lo pedido y la caché de fragmentos sigue completa.
+    """
+    lista = reverse('public-productos')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.productos = crear_catalogo('cp', 3, 4)
+        variante = cls.productos[0].variantes.order_by('-precio').first()
+        variante.activo = False
+        variante.save()
+
+    def setUp(self):
+        fragmentos.limpiar()
+        self.client = APIClient()
+
+    def resultados(self, consulta):
+        return self.client.get(f'{self.lista}?{consulta}').json()['results']
+
+    def test_resumen_compacto(self):
+        campos = {'id', 'nombre', 'slug', 'categoria', 'precio_min', 'precio_max', 'disponible',
+                  'imagen_principal'}
+        for producto in self.resultados('vista=resumen'):
+            self.assertEqual(set(producto), campos)
+            precios = ProductoVariante.objects.filter(producto_id=producto['id'], activo=True) \
+                .values_list('precio', flat=True)
+            self.assertEqual((float(producto['precio_min']), float(producto['precio_max'])),
+                             (float(min(precios)), float(max(precios))))
+            self.assertTrue(producto['imagen_principal'])
+
+    def test_resumen_con_expand_en_consultas_fijas(self):
+        consultas = {}
+        for prefijo, productos, variantes in (('pq', 2, 2), ('gr', 6, 10)):
+            crear_catalogo(prefijo, productos, variantes)
+            with CaptureQueriesContext(connection) as capturadas:
+                datos = self.resultados('vista=resumen&expand=variantes,imagen_tamanos&page_size=50')
+            consultas[prefijo] = len(capturadas)
+        self.assertEqual(consultas['pq'], consultas['gr'])
+        primero = next(p for p in datos if p['id'] == self.productos[0].id)
+        self.assertEqual(len(primero['variantes']), 3)
+        self.assertIn('imagen_tamanos', primero)
+        self.assertNotIn('variantes', self.resultados('vista=resumen')[0])
+
+    def test_fields_recorta_la_lista_y_los_anidados(self):
+        for producto in self.resultados('fields=id,nombre,variantes.precio&fields=noexiste'):
+            self.assertEqual(set(producto), {'id', 'nombre'} | ({'variantes'} if producto['variantes'] else set()))
+            self.assertTrue(all(set(v) == {'precio'} for v in producto['variantes']))
+
+    def test_fields_no_ensucia_la_cache(self):
+        self.resultados('fields=id')
+        completo = self.resultados('')
+        self.assertIn('variantes', completo[0])
+        self.assertIn('stock_records', completo[0]['variantes'][0])
+        fragmentos.limpiar()
+        self.assertEqual(self.resultados(''), completo)
+
+    def test_fields_en_el_detalle(self):
+        url = reverse('public-producto-detalle', args=[self.productos[1].slug])
+        datos = self.client.get(url + '?fields=slug,categoria.nombre').json()
+        self.assertEqual(datos, {'slug': self.productos[1].slug,
+                                 'categoria': {'nombre': self.productos[1].categoria.nombre}})
+
+
+class DetalleCondicionalTests(CloudinaryLocal, TestCase):
+    """
+    GET condicional del detalle público (condicional.py): ETag de
+    Producto.version y de la query string, Last-Modified de actualizado_en.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.producto = crear_catalogo('et', 1, 2)[0]
+
+    def setUp(self):
+        fragmentos.limpiar()
+        self.client = APIClient()
+        self.url = reverse('public-producto-detalle', args=[self.producto.slug])
+
+    def test_304_solo_con_la_consulta_del_producto(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(1):
+            respuesta = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+        self.assertEqual(respuesta['ETag'], etag)
+        self.assertFalse(respuesta.content)
+
+    def test_la_query_string_cambia_el_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        recortada = self.client.get(self.url + '?fields=id', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(recortada.status_code, 200)
+        self.assertNotEqual(recortada['ETag'], etag)
+        self.assertEqual(recortada.json(), {'id': self.producto.id})
+        self.assertEqual(self.client.get(self.url + '?fields=id', HTTP_IF_NONE_MATCH=recortada['ETag'])
+                         .status_code, 304)
+
+    def test_cambio_anidado_invalida_el_etag(self):
+        primera = self.client.get(self.url)
+        stock = Stock.objects.filter(variante__producto=self.producto).first()
+        stock.cantidad += 1
+        stock.save()
+        segunda = self.client.get(self.url, HTTP_IF_NONE_MATCH=primera['ETag'])
+        self.assertEqual(segunda.status_code, 200)
+        self.assertNotEqual(segunda['ETag'], primera['ETag'])
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=segunda['ETag']).status_code, 304)
+
+    def test_if_modified_since_sin_etag(self):
+        primera = self.client.get(self.url)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=primera['Last-Modified']).status_code,
+                         304)
+        Producto.objects.filter(pk=self.producto.pk).update(actualizado_en=timezone.now() + timedelta(days=1))
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=primera['Last-Modified']).status_code,
+                         200)
+
+    def test_admin_sin_validadores(self):
+        admin = get_user_model().objects.create(email='admin@example.com', is_staff=True, is_superuser=True)
+        self.client.force_authenticate(admin)
+        respuesta = self.client.get(self.url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotIn('ETag', respuesta)
+
+
+class UrlsMediosTests(CloudinaryLocal, SimpleTestCase):
+    """url_medio() memoriza la URL de Cloudinary y da la misma que .url (apps/medios.py)."""
+
+    def setUp(self):
+        medios.limpiar()
+        self.addCleanup(medios.limpiar)
+
+    def test_igual_que_url(self):
+        recursos = [
+            CloudinaryResource('boutique/productos/camisa', version='1761365274', format='jpg', resource_type='image'),
+            CloudinaryResource('pagos/comprobantes_qr/x', type='authenticated', resource_type='image'),
+            CloudinaryResource('docs/factura', format='pdf', resource_type='raw'),
+            CloudinaryResource('sin/tipo'),
+        ]
+        self.assertEqual([medios.url_medio(r) for r in recursos], [r.url for r in recursos])
+        self.assertEqual([medios.url_medio(v) for v in (None, '', 'texto')], [None, None, None])
+
+    def test_memoriza_por_version_y_tamano(self):
+        camisa = CloudinaryResource('boutique/camisa', version='1', format='jpg', resource_type='image')
+        with mock.patch.object(medios, 'cloudinary_url', wraps=medios.cloudinary_url) as construir:
+            primera = medios.url_medio(camisa)
+            self.assertEqual(medios.url_medio(CloudinaryResource('boutique/camisa', version='1', format='jpg',
+                                                                 resource_type='image')), primera)
+            self.assertEqual(construir.call_count, 1)
+            nueva = medios.url_medio(CloudinaryResource('boutique/camisa', version='2', format='jpg',
+                                                        resource_type='image'))
+            self.assertNotEqual(nueva, primera)
+            tamanos = medios.urls_responsive(camisa)
+            self.assertEqual(construir.call_count, 2 + len(medios.TAMANOS))
+        self.assertEqual(set(tamanos), set(medios.TAMANOS))
+        self.assertTrue(all(t in tamanos['miniatura'] for t in ('c_fill', 'h_150', 'w_150', 'f_auto', 'q_auto')))
+        self.assertEqual(medios.estadisticas()['aciertos'], 1)
+
+    def test_opciones_propias_sin_memoizar(self):
+        recurso = CloudinaryResource('boutique/camisa', format='jpg', url_options={'secure': True})
+        self.assertEqual(medios.url_medio(recurso), recurso.build_url(secure=True))
+        self.assertEqual(medios.estadisticas()['entradas'], 0)
+
+
+class UrlsMediosCatalogoTests(CloudinaryLocal, TestCase):
+    def test_pagina_caliente_sin_construir_urls(self):
+        crear_catalogo('um', 3, 2)
+        medios.limpiar()
+        self.addCleanup(medios.limpiar)
+        url = reverse('public-productos') + '?vista=resumen&expand=imagenes_galeria,imagen_tamanos'
+        with mock.patch.object(medios, 'cloudinary_url', wraps=medios.cloudinary_url) as construir:
+            fria = self.client.get(url).json()
+            self.assertGreater(construir.call_count, 0)
+            construir.reset_mock()
+            self.assertEqual(self.client.get(url).json(), fria)
+            construir.assert_not_called()
+
+
+class MatrizVariantesTests(TestCase):
+    """POST generar-variantes/ (matriz.py): producto cartesiano idempotente y acotado."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = get_user_model().objects.create(email='admin@example.com', is_staff=True, is_superuser=True)
+        categoria = Categoria.objects.create(nombre='Matriz')
+        cls.producto = Producto.objects.create(categoria=categoria, nombre='Polo', slug='polo')
+        talla = Atributo.objects.create(nombre='Talla')
+        color = Atributo.objects.create(nombre='Color')
+        material = Atributo.objects.create(nombre='Material')
+        cls.tallas = [ValorAtributo.objects.create(atributo=talla, valor=v).pk for v in ('S', 'M', 'L', 'XL')]
+        cls.colores = [ValorAtributo.objects.create(atributo=color, valor=v).pk for v in ('Rojo', 'Azul')]
+        cls.algodon = ValorAtributo.objects.create(atributo=material, valor='Algodón').pk
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.url = reverse('admin-producto-generar-variantes', args=[self.producto.pk])
+
+    def generar(self, valores, **extra):
+        return self.client.post(self.url, {'valores': valores, 'precio': '20.00', **extra}, format='json')
+
+    def combinaciones(self):
+        return sorted(
+            tuple(sorted(variante.valores.values_list('pk', flat=True)))
+            for variante in self.producto.variantes.all()
+        )
+
+    def test_crea_el_producto_cartesiano_con_stock_y_agregados(self):
+        version = Producto.objects.get(pk=self.producto.pk).version
+        respuesta = self.generar([self.tallas[:3], self.colores], stock_inicial=4, precio_oferta='15.00')
+        self.assertEqual(respuesta.status_code, 201, respuesta.content)
+        self.assertEqual((respuesta.json()['creadas'], respuesta.json()['existentes']), (6, 0))
+        self.assertEqual(len(set(self.combinaciones())), 6)
+        self.assertEqual(Stock.objects.filter(variante__producto=self.producto, almacen__nombre='Principal',
+                                              cantidad=4).count(), 6)
+        producto = Producto.objects.get(pk=self.producto.pk)
+        self.assertEqual((float(producto.precio_min), producto.en_stock), (15.0, True))
+        self.assertGreater(producto.version, version)
+        self.assertEqual(desajustes()[1], set())
+
+    def test_idempotente(self):
+        self.generar([self.tallas[:3], self.colores])
+        antes = self.combinaciones()
+        repetida = self.generar([self.colores, self.tallas[:3]])
+        self.assertEqual(repetida.status_code, 200)
+        self.assertEqual((repetida.json()['creadas'], repetida.json()['existentes']), (0, 6))
+        self.assertEqual(self.combinaciones(), antes)
+
+        ampliada = self.generar([self.tallas, self.colores]).json()
+        self.assertEqual((ampliada['creadas'], ampliada['existentes']), (2, 6))
+        self.assertEqual(len(self.combinaciones()), 8)
+
+    def test_variante_con_mas_atributos_cubre_la_combinacion(self):
+        self.generar([[self.tallas[1]], [self.colores[0]], [self.algodon]])
+        datos = self.generar([[self.tallas[1]], [self.colores[0]]]).json()
+        self.assertEqual((datos['creadas'], datos['existentes']), (0, 1))
+
+    def test_entradas_invalidas(self):
+        for valores in (
+            [self.tallas[:2], [self.tallas[2]]],    # Talla en dos listas
+            [self.tallas[:1] + self.colores[:1]],   # Dos atributos en una lista
+            [[self.tallas[0], 999999]],             # Valor inexistente
+            [[]],
+        ):
+            with self.subTest(valores=valores):
+                self.assertEqual(self.generar(valores).status_code, 400)
+        self.assertFalse(self.producto.variantes.exists())
+
+    @override_settings(MATRIZ_VARIANTES_MAX=6)
+    def test_tope_de_combinaciones(self):
+        respuesta = self.generar([self.tallas, self.colores])
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('8 combinaciones', str(respuesta.json()))
+        self.assertFalse(self.producto.variantes.exists())
+        self.assertEqual(self.generar([self.tallas[:3], self.colores]).status_code, 201)
+
+
+class BusquedaTests(TestCase):
+    """
+    Relevancia, tildes y prefijos del índice en memoria, y su sincronización
+    incremental: tras un cambio solo se leen los productos anotados en
+    ProductoCambio, no el catálogo entero.
+    """
+
+    def setUp(self):
+        crear_catalogo('bq', 20, 2)
+        categoria = Categoria.objects.create(nombre='Ropa')
+        self.en_nombre = Producto.objects.create(categoria=categoria, nombre='Camisa de Algodón', slug='camisa')
+        self.en_descripcion = Producto.objects.create(categoria=categoria, nombre='Polo básico', slug='polo',
+                                                      descripcion='Combina con cualquier camisa')
+        # Un catálogo que lleva un rato sin cambios: sus anotaciones quedan fuera del margen
+        ProductoCambio.objects.update(creado_en=timezone.now() - 2 * MARGEN_CAMBIOS)
+        self.indice = busqueda.IndiceInvertido()
+        self.indice.sincronizar()
+
+    def buscar(self, consulta):
+        return self.indice.buscar(consulta)
+
+    def test_el_nombre_pesa_mas_que_la_descripcion(self):
+        self.assertEqual(self.buscar('camisa'), [self.en_nombre.pk, self.en_descripcion.pk])
+
+    def test_sin_tildes_ni_mayusculas(self):
+        for consulta in ('algodon', 'ALGODÓN', 'Algodón'):
+            with self.subTest(consulta=consulta):
+                self.assertEqual(self.buscar(consulta), [self.en_nombre.pk])
+
+    def test_prefijo_en_la_ultima_palabra(self):
+        self.assertEqual(set(self.buscar('cami')), {self.en_nombre.pk, self.en_descripcion.pk})
+        self.assertEqual(self.buscar('algodon cami'), [self.en_nombre.pk])
+
+    def test_resincroniza_solo_los_cambiados(self):
+        self.en_descripcion.nombre = 'Polo de lino'
+        self.en_descripcion.save()
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.indice.sincronizar(), 1)
+        productos = [c['sql'] for c in consultas.captured_queries if 'FROM "productos_producto"' in c['sql']]
+        self.assertTrue(productos)
+        for sql in productos:
+            self.assertIn(f'"productos_producto"."id" IN ({self.en_descripcion.pk})', sql)
+        self.assertEqual(self.buscar('lino'), [self.en_descripcion.pk])
+
+    def test_sin_cambios_no_reindexa(self):
+        self.assertEqual(self.indice.sincronizar(), 0)
+
+    def test_desactivados_y_borrados_salen_del_indice(self):
+        self.en_nombre.activo = False
+        self.en_nombre.save()
+        self.en_descripcion.delete()
+        self.assertEqual(self.indice.sincronizar(), 2)
+        self.assertEqual(self.buscar('camisa'), [])
+
+    @override_settings(BUSQUEDA_CAMBIOS_RETENCION_S=60)
+    def test_anotaciones_purgadas_reconstruye(self):
+        self.indice._desde -= timedelta(hours=1)
+        with mock.patch.object(self.indice, 'reconstruir', return_value=0) as reconstruir:
+            self.indice.sincronizar()
+        reconstruir.assert_called_once()
+
+    @skipUnless(connection.vendor == 'postgresql', 'Requiere PostgreSQL')
+    @override_settings(BUSQUEDA_BACKEND='postgres')
+    def test_postgres_se_actualiza_al_confirmar(self):
+        backend = busqueda.BusquedaPostgres()
+        with mock.patch.object(busqueda, '_backend', backend):
+            backend.reconstruir()
+            with self.captureOnCommitCallbacks(execute=True):
+                self.en_descripcion.nombre = 'Polo de lino'
+                self.en_descripcion.save()
+                self.en_nombre.delete()
+            self.assertEqual(backend.buscar('lino'), [self.en_descripcion.pk])
+            self.assertEqual(backend.buscar('algodon'), [])
+
+
+class FacetasTests(TestCase):
+    """
+    Los conteos del índice de bitsets (facetas.py) coinciden con un COUNT
+    del ORM, con y sin filtros, también tras sincronizar cambios sueltos.
+    """
+
+    def setUp(self):
+        self.productos = crear_catalogo('fc', 6, 7)
+        variantes = ProductoVariante.objects.filter(producto__in=self.productos).order_by('id')
+        ProductoVariante.objects.filter(pk__in=[v.pk for v in variantes[::3]]).update(activo=False)
+        for variante in variantes[1::4]:
+            variante.precio = 60
+            variante.precio_oferta = 30
+            variante.save()
+        Producto.objects.filter(pk=self.productos[-1].pk).update(activo=False)
+        self.indice = IndiceFacetas()
+        self.indice.sincronizar()
+
+    def consultar(self, **parametros):
+        return self.indice.consultar(QueryDict(urlencode(parametros)))
+
+    def con_filtros(self, filtros, excepto=None):
+        """Productos activos con alguna variante activa de cada faceta filtrada (salvo `excepto`)."""
+        productos = Producto.objects.filter(activo=True)
+        for atributo, valores in filtros.items():
+            if atributo != excepto:
+                productos = productos.filter(variantes__activo=True, variantes__valores__in=valores)
+        return productos
+
+    def comprobar(self, **parametros):
+        filtros = {}
+        for atributo in Atributo.objects.all():
+            pedidos = parametros.get(slugify(atributo.nombre))
+            if pedidos:
+                filtros[atributo.pk] = list(atributo.valores.filter(valor__in=pedidos.split(',')))
+        resultado, facetas = self.consultar(**parametros)
+        esperados = list(self.con_filtros(filtros).distinct().order_by('-creado_en').values_list('id', flat=True))
+        self.assertEqual(list(resultado[:len(resultado)]), esperados)
+
+        for faceta in facetas['atributos']:
+            for valor in faceta['valores']:
+                cantidad = self.con_filtros(filtros, excepto=faceta['id']).filter(
+                    variantes__activo=True, variantes__valores=valor['id'],
+                ).distinct().count()
+                self.assertEqual(valor['cantidad'], cantidad, (faceta['nombre'], valor['valor']))
+        for rango in facetas['precio']:
+            precios = {'variantes__precio_efectivo__gte': rango['min']}
+            if rango['max'] is not None:
+                precios['variantes__precio_efectivo__lt'] = rango['max']
+            cantidad = self.con_filtros(filtros).filter(variantes__activo=True, **precios).distinct().count()
+            self.assertEqual(rango['cantidad'], cantidad, rango['valor'])
+        return facetas
+
+    def test_conteos_sin_filtros(self):
+        facetas = self.comprobar()
+        self.assertEqual({r['valor'] for r in facetas['precio']}, {'0-25', '25-50'})
+
+    def test_conteos_con_filtros(self):
+        self.comprobar(color='Rojo')
+        self.comprobar(color='Negro,Azul', talla='M')
+
+    def test_conteos_tras_sincronizar_cambios(self):
+        variante = ProductoVariante.objects.filter(producto=self.productos[0], activo=True).first()
+        variante.activo = False
+        variante.save()
+        self.productos[1].delete()
+        # Reactivado con update(): como en los cambios masivos, la versión se sube a mano
+        Producto.objects.filter(pk=self.productos[-1].pk).update(activo=True)
+        nueva_version(Producto.objects.filter(pk=self.productos[-1].pk))
+        self.assertEqual(self.indice.sincronizar(), 3)
+        self.comprobar()
+        self.comprobar(color='Rojo', talla='S')
+
+    def test_un_atributo_no_pisa_los_parametros_de_la_lista(self):
+        for nombre in ('Orden', 'Cursor', 'Fields'):
+            Atributo.objects.create(nombre=nombre)
+        self.indice.sincronizar(forzar=True)
+        parametros = {a['nombre']: a['parametro'] for a in self.indice._meta['atributos']}
+        self.assertEqual(parametros['Talla'], 'talla')
+        for nombre in ('Orden', 'Cursor', 'Fields'):
+            self.assertTrue(parametros[nombre].startswith('atributo-'), parametros[nombre])
+
+
+class AgregadosTests(TestCase):
+    """
+    Las señales dejan al día las columnas desnormalizadas (agregados.py) tras
+    cambios de stock, oferta y variantes, también al guardar instancias
+    cargadas antes del cambio. desajustes() compara con el valor real.
+    """
+
+    def setUp(self):
+        self.producto = crear_catalogo('ag', 1, 3)[0]
+        self.variantes = list(self.producto.variantes.order_by('id'))
+
+    def comprobar(self):
+        self.assertEqual(desajustes()[1], set())
+
+    def test_stock(self):
+        stock = Stock.objects.filter(variante=self.variantes[0]).first()
+        stock.cantidad = 0
+        stock.save(update_fields=['cantidad'])
+        Stock.objects.filter(variante=self.variantes[0]).exclude(pk=stock.pk).delete()
+        self.comprobar()
+        self.assertEqual(ProductoVariante.objects.get(pk=self.variantes[0].pk).stock_disponible, 0)
+
+        Stock.objects.filter(variante__producto=self.producto).delete()
+        self.comprobar()
+        self.assertFalse(Producto.objects.get(pk=self.producto.pk).en_stock)
+
+    def test_oferta(self):
+        variante = self.variantes[2]
+        variante.precio_oferta = 5
+        variante.save(update_fields=['precio_oferta'])
+        self.comprobar()
+        self.assertEqual(Producto.objects.get(pk=self.producto.pk).precio_min, 5)
+
+        variante.precio_oferta = None
+        variante.save()
+        self.comprobar()
+        self.assertEqual(Producto.objects.get(pk=self.producto.pk).precio_min, 10)
+
+    def test_variantes(self):
+        self.variantes[0].activo = False
+        self.variantes[0].save()
+        self.comprobar()
+        self.variantes[1].delete()
+        self.comprobar()
+        ProductoVariante.objects.create(producto=self.producto, precio=3, precio_oferta=0)
+        self.comprobar()
+        self.assertEqual(Producto.objects.get(pk=self.producto.pk).precio_min, 3)
+
+    def test_instancias_cargadas_antes_del_cambio(self):
+        producto = Producto.objects.get(pk=self.producto.pk)
+        variante = ProductoVariante.objects.get(pk=self.variantes[0].pk)
+        Stock.objects.filter(variante=variante).update(cantidad=0)
+        Stock.objects.filter(variante=variante).first().save()
+        self.variantes[1].precio_oferta = 1
+        self.variantes[1].save()
+        version = Producto.objects.get(pk=self.producto.pk).version
+
+        variante.sku = 'AG-RENOMBRADA'
+        variante.save()
+        self.assertEqual(variante.stock_disponible, 0)
+        producto.nombre = 'Renombrado'
+        producto.save()
+        self.comprobar()
+        self.assertEqual((producto.precio_min, producto.version), (1, version + 2))
+
+
+def archivo_csv(filas):
+    salida = io.StringIO()
+    csv.writer(salida).writerows(filas)
+    return io.BytesIO(salida.getvalue().encode())
+
+
+class ImportacionTests(TestCase):
+    """validar(), importar() y exportar_filas(): ida y vuelta y errores de validación."""
+
+    def setUp(self):
+        self.productos = crear_catalogo('ie', 3, 4)
+        variante = ProductoVariante.objects.filter(producto=self.productos[0]).first()
+        variante.precio_oferta = 9
+        variante.activo = False
+        variante.save()
+        Producto.objects.create(categoria=self.productos[0].categoria, nombre='Sin variantes', slug='ie-sin-variantes',
+                                descripcion='Con, comas y "comillas"', activo=False)
+
+    def errores(self, filas):
+        with self.assertRaises(ImportacionInvalida) as error:
+            validar(*leer_archivo(archivo_csv(filas), 'csv'))
+        return {(e['fila'], e['columna']) for e in error.exception.errores}
+
+    def test_exportar_borrar_e_importar_deja_el_mismo_catalogo(self):
+        exportado = list(exportar_filas())
+        Producto.objects.all().delete()
+        resumen = importar(validar(*leer_archivo(archivo_csv(exportado), 'csv')), lote=2)
+        self.assertEqual((resumen['productos_creados'], resumen['variantes'], resumen['lotes']), (4, 12, 2))
+        self.assertEqual(list(exportar_filas()), exportado)
+        self.assertEqual(desajustes()[1], set())
+
+    def test_volver_a_subir_en_la_misma_bd_no_duplica(self):
+        exportado = list(exportar_filas())
+        # Cada fila de variante: SKU ya usado y combinación que el producto ya tiene
+        variantes = range(2, 2 + ProductoVariante.objects.count())
+        self.assertEqual(self.errores(exportado), {(f, 'sku') for f in variantes} | {(f, None) for f in variantes})
+
+    def test_errores_por_fila_y_columna(self):
+        categoria = self.productos[0].categoria.slug
+        self.assertEqual(self.errores([['producto', 'categoria', 'precio', 'Material']]), {(1, 'Material')})
+        self.assertEqual(self.errores([
+            ['producto', 'categoria', 'precio', 'sku', 'Talla', 'stock'],
+            ['Nueva', categoria, '', 'N-1', 'S', '1'],
+            ['Nueva', categoria, '10,555', 'N-1', 'M', '-2'],
+            ['Nueva', categoria, '10', 'N-2', 's', ''],
+            ['Otra', 'no-existe', '10', 'IE-0-0', '', ''],
+        ]), {(2, 'precio'), (3, 'precio'), (3, 'sku'), (3, 'stock'), (4, None), (5, 'categoria'), (5, 'sku')})
+
+    def test_combinacion_que_el_producto_ya_tiene(self):
+        # ie-producto-0 ya tiene S/Negro y S/Blanco (entre otras)
+        cabecera = ['producto', 'slug', 'categoria', 'precio', 'Talla', 'Color']
+        self.assertEqual(self.errores([
+            cabecera,
+            ['', 'ie-producto-0', '', '10', 'S', 'negro'],
+            ['', 'ie-producto-0', '', '10', 'M', 'Negro'],
+            ['', 'ie-producto-0', '', '10', 'S', ''],
+        ]), {(2, None), (4, None)})
+        plan = validar(*leer_archivo(archivo_csv([cabecera, ['', 'ie-producto-0', '', '10', 'M', 'Negro']]), 'csv'))
+        self.assertEqual(importar(plan)['productos_ampliados'], 1)
+        self.assertEqual(self.productos[0].variantes.count(), 5)
+
+
+class ProgresoImportacionTests(TestCase):
+    """
+    El progreso de una importación va en la BD (ImportacionProgreso): otro
+    worker, con su propia caché vacía, lo ve durante y después de importar.
+    El id elegido por el cliente es de cada usuario.
+    """
+
+    def setUp(self):
+        self.categoria = Categoria.objects.create(nombre='Camisas')
+        self.admin = get_user_model().objects.create(email='admin@example.com', is_staff=True, is_superuser=True)
+        self.otro_admin = get_user_model().objects.create(email='otro@example.com', is_staff=True, is_superuser=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def subir(self, filas, importacion, cliente=None):
+        contenido = 'producto,categoria,precio\n' + ''.join(f'{f},{self.categoria.slug},10\n' for f in filas)
+        archivo = SimpleUploadedFile('catalogo.csv', contenido.encode())
+        url = reverse('admin-productos-importar') + f'?importacion={importacion}'
+        return (cliente or self.client).post(url, {'archivo': archivo}, format='multipart')
+
+    def estado(self, importacion, cliente=None):
+        return (cliente or self.client).get(reverse('admin-productos-importacion', args=[importacion]))
+
+    def test_progreso_visible_desde_otro_worker_durante_la_importacion(self):
+        otro_worker = APIClient()
+        otro_worker.force_authenticate(self.admin)
+        vistos = []
+
+        def importar_por_producto(plan, progreso):
+            def progreso_y_consulta(hechos, total):
+                progreso(hechos, total)
+                cache.clear()
+                vistos.append(self.estado('lote-1', otro_worker).json())
+            return importar(plan, lote=1, progreso=progreso_y_consulta)
+
+        with mock.patch.object(views, 'importar', importar_por_producto):
+            self.assertEqual(self.subir(['Camisa A', 'Camisa B', 'Camisa C'], 'lote-1').status_code, 201)
+        self.assertEqual([(v['estado'], v['hechos'], v['total']) for v in vistos],
+                         [('importando', 1, 3), ('importando', 2, 3), ('importando', 3, 3)])
+
+        cache.clear()
+        estado = self.estado('lote-1', otro_worker).json()
+        self.assertEqual(estado['estado'], 'terminada')
+        self.assertEqual(estado['resumen']['productos_creados'], 3)
+
+    def test_lote_fallido_guarda_el_error_y_lo_confirmado(self):
+        importar_lote = importacion._importar_lote
+
+        def falla_el_segundo(grupo, *args):
+            if grupo[0]['nombre'] == 'Camisa B':
+                raise RuntimeError('Se cayó la BD')
+            return importar_lote(grupo, *args)
+
+        with mock.patch.object(importacion, '_importar_lote', falla_el_segundo), \
+                mock.patch.object(views, 'importar', lambda plan, progreso: importar(plan, lote=1, progreso=progreso)):
+            respuesta = self.subir(['Camisa A', 'Camisa B', 'Camisa C'], 'rota')
+        self.assertEqual(respuesta.status_code, 500)
+        self.assertEqual((respuesta.json()['hechos'], respuesta.json()['total']), (1, 3))
+        self.assertIn('Se cayó la BD', respuesta.json()['error'])
+
+        estado = self.estado('rota').json()
+        self.assertEqual((estado['estado'], estado['hechos']), ('error', 1))
+        self.assertEqual(estado['resumen']['productos_creados'], 1)
+        self.assertEqual(list(Producto.objects.values_list('nombre', flat=True)), ['Camisa A'])
+
+    def test_mismo_id_de_dos_usuarios(self):
+        otro = APIClient()
+        otro.force_authenticate(self.otro_admin)
+        self.subir(['Camisa A'], 'lote')
+        self.assertEqual(self.estado('lote', otro).status_code, 404)
+
+        self.subir(['Camisa B', 'Camisa C'], 'lote', otro)
+        self.assertEqual(self.estado('lote').json()['resumen']['productos_creados'], 1)
+        self.assertEqual(self.estado('lote', otro).json()['resumen']['productos_creados'], 2)
+        self.assertEqual(ImportacionProgreso.objects.filter(clave='lote').count(), 2)
+
+    def test_archivo_invalido_y_desconocida(self):
+        self.assertEqual(self.subir(['Camisa A,sobra'], 'mala').status_code, 400)
+        estado = self.estado('mala').json()
+        self.assertEqual(estado['estado'], 'invalida')
+        self.assertTrue(estado['errores'])
+        self.assertEqual(self.estado('no-existe').status_code, 404)
+
+    def test_id_demasiado_largo(self):
+        self.assertEqual(self.subir(['Camisa A'], 'x' * 65).status_code, 400)
+        self.assertFalse(ImportacionProgreso.objects.exists())
+
+    def test_progreso_caducado(self):
+        self.subir(['Camisa A'], 'vieja')
+        hace_dos_horas = timezone.now() - timedelta(hours=2)
+        ImportacionProgreso.objects.update(actualizado_en=hace_dos_horas)
+        self.assertEqual(self.estado('vieja').status_code, 404)
+        # La siguiente importación borra las caducadas
+        self.subir(['Camisa B'], 'nueva')
+        self.assertEqual(list(ImportacionProgreso.objects.values_list('clave', flat=True)), ['nueva'])
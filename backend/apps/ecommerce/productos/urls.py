@@ -20,12 +20,32 @@ urlpatterns = [
     # GET /api/productos/categorias/ (Lista de categorías raíz)
     path('categorias/', views.CategoriaPublicListView.as_view(), name='public-categorias'),
     
+    # GET /api/productos/buscar/?q=... (Búsqueda por relevancia)
+    path('buscar/', views.ProductoBusquedaView.as_view(), name='public-productos-buscar'),
+
+    # GET /api/productos/facetas/?talla=M&color=rojo&precio=25-50 (Filtros con conteos)
+    path('facetas/', views.ProductoFacetasView.as_view(), name='public-productos-facetas'),
+
     # GET /api/productos/productos/ (Catálogo de productos)
     path('productos/', views.ProductoPublicListView.as_view(), name='public-productos'),
     
     # GET /api/productos/productos/<slug>/ (Detalle de un producto)
     path('productos/<slug:slug>/', views.ProductoPublicDetailView.as_view(), name='public-producto-detalle'),
 
+    # --- Matriz de variantes (Admin) ---
+    # POST /api/productos/admin/productos/<id>/generar-variantes/ (todas las combinaciones de valores)
+    path('admin/productos/<int:pk>/generar-variantes/', views.AdminProductoGenerarVariantesView.as_view(),
+         name='admin-producto-generar-variantes'),
+
+    # --- Importación / exportación masiva (Admin) ---
+    # POST /api/productos/admin/importar/ (multipart 'archivo': .csv o .xlsx; ?validar=1 solo valida)
+    path('admin/importar/', views.AdminProductoImportarView.as_view(), name='admin-productos-importar'),
+    # GET /api/productos/admin/importar/<id>/ (progreso de una importación)
+    path('admin/importar/<str:importacion>/', views.AdminImportacionEstadoView.as_view(),
+         name='admin-productos-importacion'),
+    # GET /api/productos/admin/exportar/?formato=csv|xlsx
+    path('admin/exportar/', views.AdminProductoExportarView.as_view(), name='admin-productos-exportar'),
+
     # --- Vistas de Administración ---
     # Incluye todas las URLs del router de admin bajo el prefijo 'admin/'
     # Ej: GET, POST /api/productos/admin/productos/
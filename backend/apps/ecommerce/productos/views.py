@@ -1,6 +1,13 @@
-from rest_framework import generics, viewsets, permissions
-from rest_framework.pagination import PageNumberPagination
-from django.db.models import Prefetch
+import csv
+import itertools
+import tempfile
+import uuid
+
+from rest_framework import generics, viewsets, permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.db.models import Q
+from django.http import FileResponse, Http404, StreamingHttpResponse
 from .models import (
     Categoria, 
     Atributo, 
@@ -14,16 +21,61 @@ from .serializers import (
     AtributoSerializer, 
     ValorAtributoSerializer, 
     ProductoSerializer, 
+    ProductoResumenSerializer,
     ProductoVarianteSerializer, 
-    ImagenProductoSerializer
+    ImagenProductoSerializer,
+    GenerarVariantesSerializer,
+)
+from .arbol import entrada_arbol
+from .campos import campos_pedidos, expansiones_pedidas
+from .catalogo import productos_catalogo, productos_resumen, variantes_catalogo
+from .condicional import con_validadores, etag_debil, no_modificado
+from .fragmentos import productos_ligeros, serializar_productos_publicos
+from .matriz import generar_variantes
+from .importacion import (
+    ImportacionInterrumpida, ImportacionInvalida, exportar_filas, guardar_progreso, importar, leer_archivo,
+    obtener_progreso, validar,
 )
+from .busqueda import obtener_backend
+from .facetas import obtener_indice_facetas
+from .paginacion import CatalogoPagination, ProductoPagination, orden_catalogo, ordenar_catalogo
+
+
+def filtrar_por_subarbol(productos, categoria):
+    """
+    Productos de la categoría (slug o id) y de todas sus descendientes,
+    usando la ruta materializada: 'Hombre' incluye 'Hombre > Ropa > Camisas'.
+    """
+    if not categoria:
+        return productos
+    filtro = Q(slug=categoria) | Q(pk=categoria) if categoria.isdigit() else Q(slug=categoria)
+    ruta = Categoria.objects.filter(filtro).values_list('ruta', flat=True).first()
+    if ruta is None:
+        return productos.none()
+    return productos.filter(categoria__ruta__startswith=ruta)
 
 
-class ProductoPagination(PageNumberPagination):
-    """Paginación personalizada para productos."""
-    page_size = 12
-    page_size_query_param = 'page_size'
-    max_page_size = 100
+def productos_en_orden(ids):
+    """
+    Productos ligeros de `ids` en ese mismo orden. Solo activos: los índices
+    en memoria (búsqueda, facetas) pueden ir unos segundos por detrás.
+    """
+    por_id = {p.id: p for p in productos_ligeros(Producto.objects.filter(id__in=ids, activo=True))}
+    return [por_id[i] for i in ids if i in por_id]
+
+
+def serializar_catalogo(productos, request, context):
+    """
+    Productos ligeros (ya en orden) serializados para las vistas públicas:
+    completos desde la caché de fragmentos o, con ?vista=resumen, la versión
+    compacta de la rejilla en una sola consulta. Aplica ?fields= / ?expand=.
+    """
+    if request.query_params.get('vista') == 'resumen':
+        ids = [producto.id for producto in productos]
+        resumen = productos_resumen(Producto.objects.filter(id__in=ids), expansiones_pedidas(request))
+        por_id = {producto.id: producto for producto in resumen}
+        return ProductoResumenSerializer([por_id[i] for i in ids if i in por_id], many=True, context=context).data
+    return serializar_productos_publicos(productos, context, campos_pedidos(request))
 
 
 # --- Vistas Públicas (Read-Only para Clientes) ---
@@ -31,60 +83,72 @@ class CategoriaPublicListView(generics.ListAPIView):
     """
     (PÚBLICO) Lista todas las categorías.
     Optimizado para mostrar solo las categorías 'raíz' (las que no tienen padre).
-    El CategoriaSerializer recursivo se encargará de anidar los hijos.
+    El árbol completo sale de la caché (arbol.py): la consulta del sello y,
+    solo al reconstruirlo, una más. Se pagina la lista de raíces ya
+    serializadas, así la respuesta es la misma de siempre.
+    Admite GET condicional (condicional.py) con la huella del árbol cacheado:
+    un 304 solo hace la consulta del sello, sin paginación.
     """
-    queryset = Categoria.objects.filter(padre__isnull=True).prefetch_related('hijos')
+    queryset = Categoria.objects.filter(padre__isnull=True).order_by('id')
     serializer_class = CategoriaSerializer
     permission_classes = [permissions.AllowAny]
 
+    def list(self, request, *args, **kwargs):
+        entrada = entrada_arbol()
+        modificado = entrada['modificado']
+        etag = etag_debil(request, 'categorias', entrada['huella'])
+        respuesta = no_modificado(request, etag, modificado)
+        if respuesta is None:
+            arbol = entrada['arbol']
+            pagina = self.paginate_queryset(arbol)
+            respuesta = self.get_paginated_response(pagina) if pagina is not None else Response(arbol)
+        return con_validadores(respuesta, etag, modificado)
+
 
 class ProductoPublicListView(generics.ListAPIView):
     """
     (PÚBLICO) Lista todos los productos ACTIVOS para el catálogo de la tienda.
-    OPTIMIZADO con prefetch_related para evitar N+1 queries.
+    La página se monta con los fragmentos cacheados de cada producto
+    (fragmentos.py); solo se serializan, en una tanda, los que cambiaron.
+    Con ?paginacion=cursor (y luego ?cursor=) pagina por cursor, sin COUNT
+    ni OFFSET, para el scroll infinito (paginacion.py).
+    ?orden=precio / -precio ordena por precio y ?disponible=true deja solo
+    los productos con stock, con las columnas desnormalizadas de Producto
+    (agregados.py) y sus índices.
+    ?vista=resumen devuelve la versión compacta para la rejilla y
+    ?fields= / ?expand= recortan o amplían la respuesta (campos.py).
     """
     queryset = Producto.objects.filter(activo=True)
     serializer_class = ProductoSerializer
     permission_classes = [permissions.AllowAny]
-    pagination_class = ProductoPagination
-    # Aquí puedes añadir filtros (por categoría, precio, etc.)
-    # filterset_fields = ['categoria__slug']
+    pagination_class = CatalogoPagination
 
     def get_queryset(self):
         """
-        Optimiza las consultas SQL usando select_related y prefetch_related
-        para cargar todas las relaciones en una sola consulta.
+        Solo id y versión: lo demás sale de la caché de fragmentos.
+        ?categoria=<slug o id> filtra por la categoría y todo su subárbol.
         """
-        return Producto.objects.filter(activo=True).select_related(
-            'categoria',
-            'categoria__padre'
-        ).prefetch_related(
-            'atributos',
-            # Prefetch optimizado para variantes y sus relaciones
-            Prefetch(
-                'variantes',
-                queryset=ProductoVariante.objects.filter(activo=True).prefetch_related(
-                    Prefetch(
-                        'valores',
-                        queryset=ValorAtributo.objects.select_related('atributo')
-                    ),
-                    'stock_records__almacen'
-                )
-            ),
-            # Prefetch optimizado para imágenes
-            Prefetch(
-                'imagenes',
-                queryset=ImagenProducto.objects.order_by('-es_principal')
-            )
-        ).order_by('-creado_en')
+        productos = filtrar_por_subarbol(
+            Producto.objects.filter(activo=True), self.request.query_params.get('categoria')
+        )
+        if self.request.query_params.get('disponible') == 'true':
+            productos = productos.filter(en_stock=True)
+        return ordenar_catalogo(productos_ligeros(productos), orden_catalogo(self.request))
+
+    def list(self, request, *args, **kwargs):
+        pagina = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        return self.get_paginated_response(serializar_catalogo(pagina, request, self.get_serializer_context()))
 
 
 class ProductoPublicDetailView(generics.RetrieveAPIView):
     """
     (PÚBLICO) Muestra los detalles de un único producto ACTIVO.
     Usa el 'slug' (URL amigable) para buscar el producto.
-    OPTIMIZADO con prefetch_related.
-    Si el usuario es admin, devuelve todas las variantes (activas e inactivas).
+    Para clientes sale de la caché de fragmentos; si el usuario es admin,
+    devuelve todas las variantes (activas e inactivas) sin caché.
+    Para clientes admite GET condicional (condicional.py): el ETag sale de
+    Producto.version y el Last-Modified de actualizado_en, así un 304 solo
+    cuesta la consulta del producto, sin fragmentos ni serialización.
     """
     serializer_class = ProductoSerializer
     permission_classes = [permissions.AllowAny]
@@ -94,33 +158,65 @@ class ProductoPublicDetailView(generics.RetrieveAPIView):
         """Optimiza las consultas SQL para el detalle del producto."""
         # Si el usuario es admin, mostrar todos los productos y variantes
         if self.request.user.is_staff:
-            productos = Producto.objects.all()
-            variantes_queryset = ProductoVariante.objects.all()
-        else:
-            # Para usuarios normales, solo productos y variantes activos
-            productos = Producto.objects.filter(activo=True)
-            variantes_queryset = ProductoVariante.objects.filter(activo=True)
-        
-        return productos.select_related(
-            'categoria',
-            'categoria__padre'
-        ).prefetch_related(
-            'atributos',
-            Prefetch(
-                'variantes',
-                queryset=variantes_queryset.prefetch_related(
-                    Prefetch(
-                        'valores',
-                        queryset=ValorAtributo.objects.select_related('atributo')
-                    ),
-                    'stock_records__almacen'
-                )
-            ),
-            Prefetch(
-                'imagenes',
-                queryset=ImagenProducto.objects.order_by('-es_principal')
+            return productos_catalogo(Producto.objects.all(), ProductoVariante.objects.all())
+        # Para usuarios normales, solo productos activos (id y versión)
+        return productos_ligeros(Producto.objects.filter(activo=True))
+
+    def retrieve(self, request, *args, **kwargs):
+        if request.user.is_staff:
+            return super().retrieve(request, *args, **kwargs)
+        producto = self.get_object()
+        etag = etag_debil(request, 'producto', producto.id, producto.version)
+        respuesta = no_modificado(request, etag, producto.actualizado_en)
+        if respuesta is None:
+            datos = serializar_productos_publicos(
+                [producto], self.get_serializer_context(), campos_pedidos(request)
             )
+            if not datos:  # Se borró entre las dos consultas
+                raise Http404
+            respuesta = Response(datos[0])
+        return con_validadores(respuesta, etag, producto.actualizado_en)
+
+
+class ProductoBusquedaView(generics.ListAPIView):
+    """
+    (PÚBLICO) Búsqueda de productos activos: GET /api/productos/buscar/?q=camisa lino
+    Sin tildes ni mayúsculas, con prefijo en la última palabra y ordenada por
+    relevancia (busqueda.py). Los resultados salen de la caché de fragmentos.
+    """
+    queryset = Producto.objects.filter(activo=True)
+    serializer_class = ProductoSerializer
+    permission_classes = [permissions.AllowAny]
+    pagination_class = ProductoPagination
+
+    def list(self, request, *args, **kwargs):
+        consulta = request.query_params.get('q', '').strip()
+        ids = obtener_backend().buscar(consulta) if consulta else []
+        productos = productos_en_orden(self.paginate_queryset(ids))
+        return self.get_paginated_response(serializar_catalogo(productos, request, self.get_serializer_context()))
+
+
+class ProductoFacetasView(generics.ListAPIView):
+    """
+    (PÚBLICO) Catálogo filtrado por facetas, con cuántos productos hay por
+    cada categoría, rango de precio y valor de atributo:
+    GET /api/productos/facetas/?categoria=hombre&talla=M,L&color=rojo&precio=25-50
+    Filtros y conteos salen del índice de bitsets en memoria (facetas.py);
+    los productos, de la caché de fragmentos, en el orden de /productos/.
+    """
+    queryset = Producto.objects.filter(activo=True)
+    serializer_class = ProductoSerializer
+    permission_classes = [permissions.AllowAny]
+    pagination_class = ProductoPagination
+
+    def list(self, request, *args, **kwargs):
+        resultado, facetas = obtener_indice_facetas().consultar(request.query_params)
+        productos = productos_en_orden(self.paginate_queryset(resultado))
+        respuesta = self.get_paginated_response(
+            serializar_catalogo(productos, request, self.get_serializer_context())
         )
+        respuesta.data['facetas'] = facetas
+        return respuesta
 
 
 # --- Vistas de ADMINISTRACIÓN (Full CRUD para Admin) ---
@@ -155,33 +251,17 @@ class AdminValorAtributoViewSet(viewsets.ModelViewSet):
 
 
 class AdminProductoViewSet(viewsets.ModelViewSet):
-    """(ADMIN) CRUD completo para Productos (la plantilla). OPTIMIZADO."""
+    """
+    (ADMIN) CRUD completo para Productos (la plantilla). OPTIMIZADO.
+    Admite la paginación por cursor del catálogo (?paginacion=cursor).
+    """
     serializer_class = ProductoSerializer
     permission_classes = [permissions.IsAdminUser]
-    pagination_class = ProductoPagination
+    pagination_class = CatalogoPagination
     
     def get_queryset(self):
         """Optimiza la carga de productos con todas sus relaciones."""
-        return Producto.objects.select_related(
-            'categoria',
-            'categoria__padre'
-        ).prefetch_related(
-            'atributos',
-            Prefetch(
-                'variantes',
-                queryset=ProductoVariante.objects.prefetch_related(
-                    Prefetch(
-                        'valores',
-                        queryset=ValorAtributo.objects.select_related('atributo')
-                    ),
-                    'stock_records__almacen'
-                )
-            ),
-            Prefetch(
-                'imagenes',
-                queryset=ImagenProducto.objects.order_by('-es_principal')
-            )
-        ).order_by('-creado_en')
+        return productos_catalogo().order_by('-creado_en', '-id')
 
 
 class AdminProductoVarianteViewSet(viewsets.ModelViewSet):
@@ -192,15 +272,8 @@ class AdminProductoVarianteViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Optimiza la carga de variantes con sus relaciones."""
-        return ProductoVariante.objects.select_related(
-            'producto',
-            'producto__categoria'
-        ).prefetch_related(
-            Prefetch(
-                'valores',
-                queryset=ValorAtributo.objects.select_related('atributo')
-            ),
-            'stock_records__almacen'
+        return variantes_catalogo(
+            ProductoVariante.objects.select_related('producto', 'producto__categoria').order_by('id')
         )
 
 
@@ -212,4 +285,148 @@ class AdminImagenProductoViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Optimiza la carga de imágenes con sus productos."""
-        return ImagenProducto.objects.select_related('producto').order_by('-es_principal')
\ No newline at end of file
+        return ImagenProducto.objects.select_related('producto').order_by('-es_principal')
+
+
+class AdminProductoGenerarVariantesView(APIView):
+    """
+    (ADMIN) POST: crea de una vez todas las combinaciones de valores de un
+    producto (matriz.py), ej. {"valores": [[S, M, L], [Rojo, Azul]],
+    "precio": "49.90", "stock_inicial": 5}. Idempotente: las combinaciones
+    que ya existen no se repiten. 201 si se creó alguna, 200 si no.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request, pk):
+        producto = generics.get_object_or_404(Producto.objects.only('id', 'slug'), pk=pk)
+        entrada = GenerarVariantesSerializer(data=request.data)
+        entrada.is_valid(raise_exception=True)
+        datos = entrada.validated_data
+        variantes, existentes = generar_variantes(
+            producto, datos['valores'], datos['precio'], datos.get('precio_oferta'),
+            datos['stock_inicial'], datos['activo'],
+        )
+        creadas = variantes_catalogo(
+            ProductoVariante.objects.filter(id__in=[v.pk for v in variantes]).select_related('producto').order_by('id')
+        )
+        return Response(
+            {
+                'creadas': len(variantes),
+                'existentes': existentes,
+                'variantes': ProductoVarianteSerializer(creadas, many=True, context={'request': request}).data,
+            },
+            status=status.HTTP_201_CREATED if variantes else status.HTTP_200_OK,
+        )
+
+
+# --- Importación / exportación masiva (importacion.py) ---
+class AdminProductoImportarView(APIView):
+    """
+    (ADMIN) POST multipart con 'archivo' (.csv o .xlsx): una fila por variante.
+    Valida todo el archivo antes de escribir; con errores responde 400 con la
+    lista (fila, columna, mensaje) y no importa nada. ?validar=1 solo valida.
+    Si falla un lote al escribir responde 500 con el error y los productos de
+    los lotes ya confirmados (hechos, resumen). El progreso se puede consultar
+    mientras tanto en importar/<importacion>/ desde cualquier worker (va en la
+    BD). El id lo puede elegir el cliente con ?importacion=, si no se genera;
+    cada usuario ve solo los suyos.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        archivo = request.FILES.get('archivo')
+        if archivo is None:
+            return Response({'error': "Falta el archivo ('archivo')"}, status=status.HTTP_400_BAD_REQUEST)
+        importacion = request.query_params.get('importacion') or uuid.uuid4().hex
+        if len(importacion) > 64:
+            return Response({'error': 'El id de importación admite 64 caracteres como máximo'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        guardar_progreso(request.user, importacion, 'validando')
+        try:
+            plan = validar(*leer_archivo(archivo))
+        except ImportacionInvalida as e:
+            guardar_progreso(request.user, importacion, 'invalida', errores=e.errores)
+            return Response({'importacion': importacion, 'errores': e.errores}, status=status.HTTP_400_BAD_REQUEST)
+
+        productos, variantes = len(plan), sum(len(p['variantes']) for p in plan)
+        if request.query_params.get('validar') in ('1', 'true'):
+            guardar_progreso(request.user, importacion, 'validada', productos=productos, variantes=variantes)
+            return Response({'importacion': importacion, 'valido': True, 'productos': productos, 'variantes': variantes})
+
+        def progreso(hechos, total):
+            guardar_progreso(request.user, importacion, 'importando', hechos=hechos, total=total)
+
+        try:
+            resumen = importar(plan, progreso=progreso)
+        except ImportacionInterrumpida as e:
+            datos = {'hechos': e.hechos, 'total': e.total, 'resumen': e.resumen, 'error': str(e)}
+            guardar_progreso(request.user, importacion, 'error', **datos)
+            return Response({'importacion': importacion, **datos}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        guardar_progreso(request.user, importacion, 'terminada', hechos=productos, total=productos, resumen=resumen)
+        return Response({'importacion': importacion, **resumen}, status=status.HTTP_201_CREATED)
+
+
+class AdminImportacionEstadoView(APIView):
+    """
+    (ADMIN) Estado de una importación del usuario: validando, importando
+    (hechos/total), validada, terminada, invalida o error (hechos: los
+    productos de los lotes ya confirmados).
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, importacion):
+        estado = obtener_progreso(request.user, importacion)
+        if estado is None:
+            raise Http404
+        return Response(estado)
+
+
+class _Eco:
+    """'Archivo' que devuelve lo que se escribe: csv.writer sin búfer."""
+
+    def write(self, valor):
+        return valor
+
+
+class AdminProductoExportarView(APIView):
+    """
+    (ADMIN) GET ?formato=csv|xlsx&categoria=<slug|id>&activo=true|false
+    Todo el catálogo (o la parte filtrada) en el formato de importación.
+    El CSV se genera en streaming, por lotes de productos; el XLSX (requiere
+    openpyxl) se escribe en modo write_only a un temporal.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        formato = request.query_params.get('formato', 'csv')
+        productos = filtrar_por_subarbol(Producto.objects.all(), request.query_params.get('categoria'))
+        activo = request.query_params.get('activo')
+        if activo in ('true', 'false'):
+            productos = productos.filter(activo=activo == 'true')
+        filas = exportar_filas(productos)
+
+        if formato == 'csv':
+            escritor = csv.writer(_Eco())
+            # BOM para que Excel abra el CSV como UTF-8
+            contenido = itertools.chain(['\ufeff'], (escritor.writerow(fila) for fila in filas))
+            respuesta = StreamingHttpResponse(contenido, content_type='text/csv; charset=utf-8')
+            respuesta['Content-Disposition'] = 'attachment; filename="catalogo.csv"'
+            return respuesta
+        if formato == 'xlsx':
+            try:
+                from openpyxl import Workbook
+            except ImportError:
+                return Response({'error': 'Para exportar XLSX hace falta instalar openpyxl'},
+                                status=status.HTTP_501_NOT_IMPLEMENTED)
+            libro = Workbook(write_only=True)
+            hoja = libro.create_sheet('catalogo')
+            for fila in filas:
+                hoja.append(fila)
+            temporal = tempfile.TemporaryFile()
+            libro.save(temporal)
+            temporal.seek(0)
+            return FileResponse(
+                temporal, as_attachment=True, filename='catalogo.xlsx',
+                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            )
+        return Response({'error': 'formato debe ser csv o xlsx'}, status=status.HTTP_400_BAD_REQUEST)
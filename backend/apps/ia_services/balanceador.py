@@ -0,0 +1,142 @@
+# apps/ia_services/balanceador.py
+"""
+Balanceo en el cliente entre réplicas de un microservicio.
+
+- Selección por menor número de peticiones en curso (least outstanding);
+  una respuesta en streaming cuenta hasta que se cierra.
+- Afinidad por clave: con una clave (p. ej. el prompt del reporte) se
+  prefiere siempre la misma réplica (rendezvous hashing), que tendrá la
+  caché caliente, salvo que vaya cargada por encima de la holgura.
+- Chequeo activo de salud en segundo plano (GET a la ruta de salud) y
+  expulsión pasiva tras fallos seguidos; una réplica expulsada vuelve
+  cuando el chequeo la encuentra sana.
+"""
+import hashlib
+import random
+import threading
+import time
+
+import requests
+
+
+class Endpoint:
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+        self.en_curso = 0
+        self.sano = True
+        self.fallos_seguidos = 0
+        self.expulsado_hasta = 0.0
+
+    def disponible(self, ahora):
+        return self.sano and ahora >= self.expulsado_hasta
+
+    def peso(self, clave):
+        """Puntuación de rendezvous hashing de esta réplica para la clave."""
+        return hashlib.blake2b(f'{clave}|{self.url}'.encode(), digest_size=8).digest()
+
+    def estado(self):
+        return {
+            'url': self.url,
+            'en_curso': self.en_curso,
+            'sano': self.sano,
+            'expulsado': time.monotonic() < self.expulsado_hasta,
+            'fallos_seguidos': self.fallos_seguidos,
+        }
+
+
+class Balanceador:
+    def __init__(
+        self,
+        urls,
+        ruta_salud='/',
+        intervalo_salud=5.0,
+        timeout_salud=1.0,
+        umbral_fallos=3,
+        expulsion_s=30.0,
+        holgura_afinidad=2,
+    ):
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.ruta_salud = ruta_salud
+        self.intervalo_salud = intervalo_salud
+        self.timeout_salud = timeout_salud
+        self.umbral_fallos = umbral_fallos
+        self.expulsion_s = expulsion_s
+        self.holgura_afinidad = holgura_afinidad
+        self._lock = threading.Lock()
+        self._hilo_salud = None
+
+    # --- Selección ---
+
+    def elegir(self, clave=None, excluir=()):
+        """Réplica para la próxima petición (no cuenta como en curso; ver tomar())."""
+        ahora = time.monotonic()
+        with self._lock:
+            candidatos = [e for e in self.endpoints if e not in excluir and e.disponible(ahora)]
+            if not candidatos:
+                # Todas caídas: se intenta igualmente con las no excluidas
+                candidatos = [e for e in self.endpoints if e not in excluir] or self.endpoints
+            minimo = min(e.en_curso for e in candidatos)
+            if clave is not None:
+                preferido = max(candidatos, key=lambda e: e.peso(clave))
+                if preferido.en_curso <= minimo + self.holgura_afinidad:
+                    return preferido
+            menos_cargados = [e for e in candidatos if e.en_curso == minimo]
+            return random.choice(menos_cargados)
+
+    def tomar(self, clave=None, excluir=()):
+        """Elige una réplica y la cuenta como en curso hasta soltar()."""
+        self._arrancar_chequeos()
+        endpoint = self.elegir(clave, excluir)
+        with self._lock:
+            endpoint.en_curso += 1
+        return endpoint
+
+    def soltar(self, endpoint):
+        """Fin de la petición; con streaming, cuando se cierra la respuesta."""
+        with self._lock:
+            endpoint.en_curso -= 1
+
+    # --- Salud ---
+
+    def registrar_exito(self, endpoint):
+        with self._lock:
+            endpoint.fallos_seguidos = 0
+
+    def registrar_fallo(self, endpoint):
+        """Fallo de conexión/timeout visto por una petición real (chequeo pasivo)."""
+        with self._lock:
+            endpoint.fallos_seguidos += 1
+            if endpoint.fallos_seguidos >= self.umbral_fallos:
+                endpoint.expulsado_hasta = time.monotonic() + self.expulsion_s
+
+    def chequear(self):
+        """Un chequeo activo de todas las réplicas."""
+        for endpoint in self.endpoints:
+            try:
+                sano = requests.get(endpoint.url + self.ruta_salud, timeout=self.timeout_salud).status_code < 500
+            except requests.RequestException:
+                sano = False
+            with self._lock:
+                endpoint.sano = sano
+                if sano and endpoint.fallos_seguidos >= self.umbral_fallos:
+                    # Se recuperó: vuelve antes de que acabe la expulsión
+                    endpoint.fallos_seguidos = 0
+                    endpoint.expulsado_hasta = 0.0
+
+    def _bucle_chequeos(self):
+        while True:
+            self.chequear()
+            time.sleep(self.intervalo_salud)
+
+    def _arrancar_chequeos(self):
+        # Con una sola réplica no hay a quién desviar el tráfico
+        if self._hilo_salud is not None or len(self.endpoints) < 2 or not self.intervalo_salud:
+            return
+        with self._lock:
+            if self._hilo_salud is None:
+                self._hilo_salud = threading.Thread(target=self._bucle_chequeos, daemon=True, name='ia-salud')
+                self._hilo_salud.start()
+
+    def estado(self):
+        with self._lock:
+            return [e.estado() for e in self.endpoints]
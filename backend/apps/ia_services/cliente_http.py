@@ -0,0 +1,418 @@
+# apps/ia_services/cliente_http.py
+"""
+Cliente HTTP compartido para el puente Django -> microservicios de IA.
+
+Una requests.Session por servicio (configurada en settings.SERVICIOS_IA):
+- Pool de conexiones keep-alive: no se abre un TCP nuevo por petición.
+- Timeout (conexión, lectura) propio de cada servicio.
+- Reintentos acotados con backoff: siempre ante fallos de conexión; ante
+  errores de lectura o 502/503/504 solo si el servicio es IDEMPOTENTE.
+- Contadores de latencia y errores por servicio (GET /api/ia/metricas/).
+- Varias réplicas por servicio (URLS): cada petición pasa por un
+  Balanceador (menos peticiones en curso, afinidad por clave, chequeos de
+  salud). Un fallo al conectar se reintenta en otra réplica; si la
+  conexión cae con la petición ya enviada, no (podría ejecutarse dos veces).
+
+ClienteServicioAsync aplica la misma política sobre httpx.AsyncClient para
+las vistas async (perfil ASGI); comparte las métricas con el cliente síncrono.
+Su AsyncClient solo se comparte en el event loop del servidor ASGI, que lo
+cierra al apagarse (lifespan, ver main/asgi.py). En cualquier otro loop
+(WSGI: Django ejecuta cada vista async en uno propio) cada petición usa un
+cliente efímero que se cierra con la respuesta.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError
+from urllib3.util.retry import Retry
+
+from .balanceador import Balanceador
+
+METODOS_IDEMPOTENTES = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+
+
+class MetricasServicio:
+    """Contadores por servicio, seguros entre hilos."""
+
+    def __init__(self, ventana=1000):
+        self._lock = threading.Lock()
+        self._latencias = deque(maxlen=ventana)
+        self.contadores = {
+            'peticiones': 0,
+            'exitos': 0,
+            'errores_conexion': 0,
+            'errores_timeout': 0,
+            'errores_http_4xx': 0,
+            'errores_http_5xx': 0,
+        }
+
+    def registrar(self, contador, latencia=None):
+        with self._lock:
+            self.contadores['peticiones'] += 1
+            self.contadores[contador] += 1
+            if latencia is not None:
+                self._latencias.append(latencia)
+
+    def resumen(self):
+        with self._lock:
+            datos = dict(self.contadores)
+            latencias = sorted(self._latencias)
+        if latencias:
+            datos['latencia_ms'] = {
+                'p50': round(latencias[len(latencias) // 2] * 1000, 1),
+                'p95': round(latencias[min(len(latencias) - 1, int(len(latencias) * 0.95))] * 1000, 1),
+                'max': round(latencias[-1] * 1000, 1),
+            }
+        return datos
+
+
+def _sin_conectar(error):
+    """
+    ¿El ConnectionError de requests ocurrió antes de enviar la petición?
+    (conexión rechazada, DNS o timeout de conexión; NewConnectionError
+    hereda de ConnectTimeoutError). RemoteDisconnected o ProtocolError
+    llegan como ConnectionError después de haber enviado el cuerpo.
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    causa = error.args[0] if error.args else None
+    return isinstance(causa, ConnectTimeoutError) or isinstance(getattr(causa, 'reason', None), ConnectTimeoutError)
+
+
+def _soltar_al_cerrar(response, balanceador, endpoint):
+    """
+    Con stream=True la réplica sigue ocupada mientras se lee el cuerpo:
+    se suelta en el balanceador cuando se cierra la respuesta.
+    """
+    cerrar = response.close
+    soltada = False
+
+    def close():
+        nonlocal soltada
+        try:
+            cerrar()
+        finally:
+            if not soltada:
+                soltada = True
+                balanceador.soltar(endpoint)
+
+    response.close = close
+
+
+class ClienteServicio:
+    """Sesión keep-alive + política de timeouts y reintentos de un microservicio."""
+
+    def __init__(self, nombre, urls, timeout=(3, 30), reintentos=2, idempotente=False, pool=10, balanceador=None):
+        self.nombre = nombre
+        urls = [urls] if isinstance(urls, str) else list(urls)
+        self.balanceador = balanceador or Balanceador(urls)
+        self.timeout = tuple(timeout)
+        self.metricas = MetricasServicio()
+
+        metodos = METODOS_IDEMPOTENTES | {'POST'} if idempotente else METODOS_IDEMPOTENTES
+        retry = Retry(
+            total=reintentos,
+            connect=0,                  # Los fallos de conexión se reintentan en otra réplica
+            read=reintentos,            # Solo para allowed_methods
+            status=reintentos,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=metodos,
+            backoff_factor=0.2,
+            raise_on_status=False,      # Devuelve la última respuesta; raise_for_status decide
+        )
+        self.reintentos_conexion = reintentos
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(urls), pool_maxsize=pool, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def request(self, metodo, ruta, clave=None, **kwargs):
+        """
+        Como requests.request, con el timeout del servicio por defecto.
+        `clave` (opcional) da afinidad: la misma clave va a la misma réplica.
+        Lanza las excepciones de requests (ConnectionError, Timeout, HTTPError
+        tras raise_for_status en la vista).
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        stream = kwargs.get('stream', False)
+        intentadas = []
+        while True:
+            endpoint = self.balanceador.tomar(clave, excluir=intentadas)
+            response = None
+            inicio = time.perf_counter()
+            try:
+                response = self.session.request(metodo, f'{endpoint.url}{ruta}', **kwargs)
+            except requests.exceptions.ConnectionError as e:
+                self.balanceador.registrar_fallo(endpoint)
+                if _sin_conectar(e):
+                    # La petición no llegó a la réplica: siempre es seguro probar otra
+                    intentadas.append(endpoint)
+                    if len(intentadas) <= self.reintentos_conexion:
+                        continue
+                self.metricas.registrar('errores_conexion')
+                raise
+            except requests.exceptions.Timeout:
+                self.balanceador.registrar_fallo(endpoint)
+                self.metricas.registrar('errores_timeout')
+                raise
+            finally:
+                if response is None or not stream:
+                    self.balanceador.soltar(endpoint)
+            self.balanceador.registrar_exito(endpoint)
+            if stream:
+                _soltar_al_cerrar(response, self.balanceador, endpoint)
+            # Con stream=True es el tiempo hasta recibir las cabeceras
+            latencia = time.perf_counter() - inicio
+            if response.status_code >= 500:
+                self.metricas.registrar('errores_http_5xx', latencia)
+            elif response.status_code >= 400:
+                self.metricas.registrar('errores_http_4xx', latencia)
+            else:
+                self.metricas.registrar('exitos', latencia)
+            return response
+
+    def post(self, ruta, **kwargs):
+        return self.request('POST', ruta, **kwargs)
+
+    def get(self, ruta, **kwargs):
+        return self.request('GET', ruta, **kwargs)
+
+
+class _StreamConCliente(httpx.AsyncByteStream):
+    """Cuerpo de una respuesta en streaming que, al cerrarse, cierra también su cliente efímero."""
+
+    def __init__(self, stream, cliente):
+        self._stream = stream
+        self._cliente = cliente
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            await self._cliente.aclose()
+
+
+class _StreamConReplica(httpx.AsyncByteStream):
+    """Cuerpo de una respuesta en streaming que ocupa su réplica en el balanceador hasta cerrarse."""
+
+    def __init__(self, stream, balanceador, endpoint):
+        self._stream = stream
+        self._balanceador = balanceador
+        self._endpoint = endpoint
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._endpoint is not None:
+                endpoint, self._endpoint = self._endpoint, None
+                self._balanceador.soltar(endpoint)
+
+
+# Event loop del servidor ASGI (lifespan): el único donde un AsyncClient vive entre peticiones
+_loop_servidor = None
+
+
+class ClienteServicioAsync:
+    """Equivalente async de ClienteServicio, sobre httpx."""
+
+    def __init__(self, nombre, urls, timeout=(3, 30), reintentos=2, idempotente=False, pool=10,
+                 metricas=None, balanceador=None, transport=None):
+        self.nombre = nombre
+        urls = [urls] if isinstance(urls, str) else list(urls)
+        self.balanceador = balanceador or Balanceador(urls)
+        self.timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+        self.reintentos = reintentos
+        self.idempotente = idempotente
+        self.limites = httpx.Limits(max_connections=pool * len(urls), max_keepalive_connections=pool * len(urls))
+        self.metricas = metricas or MetricasServicio()
+        self._transport = transport
+        self._compartido = None
+
+    def _nuevo_cliente(self):
+        return httpx.AsyncClient(timeout=self.timeout, limits=self.limites, transport=self._transport)
+
+    def _cliente(self):
+        """
+        (cliente, efimero). Las conexiones de un AsyncClient no pueden cruzar
+        event loops: solo se comparte en el loop del servidor ASGI, que lo
+        cierra en el shutdown; en otro loop el cliente es de esta petición.
+        """
+        if _loop_servidor is None or asyncio.get_running_loop() is not _loop_servidor:
+            return self._nuevo_cliente(), True
+        if self._compartido is None:
+            self._compartido = self._nuevo_cliente()
+        return self._compartido, False
+
+    async def cerrar(self):
+        """Cierra el cliente compartido (shutdown del servidor ASGI)."""
+        if self._compartido is not None:
+            cliente, self._compartido = self._compartido, None
+            await cliente.aclose()
+
+    async def request(self, metodo, ruta, stream=False, clave=None, **kwargs):
+        """
+        Devuelve un httpx.Response (sin leer si stream=True: hay que cerrarlo).
+        Lanza httpx.TimeoutException / httpx.TransportError.
+        """
+        cliente, efimero = self._cliente()
+        try:
+            response = await self._enviar(cliente, metodo, ruta, stream, clave, **kwargs)
+        except BaseException:
+            if efimero:
+                await cliente.aclose()
+            raise
+        if efimero:
+            if stream:
+                # El cliente se cierra cuando la vista cierre la respuesta
+                response.stream = _StreamConCliente(response.stream, cliente)
+            else:
+                await cliente.aclose()
+        return response
+
+    async def _enviar(self, cliente, metodo, ruta, stream, clave, **kwargs):
+        idempotente = metodo in METODOS_IDEMPOTENTES or (metodo == 'POST' and self.idempotente)
+        intentos = 1 + (self.reintentos if idempotente else 0)
+        intentadas = []
+        intento = 0
+        while True:
+            ultimo = intento >= intentos - 1
+            endpoint = self.balanceador.tomar(clave, excluir=intentadas)
+            response = None
+            inicio = time.perf_counter()
+            try:
+                peticion = cliente.build_request(metodo, f'{endpoint.url}{ruta}', **kwargs)
+                response = await cliente.send(peticion, stream=stream)
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                # La petición no llegó a la réplica: siempre es seguro probar otra
+                self.balanceador.registrar_fallo(endpoint)
+                intentadas.append(endpoint)
+                if len(intentadas) <= self.reintentos:
+                    continue
+                self.metricas.registrar('errores_conexion')
+                raise
+            except httpx.TimeoutException:
+                self.balanceador.registrar_fallo(endpoint)
+                if not ultimo:
+                    intento += 1
+                    await asyncio.sleep(0.2 * 2 ** intento)
+                    continue
+                self.metricas.registrar('errores_timeout')
+                raise
+            except httpx.TransportError:
+                self.metricas.registrar('errores_conexion')
+                raise
+            finally:
+                if response is None or not stream:
+                    self.balanceador.soltar(endpoint)
+            self.balanceador.registrar_exito(endpoint)
+            if stream:
+                # La réplica sigue ocupada mientras se lee el cuerpo: se suelta con aclose()
+                response.stream = _StreamConReplica(response.stream, self.balanceador, endpoint)
+            if response.status_code in (502, 503, 504) and not ultimo:
+                await response.aclose()
+                intento += 1
+                await asyncio.sleep(0.2 * 2 ** intento)
+                continue
+            latencia = time.perf_counter() - inicio
+            if response.status_code >= 500:
+                self.metricas.registrar('errores_http_5xx', latencia)
+            elif response.status_code >= 400:
+                self.metricas.registrar('errores_http_4xx', latencia)
+            else:
+                self.metricas.registrar('exitos', latencia)
+            return response
+
+    async def post(self, ruta, **kwargs):
+        return await self.request('POST', ruta, **kwargs)
+
+    async def get(self, ruta, **kwargs):
+        return await self.request('GET', ruta, **kwargs)
+
+
+_clientes = {}
+_clientes_async = {}
+_lock_clientes = threading.Lock()
+
+
+def _opciones(config):
+    return {
+        'timeout': config.get('TIMEOUT', (3, 30)),
+        'reintentos': config.get('REINTENTOS', 2),
+        'idempotente': config.get('IDEMPOTENTE', False),
+        'pool': config.get('POOL', 10),
+    }
+
+
+def obtener_cliente(nombre):
+    """Cliente compartido (uno por proceso) del servicio `nombre` de SERVICIOS_IA."""
+    cliente = _clientes.get(nombre)
+    if cliente is None:
+        with _lock_clientes:
+            cliente = _clientes.get(nombre)
+            if cliente is None:
+                config = settings.SERVICIOS_IA[nombre]
+                balanceador = Balanceador(
+                    config['URLS'],
+                    ruta_salud=config.get('RUTA_SALUD', '/'),
+                    intervalo_salud=config.get('INTERVALO_SALUD', 5.0),
+                )
+                cliente = ClienteServicio(nombre, config['URLS'], balanceador=balanceador, **_opciones(config))
+                _clientes[nombre] = cliente
+    return cliente
+
+
+def obtener_cliente_async(nombre):
+    """Cliente async compartido del servicio `nombre`; mismas métricas y réplicas que el síncrono."""
+    cliente = _clientes_async.get(nombre)
+    if cliente is None:
+        sincrono = obtener_cliente(nombre)
+        with _lock_clientes:
+            cliente = _clientes_async.get(nombre)
+            if cliente is None:
+                config = settings.SERVICIOS_IA[nombre]
+                cliente = ClienteServicioAsync(
+                    nombre,
+                    config['URLS'],
+                    metricas=sincrono.metricas,
+                    balanceador=sincrono.balanceador,
+                    **_opciones(config),
+                )
+                _clientes_async[nombre] = cliente
+    return cliente
+
+
+def iniciar_clientes_async():
+    """Startup del servidor ASGI: los clientes async se comparten en este event loop."""
+    global _loop_servidor
+    _loop_servidor = asyncio.get_running_loop()
+
+
+async def cerrar_clientes_async():
+    """Shutdown del servidor ASGI: cierra los AsyncClient compartidos y sus conexiones."""
+    global _loop_servidor
+    for cliente in list(_clientes_async.values()):
+        await cliente.cerrar()
+    _loop_servidor = None
+
+
+def metricas_servicios():
+    metricas = {}
+    for nombre in settings.SERVICIOS_IA:
+        cliente = obtener_cliente(nombre)
+        metricas[nombre] = {**cliente.metricas.resumen(), 'replicas': cliente.balanceador.estado()}
+    return metricas
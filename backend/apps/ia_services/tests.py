@@ -1,3 +1,212 @@
-from django.test import TestCase
+import asyncio
+import socket
+import threading
+from unittest import mock
 
-# Create your tests here.
+import httpx
+import requests
+from django.test import SimpleTestCase
+
+from . import cliente_http
+from .balanceador import Balanceador
+from .cliente_http import ClienteServicio, ClienteServicioAsync, cerrar_clientes_async, iniciar_clientes_async
+
+
+async def _cuerpo():
+    yield b'{"ok":true}'
+
+
+class TransporteFalso(httpx.MockTransport):
+    """Responde 200 en streaming, como la red, y cuenta cuántos clientes lo han cerrado."""
+
+    def __init__(self):
+        super().__init__(lambda request: httpx.Response(200, content=_cuerpo()))
+        self.cierres = 0
+
+    async def aclose(self):
+        self.cierres += 1
+
+
+class ClienteServicioAsyncTests(SimpleTestCase):
+    def setUp(self):
+        self.transporte = TransporteFalso()
+        self.cliente = ClienteServicioAsync('prueba', 'http://ia.local', transport=self.transporte)
+
+    def test_fuera_del_servidor_asgi_el_cliente_se_cierra_con_la_peticion(self):
+        # WSGI: cada vista async corre en un event loop propio
+        async def pedir():
+            response = await self.cliente.get('/')
+            return response.json()
+
+        self.assertEqual(asyncio.run(pedir()), {'ok': True})
+        self.assertEqual(asyncio.run(pedir()), {'ok': True})
+        self.assertEqual(self.transporte.cierres, 2)
+
+    def test_streaming_cierra_el_cliente_al_cerrar_la_respuesta(self):
+        async def pedir():
+            response = await self.cliente.get('/', stream=True)
+            abierto = self.transporte.cierres
+            cuerpo = await response.aread()
+            await response.aclose()
+            return abierto, cuerpo
+
+        abierto, cuerpo = asyncio.run(pedir())
+        self.assertEqual(abierto, 0)
+        self.assertEqual(cuerpo, b'{"ok":true}')
+        self.assertEqual(self.transporte.cierres, 1)
+
+    def test_streaming_ocupa_la_replica_hasta_cerrar_la_respuesta(self):
+        endpoint = self.cliente.balanceador.endpoints[0]
+
+        async def pedir():
+            response = await self.cliente.get('/', stream=True)
+            en_curso = endpoint.en_curso
+            await response.aread()
+            await response.aclose()
+            return en_curso
+
+        self.assertEqual(asyncio.run(pedir()), 1)
+        self.assertEqual(endpoint.en_curso, 0)
+
+    def test_reintento_tras_503_en_streaming_suelta_la_replica(self):
+        respuestas = iter([503, 200])
+        self.transporte.handler = lambda request: httpx.Response(next(respuestas), content=_cuerpo())
+        endpoint = self.cliente.balanceador.endpoints[0]
+
+        async def pedir():
+            with mock.patch('asyncio.sleep', mock.AsyncMock()):
+                response = await self.cliente.get('/', stream=True)
+            await response.aclose()
+            return response.status_code
+
+        self.assertEqual(asyncio.run(pedir()), 200)
+        self.assertEqual(endpoint.en_curso, 0)
+
+    def test_error_de_conexion_cierra_el_cliente(self):
+        def fallar(request):
+            raise httpx.ConnectError('sin servicio', request=request)
+
+        transporte = TransporteFalso()
+        transporte.handler = fallar
+        cliente = ClienteServicioAsync('prueba', 'http://ia.local', reintentos=0, transport=transporte)
+        with self.assertRaises(httpx.ConnectError):
+            asyncio.run(cliente.get('/'))
+        self.assertEqual(transporte.cierres, 1)
+
+    def test_en_el_servidor_asgi_se_comparte_y_se_cierra_en_el_shutdown(self):
+        async def servidor():
+            iniciar_clientes_async()
+            for _ in range(3):
+                await self.cliente.get('/')
+            abierto = self.transporte.cierres
+            await cerrar_clientes_async()
+            return abierto
+
+        with mock.patch.dict(cliente_http._clientes_async, {'prueba': self.cliente}, clear=True):
+            self.assertEqual(asyncio.run(servidor()), 0)
+        self.assertEqual(self.transporte.cierres, 1)
+        self.assertIsNone(cliente_http._loop_servidor)
+
+
+class ReplicaFalsa:
+    """
+    Servidor TCP local que lee cada petición y luego responde 200 o, con
+    `colgar=True`, cierra la conexión sin responder (RemoteDisconnected).
+    """
+
+    def __init__(self, colgar=False):
+        self.colgar = colgar
+        self.peticiones = 0
+        self.socket = socket.create_server(('127.0.0.1', 0))
+        self.url = f'http://127.0.0.1:{self.socket.getsockname()[1]}'
+        threading.Thread(target=self._atender, daemon=True).start()
+
+    def _atender(self):
+        while True:
+            try:
+                conexion, _ = self.socket.accept()
+            except OSError:
+                return
+            with conexion:
+                datos = b''
+                while b'\r\n\r\n' not in datos:
+                    leido = conexion.recv(4096)
+                    if not leido:
+                        break
+                    datos += leido
+                else:
+                    self.peticiones += 1
+                    if not self.colgar:
+                        conexion.sendall(b'HTTP/1.1 200 OK\r\nContent-Length: 2\r\nConnection: close\r\n\r\nok')
+
+    def cerrar(self):
+        self.socket.close()
+
+
+def puerto_cerrado():
+    with socket.create_server(('127.0.0.1', 0)) as libre:
+        return f'http://127.0.0.1:{libre.getsockname()[1]}'
+
+
+class ClienteServicioTests(SimpleTestCase):
+    def cliente(self, urls):
+        return ClienteServicio('prueba', urls, timeout=(1, 2), balanceador=Balanceador(urls, intervalo_salud=0))
+
+    def test_conexion_cortada_tras_enviar_un_post_no_se_repite(self):
+        replicas = [ReplicaFalsa(colgar=True), ReplicaFalsa(colgar=True)]
+        self.addCleanup(lambda: [r.cerrar() for r in replicas])
+        cliente = self.cliente([r.url for r in replicas])
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            cliente.post('/reportes', json={'prompt': 'ventas'})
+        self.assertEqual(sum(r.peticiones for r in replicas), 1)
+        self.assertEqual(cliente.metricas.resumen()['errores_conexion'], 1)
+
+    def test_conexion_rechazada_se_reintenta_en_otra_replica(self):
+        replica = ReplicaFalsa()
+        self.addCleanup(replica.cerrar)
+        cliente = self.cliente([puerto_cerrado(), replica.url])
+        for _ in range(3):
+            self.assertEqual(cliente.post('/reportes', json={'prompt': 'ventas'}).text, 'ok')
+        self.assertEqual(replica.peticiones, 3)
+
+    def test_streaming_ocupa_la_replica_hasta_cerrar_la_respuesta(self):
+        replica = ReplicaFalsa()
+        self.addCleanup(replica.cerrar)
+        cliente = self.cliente([replica.url])
+        endpoint = cliente.balanceador.endpoints[0]
+
+        response = cliente.post('/reportes', json={'prompt': 'ventas'}, stream=True)
+        self.assertEqual(endpoint.en_curso, 1)
+        self.assertEqual(b''.join(response.iter_content(1)), b'ok')
+        response.close()
+        response.close()
+        self.assertEqual(endpoint.en_curso, 0)
+
+        cliente.post('/reportes', json={'prompt': 'ventas'})
+        self.assertEqual(endpoint.en_curso, 0)
+
+
+class LifespanTests(SimpleTestCase):
+    def test_shutdown_cierra_los_clientes_async(self):
+        from main.asgi import application
+
+        transporte = TransporteFalso()
+        cliente = ClienteServicioAsync('prueba', 'http://ia.local', transport=transporte)
+        enviados = []
+
+        async def servidor():
+            mensajes = asyncio.Queue()
+            await mensajes.put({'type': 'lifespan.startup'})
+
+            async def send(mensaje):
+                enviados.append(mensaje['type'])
+                if mensaje['type'] == 'lifespan.startup.complete':
+                    await cliente.get('/')
+                    await mensajes.put({'type': 'lifespan.shutdown'})
+
+            await application({'type': 'lifespan'}, mensajes.get, send)
+
+        with mock.patch.dict(cliente_http._clientes_async, {'prueba': cliente}, clear=True):
+            asyncio.run(servidor())
+        self.assertEqual(enviados, ['lifespan.startup.complete', 'lifespan.shutdown.complete'])
+        self.assertEqual(transporte.cierres, 1)
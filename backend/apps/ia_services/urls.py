@@ -1,8 +1,18 @@
 # apps/ia_services/urls.py  
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# Perfil ASGI: vistas async que no bloquean un hilo mientras esperan al microservicio
+if settings.IA_VISTAS_ASYNC:
+    vista_prediccion = views.llamar_servicio_prediccion_async
+    vista_reporte = views.llamar_servicio_reporte_async
+else:
+    vista_prediccion = views.llamar_servicio_prediccion
+    vista_reporte = views.llamar_servicio_reporte
+
 urlpatterns = [
-    path('prediccion/', views.llamar_servicio_prediccion, name='api-prediccion'),
-    path('reporte/', views.llamar_servicio_reporte, name='api-reporte'),
+    path('prediccion/', vista_prediccion, name='api-prediccion'),
+    path('reporte/', vista_reporte, name='api-reporte'),
+    path('metricas/', views.metricas_servicios_ia, name='api-ia-metricas'),
 ]
\ No newline at end of file
@@ -1,14 +1,18 @@
 # apps/ia_services/views.py
 import requests
+import httpx
 import json
 from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from .cliente_http import obtener_cliente, obtener_cliente_async, metricas_servicios
 
-# Define tus URLs aquí o impórtalas de settings.py
-URL_SERVICIO_REPORTES = "http://127.0.0.1:8001/generar-reporte-ia"
-URL_SERVICIO_PREDICCION = "http://127.0.0.1:8002/predecir"
+# Las URLs, timeouts y reintentos de cada servicio están en settings.SERVICIOS_IA
+RUTA_SERVICIO_REPORTES = "/generar-reporte-ia"
+RUTA_SERVICIO_PREDICCION = "/predecir"
 
 @csrf_exempt
 @require_POST
@@ -29,9 +33,10 @@ def llamar_servicio_prediccion(request):
         # 2. Preparamos la petición para FastAPI
         payload = {'dias_a_predecir': dias}
 
-        # 3. ¡LA LLAMADA! Usamos requests.post()
-        # Le pasamos el JSON (payload) y un timeout
-        response = requests.post(URL_SERVICIO_PREDICCION, json=payload, timeout=10)
+        # 3. ¡LA LLAMADA! Cliente compartido: conexión keep-alive,
+        # timeout y reintentos configurados en settings.SERVICIOS_IA
+        # La clave da afinidad: la misma petición va a la réplica con la caché caliente
+        response = obtener_cliente('prediccion').post(RUTA_SERVICIO_PREDICCION, json=payload, clave=dias)
 
         # 4. Verificamos si el microservicio dio un error
         response.raise_for_status() # Lanza un error si la respuesta es 4xx o 5xx
@@ -39,6 +44,8 @@ def llamar_servicio_prediccion(request):
         # 5. Devolvemos la respuesta (que es un JSON) al frontend
         return JsonResponse(response.json())
 
+    except requests.exceptions.ReadTimeout:
+        return JsonResponse({'error': 'El servicio de predicción no respondió a tiempo.'}, status=504)
     except requests.exceptions.ConnectionError:
         # El microservicio está apagado
         return JsonResponse({'error': 'El servicio de predicción no está disponible.'}, status=503)
@@ -50,6 +57,27 @@ def llamar_servicio_prediccion(request):
         return JsonResponse({'error': f'Ocurrió un error inesperado: {str(e)}'}, status=500)
 
 
+def _payload_reporte(data):
+    payload = {'prompt': data.get('prompt')}
+    # Paginación por cursor de los reportes JSON fila-a-fila
+    if data.get('cursor'):
+        payload['cursor'] = data['cursor']
+    if data.get('page_size'):
+        payload['page_size'] = data['page_size']
+    return payload
+
+
+def _retransmitir_sync(response, chunk_size):
+    """
+    Reenvía el cuerpo por trozos y cierra la respuesta al terminar (o si el
+    cliente corta): hasta entonces la réplica cuenta como ocupada.
+    """
+    try:
+        yield from response.iter_content(chunk_size=chunk_size)
+    finally:
+        response.close()
+
+
 @csrf_exempt
 @require_POST
 def llamar_servicio_reporte(request):
@@ -58,20 +86,27 @@ def llamar_servicio_reporte(request):
     y devuelve el archivo Excel O el JSON de datos.
     """
     try:
-        # 1. Obtenemos el prompt del frontend
+        # 1. Obtenemos el prompt (o el cursor de la página siguiente) del frontend
         data = json.loads(request.body)
         prompt = data.get('prompt')
+        cursor = data.get('cursor')
         
-        if not prompt:
+        if not prompt and not cursor:
             return JsonResponse({'error': 'Falta el prompt'}, status=400)
 
         # 2. Preparamos la petición para FastAPI
-        payload = {'prompt': prompt}
+        payload = _payload_reporte(data)
 
         # 3. ¡LA LLAMADA! Usamos stream=True
         # Esto es importante para manejar archivos grandes sin
         # cargar toda la memoria de Django.
-        response = requests.post(URL_SERVICIO_REPORTES, json=payload, stream=True, timeout=60)
+        # El Accept del frontend se reenvía: si pide Arrow IPC
+        # (application/vnd.apache.arrow.stream) el microservicio lo genera
+        headers = {'Accept': request.headers.get('Accept', 'application/json')}
+        response = obtener_cliente('reportes').post(
+            RUTA_SERVICIO_REPORTES, json=payload, headers=headers, stream=True,
+            clave=prompt or cursor,
+        )
         
         # 4. Verificamos si FastAPI dio un error (4xx o 5xx)
         response.raise_for_status()
@@ -83,17 +118,20 @@ def llamar_servicio_reporte(request):
         if 'Content-Disposition' in response.headers:
             # Es un archivo, así que lo "streameamos" (transmitimos)
             return StreamingHttpResponse(
-                response.iter_content(chunk_size=8192), # Lee en pedazos de 8KB
+                _retransmitir_sync(response, 8192), # Lee en pedazos de 8KB
                 content_type=response.headers['Content-Type'],
                 headers={
                     'Content-Disposition': response.headers['Content-Disposition']
                 }
             )
         else:
-            # NO es un archivo, por lo tanto DEBE ser JSON.
-            # Lo leemos y lo devolvemos como un JsonResponse normal.
-            # .json() funciona bien con stream=True, leerá el stream y lo cerrará.
-            return JsonResponse(response.json())
+            # NO es un archivo: son los datos, en JSON o en Arrow IPC.
+            # Se retransmiten los bytes tal cual, sin decodificar y volver a
+            # codificar el payload (antes: response.json() + JsonResponse).
+            return StreamingHttpResponse(
+                _retransmitir_sync(response, 64 * 1024),
+                content_type=response.headers.get('Content-Type', 'application/json'),
+            )
         # --- FIN DEL ARREGLO ---
         
     except requests.exceptions.HTTPError as e:
@@ -103,11 +141,111 @@ def llamar_servicio_reporte(request):
             error_json = e.response.json()
         except:
             error_json = e.response.text
+        finally:
+            e.response.close()
         return JsonResponse({'error': f'Error del microservicio: {error_json}'}, status=e.response.status_code)
     
+    except requests.exceptions.ReadTimeout:
+        return JsonResponse({'error': 'El servicio de reportes no respondió a tiempo.'}, status=504)
+
     except requests.exceptions.ConnectionError:
         return JsonResponse({'error': 'El servicio de reportes no está disponible.'}, status=503)
     
     except Exception as e:
         # Cualquier otro error (ej. JSON malformado en el request inicial)
-        return JsonResponse({'error': f'Ocurrió un error inesperado en Django: {str(e)}'}, status=500)
\ No newline at end of file
+        return JsonResponse({'error': f'Ocurrió un error inesperado en Django: {str(e)}'}, status=500)
+
+
+# --- Versiones async (perfil ASGI, settings.IA_VISTAS_ASYNC) ---
+# Mientras esperan al microservicio no ocupan un hilo del worker: un
+# reporte lento no deja sin hilos al catálogo ni al checkout.
+
+@csrf_exempt
+@require_POST
+async def llamar_servicio_prediccion_async(request):
+    """
+    Igual que llamar_servicio_prediccion, sobre el cliente httpx async.
+    """
+    try:
+        data = json.loads(request.body)
+        dias = data.get('dias_a_predecir')
+
+        if not dias:
+            return JsonResponse({'error': 'Faltan dias_a_predecir'}, status=400)
+
+        response = await obtener_cliente_async('prediccion').post(
+            RUTA_SERVICIO_PREDICCION, json={'dias_a_predecir': dias}, clave=dias
+        )
+        if response.is_error:
+            return JsonResponse({'error': f'Error del microservicio: {response.text}'}, status=response.status_code)
+        return JsonResponse(response.json())
+
+    except httpx.ReadTimeout:
+        return JsonResponse({'error': 'El servicio de predicción no respondió a tiempo.'}, status=504)
+    except httpx.TransportError:
+        return JsonResponse({'error': 'El servicio de predicción no está disponible.'}, status=503)
+    except Exception as e:
+        return JsonResponse({'error': f'Ocurrió un error inesperado: {str(e)}'}, status=500)
+
+
+async def _retransmitir(response):
+    """Reenvía el cuerpo del microservicio por trozos y cierra la conexión al terminar."""
+    try:
+        async for chunk in response.aiter_bytes(64 * 1024):
+            yield chunk
+    finally:
+        await response.aclose()
+
+
+@csrf_exempt
+@require_POST
+async def llamar_servicio_reporte_async(request):
+    """
+    Igual que llamar_servicio_reporte, sobre el cliente httpx async.
+    El archivo o los datos se retransmiten en streaming sin bloquear un hilo.
+    """
+    try:
+        data = json.loads(request.body)
+        if not data.get('prompt') and not data.get('cursor'):
+            return JsonResponse({'error': 'Falta el prompt'}, status=400)
+
+        headers = {'Accept': request.headers.get('Accept', 'application/json')}
+        response = await obtener_cliente_async('reportes').post(
+            RUTA_SERVICIO_REPORTES, json=_payload_reporte(data), headers=headers, stream=True,
+            clave=data.get('prompt') or data.get('cursor'),
+        )
+
+        if response.is_error:
+            await response.aread()
+            await response.aclose()
+            try:
+                error_json = response.json()
+            except ValueError:
+                error_json = response.text
+            return JsonResponse({'error': f'Error del microservicio: {error_json}'}, status=response.status_code)
+
+        # Archivo (Excel/PDF) o datos (JSON/Arrow): se retransmiten tal cual
+        extra = {}
+        if 'Content-Disposition' in response.headers:
+            extra['Content-Disposition'] = response.headers['Content-Disposition']
+        return StreamingHttpResponse(
+            _retransmitir(response),
+            content_type=response.headers.get('Content-Type', 'application/json'),
+            headers=extra,
+        )
+
+    except httpx.ReadTimeout:
+        return JsonResponse({'error': 'El servicio de reportes no respondió a tiempo.'}, status=504)
+    except httpx.TransportError:
+        return JsonResponse({'error': 'El servicio de reportes no está disponible.'}, status=503)
+    except Exception as e:
+        return JsonResponse({'error': f'Ocurrió un error inesperado en Django: {str(e)}'}, status=500)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def metricas_servicios_ia(request):
+    """
+    Latencia y errores por microservicio vistos desde este proceso de Django.
+    """
+    return JsonResponse(metricas_servicios())
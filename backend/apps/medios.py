@@ -0,0 +1,69 @@
+# apps/medios.py
+"""
+URLs de Cloudinary para los serializadores.
+
+CloudinaryResource.url reconstruye la URL entera (opciones, transformación,
+firma si la hay) en cada acceso, y una página del catálogo lo hace cientos
+de veces con las mismas imágenes. url_medio() la calcula una vez y la
+guarda en una LRU acotada (MEDIOS_URLS_MAX) con clave (public_id, versión,
+formato, tipo, tipo de recurso, tamaño). Sin tamaño devuelve exactamente la
+misma URL que .url. Ojo: hasattr(recurso, 'url') ya construye la URL (es
+una property), por eso aquí se pregunta por el tipo.
+
+TAMANOS son las variantes responsive (miniatura, tarjeta, detalle): las
+mismas transformaciones para toda la tienda, con formato y calidad
+automáticos. urls_responsive() devuelve todas de una vez.
+
+Todo es local: cloudinary_url() no llama a la API, así que funciona sin red
+(basta el CLOUD_NAME). Si cambia la configuración de Cloudinary en caliente
+hay que llamar a limpiar().
+"""
+from functools import lru_cache
+
+from cloudinary import CloudinaryResource
+from cloudinary.utils import cloudinary_url
+from django.conf import settings
+
+TAMANOS = {
+    'miniatura': {'width': 150, 'height': 150, 'crop': 'fill', 'gravity': 'auto'},
+    'tarjeta': {'width': 480, 'height': 600, 'crop': 'fill', 'gravity': 'auto'},
+    'detalle': {'width': 1200, 'crop': 'limit'},
+}
+_RESPONSIVE = {'fetch_format': 'auto', 'quality': 'auto'}
+
+
+@lru_cache(maxsize=settings.MEDIOS_URLS_MAX)
+def _url(public_id, version, formato, tipo, tipo_recurso, tamano):
+    opciones = {'format': formato, 'version': version, 'type': tipo, 'resource_type': tipo_recurso or 'image'}
+    if tamano is not None:
+        opciones.update(TAMANOS[tamano], **_RESPONSIVE)
+    return cloudinary_url(public_id, **opciones)[0]
+
+
+def url_medio(recurso, tamano=None):
+    """
+    URL (memorizada) de un CloudinaryField o None si no hay archivo.
+    tamano: None (la original) o una clave de TAMANOS.
+    """
+    if not recurso or not isinstance(recurso, CloudinaryResource):
+        return None
+    if recurso.url_options:  # Opciones propias del recurso: sin memoizar
+        extra = {**TAMANOS[tamano], **_RESPONSIVE} if tamano else {}
+        return recurso.build_url(**{**recurso.url_options, **extra})
+    return _url(recurso.public_id, recurso.version, recurso.format, recurso.type, recurso.resource_type, tamano)
+
+
+def urls_responsive(recurso):
+    """{'miniatura': url, 'tarjeta': url, 'detalle': url} o None si no hay archivo."""
+    if not recurso or not isinstance(recurso, CloudinaryResource):
+        return None
+    return {tamano: url_medio(recurso, tamano) for tamano in TAMANOS}
+
+
+def estadisticas():
+    info = _url.cache_info()
+    return {'entradas': info.currsize, 'max_entradas': info.maxsize, 'aciertos': info.hits, 'fallos': info.misses}
+
+
+def limpiar():
+    _url.cache_clear()
@@ -5,6 +5,7 @@ from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 from .managers import CustomUserManager
 from cloudinary.models import CloudinaryField
+from apps.medios import url_medio
 
 class CustomUser(AbstractBaseUser, PermissionsMixin):
 
@@ -67,8 +68,9 @@ class Profile(models.Model):
 
     @property
     def avatar_url(self):
-        if self.avatar and hasattr(self.avatar, 'url'):
-            return self.avatar.url
+        avatar = url_medio(self.avatar)
+        if avatar:
+            return avatar
         if self.sexo == self.Sexo.masculino:
             return "https://res.cloudinary.com/dujtkzezc/image/upload/v1761365274/perfilhombre_j1m0uu.png"
         if self.sexo == self.Sexo.femenino:
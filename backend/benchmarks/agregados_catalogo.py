@@ -0,0 +1,292 @@
+# benchmarks/agregados_catalogo.py
+"""
+Benchmark y verificación de las columnas desnormalizadas del catálogo
+(agregados.py): ProductoVariante.precio_efectivo / stock_disponible y
+Producto.precio_min / en_stock.
+
+Dentro de una transacción que se deshace al final, con un catálogo sintético:
+
+- Comprueba que las columnas siguen cuadrando tras cada forma de cambiar el
+  catálogo: guardar y borrar Stock, el descuento con F() del checkout,
+  cambiar precio u oferta, activar / desactivar / borrar variantes, la
+  importación masiva y la matriz de variantes. Cuenta las consultas que
+  añade un Stock.save().
+- Desajusta columnas con update() y comprueba que reconciliar_agregados los
+  detecta (--comprobar) y los corrige.
+- Compara ordenar por precio y filtrar 'con stock' con las columnas (e
+  índices) frente a calcularlo en cada consulta con agregados y EXISTS,
+  como hacía productos_resumen(): latencia p50.
+- Recorre /productos/?orden=precio (y -precio) con ?disponible=true en
+  páginas numeradas y por cursor, hacia delante y hacia atrás, y lo compara
+  con el orden esperado.
+
+Uso (desde backend/, con DATABASE_URL apuntando a una BD migrada):
+    python -m benchmarks.agregados_catalogo
+    python -m benchmarks.agregados_catalogo --productos 20000 --repeticiones 30
+"""
+import argparse
+import csv
+import io
+import statistics
+import sys
+import time
+from decimal import Decimal
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.catalogo_sintetico import Deshacer, crear_catalogo
+
+from django.core.management import call_command  # noqa: E402
+from django.db import connection, transaction  # noqa: E402
+from django.db.models import Exists, F, Min, OuterRef, Q, Value  # noqa: E402
+from django.db.models.functions import Coalesce, NullIf  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+from apps.ecommerce.inventario.models import Stock  # noqa: E402
+from apps.ecommerce.productos import importacion  # noqa: E402
+from apps.ecommerce.productos.agregados import desajustes  # noqa: E402
+from apps.ecommerce.productos.fragmentos import fragmentos  # noqa: E402
+from apps.ecommerce.productos.matriz import generar_variantes  # noqa: E402
+from apps.ecommerce.productos.models import Producto, ProductoVariante  # noqa: E402
+from apps.ecommerce.productos.views import ProductoPublicListView  # noqa: E402
+
+fabrica = APIRequestFactory()
+lista = ProductoPublicListView.as_view()
+TAMANO = 24
+
+
+def _cuadra(ids):
+    """Ids (de `ids`) cuyas columnas no coinciden con su valor real."""
+    malos, ids = set(), sorted(ids)
+    for inicio in range(0, len(ids), 1000):
+        trozo = ids[inicio:inicio + 1000]
+        _, lote = desajustes(trozo[0] - 1, len(trozo))
+        malos |= lote & set(trozo)
+    return malos
+
+
+def _fila(producto_id):
+    return Producto.objects.values_list('precio_min', 'en_stock').get(pk=producto_id)
+
+
+def comprobar_mantenimiento(catalogo, comprobar):
+    producto = catalogo['productos'][0]
+    variantes = list(ProductoVariante.objects.filter(producto_id=producto).order_by('id'))
+    registros = list(Stock.objects.filter(variante__producto_id=producto))
+
+    with CaptureQueriesContext(connection) as consultas:
+        registros[0].cantidad += 1
+        registros[0].save()
+    print(f'Un Stock.save(): {len(consultas)} consultas (recalcula variante y producto en la misma transacción)')
+
+    for registro in registros:
+        registro.cantidad = 0
+        registro.save()
+    comprobar(_fila(producto)[1] is False and not _cuadra([producto]),
+              'Guardar el stock a 0 en todos los almacenes: en_stock = false')
+    registros[0].cantidad = 7
+    registros[0].save()
+    variante = ProductoVariante.objects.get(pk=registros[0].variante_id)
+    comprobar(variante.stock_disponible == 7 and _fila(producto)[1] is True, 'Guardar stock: stock_disponible y en_stock')
+
+    registros[0].cantidad = F('cantidad') - 3
+    registros[0].save(update_fields=['cantidad'])
+    comprobar(ProductoVariante.objects.get(pk=variante.pk).stock_disponible == 4 and not _cuadra([producto]),
+              'Descuento con F() como en el checkout')
+    registros[0].delete()
+    comprobar(_fila(producto)[1] is False and not _cuadra([producto]), 'Borrar el Stock: vuelve a sin stock')
+
+    barata = variantes[0]
+    barata.precio_oferta = Decimal('0.99')
+    barata.save()
+    comprobar(barata.precio_efectivo == Decimal('0.99') and _fila(producto)[0] == Decimal('0.99'),
+              'Una oferta baja precio_efectivo y precio_min')
+    barata.precio = Decimal('0.50')
+    barata.precio_oferta = None
+    barata.save(update_fields=['precio', 'precio_oferta'])
+    comprobar(ProductoVariante.objects.get(pk=barata.pk).precio_efectivo == Decimal('0.50')
+              and _fila(producto)[0] == Decimal('0.50'), 'save(update_fields=[precio, ...]) también lo recalcula')
+
+    barata.activo = False
+    barata.save()
+    siguiente = min(v.precio_oferta or v.precio for v in variantes[1:])
+    comprobar(_fila(producto)[0] == siguiente, 'Desactivar la variante más barata: precio_min pasa a la siguiente')
+    for otra in variantes[1:]:
+        otra.activo = False
+        otra.save()
+    comprobar(_fila(producto) == (None, False), 'Sin variantes activas: precio_min NULL y sin stock')
+    variantes[1].activo = True
+    variantes[1].save()
+    variantes[1].delete()
+    comprobar(_fila(producto) == (None, False) and not _cuadra([producto]), 'Borrar una variante lo recalcula')
+
+    filas = [['producto', 'categoria', 'sku', 'precio', 'precio_oferta', 'stock', f'stock:{catalogo["almacenes"][0].nombre}'],
+             ['Agregados importado', catalogo['categorias'][0].slug, 'BENCH-AGR-1', '20', '15', '2', '3'],
+             ['Agregados importado', catalogo['categorias'][0].slug, 'BENCH-AGR-2', '12', '', '0', '0'],
+             ['Agregados agotado', catalogo['categorias'][0].slug, 'BENCH-AGR-3', '8', '', '0', '0']]
+    salida = io.StringIO()
+    csv.writer(salida).writerows(filas)
+    cabecera, datos = importacion.leer_archivo(io.BytesIO(salida.getvalue().encode()), 'csv')
+    importacion.importar(importacion.validar(cabecera, datos))
+    importado = Producto.objects.get(nombre='Agregados importado')
+    agotado = Producto.objects.get(nombre='Agregados agotado')
+    comprobar(_fila(importado.pk) == (Decimal('12'), True) and _fila(agotado.pk) == (Decimal('8'), False)
+              and ProductoVariante.objects.get(sku='BENCH-AGR-1').stock_disponible == 5
+              and not _cuadra([importado.pk, agotado.pk]), 'La importación masiva (bulk_create) deja las columnas hechas')
+
+    matriz = Producto.objects.create(categoria=catalogo['categorias'][0], nombre='Agregados matriz')
+    generar_variantes(matriz, [catalogo['tallas'][:2], catalogo['colores'][:2]], Decimal('30'), Decimal('25'), 4)
+    comprobar(_fila(matriz.pk) == (Decimal('25'), True) and not _cuadra([matriz.pk]),
+              'La matriz de variantes deja las columnas hechas')
+
+
+def comprobar_reconciliacion(catalogo, comprobar):
+    ids = catalogo['productos']
+    comprobar(not _cuadra(ids), f'El catálogo sintético ({len(ids)} productos) cuadra al crearse')
+    # Ninguno múltiplo de 5 (esos ya están sin stock)
+    precio, stock, marcado = ids[11:15], ids[21:24], ids[31]
+    ProductoVariante.objects.filter(producto_id__in=precio).update(precio=F('precio') + 1000, precio_oferta=None)
+    Stock.objects.filter(variante__producto_id__in=stock).update(cantidad=0)
+    Producto.objects.filter(pk=marcado).update(en_stock=False)
+    esperados = set(precio) | set(stock) | {marcado}
+    comprobar(_cuadra(ids) == esperados, f'desajustes() encuentra los {len(esperados)} productos tocados con update()')
+
+    salida = io.StringIO()
+    call_command('reconciliar_agregados', '--comprobar', stdout=salida)
+    comprobar(f'{len(esperados)} de ' in salida.getvalue() and _cuadra(ids) == esperados,
+              'reconciliar_agregados --comprobar informa sin corregir')
+    version = Producto.objects.get(pk=ids[11]).version
+    inicio = time.perf_counter()
+    call_command('reconciliar_agregados', '--lote', '500', stdout=io.StringIO())
+    segundos = time.perf_counter() - inicio
+    comprobar(not _cuadra(ids) and Producto.objects.get(pk=ids[11]).version > version,
+              f'reconciliar_agregados corrige y sube la versión ({segundos * 1000:.0f} ms)')
+
+
+def _p50(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+
+def medir_consultas(repeticiones, comprobar):
+    activos = Producto.objects.filter(activo=True)
+    precio = Coalesce(NullIf('variantes__precio_oferta', Value(Decimal(0))), 'variantes__precio')
+    con_stock = Exists(Stock.objects.filter(variante__producto=OuterRef('pk'), variante__activo=True, cantidad__gt=0))
+    casos = [
+        ('ordenar por precio',
+         lambda: list(activos.annotate(p=Min(precio, filter=Q(variantes__activo=True)))
+                      .filter(p__isnull=False).order_by('p', 'id').values_list('id', flat=True)[:TAMANO]),
+         lambda: list(activos.filter(precio_min__isnull=False).order_by('precio_min', 'id')
+                      .values_list('id', flat=True)[:TAMANO])),
+        ('solo con stock',
+         lambda: list(activos.filter(con_stock).order_by('-creado_en', '-id').values_list('id', flat=True)[:TAMANO]),
+         lambda: list(activos.filter(en_stock=True).order_by('-creado_en', '-id').values_list('id', flat=True)[:TAMANO])),
+        ('con stock por precio',
+         lambda: list(activos.annotate(p=Min(precio, filter=Q(variantes__activo=True)))
+                      .filter(con_stock, p__isnull=False).order_by('p', 'id').values_list('id', flat=True)[:TAMANO]),
+         lambda: list(activos.filter(en_stock=True, precio_min__isnull=False).order_by('precio_min', 'id')
+                      .values_list('id', flat=True)[:TAMANO])),
+    ]
+    print(f'Primera página ({TAMANO}) sobre {activos.count()} productos activos:')
+    for etiqueta, calculado, columnas in casos:
+        iguales = calculado() == columnas()
+        ms_calculado, ms_columnas = _p50(calculado, repeticiones), _p50(columnas, repeticiones)
+        print(f'  {etiqueta:<22} calculado p50 {ms_calculado:8.2f} ms   columnas p50 {ms_columnas:7.2f} ms'
+              f'  (x{ms_calculado / ms_columnas:.0f})')
+        comprobar(iguales and ms_columnas < ms_calculado,
+                  f'{etiqueta}: mismo resultado y más rápido con las columnas')
+
+
+def _pedir(parametros):
+    respuesta = lista(fabrica.get('/', parametros))
+    respuesta.render()
+    return respuesta
+
+
+def _parametros(enlace):
+    return {clave: valores[0] for clave, valores in parse_qs(urlparse(enlace).query).items()}
+
+
+def comprobar_listado(comprobar):
+    fragmentos.limpiar()
+    base = Producto.objects.filter(activo=True, en_stock=True, precio_min__isnull=False)
+    for orden, campos in (('precio', ('precio_min', 'id')), ('-precio', ('-precio_min', '-id'))):
+        esperado = list(base.order_by(*campos).values_list('id', flat=True))
+        parametros = {'orden': orden, 'disponible': 'true', 'page_size': 100}
+
+        numeradas, pagina = [], 1
+        while True:
+            datos = _pedir({**parametros, 'page': pagina}).data
+            numeradas += [p['id'] for p in datos['results']]
+            if not datos['next']:
+                break
+            pagina += 1
+
+        por_cursor, siguiente, enlaces = [], {**parametros, 'paginacion': 'cursor'}, []
+        while siguiente:
+            with CaptureQueriesContext(connection) as consultas:
+                datos = _pedir(siguiente).data
+            por_cursor += [p['id'] for p in datos['results']]
+            enlaces.append(datos['previous'])
+            siguiente = datos['next'] and _parametros(datos['next'])
+        atras = _pedir(_parametros(enlaces[-1])).data['results'] if len(enlaces) > 1 else []
+
+        comprobar(numeradas == esperado and por_cursor == esperado,
+                  f'?orden={orden}&disponible=true: {len(esperado)} productos, numeradas y por cursor en el orden '
+                  f'de (precio_min, id) ({len(consultas)} consultas por página de cursor)')
+        comprobar(len(enlaces) < 2 or [p['id'] for p in atras] == esperado[(len(enlaces) - 2) * 100:(len(enlaces) - 1) * 100],
+                  f'?orden={orden}: el enlace previous por cursor vuelve a la página anterior')
+
+    precios = [p['precio_min'] for p in _pedir({'orden': 'precio', 'vista': 'resumen', 'page_size': 50}).data['results']]
+    comprobar(precios == sorted(precios, key=Decimal) and None not in precios,
+              '?vista=resumen&orden=precio: precio_min ascendente, sin productos sin precio')
+    resumen = _pedir({'disponible': 'true', 'vista': 'resumen', 'page_size': 100}).data['results']
+    comprobar(resumen and all(p['disponible'] for p in resumen), '?disponible=true: todos disponibles')
+
+    cursor = _parametros(_pedir({'paginacion': 'cursor', 'page_size': 5}).data['next'])['cursor']
+    comprobar(_pedir({'orden': 'precio', 'cursor': cursor}).status_code == 404,
+              'Un cursor de otro ?orden= da 404 (cursor inválido)')
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--productos', type=int, default=5000)
+    parser.add_argument('--variantes', type=int, default=4)
+    parser.add_argument('--repeticiones', type=int, default=15)
+    args = parser.parse_args(argv)
+
+    fallos = []
+
+    def comprobar(ok, mensaje):
+        fallos.append(not ok)
+        print(f'  {"✓" if ok else "✗"} {mensaje}')
+
+    try:
+        with transaction.atomic():
+            catalogo = crear_catalogo(args.productos, variantes=args.variantes, almacenes=2, imagenes=0,
+                                      prefijo='bench-agregados')
+            # Un quinto sin stock, para que ?disponible=true filtre algo
+            Stock.objects.filter(variante__producto_id__in=catalogo['productos'][::5]).update(cantidad=0)
+            call_command('reconciliar_agregados', stdout=io.StringIO())
+            comprobar_reconciliacion(catalogo, comprobar)
+            comprobar_mantenimiento(catalogo, comprobar)
+            medir_consultas(args.repeticiones, comprobar)
+            comprobar_listado(comprobar)
+            raise Deshacer
+    except Deshacer:
+        pass
+    fragmentos.limpiar()
+
+    if any(fallos):
+        print(f'❌ {sum(fallos)} verificaciones de las columnas desnormalizadas fallaron.')
+        return 1
+    print('✅ Columnas desnormalizadas del catálogo verificadas.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
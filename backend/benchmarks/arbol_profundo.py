@@ -0,0 +1,191 @@
+# benchmarks/arbol_profundo.py
+"""
+Benchmark de la ruta materializada de Categoria en árboles profundos.
+
+Dentro de una transacción que se deshace al final, crea por cada
+profundidad una cadena de categorías (cada nivel con --ramas hojas y un
+producto por hoja) y compara, en consultas y milisegundos, el recorrido
+recursivo por 'padre' con la ruta materializada:
+
+    migas        Hombre > Ropa > ... de la categoría más profunda
+    ancestros    de la categoría más profunda
+    subarbol     descendientes de la raíz
+    productos    productos del subárbol de la raíz (?categoria=)
+    mover        mover media cadena bajo otra raíz (reescribe el subárbol)
+
+Tras cada caso comprueba que ambos caminos dan lo mismo y, tras mover, que
+todas las rutas coinciden con las recalculadas a mano.
+
+Uso (desde backend/, con DATABASE_URL apuntando a una BD migrada):
+    python -m benchmarks.arbol_profundo
+    python -m benchmarks.arbol_profundo --profundidades 10 50 100 --ramas 5
+"""
+import argparse
+import os
+import sys
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'main.settings')
+django.setup()
+
+from django.db import connection, transaction  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+
+from apps.ecommerce.productos.models import Categoria, Producto  # noqa: E402
+from apps.ecommerce.productos.views import filtrar_por_subarbol  # noqa: E402
+
+
+class _Deshacer(Exception):
+    pass
+
+
+def _medir(funcion):
+    with CaptureQueriesContext(connection) as consultas:
+        inicio = time.perf_counter()
+        resultado = funcion()
+        ms = (time.perf_counter() - inicio) * 1000
+    return resultado, len(consultas), ms
+
+
+# --- Recorridos recursivos (lo que había antes) ---
+
+def _migas_recursivas(categoria_id):
+    nombres = []
+    categoria = Categoria.objects.get(pk=categoria_id)
+    while categoria is not None:
+        nombres.append(categoria.nombre)
+        categoria = categoria.padre
+    return ' > '.join(reversed(nombres))
+
+
+def _ancestros_recursivos(categoria_id):
+    ids = []
+    categoria = Categoria.objects.get(pk=categoria_id).padre
+    while categoria is not None:
+        ids.append(categoria.id)
+        categoria = categoria.padre
+    return list(reversed(ids))
+
+
+def _subarbol_recursivo(raiz_id):
+    ids, nivel = [], [raiz_id]
+    while nivel:
+        nivel = list(Categoria.objects.filter(padre_id__in=nivel).values_list('id', flat=True))
+        ids.extend(nivel)
+    return sorted(ids)
+
+
+def _productos_recursivos(raiz_id):
+    ids = [raiz_id] + _subarbol_recursivo(raiz_id)
+    return Producto.objects.filter(activo=True, categoria_id__in=ids).count()
+
+
+# --- Árbol de prueba ---
+
+def _crear_cadena(prefijo, profundidad, ramas):
+    padre, cadena = None, []
+    for nivel in range(profundidad):
+        padre = Categoria.objects.create(nombre=f'{prefijo} n{nivel}', padre=padre)
+        cadena.append(padre)
+        for rama in range(ramas):
+            hoja = Categoria.objects.create(nombre=f'{prefijo} n{nivel} h{rama}', padre=padre)
+            Producto.objects.create(nombre=f'{prefijo} producto {nivel}.{rama}', categoria=hoja)
+    return cadena
+
+
+def _rutas_consistentes(ids):
+    """Compara ruta/profundidad/migas guardadas con las recalculadas por 'padre'."""
+    por_id = {c.id: c for c in Categoria.objects.filter(id__in=ids)}
+    todas = {c.id: c for c in Categoria.objects.all()}
+    for categoria in por_id.values():
+        cadena, actual = [], categoria
+        while actual is not None:
+            cadena.append(actual)
+            actual = todas.get(actual.padre_id)
+        cadena.reverse()
+        if (categoria.ruta != ''.join(f'{c.id}/' for c in cadena)
+                or categoria.profundidad != len(cadena) - 1
+                or categoria.nombre_completo != ' > '.join(c.nombre for c in cadena)):
+            return False
+    return True
+
+
+def medir_profundidad(profundidad, ramas, fallos):
+    prefijo = f'bench-p{profundidad}'
+    cadena = _crear_cadena(prefijo, profundidad, ramas)
+    raiz, fondo = cadena[0], cadena[-1]
+    filas = []
+
+    def caso(nombre, recursivo, materializado):
+        a, consultas_a, ms_a = _medir(recursivo)
+        b, consultas_b, ms_b = _medir(materializado)
+        ok = a == b
+        fallos.append(not ok)
+        filas.append((nombre, consultas_a, ms_a, consultas_b, ms_b, ok))
+
+    caso('migas', lambda: _migas_recursivas(fondo.id),
+         lambda: str(Categoria.objects.get(pk=fondo.id)))
+    caso('ancestros', lambda: _ancestros_recursivos(fondo.id),
+         lambda: list(fondo.ancestros().values_list('id', flat=True)))
+    caso('subarbol', lambda: _subarbol_recursivo(raiz.id),
+         lambda: sorted(raiz.descendientes().values_list('id', flat=True)))
+    caso('productos', lambda: _productos_recursivos(raiz.id),
+         lambda: filtrar_por_subarbol(Producto.objects.filter(activo=True), str(raiz.id)).count())
+
+    # Mover la mitad inferior de la cadena bajo otra raíz
+    otra_raiz = Categoria.objects.create(nombre=f'{prefijo} otra raiz')
+    medio = Categoria.objects.get(pk=cadena[profundidad // 2].id)
+    medio.padre = otra_raiz
+    _, consultas_mover, ms_mover = _medir(medio.save)
+    ok = _rutas_consistentes([c.id for c in Categoria.objects.filter(nombre__startswith=prefijo)])
+    fallos.append(not ok)
+    filas.append(('mover', None, None, consultas_mover, ms_mover, ok))
+
+    # Un ciclo (raíz bajo su propio descendiente) debe rechazarse
+    raiz.refresh_from_db()
+    raiz.padre = Categoria.objects.get(pk=cadena[1].id)
+    try:
+        raiz.save()
+        ok = False
+    except ValueError:
+        ok = True
+    fallos.append(not ok)
+    filas.append(('ciclo', None, None, None, None, ok))
+    return filas
+
+
+def _celda(valor, ancho, decimales=None):
+    if valor is None:
+        return f"{'-':>{ancho}}"
+    return f'{valor:>{ancho}.{decimales}f}' if decimales is not None else f'{valor:>{ancho}}'
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profundidades', nargs='+', type=int, default=[10, 40, 100])
+    parser.add_argument('--ramas', type=int, default=3, help='Hojas (con un producto) por nivel')
+    args = parser.parse_args(argv)
+
+    fallos = []
+    print(f"{'prof':>5} {'caso':<10} {'rec_q':>6} {'rec_ms':>8} {'mat_q':>6} {'mat_ms':>8}  ok")
+    try:
+        with transaction.atomic():
+            for profundidad in args.profundidades:
+                for nombre, q_a, ms_a, q_b, ms_b, ok in medir_profundidad(profundidad, args.ramas, fallos):
+                    print(f"{profundidad:>5} {nombre:<10} {_celda(q_a, 6)} {_celda(ms_a, 8, 2)} "
+                          f"{_celda(q_b, 6)} {_celda(ms_b, 8, 2)}  {'✓' if ok else '✗'}")
+            raise _Deshacer
+    except _Deshacer:
+        pass
+
+    if any(fallos):
+        print(f'❌ {sum(fallos)} verificaciones de la ruta materializada fallaron.')
+        return 1
+    print('✅ Ruta materializada verificada.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,183 @@
+# benchmarks/balanceo_replicas.py
+"""
+Verificación del balanceo entre réplicas de apps.ia_services.
+
+Levanta varias réplicas FastAPI locales (cada una en su puerto) que
+imitan al microservicio de predicción y comprueba con ClienteServicio:
+
+- Menos peticiones en curso: la réplica lenta recibe menos tráfico.
+- Afinidad por clave: cada clave va siempre a la misma réplica (caché caliente).
+- Expulsión: una réplica caída deja de recibir tráfico sin errores visibles.
+- Chequeo activo: una réplica que responde 503 en la ruta de salud sale del
+  reparto y vuelve al recuperarse.
+
+Uso (desde backend/):
+    python -m benchmarks.balanceo_replicas
+"""
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import uvicorn
+from fastapi import FastAPI, Response
+
+from apps.ia_services.balanceador import Balanceador
+from apps.ia_services.cliente_http import ClienteServicio
+
+PUERTO_BASE = 18101
+
+
+class Replica:
+    """Sustituto FastAPI del microservicio con retardo, salud y caché simulados."""
+
+    def __init__(self, nombre, puerto, retardo=0.01):
+        self.nombre = nombre
+        self.puerto = puerto
+        self.retardo = retardo
+        self.sana = True
+        self.atendidas = 0
+        self.cache = set()
+        self.aciertos_cache = 0
+        self.servidor = None
+        self.hilo = None
+
+        app = FastAPI()
+
+        @app.get('/')
+        def salud():
+            return Response(status_code=200 if self.sana else 503)
+
+        @app.post('/predecir')
+        def predecir(payload: dict):
+            time.sleep(self.retardo)
+            self.atendidas += 1
+            clave = payload.get('dias_a_predecir')
+            self.aciertos_cache += clave in self.cache
+            self.cache.add(clave)
+            return {'replica': self.nombre}
+
+        self.app = app
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.puerto}'
+
+    def iniciar(self):
+        self.servidor = uvicorn.Server(uvicorn.Config(self.app, port=self.puerto, log_level='error'))
+        self.hilo = threading.Thread(target=self.servidor.run, daemon=True)
+        self.hilo.start()
+        while not self.servidor.started:
+            time.sleep(0.02)
+
+    @property
+    def activa(self):
+        return self.hilo is not None and self.hilo.is_alive()
+
+    def detener(self):
+        self.servidor.should_exit = True
+        self.hilo.join(timeout=10)
+
+    def reiniciar_contadores(self):
+        self.atendidas = 0
+        self.aciertos_cache = 0
+        self.cache.clear()
+
+
+def _cliente(replicas):
+    balanceador = Balanceador(
+        [r.url for r in replicas], intervalo_salud=0.2, timeout_salud=0.5, umbral_fallos=1, expulsion_s=60,
+    )
+    return ClienteServicio('prediccion', [r.url for r in replicas], timeout=(0.5, 5), reintentos=2,
+                           idempotente=True, balanceador=balanceador)
+
+
+def _pedir(cliente, clave=None, n=1):
+    ok = 0
+    for _ in range(n):
+        ok += cliente.post('/predecir', json={'dias_a_predecir': clave}, clave=clave).status_code == 200
+    return ok
+
+
+def caso_menos_en_curso(replicas, cliente):
+    lenta, *rapidas = replicas
+    lenta.retardo = 0.3
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        list(pool.map(lambda _: _pedir(cliente, n=10), range(6)))
+    lenta.retardo = 0.01
+    return all(lenta.atendidas < r.atendidas for r in rapidas), \
+        f"lenta={lenta.atendidas}, rápidas={[r.atendidas for r in rapidas]}"
+
+
+def caso_afinidad(replicas, cliente):
+    for clave in range(20):
+        _pedir(cliente, clave=clave, n=5)
+    aciertos = sum(r.aciertos_cache for r in replicas)
+    # 20 claves x 5 peticiones: la primera de cada clave falla la caché
+    return aciertos == 80, f"aciertos de caché {aciertos}/100"
+
+
+def caso_expulsion(replicas, cliente):
+    caida = replicas[-1]
+    caida.detener()
+    ok = _pedir(cliente, n=30)
+    estado = {e['url']: e for e in cliente.balanceador.estado()}[caida.url]
+    return ok == 30 and (estado['expulsado'] or not estado['sano']), \
+        f"{ok}/30 correctas con {caida.nombre} caída"
+
+
+def caso_recuperacion(replicas, cliente):
+    caida = replicas[-1]
+    caida.iniciar()
+    time.sleep(0.5)  # Un par de chequeos activos
+    caida.reiniciar_contadores()
+    _pedir(cliente, n=30)
+    return caida.atendidas > 0, f"{caida.nombre} atendió {caida.atendidas} tras recuperarse"
+
+
+def caso_salud_activa(replicas, cliente):
+    enferma = replicas[0]
+    enferma.sana = False
+    time.sleep(0.5)
+    _pedir(cliente, n=30)
+    sin_trafico = enferma.atendidas == 0
+    enferma.sana = True
+    return sin_trafico, f"{enferma.nombre} (503 en salud) atendió {enferma.atendidas}"
+
+
+CASOS = [
+    ("Menos peticiones en curso", caso_menos_en_curso),
+    ("Afinidad por clave", caso_afinidad),
+    ("Expulsión de réplica caída", caso_expulsion),
+    ("Vuelta tras recuperarse", caso_recuperacion),
+    ("Chequeo activo de salud", caso_salud_activa),
+]
+
+
+def main() -> int:
+    replicas = [Replica(f'r{i}', PUERTO_BASE + i) for i in range(3)]
+    for replica in replicas:
+        replica.iniciar()
+
+    fallos = 0
+    try:
+        for nombre, caso in CASOS:
+            for replica in replicas:
+                replica.reiniciar_contadores()
+            ok, detalle = caso(replicas, _cliente(replicas))
+            fallos += not ok
+            print(f'  {"✓" if ok else "✗"} {nombre}: {detalle}')
+    finally:
+        for replica in replicas:
+            if replica.activa:
+                replica.detener()
+
+    if fallos:
+        print(f'❌ {fallos} verificaciones del balanceo fallaron.')
+        return 1
+    print('✅ Balanceo entre réplicas verificado.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,206 @@
+# benchmarks/busqueda.py
+"""
+Benchmark y verificación de la búsqueda de productos (busqueda.py).
+
+Dentro de una transacción que se deshace al final, con un catálogo sintético:
+
+- Construye el índice en memoria: tiempo y memoria (tracemalloc).
+- Si la BD es Postgres, llena también ProductoBusqueda (tsvector + trigramas).
+- Mide p50/p95 de varias consultas: palabra frecuente, dos palabras, sin
+  tilde ("algodon"), prefijo ("cami") y, en Postgres, una errata.
+- Compara los resultados del índice en memoria con una búsqueda por fuerza
+  bruta, comprueba que el nombre pesa más que la descripción y que renombrar,
+  desactivar o crear productos se refleja tras sincronizar.
+- Llama al endpoint GET /api/productos/buscar/.
+
+Uso (desde backend/, con DATABASE_URL apuntando a una BD migrada):
+    python -m benchmarks.busqueda
+    python -m benchmarks.busqueda --productos 100000 --repeticiones 50
+"""
+import argparse
+import statistics
+import sys
+import time
+import tracemalloc
+
+from benchmarks.catalogo_sintetico import Deshacer, crear_catalogo
+
+from django.db import connection, transaction  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+from apps.ecommerce.productos.busqueda import (  # noqa: E402
+    BusquedaPostgres, IndiceInvertido, documentos, tokenizar,
+)
+from apps.ecommerce.productos.fragmentos import fragmentos  # noqa: E402
+from apps.ecommerce.productos.models import Producto  # noqa: E402
+from apps.ecommerce.productos.views import ProductoBusquedaView  # noqa: E402
+
+CONSULTAS = [
+    ('palabra frecuente', 'camisa'),
+    ('dos palabras', 'camisa lino'),
+    ('sin tilde', 'algodon'),
+    ('prefijo', 'cami'),
+]
+ERRATA = ('errata', 'camsia')
+
+fabrica = APIRequestFactory()
+vista = ProductoBusquedaView.as_view()
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def medir_consultas(backend, consultas, repeticiones):
+    for etiqueta, consulta in consultas:
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            resultados = backend.buscar(consulta, 20)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        print(f'  {etiqueta:<18} {consulta!r:<14} p50 {statistics.median(tiempos):7.2f} ms  '
+              f'p95 {_percentil(tiempos, 0.95):7.2f} ms  {len(resultados)} resultados')
+
+
+def construir_memoria():
+    backend = IndiceInvertido()
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    total = backend.reconstruir()
+    segundos = time.perf_counter() - inicio
+    retenida, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    estado = backend.estadisticas()
+    print(f'Índice en memoria: {total} productos, {estado["tokens"]} tokens en {segundos:.2f}s '
+          f'({retenida / 2**20:.1f} MB retenidos, pico {pico / 2**20:.1f} MB durante la carga)')
+    backend._ultima_sincronizacion = time.monotonic()  # Que las mediciones no sincronicen
+    return backend
+
+
+def fuerza_bruta(consulta):
+    """Todas las palabras deben estar; la última como prefijo."""
+    tokens = tokenizar(consulta)
+    encontrados = set()
+    for documento in documentos():
+        palabras = set(tokenizar(' '.join(documento[c] for c in ('nombre', 'categorias', 'valores', 'descripcion'))))
+        if all(t in palabras for t in tokens[:-1]) and any(p.startswith(tokens[-1]) for p in palabras):
+            encontrados.add(documento['id'])
+    return encontrados
+
+
+def comprobar_memoria(backend, comprobar):
+    for consulta in ('camisa lino', 'cami', 'algodon'):
+        ok = set(backend.buscar(consulta, 10**9)) == fuerza_bruta(consulta)
+        comprobar(ok, f'Índice en memoria = fuerza bruta para {consulta!r}')
+    comprobar(backend.buscar('Algodón', 50) == backend.buscar('algodon', 50) != [],
+              'Tildes y mayúsculas no cambian los resultados')
+    comprobar(backend.buscar('de la', 50) == [], 'Las palabras vacías no buscan nada')
+
+
+def comprobar_ranking_y_cambios(backend, catalogo, comprobar):
+    categoria = catalogo['categorias'][0]
+    en_nombre = Producto.objects.create(categoria=categoria, nombre='Abrigo Zafiro', slug='bench-zafiro-nombre')
+    en_descripcion = Producto.objects.create(categoria=categoria, nombre='Abrigo Básico',
+                                             slug='bench-zafiro-desc', descripcion='Botones color zafiro')
+    # En la transacción del benchmark los on_commit no se ejecutan: se marca a mano
+    backend.marcar_pendiente()
+    comprobar(backend.buscar('zafiro', 10) == [en_nombre.id, en_descripcion.id],
+              f'{backend.nombre}: coincidir en el nombre pesa más que en la descripción')
+
+    en_nombre.nombre = 'Abrigo Esmeralda'
+    en_nombre.save()
+    backend.marcar_pendiente()
+    comprobar(backend.buscar('esmeralda', 10) == [en_nombre.id] and en_nombre.id not in backend.buscar('zafiro', 10),
+              f'{backend.nombre}: renombrar un producto actualiza el índice')
+
+    en_descripcion.activo = False
+    en_descripcion.save()
+    backend.marcar_pendiente()
+    comprobar(backend.buscar('zafiro', 10) == [], f'{backend.nombre}: desactivar un producto lo saca del índice')
+
+    # Cambio hecho "en otro proceso": sin marcar pendiente, lo recoge la sincronización periódica
+    otro = Producto.objects.create(categoria=categoria, nombre='Falda Turquesa', slug='bench-turquesa')
+    backend.sincronizar()
+    comprobar(backend.buscar('turquesa', 10) == [otro.id],
+              f'{backend.nombre}: la sincronización periódica recoge productos nuevos')
+    for producto in (en_nombre, en_descripcion, otro):
+        producto.delete()
+    backend.sincronizar(forzar=True)
+
+
+def comprobar_endpoint(backend, comprobar):
+    from apps.ecommerce.productos import busqueda
+    busqueda._backend = backend
+    try:
+        fragmentos.limpiar()
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = vista(fabrica.get('/', {'q': 'camisa lino', 'page_size': 12}))
+            respuesta.render()
+        ids = backend.buscar('camisa lino')
+        resultados = respuesta.data['results']
+        comprobar(respuesta.status_code == 200 and respuesta.data['count'] == len(ids)
+                  and [p['id'] for p in resultados] == ids[:12],
+                  f'Endpoint /buscar/: {len(resultados)} de {len(ids)} resultados en orden, '
+                  f'{len(consultas)} consultas')
+        vacia = vista(fabrica.get('/', {'q': ''}))
+        comprobar(vacia.status_code == 200 and vacia.data['count'] == 0, 'Endpoint /buscar/ sin q devuelve 0')
+    finally:
+        busqueda._backend = None
+        fragmentos.limpiar()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--productos', type=int, default=20000)
+    parser.add_argument('--repeticiones', type=int, default=30)
+    args = parser.parse_args(argv)
+
+    fallos = []
+
+    def comprobar(ok, mensaje):
+        fallos.append(not ok)
+        print(f'  {"✓" if ok else "✗"} {mensaje}')
+
+    try:
+        with transaction.atomic():
+            inicio = time.perf_counter()
+            catalogo = crear_catalogo(args.productos, variantes=2, almacenes=1, imagenes=0, prefijo='bench-busq')
+            print(f'Catálogo sintético: {args.productos} productos en {time.perf_counter() - inicio:.1f}s')
+
+            memoria = construir_memoria()
+            medir_consultas(memoria, CONSULTAS, args.repeticiones)
+            comprobar_memoria(memoria, comprobar)
+            comprobar_endpoint(memoria, comprobar)
+            comprobar_ranking_y_cambios(memoria, catalogo, comprobar)
+
+            if connection.vendor == 'postgresql':
+                postgres = BusquedaPostgres()
+                inicio = time.perf_counter()
+                total = postgres.reconstruir()
+                print(f'Postgres (ProductoBusqueda): {total} productos en {time.perf_counter() - inicio:.2f}s'
+                      f'{"" if postgres.trigramas else " ⚠️  sin pg_trgm: no tolera erratas"}')
+                postgres._pendiente, postgres._ultima_sincronizacion = False, time.monotonic()
+                medir_consultas(postgres, CONSULTAS + ([ERRATA] if postgres.trigramas else []), args.repeticiones)
+                esperados = set(memoria.buscar('camisa lino', 10**9))
+                obtenidos = set(postgres.buscar('camisa lino', 10**9))
+                comprobar(esperados <= obtenidos, 'Postgres encuentra todo lo que encuentra el índice en memoria')
+                if postgres.trigramas:
+                    comprobar(bool(postgres.buscar(ERRATA[1], 5)), 'Postgres tolera una errata (trigramas)')
+                comprobar_ranking_y_cambios(postgres, catalogo, comprobar)
+            else:
+                print('⚠️  La BD no es Postgres: se omite el backend postgres.')
+            raise Deshacer
+    except Deshacer:
+        pass
+
+    if any(fallos):
+        print(f'❌ {sum(fallos)} verificaciones de la búsqueda fallaron.')
+        return 1
+    print('✅ Búsqueda de productos verificada.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
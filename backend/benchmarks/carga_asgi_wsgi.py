@@ -0,0 +1,205 @@
+# benchmarks/carga_asgi_wsgi.py
+"""
+Prueba de carga WSGI vs ASGI con el servicio de reportes lento.
+
+Levanta un sustituto del microservicio de reportes que tarda
+--retardo-reporte segundos en responder y, por cada perfil, un servidor
+de Django:
+
+    wsgi  Pool fijo de --hilos hilos (como gunicorn gthread) + vistas síncronas
+    asgi  uvicorn (1 worker) + vistas puente async (IA_VISTAS_ASYNC=True)
+
+Mientras --clientes-reporte clientes piden reportes sin parar, otros
+--clientes-catalogo piden --ruta-catalogo. Se mide el throughput y la
+latencia del catálogo y los reportes completados.
+
+Uso (desde backend/, con DATABASE_URL apuntando a una BD migrada):
+    python -m benchmarks.carga_asgi_wsgi
+    python -m benchmarks.carga_asgi_wsgi --hilos 8 --clientes-reporte 16 --duracion 20
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+import requests
+
+
+# --- Sustituto lento del microservicio de reportes ---
+
+class _ReporteLento(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.server.retardo)
+        cuerpo = json.dumps({'metric': 'ventas_totales', 'count': 1, 'data': [{'ventas_totales': 1}]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+
+# --- Servidor WSGI con un pool fijo de hilos ---
+
+class _WSGIServerPool(ThreadingMixIn, WSGIServer):
+    """Atiende cada conexión en un pool de `hilos` hilos (el resto espera en cola)."""
+
+    def __init__(self, *args, hilos=4, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pool = ThreadPoolExecutor(max_workers=hilos)
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self.process_request_thread, request, client_address)
+
+
+class _SinLogs(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def servir_wsgi(puerto: int, hilos: int):
+    import django
+    from django.core.wsgi import get_wsgi_application
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'main.settings')
+    django.setup()
+    servidor = make_server(
+        '127.0.0.1', puerto, get_wsgi_application(),
+        server_class=lambda *a, **k: _WSGIServerPool(*a, hilos=hilos, **k),
+        handler_class=_SinLogs,
+    )
+    servidor.serve_forever()
+
+
+# --- Carga ---
+
+def _iniciar_servidor(perfil: str, puerto: int, args, url_reportes: str):
+    env = {**os.environ, 'IA_REPORTES_URL': url_reportes, 'IA_REPORTES_TIMEOUT': '120'}
+    if perfil == 'wsgi':
+        env['IA_VISTAS_ASYNC'] = 'False'
+        comando = [sys.executable, '-m', 'benchmarks.carga_asgi_wsgi', '--servir-wsgi',
+                   '--puerto', str(puerto), '--hilos', str(args.hilos)]
+    else:
+        env['IA_VISTAS_ASYNC'] = 'True'
+        comando = [sys.executable, '-m', 'uvicorn', 'main.asgi:application', '--port', str(puerto),
+                   '--workers', '1', '--lifespan', 'off', '--log-level', 'warning']
+    proceso = subprocess.Popen(comando, env=env)
+
+    base = f'http://127.0.0.1:{puerto}'
+    limite = time.monotonic() + 30
+    while time.monotonic() < limite:
+        try:
+            if requests.get(base + args.ruta_catalogo, timeout=2).status_code < 500:
+                return proceso, base
+        except requests.RequestException:
+            pass
+        time.sleep(0.3)
+    proceso.terminate()
+    raise RuntimeError(f'El servidor {perfil} no arrancó.')
+
+
+def _bucle(funcion, fin: float, resultados: list):
+    sesion = requests.Session()
+    while time.monotonic() < fin:
+        inicio = time.perf_counter()
+        try:
+            ok = funcion(sesion).status_code == 200
+        except requests.RequestException:
+            ok = False
+        resultados.append((ok, time.perf_counter() - inicio))
+
+
+def _percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))] if valores else float('nan')
+
+
+def medir_perfil(perfil: str, args, url_reportes: str) -> dict:
+    proceso, base = _iniciar_servidor(perfil, args.puerto, args, url_reportes)
+    try:
+        catalogo, reportes = [], []
+        fin = time.monotonic() + args.duracion
+        hilos = [
+            threading.Thread(target=_bucle, args=(
+                lambda s: s.post(base + '/api/ia/reporte/', json={'prompt': 'ventas totales'}, timeout=120),
+                fin, reportes))
+            for _ in range(args.clientes_reporte)
+        ]
+        # Los reportes ocupan sus hilos primero; luego llega el tráfico del catálogo
+        for hilo in hilos:
+            hilo.start()
+        time.sleep(0.5)
+        hilos_catalogo = [
+            threading.Thread(target=_bucle, args=(
+                lambda s: s.get(base + args.ruta_catalogo, timeout=120), fin, catalogo))
+            for _ in range(args.clientes_catalogo)
+        ]
+        for hilo in hilos_catalogo:
+            hilo.start()
+        for hilo in hilos + hilos_catalogo:
+            hilo.join()
+    finally:
+        proceso.terminate()
+        proceso.wait()
+
+    latencias = [t for ok, t in catalogo if ok]
+    return {
+        'catalogo_rps': len(latencias) / (args.duracion - 0.5),
+        'catalogo_p50_ms': _percentil(latencias, 0.5) * 1000,
+        'catalogo_p95_ms': _percentil(latencias, 0.95) * 1000,
+        'catalogo_errores': sum(not ok for ok, _ in catalogo),
+        'reportes_ok': sum(ok for ok, _ in reportes),
+        'reportes_errores': sum(not ok for ok, _ in reportes),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--perfiles', nargs='+', choices=('wsgi', 'asgi'), default=['wsgi', 'asgi'])
+    parser.add_argument('--hilos', type=int, default=8, help='Hilos del servidor WSGI')
+    parser.add_argument('--retardo-reporte', type=float, default=3.0, help='Segundos que tarda cada reporte')
+    parser.add_argument('--clientes-reporte', type=int, default=16)
+    parser.add_argument('--clientes-catalogo', type=int, default=4)
+    parser.add_argument('--ruta-catalogo', default='/api/productos/categorias/')
+    parser.add_argument('--duracion', type=float, default=15.0)
+    parser.add_argument('--puerto', type=int, default=18000)
+    parser.add_argument('--servir-wsgi', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.servir_wsgi:
+        servir_wsgi(args.puerto, args.hilos)
+        return
+
+    sustituto = ThreadingHTTPServer(('127.0.0.1', 0), _ReporteLento)
+    sustituto.retardo = args.retardo_reporte
+    threading.Thread(target=sustituto.serve_forever, daemon=True).start()
+    url_reportes = f'http://127.0.0.1:{sustituto.server_address[1]}'
+
+    print(f"Reportes de {args.retardo_reporte}s · {args.clientes_reporte} clientes de reportes · "
+          f"{args.clientes_catalogo} de catálogo · {args.duracion}s por perfil\n")
+    print(f"{'perfil':<6} {'cat_req/s':>10} {'cat_p50_ms':>11} {'cat_p95_ms':>11} {'cat_err':>8} "
+          f"{'rep_ok':>7} {'rep_err':>8}")
+    try:
+        for perfil in args.perfiles:
+            r = medir_perfil(perfil, args, url_reportes)
+            print(f"{perfil:<6} {r['catalogo_rps']:>10.1f} {r['catalogo_p50_ms']:>11.1f} "
+                  f"{r['catalogo_p95_ms']:>11.1f} {r['catalogo_errores']:>8} "
+                  f"{r['reportes_ok']:>7} {r['reportes_errores']:>8}")
+    finally:
+        sustituto.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+# benchmarks/catalogo_sintetico.py
+"""
+Catálogo sintético para los benchmarks y verificaciones de apps.ecommerce.productos.
+
+crear_catalogo() inserta con bulk_create (rápido incluso con decenas de
+miles de productos) una categoría raíz con subcategorías, atributos Talla y
+Color, productos con N variantes cada uno, sus valores y stock en varios
+almacenes. Pensado para usarse dentro de una transacción que se deshace.
+"""
+import itertools
+import os
+import random
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'main.settings')
+# Las URLs de Cloudinary se generan en local; sin credenciales basta un nombre
+os.environ.setdefault('CLOUDINARY_CLOUD_NAME', 'bench')
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+
+from apps.ecommerce.inventario.models import Almacen, Stock  # noqa: E402
+from apps.ecommerce.productos.agregados import actualizar_productos  # noqa: E402
+from apps.ecommerce.productos.models import (  # noqa: E402
+    Atributo, Categoria, ImagenProducto, Producto, ProductoVariante, ValorAtributo,
+)
+
+TALLAS = ['XS', 'S', 'M', 'L', 'XL', 'XXL']
+COLORES = ['Negro', 'Blanco', 'Rojo', 'Azul', 'Verde', 'Gris', 'Beige', 'Rosa']
+PALABRAS = ['Camisa', 'Pantalón', 'Vestido', 'Chaqueta', 'Falda', 'Blusa', 'Abrigo', 'Jersey',
+            'Lino', 'Algodón', 'Seda', 'Lana', 'Vaquero', 'Manga Larga', 'Corto', 'Clásico',
+            'Slim', 'Oversize', 'Estampado', 'Básico']
+
+
+class Deshacer(Exception):
+    """Se lanza al final de un atomic() para deshacer todo lo creado."""
+
+
+def _valores(atributo_nombre, valores):
+    atributo, _ = Atributo.objects.get_or_create(nombre=atributo_nombre)
+    return [ValorAtributo.objects.get_or_create(atributo=atributo, valor=v)[0] for v in valores]
+
+
+def crear_catalogo(productos, variantes=4, almacenes=2, imagenes=1, prefijo='bench', semilla=0, lote=2000):
+    """
+    Devuelve un dict con 'raiz', 'categorias', 'productos' (ids), 'tallas', 'colores'
+    y 'almacenes'. Cada producto tiene `variantes` combinaciones Talla x Color.
+    """
+    aleatorio = random.Random(semilla)
+    raiz = Categoria.objects.create(nombre=f'{prefijo} raiz')
+    categorias = [Categoria.objects.create(nombre=f'{prefijo} sub {i}', padre=raiz) for i in range(4)]
+    tallas, colores = _valores('Talla', TALLAS), _valores('Color', COLORES)
+    combinaciones = list(itertools.product(tallas, colores))
+    lista_almacenes = [
+        Almacen.objects.get_or_create(nombre=f'{prefijo} almacén {i}')[0] for i in range(almacenes)
+    ]
+
+    ids = []
+    for inicio in range(0, productos, lote):
+        nuevos = [
+            Producto(
+                categoria=categorias[i % len(categorias)],
+                nombre=' '.join(aleatorio.sample(PALABRAS, 3)) + f' {i}',
+                slug=f'{prefijo}-producto-{i}',
+                descripcion=f'Producto sintético número {i}',
+            )
+            for i in range(inicio, min(productos, inicio + lote))
+        ]
+        Producto.objects.bulk_create(nuevos)
+        if nuevos[0].pk is None:  # Backends sin RETURNING
+            nuevos = list(Producto.objects.filter(slug__in=[p.slug for p in nuevos]))
+
+        variantes_lote = []
+        for producto in nuevos:
+            for combinacion in aleatorio.sample(combinaciones, min(variantes, len(combinaciones))):
+                variante = ProductoVariante(
+                    producto=producto, sku=f'{producto.slug}-{len(variantes_lote)}'.upper(),
+                    precio=aleatorio.randint(10, 200),
+                )
+                variante.combinacion = combinacion
+                variantes_lote.append(variante)
+        # bulk_create no dispara señales: las columnas desnormalizadas se rellenan aquí
+        for variante in variantes_lote:
+            variante.cantidades = [aleatorio.randint(0, 20) for _ in lista_almacenes]
+            variante.precio_efectivo, variante.stock_disponible = variante.precio, sum(variante.cantidades)
+        ProductoVariante.objects.bulk_create(variantes_lote)
+        if variantes_lote and variantes_lote[0].pk is None:
+            por_sku = dict(ProductoVariante.objects.filter(
+                sku__in=[v.sku for v in variantes_lote]).values_list('sku', 'pk'))
+            for variante in variantes_lote:
+                variante.pk = por_sku[variante.sku]
+
+        Relacion = ProductoVariante.valores.through
+        Relacion.objects.bulk_create([
+            Relacion(productovariante_id=v.pk, valoratributo_id=valor.pk)
+            for v in variantes_lote for valor in v.combinacion
+        ])
+        Stock.objects.bulk_create([
+            Stock(variante_id=v.pk, almacen=almacen, cantidad=cantidad)
+            for v in variantes_lote for almacen, cantidad in zip(lista_almacenes, v.cantidades)
+        ])
+        actualizar_productos([p.pk for p in nuevos])
+        ImagenProducto.objects.bulk_create([
+            ImagenProducto(producto=p, imagen=f'{prefijo}/{p.slug}-{n}', es_principal=n == 0)
+            for p in nuevos for n in range(imagenes)
+        ])
+        ids.extend(p.pk for p in nuevos)
+
+    return {
+        'raiz': raiz, 'categorias': categorias, 'productos': ids,
+        'tallas': tallas, 'colores': colores, 'almacenes': lista_almacenes,
+    }
+
+
+def crear_admin(prefijo='bench'):
+    return get_user_model().objects.create(email=f'{prefijo}-admin@example.com', is_staff=True, is_superuser=True)
@@ -0,0 +1,114 @@
+# benchmarks/consultas_categorias.py
+"""
+Verificación del árbol de categorías cacheado (GET /api/productos/categorias/).
+
+Dentro de una transacción que se deshace al final, crea árboles de varios
+tamaños y comprueba:
+
+- La respuesta es idéntica a la del serializador recursivo de siempre.
+- Reconstruir el árbol cuesta 2 consultas (sello + carga) sin importar el
+  número de categorías.
+- Con la caché caliente solo se hace la consulta del sello.
+- Guardar o borrar una categoría cambia el sello: el árbol se reconstruye.
+
+Uso (desde backend/, con DATABASE_URL apuntando a una BD migrada):
+    python -m benchmarks.consultas_categorias
+"""
+import os
+import sys
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'main.settings')
+django.setup()
+
+from django.db import connection, transaction  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+from apps.ecommerce.productos.arbol import invalidar_arbol  # noqa: E402
+from apps.ecommerce.productos.models import Categoria  # noqa: E402
+from apps.ecommerce.productos.serializers import CategoriaSerializer  # noqa: E402
+from apps.ecommerce.productos.views import CategoriaPublicListView  # noqa: E402
+
+vista = CategoriaPublicListView.as_view()
+fabrica = APIRequestFactory()
+
+
+class _Deshacer(Exception):
+    pass
+
+
+def _pedir():
+    with CaptureQueriesContext(connection) as consultas:
+        respuesta = vista(fabrica.get('/api/productos/categorias/'))
+    return respuesta.data, len(consultas)
+
+
+def _respuesta_recursiva():
+    """Lo que devolvía la vista antes: raíces + una consulta por nodo."""
+    raices = Categoria.objects.filter(padre__isnull=True).order_by('id')
+    with CaptureQueriesContext(connection) as consultas:
+        datos = CategoriaSerializer(raices, many=True).data
+    return datos, len(consultas)
+
+
+def _crear_arbol(prefijo, raices, hijos, nietos):
+    for r in range(raices):
+        raiz = Categoria.objects.create(nombre=f'{prefijo} {r}')
+        for h in range(hijos):
+            hijo = Categoria.objects.create(nombre=f'{prefijo} {r}.{h}', padre=raiz)
+            for n in range(nietos):
+                Categoria.objects.create(nombre=f'{prefijo} {r}.{h}.{n}', padre=hijo)
+
+
+def _comprobar(fallos, ok, mensaje):
+    print(f'  {"✓" if ok else "✗"} {mensaje}')
+    fallos.append(not ok)
+
+
+def main() -> int:
+    fallos = []
+    try:
+        with transaction.atomic():
+            for prefijo, forma in (('bench-a', (3, 3, 2)), ('bench-b', (10, 5, 4))):
+                _crear_arbol(prefijo, *forma)
+                total = Categoria.objects.count()
+
+                invalidar_arbol()
+                datos, frias = _pedir()
+                _, calientes = _pedir()
+                esperado, recursivas = _respuesta_recursiva()
+                _comprobar(fallos, frias == 2,
+                           f'{total} categorías: {frias} consulta(s) en frío (antes {recursivas + 1})')
+                _comprobar(fallos, calientes == 1, f'{total} categorías: {calientes} consulta(s) con caché')
+                _comprobar(fallos, datos['count'] == len(esperado)
+                           and datos['results'] == esperado[:len(datos['results'])],
+                           f'{total} categorías: respuesta idéntica a la recursiva')
+
+            hoja = Categoria.objects.filter(nombre='bench-b 0.0.0').get()
+            hoja.nombre = 'bench-b renombrada'
+            hoja.save()
+            datos, frias = _pedir()
+            _comprobar(fallos, frias == 2 and 'bench-b renombrada' in str(datos['results']),
+                       'Guardar una categoría invalida la caché')
+
+            hoja.delete()
+            datos, frias = _pedir()
+            _comprobar(fallos, frias == 2 and 'bench-b renombrada' not in str(datos['results']),
+                       'Borrar una categoría invalida la caché')
+            raise _Deshacer
+    except _Deshacer:
+        pass
+    finally:
+        invalidar_arbol()
+
+    if any(fallos):
+        print(f'❌ {sum(fallos)} verificaciones del árbol de categorías fallaron.')
+        return 1
+    print('✅ Árbol de categorías verificado.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
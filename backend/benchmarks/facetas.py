@@ -0,0 +1,272 @@
+# benchmarks/facetas.py
+"""
+Benchmark y verificación del listado por facetas (facetas.py).
+
+Dentro de una transacción que se deshace al final, con un catálogo sintético:
+
+- Construye el índice de bitsets: tiempo y memoria (tracemalloc).
+- Para varias combinaciones de filtros compara productos (en orden) y
+  conteos del índice con los mismos conteos hechos en SQL (un GROUP BY por
+  faceta, lo que haría la vista sin índice), y mide p50 de ambos.
+- Cambia precios y valores de variantes, crea, desactiva y "antedata"
+  productos, y comprueba que tras sincronizar el índice sigue cuadrando.
+- Llama al endpoint GET /api/productos/facetas/ y cuenta sus consultas.
+
+Uso (desde backend/, con DATABASE_URL apuntando a una BD migrada):
+    python -m benchmarks.facetas
+    python -m benchmarks.facetas --productos 100000 --repeticiones 20
+"""
+import argparse
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import timedelta
+
+from benchmarks.catalogo_sintetico import Deshacer, crear_catalogo
+
+from django.conf import settings  # noqa: E402
+from django.db import connection, transaction  # noqa: E402
+from django.db.models import Case, Count, F, When  # noqa: E402
+from django.http import QueryDict  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from django.utils.http import urlencode  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+from apps.ecommerce.productos import facetas as modulo_facetas  # noqa: E402
+from apps.ecommerce.productos.agregados import actualizar_productos  # noqa: E402
+from apps.ecommerce.productos.busqueda import normalizar  # noqa: E402
+from apps.ecommerce.productos.facetas import IndiceFacetas, rangos_precio  # noqa: E402
+from apps.ecommerce.productos.fragmentos import fragmentos  # noqa: E402
+from apps.ecommerce.productos.models import Categoria, Producto, ProductoVariante  # noqa: E402
+from apps.ecommerce.productos.signals import nueva_version  # noqa: E402
+from apps.ecommerce.productos.views import ProductoFacetasView  # noqa: E402
+
+fabrica = APIRequestFactory()
+vista = ProductoFacetasView.as_view()
+
+
+def escenarios(catalogo):
+    raiz, sub = catalogo['raiz'], catalogo['categorias'][0]
+    return [
+        ('sin filtros', {}),
+        ('talla=M,L', {'talla': 'M,L'}),
+        ('talla+color+precio', {'talla': 'M', 'color': 'Rojo', 'precio': '25-50'}),
+        ('subcategoría+colores', {'categoria': sub.slug, 'color': 'Azul,Negro'}),
+        ('categoría raíz', {'categoria': raiz.slug, 'precio': ['0-25', '200-']}),
+    ]
+
+
+def _query_dict(parametros):
+    return QueryDict(urlencode(parametros, doseq=True))
+
+
+# --- Lo mismo en SQL (referencia y comparación de tiempos) ---
+
+def _precio_efectivo():
+    return Case(When(precio_oferta__gt=0, then=F('precio_oferta')), default=F('precio'))
+
+
+def _filtros_sql(indice, parametros):
+    """{faceta: Q sobre Producto} con la misma semántica que el índice."""
+    q = _query_dict(parametros)
+    filtros = {}
+    if q.get('categoria'):
+        categoria = Categoria.objects.filter(slug=q['categoria']).first()
+        filtros['categoria'] = {'categoria__ruta__startswith': categoria.ruta if categoria else '-'}
+    precios = set(indice._valores_pedidos(q, 'precio'))
+    if precios:
+        variantes = ProductoVariante.objects.none()
+        for clave, minimo, maximo in rangos_precio():
+            if clave in precios:
+                rango = ProductoVariante.objects.alias(efectivo=_precio_efectivo()).filter(activo=True,
+                                                                                           efectivo__gte=minimo)
+                if maximo is not None:
+                    rango = rango.filter(efectivo__lt=maximo)
+                variantes = variantes | rango
+        filtros['precio'] = {'id__in': variantes.values('producto_id')}
+    for atributo in indice._meta['atributos']:
+        pedidos = {normalizar(v) for v in indice._valores_pedidos(q, atributo['parametro'])}
+        if pedidos:
+            ids = [v['id'] for v in atributo['valores'] if normalizar(v['valor']) in pedidos]
+            filtros[atributo['id']] = {'id__in': ProductoVariante.objects.filter(
+                activo=True, valores__in=ids).values('producto_id')}
+    return filtros
+
+
+def _base_sql(filtros, excepto=None):
+    productos = Producto.objects.filter(activo=True)
+    for faceta, filtro in filtros.items():
+        if faceta != excepto:
+            productos = productos.filter(**filtro)
+    return productos
+
+
+def consultar_sql(indice, parametros):
+    """Ids en orden y conteos {('valor'|'precio'|'categoria', clave): n} con GROUP BY."""
+    filtros = _filtros_sql(indice, parametros)
+    ids = list(_base_sql(filtros).order_by('-creado_en', '-id').values_list('id', flat=True))
+    conteos = {}
+
+    base = _base_sql(filtros, 'categoria')
+    q = _query_dict(parametros)
+    padre = Categoria.objects.filter(slug=q['categoria']).first() if q.get('categoria') else None
+    for hija in Categoria.objects.filter(padre=padre):
+        n = base.filter(categoria__ruta__startswith=hija.ruta).count()
+        if n:
+            conteos[('categoria', hija.id)] = n
+
+    base = _base_sql(filtros, 'precio').values('id')
+    for indice_rango, (clave, minimo, maximo) in enumerate(rangos_precio()):
+        variantes = ProductoVariante.objects.alias(efectivo=_precio_efectivo()).filter(
+            activo=True, producto_id__in=base, efectivo__gte=minimo)
+        if maximo is not None:
+            variantes = variantes.filter(efectivo__lt=maximo)
+        n = variantes.aggregate(n=Count('producto_id', distinct=True))['n']
+        if n:
+            conteos[('precio', clave)] = n
+
+    Relacion = ProductoVariante.valores.through
+    for atributo in indice._meta['atributos']:
+        base = _base_sql(filtros, atributo['id']).values('id')
+        filas = (Relacion.objects
+                 .filter(productovariante__activo=True, productovariante__producto_id__in=base,
+                         valoratributo__atributo_id=atributo['id'])
+                 .values('valoratributo_id')
+                 .annotate(n=Count('productovariante__producto_id', distinct=True)))
+        for fila in filas:
+            conteos[('valor', fila['valoratributo_id'])] = fila['n']
+    return ids, conteos
+
+
+def consultar_indice(indice, parametros):
+    resultado, facetas = indice.consultar(_query_dict(parametros))
+    conteos = {('categoria', c['id']): c['cantidad'] for c in facetas['categorias']}
+    conteos.update({('precio', p['valor']): p['cantidad'] for p in facetas['precio'] if p['cantidad']})
+    conteos.update({('valor', v['id']): v['cantidad']
+                    for a in facetas['atributos'] for v in a['valores'] if v['cantidad']})
+    return resultado[:len(resultado)], conteos
+
+
+def _p50(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+
+def _sincronizado(indice):
+    # En la transacción del benchmark los on_commit no se ejecutan: se marca a mano
+    indice.marcar_pendiente()
+    return indice
+
+
+def comprobar_escenarios(indice, catalogo, comprobar, repeticiones=0, sufijo=''):
+    for etiqueta, parametros in escenarios(catalogo):
+        ids_indice, conteos_indice = consultar_indice(_sincronizado(indice), parametros)
+        ids_sql, conteos_sql = consultar_sql(indice, parametros)
+        detalle = f'{len(ids_sql)} productos, {len(conteos_sql)} conteos'
+        if repeticiones:
+            ms_indice = _p50(lambda: indice.consultar(_query_dict(parametros)), repeticiones)
+            ms_sql = _p50(lambda: consultar_sql(indice, parametros), max(1, repeticiones // 4))
+            detalle += f'; índice p50 {ms_indice:.2f} ms vs SQL p50 {ms_sql:.1f} ms'
+        comprobar(ids_indice == ids_sql and conteos_indice == conteos_sql, f'{etiqueta}{sufijo}: {detalle}')
+
+
+def comprobar_cambios(indice, catalogo, comprobar):
+    variante = ProductoVariante.objects.filter(producto_id=catalogo['productos'][0], activo=True).first()
+    variante.precio, variante.precio_oferta = 500, None
+    variante.save()
+    variante.valores.clear()
+    variante.valores.add(catalogo['tallas'][0], catalogo['colores'][0])
+    ProductoVariante.objects.filter(producto_id=catalogo['productos'][1]).first().delete()
+    comprobar_escenarios(indice, catalogo, comprobar, sufijo=' tras cambiar variantes')
+
+    categoria = catalogo['categorias'][1]
+    nuevo = Producto.objects.create(categoria=categoria, nombre='Falda nueva', slug='bench-facetas-nueva')
+    ProductoVariante.objects.create(producto=nuevo, precio=30).valores.add(catalogo['tallas'][2])
+    ids, _ = consultar_indice(_sincronizado(indice), {})
+    comprobar(ids[0] == nuevo.id, 'Un producto nuevo sale el primero')
+
+    nuevo.activo = False
+    nuevo.save()
+    ids, _ = consultar_indice(_sincronizado(indice), {})
+    comprobar(nuevo.id not in ids, 'Desactivar un producto lo saca del índice')
+
+    antiguo = Producto.objects.create(categoria=categoria, nombre='Falda antigua', slug='bench-facetas-antigua')
+    Producto.objects.filter(pk=antiguo.pk).update(creado_en=F('creado_en') - timedelta(days=3650))
+    nueva_version(Producto.objects.filter(pk=antiguo.pk))  # update() no dispara señales
+    comprobar_escenarios(indice, catalogo, comprobar, sufijo=' con un alta antedatada')
+
+
+def comprobar_endpoint(indice, comprobar):
+    modulo_facetas._indice = indice
+    try:
+        fragmentos.limpiar()
+        parametros = {'talla': 'M,L', 'color': 'Rojo', 'page_size': 12}
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = vista(fabrica.get('/', parametros))
+            respuesta.render()
+        ids, conteos = consultar_indice(indice, parametros)
+        comprobar(respuesta.status_code == 200 and respuesta.data['count'] == len(ids)
+                  and [p['id'] for p in respuesta.data['results']] == ids[:12]
+                  and 'facetas' in respuesta.data,
+                  f'Endpoint /facetas/: {len(respuesta.data["results"])} de {len(ids)} productos, '
+                  f'{len(consultas)} consultas')
+        pagina_2 = vista(fabrica.get('/', {**parametros, 'page': 2})).data['results']
+        comprobar([p['id'] for p in pagina_2] == ids[12:24], 'Endpoint /facetas/: la página 2 sigue el orden')
+    finally:
+        modulo_facetas._indice = None
+        fragmentos.limpiar()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--productos', type=int, default=5000)
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    fallos = []
+
+    def comprobar(ok, mensaje):
+        fallos.append(not ok)
+        print(f'  {"✓" if ok else "✗"} {mensaje}')
+
+    try:
+        with transaction.atomic():
+            catalogo = crear_catalogo(args.productos, variantes=4, almacenes=1, imagenes=0, prefijo='bench-facetas')
+            # Un tercio de los productos con oferta: el rango usa el precio de oferta
+            ProductoVariante.objects.filter(producto_id__in=catalogo['productos'][::3]).update(
+                precio_oferta=F('precio') / 2)
+            actualizar_productos(catalogo['productos'][::3], con_variantes=True)  # update() no dispara señales
+
+            indice = IndiceFacetas()
+            tracemalloc.start()
+            inicio = time.perf_counter()
+            total = indice.reconstruir()
+            segundos = time.perf_counter() - inicio
+            retenida, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            indice._pendiente, indice._ultima_sincronizacion = False, time.monotonic()
+            print(f'Índice de facetas: {total} productos, {indice.estadisticas()["bitsets"]} bitsets en '
+                  f'{segundos:.2f}s ({retenida / 2**20:.1f} MB retenidos, pico {pico / 2**20:.1f} MB); '
+                  f'rangos de precio {settings.FACETAS_RANGOS_PRECIO}')
+
+            comprobar_escenarios(indice, catalogo, comprobar, repeticiones=args.repeticiones)
+            comprobar_endpoint(indice, comprobar)
+            comprobar_cambios(indice, catalogo, comprobar)
+            raise Deshacer
+    except Deshacer:
+        pass
+
+    if any(fallos):
+        print(f'❌ {sum(fallos)} verificaciones de las facetas fallaron.')
+        return 1
+    print('✅ Facetas verificadas.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,161 @@
+# benchmarks/fragmentos_catalogo.py
+"""
+Verificación y benchmark de la caché de fragmentos del catálogo (fragmentos.py).
+
+Dentro de una transacción que se deshace al final:
+
+- Mide el listado público en frío (caché vacía) y en caliente: latencia
+  p50 y consultas por página.
+- Comprueba que la página cacheada es idéntica a la serialización directa.
+- Cambia precio, stock, imágenes, valores y categoría y comprueba que la
+  siguiente petición refleja el cambio (las señales suben Producto.version).
+- Comprueba que la LRU no pasa de max_entradas y expulsa la menos usada.
+
+Uso (desde backend/, con DATABASE_URL apuntando a una BD migrada):
+    python -m benchmarks.fragmentos_catalogo
+    python -m benchmarks.fragmentos_catalogo --productos 500 --variantes 20 --repeticiones 30
+"""
+import argparse
+import statistics
+import sys
+import time
+
+from benchmarks.catalogo_sintetico import Deshacer, crear_catalogo
+
+from django.db import connection, transaction  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+from apps.ecommerce.inventario.models import Stock  # noqa: E402
+from apps.ecommerce.productos.catalogo import productos_catalogo  # noqa: E402
+from apps.ecommerce.productos.fragmentos import CacheFragmentos, fragmentos  # noqa: E402
+from apps.ecommerce.productos.models import Categoria, ImagenProducto, Producto, ProductoVariante  # noqa: E402
+from apps.ecommerce.productos.serializers import ProductoSerializer  # noqa: E402
+from apps.ecommerce.productos.views import ProductoPublicDetailView, ProductoPublicListView  # noqa: E402
+
+fabrica = APIRequestFactory()
+lista = ProductoPublicListView.as_view()
+detalle = ProductoPublicDetailView.as_view()
+
+
+def _pagina(page_size=24):
+    with CaptureQueriesContext(connection) as consultas:
+        inicio = time.perf_counter()
+        respuesta = lista(fabrica.get('/', {'page_size': page_size}))
+        respuesta.render()
+        ms = (time.perf_counter() - inicio) * 1000
+    return respuesta.data['results'], len(consultas), ms
+
+
+def _detalle(slug):
+    return detalle(fabrica.get('/'), slug=slug).data
+
+
+def _directo(ids):
+    productos = productos_catalogo(Producto.objects.filter(id__in=ids), ProductoVariante.objects.filter(activo=True))
+    por_id = {p['id']: p for p in ProductoSerializer(productos, many=True).data}
+    return [por_id[i] for i in ids]
+
+
+def medir(args):
+    tiempos_frio, tiempos_caliente = [], []
+    for _ in range(args.repeticiones):
+        fragmentos.limpiar()
+        _, consultas_frio, ms = _pagina()
+        tiempos_frio.append(ms)
+        _, consultas_caliente, ms = _pagina()
+        tiempos_caliente.append(ms)
+    return (statistics.median(tiempos_frio), consultas_frio,
+            statistics.median(tiempos_caliente), consultas_caliente)
+
+
+def comprobar_invalidacion(catalogo, comprobar):
+    pagina, _, _ = _pagina()
+    comprobar(bool(pagina) and pagina == _directo([p['id'] for p in pagina]),
+              'La página cacheada es idéntica a la serialización directa')
+
+    producto = Producto.objects.get(pk=pagina[0]['id'])
+    variante = producto.variantes.first()
+
+    variante.precio = 999
+    variante.save()
+    precio = next(v for v in _detalle(producto.slug)['variantes'] if v['id'] == variante.id)['precio']
+    comprobar(precio == '999.00',
+              'Cambiar el precio de una variante invalida su producto')
+
+    stock = Stock.objects.filter(variante=variante).first()
+    stock.cantidad = 777
+    stock.save()
+    total = next(v for v in _detalle(producto.slug)['variantes'] if v['id'] == variante.id)['stock_total']
+    comprobar(total >= 777, 'Cambiar el stock invalida el producto')
+
+    ImagenProducto.objects.create(producto=producto, imagen='bench/nueva', alt_text='nueva')
+    comprobar(any(i['alt_text'] == 'nueva' for i in _detalle(producto.slug)['imagenes_galeria']),
+              'Añadir una imagen invalida el producto')
+
+    variante.valores.clear()
+    comprobar(next(v for v in _detalle(producto.slug)['variantes'] if v['id'] == variante.id)['valores'] == [],
+              'Cambiar los valores de una variante (M2M) invalida el producto')
+
+    categoria = Categoria.objects.get(pk=catalogo['raiz'].pk)
+    categoria.nombre = 'bench raiz renombrada'
+    categoria.save()
+    comprobar(_detalle(producto.slug)['categoria']['nombre_completo'].startswith('bench raiz renombrada'),
+              'Renombrar la categoría padre invalida sus productos')
+
+    producto.activo = False
+    producto.save()
+    comprobar(producto.id not in [p['id'] for p in _pagina()[0]], 'Desactivar un producto lo saca del listado')
+
+
+def comprobar_lru(comprobar):
+    lru = CacheFragmentos(max_entradas=3)
+    for i in range(3):
+        lru.guardar(i, 1, {'id': i})
+    lru.obtener(0, 1)  # 0 pasa a ser el más reciente
+    lru.guardar(3, 1, {'id': 3})
+    estado = lru.estadisticas()
+    comprobar(estado['entradas'] == 3 and lru.obtener(1, 1) is None and lru.obtener(0, 1) is not None,
+              'La LRU respeta max_entradas y expulsa la menos usada')
+    comprobar(lru.obtener(0, 2) is None, 'Una versión distinta no devuelve el fragmento viejo')
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--productos', type=int, default=200)
+    parser.add_argument('--variantes', type=int, default=12)
+    parser.add_argument('--repeticiones', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    fallos = []
+
+    def comprobar(ok, mensaje):
+        fallos.append(not ok)
+        print(f'  {"✓" if ok else "✗"} {mensaje}')
+
+    try:
+        with transaction.atomic():
+            catalogo = crear_catalogo(args.productos, variantes=args.variantes, prefijo='bench-frag')
+            ms_frio, q_frio, ms_caliente, q_caliente = medir(args)
+            print(f'Página de 24 productos x {args.variantes} variantes:')
+            print(f'  en frío     p50 {ms_frio:8.2f} ms  {q_frio} consultas')
+            print(f'  en caliente p50 {ms_caliente:8.2f} ms  {q_caliente} consultas '
+                  f'(x{ms_frio / ms_caliente:.1f})')
+            comprobar(q_caliente < q_frio and ms_caliente < ms_frio, 'La página en caliente no re-serializa')
+            comprobar_invalidacion(catalogo, comprobar)
+            raise Deshacer
+    except Deshacer:
+        pass
+    finally:
+        fragmentos.limpiar()
+    comprobar_lru(comprobar)
+
+    if any(fallos):
+        print(f'❌ {sum(fallos)} verificaciones de la caché de fragmentos fallaron.')
+        return 1
+    print('✅ Caché de fragmentos verificada.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
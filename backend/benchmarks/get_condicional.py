@@ -0,0 +1,190 @@
+# benchmarks/get_condicional.py
+"""
+Benchmark y verificación del GET condicional del catálogo (condicional.py).
+
+Dentro de una transacción que se deshace al final, con un catálogo sintético:
+
+- Compara el detalle público y el árbol de categorías completos (con la
+  caché en frío y en caliente) con su 304 (If-None-Match): latencia p50,
+  consultas y bytes.
+- Comprueba que el ETag cambia al cambiar precio, stock, imágenes o la
+  categoría del producto, y con ?fields=; que If-Modified-Since responde 304
+  mientras no haya cambios y 200 después; y que el admin no recibe ETag.
+- Comprueba que renombrar una categoría cambia el ETag del menú.
+
+Uso (desde backend/, con DATABASE_URL apuntando a una BD migrada):
+    python -m benchmarks.get_condicional
+    python -m benchmarks.get_condicional --variantes 30 --repeticiones 50
+"""
+import argparse
+import statistics
+import sys
+import time
+from datetime import timedelta
+
+from benchmarks.catalogo_sintetico import Deshacer, crear_admin, crear_catalogo
+
+from django.db import connection, transaction  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from rest_framework.test import APIRequestFactory, force_authenticate  # noqa: E402
+
+from apps.ecommerce.inventario.models import Stock  # noqa: E402
+from apps.ecommerce.productos.arbol import invalidar_arbol  # noqa: E402
+from apps.ecommerce.productos.fragmentos import fragmentos  # noqa: E402
+from apps.ecommerce.productos.models import Categoria, ImagenProducto, Producto  # noqa: E402
+from apps.ecommerce.productos.views import CategoriaPublicListView, ProductoPublicDetailView  # noqa: E402
+
+fabrica = APIRequestFactory()
+detalle = ProductoPublicDetailView.as_view()
+categorias = CategoriaPublicListView.as_view()
+
+
+def _pedir(vista, parametros=None, cabeceras=None, admin=None, **kwargs):
+    peticion = fabrica.get('/', parametros or {}, **(cabeceras or {}))
+    if admin:
+        force_authenticate(peticion, user=admin)
+    respuesta = vista(peticion, **kwargs)
+    if hasattr(respuesta, 'render'):
+        respuesta.render()
+    return respuesta
+
+
+def _medir(repeticiones, *args, frio=False, **kwargs):
+    tiempos = []
+    for _ in range(repeticiones):
+        if frio:
+            fragmentos.limpiar()
+            invalidar_arbol()
+        with CaptureQueriesContext(connection) as consultas:
+            inicio = time.perf_counter()
+            respuesta = _pedir(*args, **kwargs)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos), len(consultas), len(respuesta.content), respuesta
+
+
+def medir(slug, repeticiones, comprobar):
+    print('Respuesta completa frente a 304:')
+    for etiqueta, vista, kwargs in (('detalle', detalle, {'slug': slug}), ('categorías', categorias, {})):
+        etag = _pedir(vista, **kwargs)['ETag']
+        ms_frio, consultas_frio, _, _ = _medir(repeticiones, vista, frio=True, **kwargs)
+        ms, consultas, octetos, _ = _medir(repeticiones, vista, **kwargs)
+        ms_304, consultas_304, octetos_304, respuesta = _medir(
+            repeticiones, vista, cabeceras={'HTTP_IF_NONE_MATCH': etag}, **kwargs
+        )
+        print(f'  {etiqueta:<11} 200 en frío     p50 {ms_frio:7.2f} ms  {consultas_frio} consultas')
+        print(f'  {etiqueta:<11} 200 en caliente p50 {ms:7.2f} ms  {consultas} consultas  {octetos / 1024:.1f} KiB')
+        print(f'  {etiqueta:<11} 304             p50 {ms_304:7.2f} ms  {consultas_304} consultas  {octetos_304} bytes')
+        comprobar(respuesta.status_code == 304 and respuesta['ETag'] == etag and octetos_304 == 0,
+                  f'{etiqueta}: If-None-Match con el ETag vigente da 304 sin cuerpo')
+        comprobar(consultas_304 <= consultas and ms_304 < ms,
+                  f'{etiqueta}: el 304 no hace más consultas ({consultas_304}) y es más rápido')
+
+
+def comprobar_detalle(catalogo, admin, comprobar):
+    producto = Producto.objects.get(pk=catalogo['productos'][0])
+    variante = producto.variantes.first()
+
+    def etag():
+        return _pedir(detalle, slug=producto.slug)['ETag']
+
+    cambios = [
+        ('el precio de una variante', lambda: _guardar_precio(variante)),
+        ('el stock', lambda: _guardar_stock(variante)),
+        ('una imagen', lambda: ImagenProducto.objects.create(producto=producto, imagen='bench/condicional')),
+        ('la categoría', lambda: _renombrar(producto.categoria_id)),
+    ]
+    for descripcion, cambiar in cambios:
+        antes = etag()
+        cambiar()
+        respuesta = _pedir(detalle, cabeceras={'HTTP_IF_NONE_MATCH': antes}, slug=producto.slug)
+        comprobar(respuesta.status_code == 200 and respuesta['ETag'] != antes,
+                  f'Cambiar {descripcion} cambia el ETag del detalle')
+
+    comprobar(_pedir(detalle, {'fields': 'id,nombre'}, slug=producto.slug)['ETag'] != etag(),
+              '?fields= cambia el ETag (es otra representación)')
+
+    # If-Modified-Since: se atrasa actualizado_en para que el cambio caiga en otro segundo
+    Producto.objects.filter(pk=producto.pk).update(actualizado_en=timezone.now() - timedelta(hours=1))
+    modificado = _pedir(detalle, slug=producto.slug)['Last-Modified']
+    sin_cambios = _pedir(detalle, cabeceras={'HTTP_IF_MODIFIED_SINCE': modificado}, slug=producto.slug)
+    comprobar(sin_cambios.status_code == 304, 'If-Modified-Since sin cambios da 304')
+    _guardar_stock(variante)
+    cambiado = _pedir(detalle, cabeceras={'HTTP_IF_MODIFIED_SINCE': modificado}, slug=producto.slug)
+    comprobar(cambiado.status_code == 200 and cambiado['Last-Modified'] != modificado,
+              'Tras cambiar el stock If-Modified-Since da 200 con un Last-Modified nuevo')
+
+    respuesta = _pedir(detalle, cabeceras={'HTTP_IF_NONE_MATCH': etag()}, admin=admin, slug=producto.slug)
+    comprobar(respuesta.status_code == 200 and not respuesta.has_header('ETag'),
+              'El admin recibe siempre el detalle completo, sin ETag')
+
+
+def _guardar_precio(variante):
+    variante.precio += 1
+    variante.save()
+
+
+def _guardar_stock(variante):
+    stock = Stock.objects.filter(variante=variante).first()
+    stock.cantidad += 1
+    stock.save()
+
+
+def _renombrar(categoria_id):
+    categoria = Categoria.objects.get(pk=categoria_id)
+    categoria.nombre += ' *'
+    categoria.save()
+
+
+def comprobar_categorias(catalogo, comprobar):
+    invalidar_arbol()
+    primera = _pedir(categorias)
+    with CaptureQueriesContext(connection) as consultas:
+        respuesta = _pedir(categorias, cabeceras={'HTTP_IF_NONE_MATCH': primera['ETag']})
+    comprobar(respuesta.status_code == 304 and len(consultas) == 1,
+              f'Menú con la caché caliente: 304 con {len(consultas)} consulta(s) (el sello)')
+    invalidar_arbol()
+    comprobar(_pedir(categorias, cabeceras={'HTTP_IF_NONE_MATCH': primera['ETag']}).status_code == 304,
+              'Reconstruir el árbol sin cambios mantiene el ETag')
+    _renombrar(catalogo['categorias'][0].pk)
+    respuesta = _pedir(categorias, cabeceras={'HTTP_IF_NONE_MATCH': primera['ETag']})
+    comprobar(respuesta.status_code == 200 and respuesta['ETag'] != primera['ETag'],
+              'Renombrar una categoría cambia el ETag del menú')
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--variantes', type=int, default=12)
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    fallos = []
+
+    def comprobar(ok, mensaje):
+        fallos.append(not ok)
+        print(f'  {"✓" if ok else "✗"} {mensaje}')
+
+    try:
+        with transaction.atomic():
+            admin = crear_admin(prefijo='bench-etag')
+            catalogo = crear_catalogo(20, variantes=args.variantes, imagenes=3, prefijo='bench-etag')
+            slug = Producto.objects.get(pk=catalogo['productos'][1]).slug
+            medir(slug, args.repeticiones, comprobar)
+            comprobar_detalle(catalogo, admin, comprobar)
+            comprobar_categorias(catalogo, comprobar)
+            raise Deshacer
+    except Deshacer:
+        pass
+    finally:
+        fragmentos.limpiar()
+        invalidar_arbol()
+
+    if any(fallos):
+        print(f'❌ {sum(fallos)} verificaciones del GET condicional fallaron.')
+        return 1
+    print('✅ GET condicional verificado.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,309 @@
+# benchmarks/importacion_catalogo.py
+"""
+Benchmark y verificación de la importación / exportación masiva del
+catálogo (importacion.py y las vistas admin/importar/ y admin/exportar/).
+
+Dentro de una transacción que se deshace al final:
+
+- Importa por la API CSVs de 1.000 y 10.000 variantes (por defecto) y mide
+  variantes/s y consultas por lote, frente a crear lo mismo fila a fila con
+  los serializadores del admin (ProductoSerializer + ProductoVarianteSerializer).
+- Comprueba lo escrito: productos, atributos, variantes (SKUs dados y
+  generados), valores (los nuevos se crean), stock por almacén, versión nueva
+  de los productos ampliados y que salen en el catálogo público.
+- Comprueba que un archivo con errores no escribe nada y lista fila/columna,
+  el progreso (callback y endpoint) y el ida y vuelta exportar -> importar
+  en CSV y en XLSX.
+
+Uso (desde backend/, con DATABASE_URL apuntando a una BD migrada):
+    python -m benchmarks.importacion_catalogo
+    python -m benchmarks.importacion_catalogo --variantes 1000 5000 20000
+"""
+import argparse
+import csv
+import io
+import sys
+import time
+
+from benchmarks.catalogo_sintetico import Deshacer, crear_admin, crear_catalogo
+
+from django.core.files.uploadedfile import SimpleUploadedFile  # noqa: E402
+from django.db import connection, transaction  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from rest_framework.test import APIRequestFactory, force_authenticate  # noqa: E402
+
+from apps.ecommerce.inventario.models import Stock  # noqa: E402
+from apps.ecommerce.productos import importacion  # noqa: E402
+from apps.ecommerce.productos.models import Producto, ProductoVariante, ValorAtributo  # noqa: E402
+from apps.ecommerce.productos.serializers import ProductoSerializer, ProductoVarianteSerializer  # noqa: E402
+from apps.ecommerce.productos.views import (  # noqa: E402
+    AdminImportacionEstadoView, AdminProductoExportarView, AdminProductoImportarView, ProductoPublicDetailView,
+)
+
+fabrica = APIRequestFactory()
+importar_vista = AdminProductoImportarView.as_view()
+estado_vista = AdminImportacionEstadoView.as_view()
+exportar_vista = AdminProductoExportarView.as_view()
+detalle_publico = ProductoPublicDetailView.as_view()
+TALLAS = ['S', 'M', 'L', 'XL']
+COLORES = ['Negro', 'Blanco', 'Rojo', 'Azul', 'Verde']
+POR_PRODUCTO = 10
+
+
+def _csv(filas):
+    salida = io.StringIO()
+    csv.writer(salida).writerows(filas)
+    return salida.getvalue().encode('utf-8')
+
+
+def generar_filas(catalogo, variantes, prefijo):
+    """Cabecera + `variantes` filas, POR_PRODUCTO variantes por producto; la mitad sin SKU."""
+    almacen = catalogo['almacenes'][0].nombre
+    filas = [['producto', 'categoria', 'descripcion', 'sku', 'precio', 'precio_oferta',
+              'Talla', 'Color', 'stock', f'stock:{almacen}']]
+    for n in range(variantes):
+        producto, i = divmod(n, POR_PRODUCTO)
+        filas.append([
+            f'{prefijo} producto {producto}', catalogo['categorias'][producto % 4].slug, 'Importado',
+            f'{prefijo}-{producto}-{i}'.upper() if i % 2 else '', f'{10 + i}.90', '9.50' if i == 0 else '',
+            TALLAS[i % len(TALLAS)], COLORES[i // len(TALLAS)], str(i), '3',
+        ])
+    return filas
+
+
+def _subir(admin, contenido, nombre='catalogo.csv', **parametros):
+    query = '&'.join(f'{k}={v}' for k, v in parametros.items())
+    peticion = fabrica.post(f'/?{query}', {'archivo': SimpleUploadedFile(nombre, contenido)}, format='multipart')
+    force_authenticate(peticion, user=admin)
+    respuesta = importar_vista(peticion)
+    respuesta.render()
+    return respuesta
+
+
+def _get(vista, admin=None, parametros=None, **kwargs):
+    peticion = fabrica.get('/', parametros or {})
+    if admin:
+        force_authenticate(peticion, user=admin)
+    respuesta = vista(peticion, **kwargs)
+    if hasattr(respuesta, 'render'):
+        respuesta.render()
+    return respuesta
+
+
+def medir(catalogo, admin, tamanos, comprobar):
+    print('Importación por la API (CSV, lotes de 200 productos):')
+    for variantes in tamanos:
+        prefijo = f'bench-imp-{variantes}'
+        contenido = _csv(generar_filas(catalogo, variantes, prefijo))
+        with CaptureQueriesContext(connection) as consultas:
+            inicio = time.perf_counter()
+            respuesta = _subir(admin, contenido)
+            segundos = time.perf_counter() - inicio
+        datos = respuesta.data
+        print(f'  {variantes:>6} variantes  {segundos:6.2f} s  {variantes / segundos:8.0f} variantes/s  '
+              f'{len(consultas)} consultas ({datos.get("lotes")} lotes, '
+              f'{len(consultas) * 1000 / variantes:.0f} por cada 1.000 variantes)')
+        comprobar(respuesta.status_code == 201 and datos['variantes'] == variantes
+                  and datos['productos_creados'] == variantes // POR_PRODUCTO,
+                  f'{variantes} variantes importadas en {variantes // POR_PRODUCTO} productos')
+    consultas_masiva = len(consultas) / variantes
+
+    # Fila a fila con los serializadores del admin, sobre una muestra
+    muestra = 200
+    filas = generar_filas(catalogo, muestra, 'bench-imp-serializador')[1:]
+    with CaptureQueriesContext(connection) as consultas:
+        inicio = time.perf_counter()
+        _fila_a_fila(catalogo, filas, muestra)
+        segundos_fila = time.perf_counter() - inicio
+    por_fila = muestra / segundos_fila
+    consultas_fila = len(consultas) / muestra
+    print(f'  fila a fila con serializadores: {por_fila:8.0f} variantes/s  '
+          f'{consultas_fila * 1000:.0f} consultas por cada 1.000 variantes (muestra de {muestra})')
+    comprobar(variantes / segundos > por_fila * 3,
+              f'La importación masiva es x{variantes / segundos / por_fila:.0f} más rápida que fila a fila')
+    comprobar(consultas_masiva * 20 < consultas_fila,
+              f'Y hace x{consultas_fila / consultas_masiva:.0f} menos consultas: por lotes, no por fila')
+
+
+def _fila_a_fila(catalogo, filas, muestra):
+    valores = {(v.atributo.nombre, v.valor): (v.pk, v.atributo_id) for v in ValorAtributo.objects.select_related('atributo')}
+    for n in range(0, muestra, POR_PRODUCTO):
+        producto = ProductoSerializer(data={
+            'nombre': filas[n][0], 'categoria_id': catalogo['categorias'][0].pk, 'descripcion': 'Importado',
+            'atributos_ids': [valores[('Talla', 'S')][1], valores[('Color', 'Negro')][1]],
+        })
+        producto.is_valid(raise_exception=True)
+        producto = producto.save()
+        for fila in filas[n:n + POR_PRODUCTO]:
+            variante = ProductoVarianteSerializer(data={
+                'producto': producto.pk, 'precio': fila[4], 'stock_inicial': int(fila[8]),
+                'valores_ids': [valores[('Talla', fila[6])][0], valores[('Color', fila[7])][0]],
+            })
+            variante.is_valid(raise_exception=True)
+            variante.save()
+
+
+def comprobar_contenido(catalogo, admin, comprobar):
+    almacen = catalogo['almacenes'][0]
+    existente = Producto.objects.get(pk=catalogo['productos'][0])
+    version = existente.version
+    filas = [
+        ['producto', 'slug', 'categoria', 'sku', 'precio', 'precio_oferta', 'variante_activa', 'Talla', 'Color',
+         'stock', f'stock:{almacen.nombre}'],
+        ['Abrigo importado', '', catalogo['categorias'][1].slug, 'BENCH-IMP-A1', '120', '99.90', 'si', 'M', 'Ocre', '5', ''],
+        ['Abrigo importado', '', '', '', '120', '', 'no', 'L', 'Ocre', '', '7'],
+        ['', existente.slug, '', 'BENCH-IMP-E1', '15,5', '', '', 'XXL', 'Fucsia', '', '2'],
+        ['Solo producto', 'bench-imp-solo', str(catalogo['categorias'][2].pk), '', '', '', '', '', '', '', ''],
+    ]
+    respuesta = _subir(admin, _csv(filas))
+    comprobar(respuesta.status_code == 201 and respuesta.data['productos_creados'] == 2
+              and respuesta.data['productos_ampliados'] == 1 and respuesta.data['valores_creados'] == 2,
+              '2 productos nuevos, 1 ampliado y los valores Ocre/Fucsia creados')
+
+    abrigo = Producto.objects.get(nombre='Abrigo importado')
+    a1, a2 = abrigo.variantes.order_by('id')
+    comprobar(a1.sku == 'BENCH-IMP-A1' and a2.sku.startswith(abrigo.slug.upper() + '-') and not a2.activo
+              and str(a1.precio_oferta) == '99.90' and abrigo.categoria_id == catalogo['categorias'][1].pk,
+              'SKU dado y generado (como ProductoVariante.save), precio de oferta, variante inactiva y categoría')
+    comprobar(set(abrigo.atributos.values_list('nombre', flat=True)) == {'Talla', 'Color'}
+              and sorted(a1.valores.values_list('valor', flat=True)) == ['M', 'Ocre'],
+              'Atributos del producto y valores de cada variante')
+    comprobar(dict(Stock.objects.filter(variante__producto=abrigo).values_list('almacen__nombre', 'cantidad'))
+              == {'Principal': 5, almacen.nombre: 7}, "'stock' va al almacén Principal y stock:<nombre> a ese almacén")
+    existente.refresh_from_db()
+    nueva = ProductoVariante.objects.get(sku='BENCH-IMP-E1')
+    comprobar(nueva.producto_id == existente.pk and str(nueva.precio) == '15.50' and existente.version > version,
+              'El slug existente añade la variante (precio con coma) y sube la versión del producto')
+    solo = Producto.objects.get(slug='bench-imp-solo')
+    comprobar(not solo.variantes.exists(), 'Una fila sin datos de variante crea solo el producto')
+    publico = _get(detalle_publico, slug=abrigo.slug)
+    comprobar(publico.status_code == 200 and len(publico.data['variantes']) == 1,
+              'El producto importado sale en la tienda (solo con su variante activa)')
+
+
+def comprobar_errores(catalogo, admin, comprobar):
+    antes = (Producto.objects.count(), ProductoVariante.objects.count(), ValorAtributo.objects.count())
+    filas = [
+        ['producto', 'categoria', 'sku', 'precio', 'stock', 'Talla'],
+        ['Bueno', catalogo['categorias'][0].slug, '', '10', '1', 'Nueva talla'],
+        ['Malo', 'no-existe', '', 'diez', '-1', 'M'],
+        ['Repetido', catalogo['categorias'][0].slug, 'BENCH-IMP-A1', '10', '', 'S'],
+        ['Repetido', catalogo['categorias'][0].slug, 'X-1', '10', '', 'S'],
+        ['Sin precio', catalogo['categorias'][0].slug, 'X-1', '', '', 'M'],
+    ]
+    respuesta = _subir(admin, _csv(filas))
+    errores = {(e['fila'], e['columna']) for e in respuesta.data.get('errores', [])}
+    esperados = {(3, 'categoria'), (3, 'precio'), (3, 'stock'), (5, None), (6, 'precio'), (6, 'sku'), (4, 'sku')}
+    comprobar(respuesta.status_code == 400 and esperados <= errores,
+              f'Archivo con errores: 400 con fila y columna de cada uno ({len(errores)} errores)')
+    despues = (Producto.objects.count(), ProductoVariante.objects.count(), ValorAtributo.objects.count())
+    comprobar(antes == despues, 'Con errores no se escribe nada (ni la fila buena ni valores nuevos)')
+
+    respuesta = _subir(admin, _csv([['producto', 'categoria', 'precio', 'Tela', 'stock:No existe']]))
+    comprobar(respuesta.status_code == 400 and {e['columna'] for e in respuesta.data['errores']} == {'Tela', 'stock:No existe'},
+              'Atributo o almacén desconocido en la cabecera: error antes de leer las filas')
+    respuesta = _subir(admin, b'a,b', nombre='catalogo.txt')
+    comprobar(respuesta.status_code == 400, 'Extensión no soportada: 400')
+
+    filas = generar_filas(catalogo, 40, 'bench-imp-validar')
+    respuesta = _subir(admin, _csv(filas), validar=1)
+    comprobar(respuesta.status_code == 200 and respuesta.data['variantes'] == 40
+              and not Producto.objects.filter(nombre__startswith='bench-imp-validar').exists(),
+              '?validar=1 valida sin escribir')
+
+
+def comprobar_progreso(catalogo, admin, comprobar):
+    llamadas = []
+    cabecera, filas = importacion.leer_archivo(io.BytesIO(_csv(generar_filas(catalogo, 500, 'bench-imp-prog'))), 'csv')
+    importacion.importar(importacion.validar(cabecera, filas), lote=7, progreso=lambda *a: llamadas.append(a))
+    comprobar(llamadas[-1] == (50, 50) and len(llamadas) == 8 and [h for h, _ in llamadas] == sorted(h for h, _ in llamadas),
+              f'progreso(hechos, total) tras cada lote: {llamadas[:2]}...{llamadas[-1]}')
+
+    _subir(admin, _csv(generar_filas(catalogo, 30, 'bench-imp-prog-api')), importacion='bench-prog')
+    estado = _get(estado_vista, admin, importacion='bench-prog').data
+    comprobar(estado['estado'] == 'terminada' and estado['hechos'] == estado['total'] == 3
+              and estado['resumen']['variantes'] == 30, 'El endpoint de progreso devuelve la importación terminada')
+    comprobar(_get(estado_vista, admin, importacion='no-existe').status_code == 404, 'Importación desconocida: 404')
+
+
+def comprobar_ida_y_vuelta(catalogo, admin, comprobar):
+    ids = catalogo['productos'][:20]
+    categoria = catalogo['categorias'][0]
+    filtro = {'formato': 'csv', 'categoria': categoria.slug}
+    inicio = time.perf_counter()
+    respuesta = _get(exportar_vista, admin, filtro)
+    contenido = b''.join(respuesta.streaming_content)
+    segundos = time.perf_counter() - inicio
+    filas = list(csv.reader(io.StringIO(contenido.decode('utf-8-sig'))))
+    esperadas = ProductoVariante.objects.filter(producto__categoria__ruta__startswith=categoria.ruta).count()
+    print(f'Exportación CSV en streaming: {len(filas) - 1} filas en {segundos * 1000:.0f} ms '
+          f'({(len(filas) - 1) / segundos:.0f} filas/s)')
+    comprobar(respuesta.streaming and contenido.startswith('﻿'.encode()) and len(filas) - 1 >= esperadas,
+              'CSV en streaming con BOM, una fila por variante de la categoría')
+
+    # Se reimporta con slugs y SKUs nuevos: mismo contenido, productos distintos
+    sku, slug = filas[0].index('sku'), filas[0].index('slug')
+    originales = {f[slug] for f in filas[1:]} & set(Producto.objects.filter(id__in=ids).values_list('slug', flat=True))
+    copia = [filas[0]] + [f[:slug] + [f'copia-{f[slug]}'] + f[slug + 1:sku] + [f'COPIA-{f[sku]}'] + f[sku + 1:]
+                          for f in filas[1:] if f[slug] in originales]
+    respuesta = _subir(admin, _csv(copia))
+    comprobar(respuesta.status_code == 201, f'El CSV exportado se puede volver a importar ({len(copia) - 1} filas)')
+    nuevas = list(csv.reader(io.StringIO(
+        b''.join(_get(exportar_vista, admin, filtro).streaming_content).decode('utf-8-sig'))))
+    reimportadas = sorted(f for f in nuevas[1:] if f[slug].startswith('copia-'))
+    comprobar(reimportadas == sorted(copia[1:]), 'Exportar -> importar -> exportar da las mismas filas')
+
+    try:
+        import openpyxl
+    except ImportError:
+        print('  - openpyxl no está instalado: se omite el XLSX')
+        return
+    respuesta = _get(exportar_vista, admin, {'formato': 'xlsx', 'categoria': categoria.slug})
+    contenido = b''.join(respuesta.streaming_content)
+    hoja = openpyxl.load_workbook(io.BytesIO(contenido), read_only=True).active
+    filas_xlsx = [[c or '' for c in fila] for fila in hoja.iter_rows(values_only=True)]
+    comprobar(filas_xlsx == nuevas, 'El XLSX exportado tiene las mismas filas que el CSV')
+    libro = openpyxl.Workbook()
+    libro.active.append(['producto', 'categoria', 'precio', 'Talla', 'stock'])
+    libro.active.append(['Desde Excel', categoria.slug, 19.9, 'M', 4])
+    salida = io.BytesIO()
+    libro.save(salida)
+    respuesta = _subir(admin, salida.getvalue(), nombre='catalogo.xlsx')
+    variante = ProductoVariante.objects.filter(producto__nombre='Desde Excel').first()
+    comprobar(respuesta.status_code == 201 and variante and str(variante.precio) == '19.90'
+              and variante.stock_total == 4, 'XLSX con celdas numéricas se importa igual que el CSV')
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--variantes', type=int, nargs='+', default=[1000, 10000])
+    args = parser.parse_args(argv)
+
+    fallos = []
+
+    def comprobar(ok, mensaje):
+        fallos.append(not ok)
+        print(f'  {"✓" if ok else "✗"} {mensaje}')
+
+    try:
+        with transaction.atomic():
+            admin = crear_admin(prefijo='bench-imp')
+            catalogo = crear_catalogo(40, variantes=4, prefijo='bench-imp')
+            medir(catalogo, admin, args.variantes, comprobar)
+            comprobar_contenido(catalogo, admin, comprobar)
+            comprobar_errores(catalogo, admin, comprobar)
+            comprobar_progreso(catalogo, admin, comprobar)
+            comprobar_ida_y_vuelta(catalogo, admin, comprobar)
+            raise Deshacer
+    except Deshacer:
+        pass
+
+    if any(fallos):
+        print(f'❌ {sum(fallos)} verificaciones de la importación fallaron.')
+        return 1
+    print('✅ Importación y exportación masiva verificadas.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,214 @@
+# benchmarks/lista_compacta.py
+"""
+Benchmark y verificación de la lista compacta del catálogo (?vista=resumen)
+y de ?fields= / ?expand= (campos.py).
+
+Dentro de una transacción que se deshace al final, con un catálogo sintético:
+
+- Compara, para una página, el listado completo (en frío y en caliente),
+  ?vista=resumen, ?fields= sobre el completo y el resumen con
+  ?expand=variantes: latencia p50, consultas y bytes de la respuesta.
+- Comprueba que precio_min / precio_max, disponible e imagen_principal del
+  resumen coinciden con lo que se deduce del payload completo.
+- Comprueba que el resumen hace las mismas consultas con cualquier tamaño
+  de página, que ?fields= también recorta el admin, que la caché de
+  fragmentos sigue guardando el producto completo y que al escribir se
+  ignora ?fields=.
+
+Uso (desde backend/, con DATABASE_URL apuntando a una BD migrada):
+    python -m benchmarks.lista_compacta
+    python -m benchmarks.lista_compacta --productos 500 --variantes 20 --repeticiones 30
+"""
+import argparse
+import statistics
+import sys
+import time
+from decimal import Decimal
+
+from benchmarks.catalogo_sintetico import Deshacer, crear_admin, crear_catalogo
+
+from django.db import connection, transaction  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from rest_framework.test import APIRequestFactory, force_authenticate  # noqa: E402
+
+from apps.ecommerce.productos.agregados import actualizar_productos  # noqa: E402
+from apps.ecommerce.productos.fragmentos import fragmentos  # noqa: E402
+from apps.ecommerce.productos.models import Producto, ProductoVariante  # noqa: E402
+from apps.ecommerce.productos.views import (  # noqa: E402
+    AdminProductoViewSet, AdminProductoVarianteViewSet, ProductoPublicDetailView, ProductoPublicListView,
+)
+
+fabrica = APIRequestFactory()
+lista = ProductoPublicListView.as_view()
+detalle = ProductoPublicDetailView.as_view()
+admin_lista = AdminProductoViewSet.as_view({'get': 'list'})
+admin_variante = AdminProductoVarianteViewSet.as_view({'patch': 'partial_update'})
+TAMANO = 24
+
+
+def _pedir(parametros, vista=lista, **kwargs):
+    respuesta = vista(fabrica.get('/', parametros), **kwargs)
+    respuesta.render()
+    return respuesta
+
+
+def _medir(parametros, repeticiones, frio=False):
+    tiempos = []
+    for _ in range(repeticiones):
+        if frio:
+            fragmentos.limpiar()
+        with CaptureQueriesContext(connection) as consultas:
+            inicio = time.perf_counter()
+            respuesta = _pedir(parametros)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos), len(consultas), len(respuesta.content)
+
+
+def medir(args, comprobar):
+    casos = [
+        ('completo en frío', {'page_size': TAMANO}, True),
+        ('completo en caliente', {'page_size': TAMANO}, False),
+        ('?vista=resumen', {'page_size': TAMANO, 'vista': 'resumen'}, False),
+        ('?fields=id,nombre,slug', {'page_size': TAMANO, 'fields': 'id,nombre,slug'}, False),
+        ('resumen + variantes', {'page_size': TAMANO, 'vista': 'resumen', 'expand': 'variantes'}, False),
+    ]
+    print(f'Página de {TAMANO} productos x {args.variantes} variantes:')
+    resultados = {}
+    for etiqueta, parametros, frio in casos:
+        _pedir(parametros)
+        ms, consultas, octetos = _medir(parametros, args.repeticiones, frio)
+        resultados[etiqueta] = (ms, consultas, octetos)
+        print(f'  {etiqueta:<24} p50 {ms:8.2f} ms  {consultas:2} consultas  {octetos / 1024:8.1f} KiB')
+
+    _, q_frio, kib_completo = resultados['completo en frío']
+    _, q_resumen, kib_resumen = resultados['?vista=resumen']
+    comprobar(q_resumen < q_frio and kib_resumen * 5 < kib_completo,
+              f'El resumen hace menos consultas que el completo en frío ({q_resumen} < {q_frio}) '
+              f'y pesa x{kib_completo / kib_resumen:.0f} menos')
+    comprobar(resultados['?fields=id,nombre,slug'][2] < kib_resumen,
+              '?fields= recorta los bytes del listado completo')
+
+    consultas_por_tamano = {_medir({'page_size': n, 'vista': 'resumen'}, 1)[1] for n in (6, 24, 100)}
+    comprobar(len(consultas_por_tamano) == 1,
+              f'El resumen hace las mismas consultas con 6, 24 y 100 por página ({consultas_por_tamano})')
+
+
+def _rango(variantes):
+    precios = [Decimal(v['precio_oferta'] or v['precio']) for v in variantes if v['activo']]
+    return (min(precios), max(precios)) if precios else (None, None)
+
+
+def comprobar_resumen(comprobar):
+    # Sin stock en ninguna variante activa / sin variantes activas
+    completos = _pedir({'page_size': TAMANO}).data['results']
+    sin_stock, sin_variantes, con_oferta = (p['id'] for p in completos[:3])
+    variante = ProductoVariante.objects.filter(producto_id=con_oferta).first()
+    variante.precio_oferta = Decimal('1.50')
+    variante.save()
+    for stock_variante in ProductoVariante.objects.filter(producto_id=sin_stock):
+        stock_variante.stock_records.update(cantidad=0)
+    ProductoVariante.objects.filter(producto_id=sin_variantes).update(activo=False)
+    # update() no pasa por las señales: columnas desnormalizadas y fragmentos a mano
+    actualizar_productos([sin_stock, sin_variantes], con_variantes=True)
+    fragmentos.limpiar()
+
+    completos = {p['id']: p for p in _pedir({'page_size': TAMANO}).data['results']}
+    resumen = _pedir({'page_size': TAMANO, 'vista': 'resumen'}).data['results']
+    comprobar([p['id'] for p in resumen] == list(completos), 'El resumen trae los mismos productos y en el mismo orden')
+
+    errores = []
+    for producto in resumen:
+        completo = completos[producto['id']]
+        activas = [v for v in completo['variantes'] if v['activo']]
+        minimo, maximo = _rango(activas)
+        precio_min = producto['precio_min'] and Decimal(producto['precio_min'])
+        precio_max = producto['precio_max'] and Decimal(producto['precio_max'])
+        disponible = any(v['stock_total'] > 0 for v in activas)
+        galeria = completo['imagenes_galeria']
+        imagen = next((i['imagen_url'] for i in galeria if i['es_principal']), galeria[0]['imagen_url'] if galeria else None)
+        if (precio_min, precio_max, producto['disponible'], producto['imagen_principal']) != (minimo, maximo, disponible, imagen):
+            errores.append(producto['id'])
+    comprobar(not errores, 'precio_min/max, disponible e imagen_principal coinciden con el payload completo')
+    por_id = {p['id']: p for p in resumen}
+    comprobar(por_id[con_oferta]['precio_min'] == '1.50', 'El precio de oferta cuenta para precio_min')
+    comprobar(por_id[sin_stock]['disponible'] is False, 'Sin stock en ninguna variante: disponible = false')
+    comprobar(por_id[sin_variantes]['precio_min'] is None and por_id[sin_variantes]['disponible'] is False,
+              'Sin variantes activas: sin precio y no disponible')
+
+    expandido = _pedir({'page_size': TAMANO, 'vista': 'resumen', 'expand': 'variantes,imagenes_galeria',
+                        'fields': 'id,precio_min,variantes.sku,imagenes_galeria'}).data['results'][0]
+    comprobar(set(expandido) == {'id', 'precio_min', 'variantes', 'imagenes_galeria'}
+              and all(set(v) == {'sku'} for v in expandido['variantes'])
+              and expandido['imagenes_galeria'] and 'imagen_url' in expandido['imagenes_galeria'][0],
+              '?expand= añade campos al resumen y ?fields= los recorta (también los anidados)')
+
+
+def comprobar_campos(comprobar, admin):
+    completo = _pedir({'page_size': 1}).data['results'][0]
+    recortado = _pedir({'page_size': 1, 'fields': 'id,nombre,variantes.sku,variantes.stock_total'}).data['results'][0]
+    comprobar(set(recortado) == {'id', 'nombre', 'variantes'}
+              and all(set(v) == {'sku', 'stock_total'} for v in recortado['variantes']),
+              'Listado público: ?fields= deja solo esos campos (con los anidados)')
+    comprobar(fragmentos.obtener(completo['id'], _version(completo['id'])) == completo,
+              'La caché de fragmentos sigue guardando el producto completo')
+    comprobar(_pedir({}).data['results'][0] == _pedir({}).data['results'][0] and
+              set(_pedir({'page_size': 1}).data['results'][0]) == set(completo),
+              'Sin ?fields= la respuesta es la de siempre')
+
+    uno = _pedir({'fields': 'slug,categoria.nombre'}, detalle, slug=completo['slug']).data
+    comprobar(uno == {'slug': completo['slug'], 'categoria': {'nombre': completo['categoria']['nombre']}},
+              'Detalle público: ?fields= también recorta')
+
+    peticion = fabrica.get('/', {'page_size': 2, 'fields': 'id,nombre,variantes.id'})
+    force_authenticate(peticion, user=admin)
+    datos = admin_lista(peticion).data['results']
+    comprobar(all(set(p) == {'id', 'nombre', 'variantes'} and all(set(v) == {'id'} for v in p['variantes'])
+                  for p in datos), 'Admin: ?fields= recorta el ProductoSerializer')
+
+    variante = ProductoVariante.objects.filter(producto_id=completo['id']).first()
+    peticion = fabrica.patch('/?fields=id', {'precio': '42.00'}, format='json')
+    force_authenticate(peticion, user=admin)
+    respuesta = admin_variante(peticion, pk=variante.pk)
+    comprobar(respuesta.status_code == 200 and respuesta.data['precio'] == '42.00' and 'sku' in respuesta.data,
+              'Al escribir se ignora ?fields= (respuesta y validación completas)')
+
+
+def _version(producto_id):
+    return Producto.objects.values_list('version', flat=True).get(pk=producto_id)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--productos', type=int, default=200)
+    parser.add_argument('--variantes', type=int, default=12)
+    parser.add_argument('--repeticiones', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    fallos = []
+
+    def comprobar(ok, mensaje):
+        fallos.append(not ok)
+        print(f'  {"✓" if ok else "✗"} {mensaje}')
+
+    try:
+        with transaction.atomic():
+            admin = crear_admin(prefijo='bench-lista')
+            crear_catalogo(args.productos, variantes=args.variantes, imagenes=3, prefijo='bench-lista')
+            medir(args, comprobar)
+            comprobar_resumen(comprobar)
+            comprobar_campos(comprobar, admin)
+            raise Deshacer
+    except Deshacer:
+        pass
+    finally:
+        fragmentos.limpiar()
+
+    if any(fallos):
+        print(f'❌ {sum(fallos)} verificaciones de la lista compacta fallaron.')
+        return 1
+    print('✅ Lista compacta y ?fields= / ?expand= verificados.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,201 @@
+# benchmarks/matriz_variantes.py
+"""
+Benchmark y verificación de la matriz de variantes (matriz.py y
+POST admin/productos/<id>/generar-variantes/).
+
+Dentro de una transacción que se deshace al final:
+
+- Genera Talla x Color (6 x 8 = 48 variantes por defecto) con el endpoint y
+  lo compara con crear cada combinación con ProductoVarianteSerializer
+  (lo que hacía el admin variante a variante): tiempo y consultas.
+- Comprueba lo creado: una variante por combinación con sus dos valores,
+  precio, oferta, stock en el almacén Principal, atributos del producto y
+  versión nueva (caché de fragmentos).
+- Comprueba la idempotencia: repetir la petición no crea nada y ampliar la
+  matriz (una talla más) crea solo las combinaciones nuevas; una variante
+  con un atributo de más ya cubre su combinación.
+- Comprueba los errores: valores de dos atributos en una lista, un atributo
+  repetido, IDs que no existen, listas vacías y demasiadas combinaciones.
+
+Uso (desde backend/, con DATABASE_URL apuntando a una BD migrada):
+    python -m benchmarks.matriz_variantes
+    python -m benchmarks.matriz_variantes --tallas 6 --colores 8
+"""
+import argparse
+import sys
+import time
+from decimal import Decimal
+
+from benchmarks.catalogo_sintetico import Deshacer, crear_admin, crear_catalogo
+
+from django.conf import settings  # noqa: E402
+from django.db import connection, transaction  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from rest_framework.test import APIRequestFactory, force_authenticate  # noqa: E402
+
+from apps.ecommerce.inventario.models import Stock  # noqa: E402
+from apps.ecommerce.productos.models import Atributo, Producto, ProductoVariante, ValorAtributo  # noqa: E402
+from apps.ecommerce.productos.serializers import ProductoVarianteSerializer  # noqa: E402
+from apps.ecommerce.productos.views import AdminProductoGenerarVariantesView  # noqa: E402
+
+fabrica = APIRequestFactory()
+generar = AdminProductoGenerarVariantesView.as_view()
+
+
+def _generar(admin, producto_id, datos):
+    peticion = fabrica.post('/', datos, format='json')
+    force_authenticate(peticion, user=admin)
+    with CaptureQueriesContext(connection) as consultas:
+        inicio = time.perf_counter()
+        respuesta = generar(peticion, pk=producto_id)
+        respuesta.render()
+        segundos = time.perf_counter() - inicio
+    return respuesta, len(consultas), segundos
+
+
+def _producto_vacio(catalogo, nombre):
+    return Producto.objects.create(categoria=catalogo['categorias'][0], nombre=nombre)
+
+
+def medir(catalogo, admin, tallas, colores, comprobar):
+    combinaciones = len(tallas) * len(colores)
+    datos = {'valores': [[v.pk for v in tallas], [v.pk for v in colores]], 'precio': '49.90', 'stock_inicial': 5}
+
+    producto = _producto_vacio(catalogo, 'Matriz por endpoint')
+    producto.refresh_from_db()
+    respuesta, consultas, segundos = _generar(admin, producto.pk, datos)
+
+    uno_a_uno = _producto_vacio(catalogo, 'Matriz variante a variante')
+    with CaptureQueriesContext(connection) as capturadas:
+        inicio = time.perf_counter()
+        for talla in tallas:
+            for color in colores:
+                serializer = ProductoVarianteSerializer(data={
+                    'producto': uno_a_uno.pk, 'precio': '49.90', 'stock_inicial': 5,
+                    'valores_ids': [talla.pk, color.pk],
+                })
+                serializer.is_valid(raise_exception=True)
+                serializer.save()
+        segundos_uno = time.perf_counter() - inicio
+
+    print(f'{combinaciones} combinaciones ({len(tallas)} tallas x {len(colores)} colores):')
+    print(f'  variante a variante  {segundos_uno * 1000:8.1f} ms  {len(capturadas)} consultas')
+    print(f'  generar-variantes    {segundos * 1000:8.1f} ms  {consultas} consultas  (x{segundos_uno / segundos:.0f})')
+    comprobar(respuesta.status_code == 201 and respuesta.data['creadas'] == combinaciones
+              and len(respuesta.data['variantes']) == combinaciones,
+              f'201 con las {combinaciones} variantes creadas')
+    comprobar(consultas < 30 and consultas * 10 < len(capturadas),
+              f'Consultas constantes ({consultas}), no una tanda por variante ({len(capturadas)})')
+    comprobar(segundos < segundos_uno, 'Más rápido que crear variante a variante')
+    return producto
+
+
+def comprobar_contenido(producto, tallas, colores, comprobar):
+    variantes = list(ProductoVariante.objects.filter(producto=producto).prefetch_related('valores'))
+    combinaciones = {frozenset(v.pk for v in variante.valores.all()) for variante in variantes}
+    esperadas = {frozenset((t.pk, c.pk)) for t in tallas for c in colores}
+    comprobar(combinaciones == esperadas and len(variantes) == len(esperadas),
+              'Una variante por combinación, cada una con su talla y su color')
+    comprobar(all(v.precio == Decimal('49.90') and v.activo and v.sku.startswith(producto.slug.upper() + '-')
+                  for v in variantes) and len({v.sku for v in variantes}) == len(variantes),
+              'Precio común, activas y SKU generado como en ProductoVariante.save()')
+    stock = Stock.objects.filter(variante__producto=producto)
+    comprobar(stock.count() == len(variantes) and {s.almacen.nombre for s in stock} == {'Principal'}
+              and {s.cantidad for s in stock} == {5}, 'stock_inicial en el almacén Principal, como el serializador')
+    comprobar(set(producto.atributos.values_list('nombre', flat=True)) == {'Talla', 'Color'},
+              'Los atributos quedan asociados al producto')
+    comprobar(Producto.objects.get(pk=producto.pk).version > producto.version,
+              'Sube la versión del producto (la caché de fragmentos se entera)')
+
+
+def comprobar_idempotencia(catalogo, admin, producto, tallas, colores, comprobar):
+    datos = {'valores': [[v.pk for v in tallas], [v.pk for v in colores]], 'precio': '10'}
+    antes = ProductoVariante.objects.filter(producto=producto).count()
+    respuesta, consultas, _ = _generar(admin, producto.pk, datos)
+    comprobar(respuesta.status_code == 200 and respuesta.data['creadas'] == 0
+              and respuesta.data['existentes'] == antes
+              and ProductoVariante.objects.filter(producto=producto).count() == antes,
+              f'Repetir la petición no crea nada (200, {consultas} consultas)')
+
+    nueva, _ = ValorAtributo.objects.get_or_create(atributo=tallas[0].atributo, valor='Bench XXXL')
+    datos['valores'][0].append(nueva.pk)
+    respuesta, _, _ = _generar(admin, producto.pk, datos)
+    comprobar(respuesta.status_code == 201 and respuesta.data['creadas'] == len(colores)
+              and respuesta.data['existentes'] == antes,
+              f'Una talla más crea solo sus {len(colores)} combinaciones')
+
+    # Una variante 'talla / color / material' ya cubre 'talla / color'
+    otro = _producto_vacio(catalogo, 'Matriz con material')
+    material, _ = Atributo.objects.get_or_create(nombre='Bench Material')
+    algodon, _ = ValorAtributo.objects.get_or_create(atributo=material, valor='Algodón')
+    variante = ProductoVariante.objects.create(producto=otro, precio=1)
+    variante.valores.set([tallas[0], colores[0], algodon])
+    respuesta, _, _ = _generar(admin, otro.pk, {'valores': [[tallas[0].pk], [colores[0].pk, colores[1].pk]],
+                                                'precio': '5', 'precio_oferta': '4.50', 'activo': False})
+    creada = ProductoVariante.objects.filter(producto=otro).exclude(pk=variante.pk).first()
+    comprobar(respuesta.data['creadas'] == 1 and respuesta.data['existentes'] == 1
+              and creada.precio_oferta == Decimal('4.50') and not creada.activo,
+              'Una variante con un atributo de más ya cubre su combinación; oferta y activo se aplican')
+
+
+def comprobar_errores(admin, producto, tallas, colores, comprobar):
+    casos = [
+        ('valores de dos atributos en una lista', {'valores': [[tallas[0].pk, colores[0].pk]]}),
+        ('el mismo atributo en dos listas', {'valores': [[tallas[0].pk], [tallas[1].pk]]}),
+        ('un ID que no existe', {'valores': [[tallas[0].pk], [999999999]]}),
+        ('una lista vacía', {'valores': [[tallas[0].pk], []]}),
+        ('sin valores', {'valores': []}),
+        ('sin precio', {'valores': [[tallas[0].pk]], 'precio': None}),
+    ]
+    antes = ProductoVariante.objects.count()
+    for descripcion, datos in casos:
+        respuesta, _, _ = _generar(admin, producto.pk, {'precio': '1', **datos})
+        comprobar(respuesta.status_code == 400, f'400 con {descripcion}')
+
+    muchas = list(ValorAtributo.objects.filter(atributo=tallas[0].atributo).values_list('pk', flat=True))
+    maximo = settings.MATRIZ_VARIANTES_MAX
+    settings.MATRIZ_VARIANTES_MAX = len(muchas) - 1
+    try:
+        respuesta, _, _ = _generar(admin, producto.pk, {'valores': [muchas], 'precio': '1'})
+    finally:
+        settings.MATRIZ_VARIANTES_MAX = maximo
+    comprobar(respuesta.status_code == 400, 'Más combinaciones que MATRIZ_VARIANTES_MAX: 400')
+    comprobar(ProductoVariante.objects.count() == antes, 'Ninguna petición con errores crea variantes')
+    respuesta, _, _ = _generar(admin, 999999999, {'valores': [[tallas[0].pk]], 'precio': '1'})
+    comprobar(respuesta.status_code == 404, 'Producto que no existe: 404')
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tallas', type=int, default=6)
+    parser.add_argument('--colores', type=int, default=8)
+    args = parser.parse_args(argv)
+
+    fallos = []
+
+    def comprobar(ok, mensaje):
+        fallos.append(not ok)
+        print(f'  {"✓" if ok else "✗"} {mensaje}')
+
+    try:
+        with transaction.atomic():
+            admin = crear_admin(prefijo='bench-matriz')
+            catalogo = crear_catalogo(1, variantes=1, prefijo='bench-matriz')
+            tallas, colores = catalogo['tallas'][:args.tallas], catalogo['colores'][:args.colores]
+            producto = medir(catalogo, admin, tallas, colores, comprobar)
+            comprobar_contenido(producto, tallas, colores, comprobar)
+            comprobar_idempotencia(catalogo, admin, producto, tallas, colores, comprobar)
+            comprobar_errores(admin, producto, tallas, colores, comprobar)
+            raise Deshacer
+    except Deshacer:
+        pass
+
+    if any(fallos):
+        print(f'❌ {sum(fallos)} verificaciones de la matriz de variantes fallaron.')
+        return 1
+    print('✅ Matriz de variantes verificada.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,199 @@
+# benchmarks/paginacion_catalogo.py
+"""
+Benchmark y verificación de la paginación por cursor del catálogo (paginacion.py).
+
+Dentro de una transacción que se deshace al final, con un catálogo sintético:
+
+- Compara página 1 y una página profunda con páginas numeradas (COUNT +
+  OFFSET) y con cursor (keyset): latencia p50 y consultas.
+- Recorre el catálogo entero con los enlaces 'next' (público y admin) y
+  comprueba que sale cada producto una sola vez y en el orden de
+  (-creado_en, -id), incluso con muchos productos del mismo instante.
+- Comprueba los enlaces 'previous', el cursor inválido y ?total=aproximado.
+- En Postgres muestra el plan de la consulta por cursor (debe usar el índice).
+
+Uso (desde backend/, con DATABASE_URL apuntando a una BD migrada):
+    python -m benchmarks.paginacion_catalogo
+    python -m benchmarks.paginacion_catalogo --productos 100000 --repeticiones 20
+"""
+import argparse
+import statistics
+import sys
+import time
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.catalogo_sintetico import Deshacer, crear_admin, crear_catalogo
+
+from django.db import connection, transaction  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from rest_framework.test import APIRequestFactory, force_authenticate  # noqa: E402
+
+from apps.ecommerce.productos.fragmentos import fragmentos  # noqa: E402
+from apps.ecommerce.productos.models import Producto  # noqa: E402
+from apps.ecommerce.productos.paginacion import (  # noqa: E402
+    ORDEN_POR_DEFECTO, ORDENES_CATALOGO, CursorCatalogoPagination,
+)
+from apps.ecommerce.productos.views import AdminProductoViewSet, ProductoPublicListView  # noqa: E402
+
+fabrica = APIRequestFactory()
+lista = ProductoPublicListView.as_view()
+admin_lista = AdminProductoViewSet.as_view({'get': 'list'})
+TAMANO = 24
+
+
+def _pedir(parametros, vista=lista, admin=None):
+    peticion = fabrica.get('/', parametros)
+    if admin:
+        force_authenticate(peticion, user=admin)
+    respuesta = vista(peticion)
+    respuesta.render()
+    return respuesta
+
+
+def _parametros(enlace):
+    return {clave: valores[0] for clave, valores in parse_qs(urlparse(enlace).query).items()}
+
+
+def _cursor_en(posicion):
+    """Cursor que apunta justo después del producto en `posicion` (sin recorrer hasta allí)."""
+    producto = Producto.objects.filter(activo=True).order_by('-creado_en', '-id')[posicion]
+    paginador = CursorCatalogoPagination()
+    paginador.base_url = 'http://testserver/'
+    paginador.orden, paginador.campo = ORDEN_POR_DEFECTO, ORDENES_CATALOGO[ORDEN_POR_DEFECTO][0]
+    return _parametros(paginador._codificar(producto))['cursor']
+
+
+def _medir(parametros, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        with CaptureQueriesContext(connection) as consultas:
+            inicio = time.perf_counter()
+            respuesta = _pedir(parametros)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos), len(consultas), respuesta
+
+
+def medir(total, repeticiones, comprobar):
+    profunda = max(2, total // TAMANO - 1)
+    casos = [
+        ('páginas  p. 1', {'page_size': TAMANO}),
+        (f'páginas  p. {profunda}', {'page_size': TAMANO, 'page': profunda}),
+        ('cursor   p. 1', {'page_size': TAMANO, 'paginacion': 'cursor'}),
+        (f'cursor   p. {profunda}', {'page_size': TAMANO, 'cursor': _cursor_en((profunda - 1) * TAMANO - 1)}),
+    ]
+    print(f'{total} productos activos, {TAMANO} por página (fragmentos en caliente):')
+    resultados = {}
+    for etiqueta, parametros in casos:
+        _pedir(parametros)  # Calienta la caché de fragmentos de esa página
+        ms, consultas, respuesta = _medir(parametros, repeticiones)
+        resultados[etiqueta] = (ms, consultas, [p['id'] for p in respuesta.data['results']])
+        print(f'  {etiqueta:<16} p50 {ms:8.2f} ms  {consultas} consultas')
+    (_, _, ids_paginas), (_, _, ids_cursor) = resultados[casos[1][0]], resultados[casos[3][0]]
+    comprobar(ids_paginas == ids_cursor, f'La página {profunda} por cursor = la página {profunda} numerada')
+    (_, q_1, _), (_, q_n, _) = resultados[casos[2][0]], resultados[casos[3][0]]
+    comprobar(q_1 == q_n, f'Por cursor la página {profunda} hace las mismas consultas que la 1 ({q_n})')
+
+
+def recorrer(parametros, vista=lista, admin=None):
+    ids, paginas, respuesta = [], [], _pedir(parametros, vista, admin)
+    while True:
+        paginas.append(respuesta.data)
+        ids.extend(p['id'] for p in respuesta.data['results'])
+        if not respuesta.data['next']:
+            return ids, paginas
+        respuesta = _pedir(_parametros(respuesta.data['next']), vista, admin)
+
+
+def comprobar_recorrido(comprobar, admin):
+    esperado = list(Producto.objects.filter(activo=True).order_by('-creado_en', '-id').values_list('id', flat=True))
+    ids, paginas = recorrer({'paginacion': 'cursor', 'page_size': 100})
+    comprobar(ids == esperado, f'El recorrido público por cursor ve {len(ids)} productos, cada uno una vez y en orden')
+    comprobar(paginas[0]['previous'] is None and 'count' not in paginas[0],
+              'La primera página no tiene previous ni COUNT')
+
+    anterior = _pedir(_parametros(paginas[2]['previous'])).data
+    comprobar([p['id'] for p in anterior['results']] == [p['id'] for p in paginas[1]['results']],
+              "El enlace 'previous' de la página 3 devuelve la página 2")
+    primera = _pedir(_parametros(anterior['previous'])).data
+    comprobar(primera['previous'] is None and [p['id'] for p in primera['results']] == esperado[:100],
+              "Volviendo con 'previous' se llega a la primera página, sin más 'previous'")
+
+    todos = list(Producto.objects.order_by('-creado_en', '-id').values_list('id', flat=True))
+    ids, _ = recorrer({'paginacion': 'cursor', 'page_size': 100}, admin_lista, admin)
+    comprobar(ids == todos, f'El recorrido admin por cursor ve {len(ids)} productos (incluidos inactivos)')
+
+    invalido = _pedir({'cursor': 'no-es-un-cursor'})
+    comprobar(invalido.status_code == 404, 'Un cursor inválido devuelve 404')
+
+    clasica = _pedir({'page': 2, 'page_size': 10}).data
+    comprobar('count' in clasica and [p['id'] for p in clasica['results']] == esperado[10:20],
+              'Sin cursor sigue la paginación por páginas de siempre')
+
+
+def comprobar_total(comprobar):
+    real = Producto.objects.filter(activo=True).count()
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE productos_producto')
+    datos = _pedir({'paginacion': 'cursor', 'total': 'aproximado'}).data
+    estimado = datos.get('total_aproximado')
+    comprobar(isinstance(estimado, int) and estimado > 0,
+              f'?total=aproximado: {estimado} estimados para {real} reales')
+
+
+def mostrar_plan():
+    if connection.vendor != 'postgresql':
+        print('⚠️  La BD no es Postgres: no se muestra el plan de la consulta por cursor.')
+        return
+    cursor_1000 = _cursor_en(1000)
+    with CaptureQueriesContext(connection) as consultas:
+        _pedir({'page_size': TAMANO, 'cursor': cursor_1000})
+    sql = next(q['sql'] for q in consultas.captured_queries
+               if q['sql'].startswith('SELECT') and 'FROM "productos_producto"' in q['sql'] and 'LIMIT' in q['sql'])
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN {sql}')
+        plan = [fila[0] for fila in cursor.fetchall()]
+    print('Plan en Postgres de la página por cursor desde la posición 1000:')
+    for linea in plan[:4]:
+        print(f'    {linea}')
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--productos', type=int, default=20000)
+    parser.add_argument('--repeticiones', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    fallos = []
+
+    def comprobar(ok, mensaje):
+        fallos.append(not ok)
+        print(f'  {"✓" if ok else "✗"} {mensaje}')
+
+    try:
+        with transaction.atomic():
+            admin = crear_admin()
+            catalogo = crear_catalogo(args.productos, variantes=1, almacenes=1, imagenes=0, prefijo='bench-pag')
+            # Empates: 500 productos creados "en el mismo instante" (importación masiva)
+            Producto.objects.filter(id__in=catalogo['productos'][100:600]).update(creado_en=timezone.now())
+            Producto.objects.filter(id__in=catalogo['productos'][::50]).update(activo=False)
+            medir(Producto.objects.filter(activo=True).count(), args.repeticiones, comprobar)
+            comprobar_recorrido(comprobar, admin)
+            comprobar_total(comprobar)
+            mostrar_plan()
+            raise Deshacer
+    except Deshacer:
+        pass
+    finally:
+        fragmentos.limpiar()
+
+    if any(fallos):
+        print(f'❌ {sum(fallos)} verificaciones de la paginación fallaron.')
+        return 1
+    print('✅ Paginación por cursor verificada.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,178 @@
+# benchmarks/urls_medios.py
+"""
+Benchmark y verificación de las URLs memorizadas de Cloudinary (apps/medios.py).
+
+Sin red: se bloquean las conexiones de salida durante toda la prueba, así
+que cualquier llamada a la API de Cloudinary haría fallar el script.
+
+- Comprueba que url_medio() devuelve exactamente lo mismo que .url para
+  recursos con y sin versión, formato, tipo o tipo de recurso, y que una
+  versión nueva de la misma imagen da otra URL.
+- Comprueba las variantes responsive (miniatura, tarjeta, detalle), que la
+  LRU no pasa de su máximo y Profile.avatar_url (con y sin avatar).
+- Mide .url frente a url_medio() para una imagen y una página del catálogo
+  serializada con ProductoSerializer (con y sin memo), contando cuántas
+  URLs se construyen de verdad.
+
+Uso (desde backend/, con DATABASE_URL apuntando a una BD migrada):
+    python -m benchmarks.urls_medios
+    python -m benchmarks.urls_medios --repeticiones 50
+"""
+import argparse
+import contextlib
+import socket
+import statistics
+import sys
+import time
+from unittest import mock
+
+from benchmarks.catalogo_sintetico import Deshacer, crear_catalogo
+
+import cloudinary.utils  # noqa: E402
+from cloudinary import CloudinaryResource  # noqa: E402
+from django.db import transaction  # noqa: E402
+
+from apps import medios  # noqa: E402
+from apps.ecommerce.productos.catalogo import productos_catalogo  # noqa: E402
+from apps.ecommerce.productos.models import Producto, ProductoVariante  # noqa: E402
+from apps.ecommerce.productos.serializers import ProductoSerializer  # noqa: E402
+from apps.usuarios.models import Profile  # noqa: E402
+
+
+def _sin_red(*args, **kwargs):
+    raise OSError('Red bloqueada en el benchmark: nada debe llamar a Cloudinary')
+
+
+@contextlib.contextmanager
+def contar_urls():
+    """Cuenta las URLs construidas de verdad (por .url o por apps/medios.py)."""
+    contador = mock.Mock(wraps=cloudinary.utils.cloudinary_url)
+    with mock.patch.object(cloudinary.utils, 'cloudinary_url', contador), \
+            mock.patch.object(medios, 'cloudinary_url', contador):
+        yield contador
+
+
+def comprobar_equivalencia(comprobar):
+    recursos = [
+        CloudinaryResource('boutique/productos/camisa', version='1761365274', format='jpg', resource_type='image'),
+        CloudinaryResource('boutique/productos/camisa', format='avif', resource_type='image'),
+        CloudinaryResource('usuarios/perfiles/ana', version='12', resource_type='image'),
+        CloudinaryResource('pagos/comprobantes_qr/x', type='authenticated', resource_type='image'),
+        CloudinaryResource('docs/factura', format='pdf', resource_type='raw'),
+        CloudinaryResource('sin/tipo'),
+    ]
+    comprobar(all(medios.url_medio(r) == r.url for r in recursos),
+              f'url_medio() = .url en {len(recursos)} recursos distintos (versión, formato, tipo...)')
+    comprobar(medios.url_medio(None) is None and medios.url_medio('') is None
+              and medios.url_medio('texto sin url') is None, 'Sin archivo devuelve None, como antes')
+    nueva = CloudinaryResource('boutique/productos/camisa', version='1761365999', format='jpg', resource_type='image')
+    comprobar(medios.url_medio(nueva) != medios.url_medio(recursos[0]), 'Una versión nueva da otra URL')
+
+    responsive = medios.urls_responsive(recursos[0])
+    comprobar(set(responsive) == set(medios.TAMANOS)
+              and all(t in responsive['miniatura'] for t in ('c_fill', 'g_auto', 'h_150', 'w_150'))
+              and all('f_auto' in url and 'q_auto' in url and 'v1761365274' in url for url in responsive.values()),
+              'Variantes responsive con su transformación, formato/calidad automáticos y la versión')
+    comprobar(medios.urls_responsive(None) is None, 'Sin archivo no hay variantes responsive')
+
+    perfil = Profile(avatar=recursos[2])
+    comprobar(perfil.avatar_url == recursos[2].url, 'Profile.avatar_url con avatar = .url')
+    comprobar(Profile(sexo=Profile.Sexo.femenino).avatar_url.endswith('perfilmujer_plgovh.jpg'),
+              'Profile.avatar_url sin avatar sigue usando la imagen por defecto')
+
+
+def comprobar_lru(comprobar):
+    medios.limpiar()
+    maximo = medios.estadisticas()['max_entradas']
+    for i in range(maximo + 100):
+        medios.url_medio(CloudinaryResource(f'lru/{i}', resource_type='image'))
+    comprobar(medios.estadisticas()['entradas'] == maximo, f'La LRU no pasa de MEDIOS_URLS_MAX ({maximo})')
+    medios.limpiar()
+
+
+def _p50(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+
+def medir(catalogo, repeticiones, comprobar):
+    recurso = CloudinaryResource('boutique/productos/camisa', version='1761365274', format='jpg', resource_type='image')
+    medios.url_medio(recurso)
+    n = 1000
+    ms_url = _p50(lambda: [recurso.url for _ in range(n)], repeticiones)
+    ms_memo = _p50(lambda: [medios.url_medio(recurso) for _ in range(n)], repeticiones)
+    print(f'{n} accesos a la URL de una imagen:')
+    print(f'  .url         p50 {ms_url:7.2f} ms')
+    print(f'  url_medio()  p50 {ms_memo:7.2f} ms  (x{ms_url / ms_memo:.1f})')
+    comprobar(ms_memo < ms_url, 'url_medio() memorizada es más rápida que .url')
+
+    ids = catalogo['productos'][:24]
+    productos = list(productos_catalogo(Producto.objects.filter(id__in=ids), ProductoVariante.objects.filter(activo=True)))
+    # Imagen propia en la mitad de las variantes
+    for producto in productos:
+        for variante in list(producto.variantes.all())[::2]:
+            variante.imagen_variante = CloudinaryResource(f'bench-medios/variante-{variante.pk}', resource_type='image')
+
+    def serializar():
+        return ProductoSerializer(productos, many=True).data
+
+    sin_memo = mock.patch.object(medios, '_url', medios._url.__wrapped__)
+    with sin_memo, contar_urls() as llamadas:
+        datos_sin_memo = serializar()
+        urls_sin_memo = llamadas.call_count
+        ms_sin_memo = _p50(serializar, repeticiones)
+    medios.limpiar()
+    with contar_urls() as llamadas:
+        datos = serializar()
+        urls_primera = llamadas.call_count
+        llamadas.reset_mock()
+        serializar()
+        urls_segunda = llamadas.call_count
+        ms_memo = _p50(serializar, repeticiones)
+
+    print(f'Página de {len(productos)} productos serializada con ProductoSerializer:')
+    print(f'  sin memo      p50 {ms_sin_memo:7.2f} ms  {urls_sin_memo} URLs construidas')
+    print(f'  con memo      p50 {ms_memo:7.2f} ms  {urls_primera} la primera vez, {urls_segunda} después')
+    comprobar(datos == datos_sin_memo, 'La página serializada es idéntica con y sin memo')
+    comprobar(urls_segunda == 0 and urls_primera <= urls_sin_memo,
+              'Cada URL se construye una vez; con el memo caliente, ninguna')
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    fallos = []
+
+    def comprobar(ok, mensaje):
+        fallos.append(not ok)
+        print(f'  {"✓" if ok else "✗"} {mensaje}')
+
+    medios.limpiar()
+    try:
+        with transaction.atomic():
+            catalogo = crear_catalogo(24, variantes=12, imagenes=3, prefijo='bench-medios')
+            with mock.patch.object(socket.socket, 'connect', _sin_red):
+                comprobar_equivalencia(comprobar)
+                medir(catalogo, args.repeticiones, comprobar)
+                comprobar_lru(comprobar)
+            raise Deshacer
+    except Deshacer:
+        pass
+    finally:
+        medios.limpiar()
+
+    if any(fallos):
+        print(f'❌ {sum(fallos)} verificaciones de las URLs de medios fallaron.')
+        return 1
+    print('✅ URLs de Cloudinary memorizadas verificadas (sin red).')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -13,4 +13,31 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'main.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Tras get_asgi_application(): las apps ya están cargadas
+from apps.ia_services.cliente_http import cerrar_clientes_async, iniciar_clientes_async  # noqa: E402
+
+
+async def _lifespan(receive, send):
+    """
+    Protocolo lifespan (Django no lo implementa): los clientes httpx de las
+    vistas puente async se comparten mientras vive el servidor y se cierran
+    al apagarlo, sin dejar pools de conexiones abiertos.
+    """
+    while True:
+        mensaje = await receive()
+        if mensaje['type'] == 'lifespan.startup':
+            iniciar_clientes_async()
+            await send({'type': 'lifespan.startup.complete'})
+        elif mensaje['type'] == 'lifespan.shutdown':
+            await cerrar_clientes_async()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    await django_application(scope, receive, send)
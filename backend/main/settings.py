@@ -18,6 +18,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',  # Búsqueda full-text/trigramas (BUSQUEDA_BACKEND='postgres')
 
     'corsheaders',
     'rest_framework', 
@@ -92,6 +93,69 @@ DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
 STRIPE_SECRET_KEY = os.getenv('STRIPE_SECRET_KEY')
 STRIPE_WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET')
 
+# --- Microservicios de IA (puente apps.ia_services) ---
+# URLS: réplicas separadas por comas (balanceo en el cliente, chequeo GET RUTA_SALUD).
+# TIMEOUT: (conexión, lectura) en segundos. REINTENTOS: reintentos acotados;
+# las llamadas no IDEMPOTENTES solo se reintentan si falló la conexión.
+IA_INTERVALO_SALUD = float(os.getenv('IA_INTERVALO_SALUD', '5'))
+SERVICIOS_IA = {
+    'reportes': {
+        'URLS': os.getenv('IA_REPORTES_URL', 'http://127.0.0.1:8001').split(','),
+        'RUTA_SALUD': '/',
+        'INTERVALO_SALUD': IA_INTERVALO_SALUD,
+        'TIMEOUT': (float(os.getenv('IA_REPORTES_TIMEOUT_CONEXION', '3')), float(os.getenv('IA_REPORTES_TIMEOUT', '60'))),
+        'REINTENTOS': int(os.getenv('IA_REPORTES_REINTENTOS', '2')),
+        'IDEMPOTENTE': False,  # Cada reporte puede gastar una llamada al LLM
+        'POOL': int(os.getenv('IA_REPORTES_POOL', '10')),
+    },
+    'prediccion': {
+        'URLS': os.getenv('IA_PREDICCION_URL', 'http://127.0.0.1:8002').split(','),
+        'RUTA_SALUD': '/',
+        'INTERVALO_SALUD': IA_INTERVALO_SALUD,
+        'TIMEOUT': (float(os.getenv('IA_PREDICCION_TIMEOUT_CONEXION', '3')), float(os.getenv('IA_PREDICCION_TIMEOUT', '10'))),
+        'REINTENTOS': int(os.getenv('IA_PREDICCION_REINTENTOS', '2')),
+        'IDEMPOTENTE': True,  # Predecir no modifica nada
+        'POOL': int(os.getenv('IA_PREDICCION_POOL', '10')),
+    },
+}
+
+# Vistas puente async (servir con ASGI: python servidor_asgi.py)
+IA_VISTAS_ASYNC = os.getenv('IA_VISTAS_ASYNC', 'False') == 'True'
+
+# --- Caché del catálogo (apps.ecommerce.productos) ---
+# Sin CACHES se usa la LocMemCache de cada proceso. El árbol de categorías
+# lleva en la clave un sello leído de la BD (arbol.py), así ningún proceso
+# sirve un menú viejo; el TTL acota lo demás (totales aproximados del catálogo).
+CATALOGO_CACHE_TTL = int(os.getenv('CATALOGO_CACHE_TTL', '300'))
+# Fragmentos serializados por producto (LRU en memoria de cada proceso). La
+# clave lleva Producto.version, que las señales suben en la BD: los demás
+# procesos ven la versión nueva y nunca sirven un fragmento viejo.
+CATALOGO_FRAGMENTOS_MAX = int(os.getenv('CATALOGO_FRAGMENTOS_MAX', '5000'))
+
+# --- Búsqueda de productos (productos/busqueda.py) ---
+# 'memoria': índice invertido en cada proceso. 'postgres': full-text + trigramas.
+BUSQUEDA_BACKEND = os.getenv('BUSQUEDA_BACKEND', 'memoria')
+# Cada cuánto un proceso comprueba cambios hechos por otros (Producto.version).
+# Vale para todos los índices en memoria (búsqueda y facetas).
+BUSQUEDA_SINCRONIZACION_S = float(os.getenv('BUSQUEDA_SINCRONIZACION_S', '30'))
+# Cuánto se guardan las anotaciones de ProductoCambio (productos/indices.py).
+# Un proceso que lleva más que esto sin sincronizar reconstruye sus índices.
+BUSQUEDA_CAMBIOS_RETENCION_S = float(os.getenv('BUSQUEDA_CAMBIOS_RETENCION_S', '3600'))
+BUSQUEDA_MAX_RESULTADOS = int(os.getenv('BUSQUEDA_MAX_RESULTADOS', '1000'))
+
+# --- Filtros por facetas (productos/facetas.py) ---
+# Límites de los rangos de precio (precio de oferta si la variante la tiene):
+# 0-25, 25-50, 50-100, 100-200 y 200 o más.
+FACETAS_RANGOS_PRECIO = [int(p) for p in os.getenv('FACETAS_RANGOS_PRECIO', '25,50,100,200').split(',')]
+
+# --- Matriz de variantes (productos/matriz.py) ---
+# Máximo de combinaciones que se generan en una petición.
+MATRIZ_VARIANTES_MAX = int(os.getenv('MATRIZ_VARIANTES_MAX', '500'))
+
+# --- URLs de imágenes (apps/medios.py) ---
+# Máximo de URLs de Cloudinary memorizadas por proceso (LRU).
+MEDIOS_URLS_MAX = int(os.getenv('MEDIOS_URLS_MAX', '20000'))
+
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
 USE_I18N = True
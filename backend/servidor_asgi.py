@@ -0,0 +1,34 @@
+# backend/servidor_asgi.py
+"""
+Perfil de despliegue ASGI del backend.
+
+Sirve main.asgi:application con uvicorn y activa las vistas puente async
+(IA_VISTAS_ASYNC=True): las peticiones a /api/ia/ que esperan a los
+microservicios no ocupan hilos, así que un reporte lento no deja sin
+capacidad al catálogo ni al checkout.
+
+Variables de entorno:
+    HOST (0.0.0.0), PORT (8000)
+    WEB_CONCURRENCY      Procesos worker (2)
+    ASGI_LIMITE_CONCURRENCIA  Conexiones simultáneas por worker antes de responder 503 (1000)
+    ASGI_KEEP_ALIVE      Segundos de keep-alive con el cliente/proxy (5)
+
+Uso (desde backend/):
+    python servidor_asgi.py
+"""
+import os
+
+import uvicorn
+
+if __name__ == '__main__':
+    os.environ['IA_VISTAS_ASYNC'] = 'True'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'main.settings')
+    uvicorn.run(
+        'main.asgi:application',
+        host=os.getenv('HOST', '0.0.0.0'),
+        port=int(os.getenv('PORT', '8000')),
+        workers=int(os.getenv('WEB_CONCURRENCY', '2')),
+        limit_concurrency=int(os.getenv('ASGI_LIMITE_CONCURRENCIA', '1000')),
+        timeout_keep_alive=int(os.getenv('ASGI_KEEP_ALIVE', '5')),
+        lifespan='on',  # main.asgi cierra los clientes httpx al apagarse
+    )
@@ -9,4 +9,27 @@ if not COHERE_API_KEY:
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
-    raise ValueError("¡No se encontró la DATABASE_URL! Asegúrate de que tu archivo .env esté correcto.")
\ No newline at end of file
+    raise ValueError("¡No se encontró la DATABASE_URL! Asegúrate de que tu archivo .env esté correcto.")
+
+# --- Pool de conexiones a la Base de Datos ---
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))      # segundos esperando una conexión libre
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))    # segundos antes de reciclar una conexión
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "True") == "True"
+
+# Tiempo máximo por consulta (ms). La BD cancela la consulta si lo excede.
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+
+# --- Cliente LLM (deadline, concurrencia y circuit breaker) ---
+LLM_PROVEEDOR = os.getenv("LLM_PROVEEDOR", "cohere")           # "cohere" | "falso" (pruebas locales)
+LLM_MODELO = os.getenv("LLM_MODELO", "command-a-03-2025")
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "15"))        # deadline por llamada (incluye reintentos)
+LLM_MAX_CONCURRENCIA = int(os.getenv("LLM_MAX_CONCURRENCIA", "4"))
+LLM_ESPERA_COLA_S = float(os.getenv("LLM_ESPERA_COLA_S", "2"))  # espera máxima por un cupo libre
+LLM_REINTENTOS = int(os.getenv("LLM_REINTENTOS", "1"))
+LLM_CB_UMBRAL_FALLOS = int(os.getenv("LLM_CB_UMBRAL_FALLOS", "5"))
+LLM_CB_ENFRIAMIENTO_S = float(os.getenv("LLM_CB_ENFRIAMIENTO_S", "30"))
+# Proveedor falso: retardo e índice de errores inyectados
+LLM_FALSO_RETARDO_S = float(os.getenv("LLM_FALSO_RETARDO_S", "0"))
+LLM_FALSO_TASA_ERROR = float(os.getenv("LLM_FALSO_TASA_ERROR", "0"))
@@ -0,0 +1,108 @@
+# app/core/database.py
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
+from .config import (
+    DATABASE_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING,
+    DB_STATEMENT_TIMEOUT_MS,
+)
+
+# SQLSTATE de PostgreSQL para una consulta cancelada (statement_timeout)
+SQLSTATE_CONSULTA_CANCELADA = "57014"
+
+# Drivers async equivalentes a los drivers síncronos de la DATABASE_URL
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def _opciones_pool(url) -> dict:
+    """Opciones de pool comunes para el motor síncrono y el async."""
+    opciones = {"pool_pre_ping": DB_POOL_PRE_PING}
+    if url.get_backend_name() == "postgresql":
+        opciones.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+    return opciones
+
+
+def crear_engine(database_url: str = DATABASE_URL):
+    """
+    Motor síncrono con pool configurable.
+    En PostgreSQL fija statement_timeout por conexión, así una consulta
+    desbocada se cancela en la BD en lugar de bloquear un worker.
+    """
+    url = make_url(database_url)
+    connect_args = {}
+    if url.get_backend_name() == "postgresql":
+        connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+    return create_engine(url, connect_args=connect_args, **_opciones_pool(url))
+
+
+def crear_async_engine(database_url: str = DATABASE_URL):
+    """
+    Motor async (asyncpg / aiosqlite) para que los handlers de FastAPI
+    no bloqueen el event loop mientras esperan a la BD.
+    Devuelve None si el driver async no está instalado.
+    """
+    try:
+        from sqlalchemy.ext.asyncio import create_async_engine
+    except ImportError:
+        return None
+
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        return None
+    url = url.set(drivername=ASYNC_DRIVERS[backend])
+
+    connect_args = {}
+    if backend == "postgresql":
+        connect_args["server_settings"] = {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
+
+    try:
+        return create_async_engine(url, connect_args=connect_args, **_opciones_pool(url))
+    except ImportError as e:
+        print(f"Motor async no disponible ({e}). Se usará el motor síncrono en un threadpool.")
+        return None
+
+
+def consulta_cancelada(error: Exception) -> bool:
+    """
+    True si la BD canceló la consulta por statement_timeout. SQLAlchemy la
+    envuelve en OperationalError/DBAPIError; psycopg2 y el adaptador de
+    asyncpg dejan el SQLSTATE en orig.pgcode.
+    """
+    return isinstance(error, DBAPIError) and getattr(error.orig, "pgcode", None) == SQLSTATE_CONSULTA_CANCELADA
+
+
+def estado_pool(engine) -> dict:
+    """Métricas de utilización del pool de un motor (síncrono o async)."""
+    if engine is None:
+        return {"disponible": False}
+    pool = getattr(engine, "sync_engine", engine).pool
+    metricas = {"disponible": True, "tipo": type(pool).__name__}
+    for nombre in ("size", "checkedin", "checkedout", "overflow"):
+        metodo = getattr(pool, nombre, None)
+        if callable(metodo):
+            metricas[nombre] = metodo()
+    return metricas
+
+
+try:
+    engine = crear_engine()
+    print("Conexión a la base de datos PostgreSQL establecida exitosamente.")
+except Exception as e:
+    print(f"Error al conectar a la base de datos: {e}")
+    engine = None
+
+async_engine = crear_async_engine() if engine is not None else None
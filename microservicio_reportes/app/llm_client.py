@@ -0,0 +1,274 @@
+# microservicio_reportes/app/llm_client.py
+"""
+Cliente LLM resiliente.
+
+Envuelve al proveedor (Cohere, o uno falso para pruebas locales) con:
+- Deadline por llamada: el hilo del request deja de esperar al vencer.
+- Semáforo de concurrencia: como máximo N llamadas en vuelo contra el
+  proveedor; una llamada colgada sigue ocupando su cupo hasta que termine.
+- Reintentos acotados para errores (no para timeouts), dentro del deadline.
+- Circuit breaker: tras N fallos seguidos falla rápido durante un
+  enfriamiento y luego deja pasar una única llamada de prueba.
+- Métricas de latencia y errores (GET /metricas/llm).
+"""
+import json
+import math
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from .core.config import (
+    COHERE_API_KEY,
+    LLM_PROVEEDOR,
+    LLM_MODELO,
+    LLM_TIMEOUT_S,
+    LLM_MAX_CONCURRENCIA,
+    LLM_ESPERA_COLA_S,
+    LLM_REINTENTOS,
+    LLM_CB_UMBRAL_FALLOS,
+    LLM_CB_ENFRIAMIENTO_S,
+    LLM_FALSO_RETARDO_S,
+    LLM_FALSO_TASA_ERROR,
+)
+
+
+class ErrorProveedorLLM(Exception):
+    """El proveedor LLM no dio una respuesta utilizable."""
+
+
+class TiempoAgotadoLLMError(ErrorProveedorLLM):
+    """La llamada superó su deadline."""
+
+
+class ConcurrenciaAgotadaError(ErrorProveedorLLM):
+    """No hubo cupo libre en el semáforo a tiempo."""
+
+
+class CircuitoAbiertoError(ErrorProveedorLLM):
+    """El circuit breaker está abierto: no se llama al proveedor."""
+
+
+# --- Proveedores ---
+
+class ProveedorCohere:
+    def __init__(self, api_key: str, modelo: str):
+        import cohere
+        # Los reintentos los gestiona ClienteLLM, no el SDK
+        self.co = cohere.Client(api_key, max_retries=0)
+        self.modelo = modelo
+
+    def chat(self, message: str, preamble: str, temperature: float, timeout_s: float) -> str:
+        response = self.co.chat(
+            message=message,
+            preamble=preamble,
+            temperature=temperature,
+            model=self.modelo,
+            request_options={"timeout_in_seconds": max(1, math.ceil(timeout_s)), "max_retries": 0},
+        )
+        return response.text
+
+
+class ProveedorFalso:
+    """
+    Proveedor local para pruebas: responde con el parser por reglas
+    e inyecta retardos y errores de forma configurable.
+    """
+
+    def __init__(self, retardo_s: float = 0.0, tasa_error: float = 0.0, semilla=None, respuesta: str = None):
+        self.retardo_s = retardo_s
+        self.tasa_error = tasa_error
+        self.respuesta = respuesta
+        self._random = random.Random(semilla)
+
+    def chat(self, message: str, preamble: str, temperature: float, timeout_s: float) -> str:
+        if self.retardo_s:
+            time.sleep(self.retardo_s)
+        if self._random.random() < self.tasa_error:
+            raise ErrorProveedorLLM("Error inyectado por el proveedor falso.")
+        if self.respuesta is not None:
+            return self.respuesta
+        from .parser_reglas import analizar_prompt_reglas
+        return json.dumps(analizar_prompt_reglas(message))
+
+
+# --- Circuit breaker ---
+
+class CircuitBreaker:
+    CERRADO = "cerrado"
+    ABIERTO = "abierto"
+    SEMI_ABIERTO = "semi_abierto"
+
+    def __init__(self, umbral_fallos: int, enfriamiento_s: float, reloj=time.monotonic):
+        self.umbral_fallos = umbral_fallos
+        self.enfriamiento_s = enfriamiento_s
+        self._reloj = reloj
+        self._lock = threading.Lock()
+        self._estado = self.CERRADO
+        self._fallos_seguidos = 0
+        self._abierto_desde = 0.0
+        self._prueba_en_curso = False
+
+    @property
+    def estado(self) -> str:
+        with self._lock:
+            return self._estado
+
+    def permitir(self) -> bool:
+        """¿Puede pasar esta llamada? En semi-abierto solo pasa una de prueba."""
+        with self._lock:
+            if self._estado == self.ABIERTO:
+                if self._reloj() - self._abierto_desde < self.enfriamiento_s:
+                    return False
+                self._estado = self.SEMI_ABIERTO
+            if self._estado == self.SEMI_ABIERTO:
+                if self._prueba_en_curso:
+                    return False
+                self._prueba_en_curso = True
+            return True
+
+    def registrar_exito(self):
+        with self._lock:
+            self._estado = self.CERRADO
+            self._fallos_seguidos = 0
+            self._prueba_en_curso = False
+
+    def liberar_prueba(self):
+        """La llamada no llegó al proveedor: no cuenta ni como éxito ni como fallo."""
+        with self._lock:
+            self._prueba_en_curso = False
+
+    def registrar_fallo(self):
+        with self._lock:
+            self._fallos_seguidos += 1
+            self._prueba_en_curso = False
+            if self._estado == self.SEMI_ABIERTO or self._fallos_seguidos >= self.umbral_fallos:
+                self._estado = self.ABIERTO
+                self._abierto_desde = self._reloj()
+
+
+# --- Métricas ---
+
+class MetricasLLM:
+    CONTADORES = (
+        "llamadas", "exitos", "errores", "timeouts", "reintentos",
+        "rechazos_concurrencia", "rechazos_circuito", "fallback_reglas",
+    )
+
+    def __init__(self, ventana: int = 1000):
+        self._lock = threading.Lock()
+        self._contadores = dict.fromkeys(self.CONTADORES, 0)
+        self._latencias = deque(maxlen=ventana)
+
+    def incrementar(self, contador: str):
+        with self._lock:
+            self._contadores[contador] += 1
+
+    def registrar_latencia(self, segundos: float):
+        with self._lock:
+            self._latencias.append(segundos)
+
+    def resumen(self) -> dict:
+        with self._lock:
+            latencias = sorted(self._latencias)
+            resumen = dict(self._contadores)
+        if latencias:
+            resumen["latencia_ms"] = {
+                "p50": round(latencias[len(latencias) // 2] * 1000, 1),
+                "p95": round(latencias[min(len(latencias) - 1, int(len(latencias) * 0.95))] * 1000, 1),
+                "max": round(latencias[-1] * 1000, 1),
+                "muestras": len(latencias),
+            }
+        return resumen
+
+
+# --- Cliente ---
+
+class ClienteLLM:
+    def __init__(
+        self,
+        proveedor,
+        timeout_s: float = LLM_TIMEOUT_S,
+        max_concurrencia: int = LLM_MAX_CONCURRENCIA,
+        espera_cola_s: float = LLM_ESPERA_COLA_S,
+        reintentos: int = LLM_REINTENTOS,
+        circuito: CircuitBreaker = None,
+    ):
+        self.proveedor = proveedor
+        self.timeout_s = timeout_s
+        self.espera_cola_s = espera_cola_s
+        self.reintentos = reintentos
+        self.circuito = circuito or CircuitBreaker(LLM_CB_UMBRAL_FALLOS, LLM_CB_ENFRIAMIENTO_S)
+        self.metricas = MetricasLLM()
+        self._semaforo = threading.BoundedSemaphore(max_concurrencia)
+        # Un hilo por cupo del semáforo: las llamadas nunca esperan en la cola del executor
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrencia, thread_name_prefix="llm")
+
+    def _llamar_una_vez(self, message: str, preamble: str, temperature: float, restante: float) -> str:
+        if not self._semaforo.acquire(timeout=min(self.espera_cola_s, restante)):
+            self.metricas.incrementar("rechazos_concurrencia")
+            raise ConcurrenciaAgotadaError("Demasiadas llamadas al LLM en curso.")
+
+        self.metricas.incrementar("llamadas")
+        inicio = time.monotonic()
+        futuro = self._executor.submit(self.proveedor.chat, message, preamble, temperature, restante)
+        # El cupo se libera cuando el proveedor termina de verdad, no cuando vence el deadline
+        futuro.add_done_callback(lambda _: self._semaforo.release())
+        try:
+            texto = futuro.result(timeout=restante)
+        except FutureTimeout:
+            self.metricas.incrementar("timeouts")
+            raise TiempoAgotadoLLMError(f"El LLM no respondió en {restante:.2f}s.")
+        except Exception as e:
+            self.metricas.incrementar("errores")
+            raise ErrorProveedorLLM(str(e)) from e
+        self.metricas.registrar_latencia(time.monotonic() - inicio)
+        return texto
+
+    def chat(self, message: str, preamble: str, temperature: float = 0.2) -> str:
+        """
+        Devuelve el texto del modelo o lanza ErrorProveedorLLM
+        (TiempoAgotadoLLMError, ConcurrenciaAgotadaError, CircuitoAbiertoError).
+        """
+        if not self.circuito.permitir():
+            self.metricas.incrementar("rechazos_circuito")
+            raise CircuitoAbiertoError("Proveedor LLM degradado (circuito abierto).")
+
+        deadline = time.monotonic() + self.timeout_s
+        intento = 0
+        while True:
+            try:
+                texto = self._llamar_una_vez(message, preamble, temperature, deadline - time.monotonic())
+            except ConcurrenciaAgotadaError:
+                # Saturación local: el proveedor no ha fallado
+                self.circuito.liberar_prueba()
+                raise
+            except TiempoAgotadoLLMError:
+                self.circuito.registrar_fallo()
+                raise
+            except ErrorProveedorLLM:
+                intento += 1
+                if intento > self.reintentos or deadline - time.monotonic() <= 0:
+                    self.circuito.registrar_fallo()
+                    raise
+                self.metricas.incrementar("reintentos")
+                continue
+            self.metricas.incrementar("exitos")
+            self.circuito.registrar_exito()
+            return texto
+
+    def estado(self) -> dict:
+        return {
+            "proveedor": type(self.proveedor).__name__,
+            "circuito": self.circuito.estado,
+            **self.metricas.resumen(),
+        }
+
+
+def crear_cliente_llm() -> ClienteLLM:
+    if LLM_PROVEEDOR == "falso":
+        proveedor = ProveedorFalso(retardo_s=LLM_FALSO_RETARDO_S, tasa_error=LLM_FALSO_TASA_ERROR)
+    else:
+        proveedor = ProveedorCohere(COHERE_API_KEY, LLM_MODELO)
+    return ClienteLLM(proveedor)
@@ -1,14 +1,15 @@
 # microservicio_reportes/app/llm_service.py
-import cohere
 import json
 import re
-from .core.config import COHERE_API_KEY
 from datetime import date
 from .utils.date_utils import obtener_rango_fechas
+from .llm_client import crear_cliente_llm, ErrorProveedorLLM
+from .parser_reglas import analizar_prompt_reglas
 
 # Configura la API de Google
 #genai.configure(api_key=GEMINI_API_KEY)
-co = cohere.Client(COHERE_API_KEY)
+# Cohere detrás del cliente resiliente (deadline, semáforo y circuit breaker)
+cliente_llm = crear_cliente_llm()
 
 def construir_preambulo_sistema(fecha_actual: str) -> str:
     """
@@ -112,20 +113,25 @@ def analizar_prompt_usuario(user_prompt: str) -> dict:
     """
     Envía el prompt del usuario a Cohere y devuelve un JSON estructurado.
     Incluye manejo de errores, validación y logs.
+    Si el proveedor está degradado (timeout, sin cupo, circuito abierto o
+    error) se usa el parser por reglas en su lugar.
     """
     hoy = date.today().isoformat()
     preambulo = construir_preambulo_sistema(hoy)
     print(f"\n🧠 Prompt del usuario: {user_prompt}\n")
 
     try:
-        response = co.chat(
+        raw_text = cliente_llm.chat(
             message=user_prompt,
             preamble=preambulo,
             temperature=0.2,
-            model="command-a-03-2025"
-        )
+        ).strip()
+    except ErrorProveedorLLM as e:
+        print(f"⚠️ Proveedor LLM degradado ({e}). Usando el parser por reglas.")
+        cliente_llm.metricas.incrementar("fallback_reglas")
+        return analizar_prompt_reglas(user_prompt)
 
-        raw_text = response.text.strip()
+    try:
         print(f"🪶 Respuesta cruda del modelo:\n{raw_text}\n")
 
         json_text = limpiar_json(raw_text)
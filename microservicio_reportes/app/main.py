@@ -1,18 +1,44 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI, HTTPException, Header
 from starlette.responses import StreamingResponse, Response
+from starlette.concurrency import run_in_threadpool
 import io
+import asyncio
 import pandas as pd
 from .schemas import ReportRequest
-from .llm_service import analizar_prompt_usuario
+from .llm_service import analizar_prompt_usuario, cliente_llm
+from .core.database import engine, async_engine, estado_pool, consulta_cancelada
 from .reporting import (
-    get_report_dataframe, 
+    get_report_dataframe_async, 
     convert_df_to_excel_bytes, 
-    convert_df_to_pdf_bytes
+    convert_df_to_pdf_bytes,
+    convert_df_to_json_bytes,
+    convert_df_to_arrow_bytes,
+    arrow_disponible,
+    ARROW_STREAM_MEDIA_TYPE,
+    decodificar_cursor,
+    separar_pagina,
+    METRICAS_PAGINABLES,
 )
 
+TIMEOUT_CONSULTA = "La consulta del reporte excedió el tiempo máximo permitido."
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Al apagar: cerrar los pools de conexiones
+    if async_engine is not None:
+        await async_engine.dispose()
+    if engine is not None:
+        engine.dispose()
+
+
 app = FastAPI(
     title="Microservicio de Reportes de IA",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # El decorador @app.get("/") le dice a FastAPI que esta función maneja las peticiones a la raíz "/"
@@ -23,36 +49,68 @@ def leer_raiz():
     """
     return {"mensaje": "¡Microservicio de Reportes está en línea!"}
 
+@app.get("/metricas/db")
+def metricas_db():
+    """
+    Utilización de los pools de conexiones (síncrono y async).
+    """
+    return {
+        "pool_sync": estado_pool(engine),
+        "pool_async": estado_pool(async_engine),
+    }
+
+@app.get("/metricas/llm")
+def metricas_llm():
+    """
+    Latencias, errores y estado del circuit breaker del cliente LLM.
+    """
+    return cliente_llm.estado()
+
 @app.post("/generar-reporte-ia")
-def generar_reporte(request: ReportRequest):
+async def generar_reporte(request: ReportRequest, accept: Optional[str] = Header(default=None)):
     """
     Recibe un prompt, lo analiza con IA, consulta la BD
     y devuelve un archivo (Excel, PDF) o los datos (JSON).
+    Si el cliente acepta application/vnd.apache.arrow.stream, los datos
+    se devuelven como Arrow IPC stream en lugar de JSON.
     """
     print(f"Recibido prompt: {request.prompt}")
     
-    # 1. Analizamos el prompt con la IA (Cohere + utils)
-    try:
-        parametros = analizar_prompt_usuario(request.prompt)
-        if "error" in parametros:
-            raise HTTPException(status_code=400, detail=parametros["error"])
-    except Exception as e:
-        print(f"Error en servicio LLM: {e}")
-        raise HTTPException(status_code=500, detail=f"Error al contactar la IA: {e}")
+    if request.cursor:
+        # Página siguiente: el cursor ya trae la métrica y el rango, no hace falta la IA
+        parametros = decodificar_cursor(request.cursor)
+    else:
+        # 1. Analizamos el prompt con la IA (Cohere + utils)
+        try:
+            # La llamada a Cohere es síncrona: la sacamos del event loop
+            parametros = await run_in_threadpool(analizar_prompt_usuario, request.prompt)
+            if "error" in parametros:
+                raise HTTPException(status_code=400, detail=parametros["error"])
+        except HTTPException:
+            raise
+        except Exception as e:
+            print(f"Error en servicio LLM: {e}")
+            raise HTTPException(status_code=500, detail=f"Error al contactar la IA: {e}")
+
+    paginado = (
+        parametros.get('metric') in METRICAS_PAGINABLES
+        and parametros.get('format', 'json').lower() == 'json'
+        and bool(request.page_size or parametros.get('page_size'))
+    )
+    if paginado and request.page_size:
+        parametros['page_size'] = request.page_size
     
     formato = parametros.get('format', 'json').lower()
     
     try:
         # 2. SIEMPRE consultamos la BD
-        df = get_report_dataframe(parametros)
+        df = await get_report_dataframe_async(parametros)
         
-        # Limpiamos el DataFrame para JSON
-        df_cleaned = df.replace({pd.NA: None, pd.NaT: None, float('nan'): None})
-
         # 3. Decidimos cómo formatear la salida
         if formato == 'excel':
             metric_name = parametros.get('metric', 'reporte')
-            excel_bytes = convert_df_to_excel_bytes(df_cleaned, metric_name)
+            df_cleaned = df.replace({pd.NA: None, pd.NaT: None, float('nan'): None})
+            excel_bytes = await run_in_threadpool(convert_df_to_excel_bytes, df_cleaned, metric_name)
             filename = f"reporte_{metric_name}.xlsx"
             
             return StreamingResponse(
@@ -63,7 +121,8 @@ def generar_reporte(request: ReportRequest):
             
         elif formato == 'pdf':
             metric_name = parametros.get('metric', 'reporte')
-            pdf_bytes = convert_df_to_pdf_bytes(df_cleaned, metric_name)
+            df_cleaned = df.replace({pd.NA: None, pd.NaT: None, float('nan'): None})
+            pdf_bytes = await run_in_threadpool(convert_df_to_pdf_bytes, df_cleaned, metric_name)
             filename = f"reporte_{metric_name}.pdf"
 
             return Response(
@@ -73,24 +132,46 @@ def generar_reporte(request: ReportRequest):
             )
 
         elif formato == 'json':
-            # Convertimos el DataFrame a un diccionario
-            data_json = df_cleaned.to_dict(orient='records')
-            
-            return {
+            next_cursor = None
+            if paginado:
+                df, next_cursor = separar_pagina(df, parametros)
+
+            metadata = {
                 "metric": parametros.get('metric'),
                 "group_by": parametros.get('group_by'),
                 "date_range": parametros.get('date_range'),
-                "count": len(data_json),
-                "data": data_json
+                "count": len(df),
             }
+            if paginado:
+                metadata.update(
+                    page_size=parametros['page_size'],
+                    next_cursor=next_cursor,
+                    has_more=next_cursor is not None,
+                )
+
+            if accept and ARROW_STREAM_MEDIA_TYPE in accept and arrow_disponible():
+                arrow_bytes = await run_in_threadpool(convert_df_to_arrow_bytes, df, metadata)
+                return Response(content=arrow_bytes, media_type=ARROW_STREAM_MEDIA_TYPE)
+
+            # Del DataFrame a bytes JSON en una pasada (sin dicts por fila)
+            json_bytes = await run_in_threadpool(convert_df_to_json_bytes, df, metadata)
+            return Response(content=json_bytes, media_type="application/json")
             
         else:
             raise HTTPException(status_code=400, detail=f"Formato '{formato}' no soportado.")
 
+    except HTTPException:
+        raise
     except NotImplementedError as e:
         # Error si la métrica no existe
         raise HTTPException(status_code=400, detail=str(e))
+    except asyncio.TimeoutError:
+        # La consulta excedió DB_STATEMENT_TIMEOUT_MS y fue cancelada
+        raise HTTPException(status_code=504, detail=TIMEOUT_CONSULTA)
     except Exception as e:
+        if consulta_cancelada(e):
+            # statement_timeout de PostgreSQL: la BD canceló la consulta
+            raise HTTPException(status_code=504, detail=TIMEOUT_CONSULTA)
         # Error general (ej. la tabla de BD no existe)
         print(f"Error al generar el reporte: {e}")
         raise HTTPException(status_code=500, detail=f"Error interno al generar el reporte: {e}")
\ No newline at end of file
@@ -0,0 +1,91 @@
+# microservicio_reportes/app/parser_reglas.py
+"""
+Parser de prompts basado en reglas (palabras clave).
+
+Es el plan B cuando el proveedor LLM está degradado: cubre las peticiones
+habituales ("ventas totales del mes pasado en excel", "pedidos pendientes
+de esta semana") y devuelve el mismo JSON que analizar_prompt_usuario.
+"""
+import re
+import unicodedata
+from typing import Optional
+
+from .utils.date_utils import obtener_rango_fechas
+
+# (palabras clave, métrica). Se evalúan en orden: las más específicas primero.
+# Las claves están sin tildes y en minúsculas.
+REGLAS_METRICAS = [
+    (("valor de vida", "ltv", "valor vida"), "valor_vida_cliente"),
+    (("retencion",), "retencion_clientes"),
+    (("clientes inactivos", "clientes perdidos", "sin comprar"), "clientes_inactivos"),
+    (("clientes frecuentes", "clientes recurrentes", "mejores clientes"), "clientes_frecuentes"),
+    (("clientes nuevos", "nuevos clientes"), "clientes_nuevos"),
+    (("ticket promedio", "valor promedio"), "ticket_promedio"),
+    (("cantidad de pedidos", "numero de pedidos", "total de pedidos", "cuantos pedidos"), "cantidad_pedidos"),
+    (("pedidos pendientes", "pendientes"), "pedidos_pendientes"),
+    (("pedidos enviados", "enviados"), "pedidos_enviados"),
+    (("pedidos entregados", "entregados"), "pedidos_entregados"),
+    (("devoluciones", "cancelados", "cancelaciones"), "devoluciones"),
+    (("stock bajo", "inventario bajo", "poco stock", "bajo stock"), "inventario_bajo"),
+    (("stock", "inventario", "existencias"), "stock_actual"),
+    (("por categoria",), "ventas_por_categoria"),
+    (("mas vendidos", "top productos", "productos estrella"), "productos_mas_vendidos"),
+    (("ventas", "ingresos", "facturacion"), "ventas_totales"),
+]
+
+REGLAS_FORMATO = [
+    (("excel", "xlsx", "hoja de calculo"), "excel"),
+    (("pdf",), "pdf"),
+]
+
+
+def normalizar_texto(texto: str) -> str:
+    """Minúsculas y sin tildes ("Últimos días" -> "ultimos dias")."""
+    sin_tildes = unicodedata.normalize("NFKD", texto.lower())
+    return "".join(c for c in sin_tildes if not unicodedata.combining(c))
+
+
+def _buscar(texto: str, reglas) -> Optional[str]:
+    for claves, valor in reglas:
+        if any(clave in texto for clave in claves):
+            return valor
+    return None
+
+
+def _descripcion_rango(texto: str) -> str:
+    """Traduce el texto normalizado a la descripción que entiende obtener_rango_fechas."""
+    match = re.search(r"ultim[oa]s (\d+) dias", texto)
+    if match:
+        return f"últimos {match.group(1)} días"
+    for clave, descripcion in (
+        ("hoy", "hoy"),
+        ("ayer", "ayer"),
+        ("esta semana", "esta semana"),
+        ("mes pasado", "mes pasado"),
+        ("mes anterior", "mes pasado"),
+        ("este trimestre", "este trimestre"),
+        ("este ano", "este año"),
+        ("ano actual", "año actual"),
+    ):
+        if clave in texto:
+            return descripcion
+    # Igual que el preámbulo del LLM: sin fecha -> mes actual
+    return "este mes"
+
+
+def analizar_prompt_reglas(user_prompt: str) -> dict:
+    """
+    Devuelve {"metric", "date_range", "format"} o {"error": ...}
+    si ninguna regla reconoce la métrica.
+    """
+    texto = normalizar_texto(user_prompt or "")
+    metric = _buscar(texto, REGLAS_METRICAS)
+    if metric is None:
+        return {"error": "No pude entender la petición. Asegúrate de formular una solicitud clara de reporte."}
+
+    return {
+        "metric": metric,
+        "date_range": obtener_rango_fechas(_descripcion_rango(texto)),
+        "format": _buscar(texto, REGLAS_FORMATO) or "json",
+        "origen": "reglas",
+    }
@@ -1,8 +1,18 @@
 # app/reporting.py
 import pandas as pd
 import io
-from sqlalchemy import create_engine, text
-from .core.config import DATABASE_URL
+import json
+import re
+import base64
+import uuid
+import asyncio
+from decimal import Decimal
+from datetime import date, datetime, time
+from sqlalchemy import text, bindparam, DateTime, Uuid
+from starlette.concurrency import run_in_threadpool
+from .core.config import DB_STATEMENT_TIMEOUT_MS
+from .core.database import engine, async_engine
+from .schemas import PAGE_SIZE_MAX
 from fastapi import HTTPException
 
 from reportlab.lib.pagesizes import letter, landscape
@@ -11,17 +21,19 @@ from reportlab.lib import colors
 import openpyxl
 
 try:
-    engine = create_engine(DATABASE_URL)
-    print("Conexión a la base de datos PostgreSQL establecida exitosamente.")
-except Exception as e:
-    print(f"Error al conectar a la base de datos: {e}")
-    engine = None
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# Transporte binario columnar opcional (Arrow IPC stream) hacia Django
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
 
 # ==============================================================================
 # --- LÓGICA DE CONSULTAS SQL (BASADA EN TUS MODELOS) ---
 # ==============================================================================
-# Cada función _get_... sabe cómo construir y ejecutar una consulta SQL.
-def _get_ventas_totales(params: dict, date_range: dict) -> pd.DataFrame:
+# Cada función _get_... sabe cómo construir y ejecutar una consulta SQL
+# sobre la conexión que recibe (síncrona o la fachada de run_sync del motor async).
+def _get_ventas_totales(params: dict, date_range: dict, conn) -> pd.DataFrame:
     # CORRECCIÓN: Usamos :start_date y :end_date
     sql_query = text("""
         SELECT 
@@ -35,9 +47,9 @@ def _get_ventas_totales(params: dict, date_range: dict) -> pd.DataFrame:
         GROUP BY DATE(creado_en)
         ORDER BY fecha;
     """)
-    return pd.read_sql(sql_query, engine, params=date_range)
+    return pd.read_sql(sql_query, conn, params=date_range)
 
-def _get_ticket_promedio(params: dict, date_range: dict) -> pd.DataFrame:
+def _get_ticket_promedio(params: dict, date_range: dict, conn) -> pd.DataFrame:
     # CORRECCIÓN: Usamos :start_date y :end_date
     sql_query = text("""
         SELECT 
@@ -52,9 +64,9 @@ def _get_ticket_promedio(params: dict, date_range: dict) -> pd.DataFrame:
         GROUP BY DATE(creado_en)
         ORDER BY fecha;
     """)
-    return pd.read_sql(sql_query, engine, params=date_range)
+    return pd.read_sql(sql_query, conn, params=date_range)
 
-def _get_productos_mas_vendidos(params: dict, date_range: dict) -> pd.DataFrame:
+def _get_productos_mas_vendidos(params: dict, date_range: dict, conn) -> pd.DataFrame:
     limit = int(params.get("limit", 10))
     # CORRECCIÓN: Usamos :start_date y :end_date
     sql_query = text("""
@@ -74,9 +86,9 @@ def _get_productos_mas_vendidos(params: dict, date_range: dict) -> pd.DataFrame:
         ORDER BY total_unidades_vendidas DESC
         LIMIT :limit;
     """)
-    return pd.read_sql(sql_query, engine, params={**date_range, "limit": limit})
+    return pd.read_sql(sql_query, conn, params={**date_range, "limit": limit})
 
-def _get_ventas_por_categoria(params: dict, date_range: dict) -> pd.DataFrame:
+def _get_ventas_por_categoria(params: dict, date_range: dict, conn) -> pd.DataFrame:
     # CORRECCIÓN: Usamos :start_date y :end_date
     sql_query = text("""
         SELECT 
@@ -94,9 +106,9 @@ def _get_ventas_por_categoria(params: dict, date_range: dict) -> pd.DataFrame:
         GROUP BY c.nombre
         ORDER BY total_monto_vendido DESC;
     """)
-    return pd.read_sql(sql_query, engine, params=date_range)
+    return pd.read_sql(sql_query, conn, params=date_range)
 
-def _get_pedidos_por_estado(params: dict, date_range: dict) -> pd.DataFrame:
+def _get_pedidos_por_estado(params: dict, date_range: dict, conn) -> pd.DataFrame:
     metric_map = {
         'pedidos_pendientes': ['PENDIENTE', 'EN_VERIFICACION'],
         'pedidos_enviados': ['ENVIADO'],
@@ -105,19 +117,39 @@ def _get_pedidos_por_estado(params: dict, date_range: dict) -> pd.DataFrame:
     }
     metric = params.get('metric')
     estados = metric_map.get(metric, ['PENDIENTE'])
-    
-    # CORRECCIÓN: Usamos :start_date y :end_date
-    sql_query = text("""
+    sql_params = {**date_range, "estados": list(estados)}
+
+    # Paginación keyset sobre (creado_en, id): sin OFFSET, cada página
+    # cuesta lo mismo que la primera (usa el índice estado, creado_en).
+    keyset = ""
+    limit = ""
+    posicion = params.get('after')
+    if posicion:
+        keyset = "AND (creado_en, id) > (:after_creado_en, :after_id)"
+        sql_params.update(after_creado_en=posicion['creado_en'], after_id=posicion['id'])
+    if params.get('page_size'):
+        # Una fila extra para saber si hay más páginas
+        limit = "LIMIT :limit"
+        sql_params['limit'] = int(params['page_size']) + 1
+
+    sql_query = text(f"""
         SELECT id, creado_en, email_cliente, total_pedido, estado
         FROM pedidos_pedido
         WHERE 
             creado_en BETWEEN :start_date AND :end_date
             AND estado IN :estados
-        ORDER BY creado_en;
-    """)
-    return pd.read_sql(sql_query, engine, params={**date_range, "estados": tuple(estados)})
+            {keyset}
+        ORDER BY creado_en, id
+        {limit};
+    """).bindparams(bindparam("estados", expanding=True))
+    if posicion:
+        sql_query = sql_query.bindparams(
+            bindparam("after_creado_en", type_=DateTime(timezone=True)),
+            bindparam("after_id", type_=Uuid()),
+        )
+    return pd.read_sql(sql_query, conn, params=sql_params)
 
-def _get_stock_actual(params: dict, date_range: dict) -> pd.DataFrame:
+def _get_stock_actual(params: dict, date_range: dict, conn) -> pd.DataFrame:
     where_clause = ""
     if params.get('metric') == 'inventario_bajo':
         where_clause = "WHERE s.cantidad <= 10"
@@ -135,32 +167,38 @@ def _get_stock_actual(params: dict, date_range: dict) -> pd.DataFrame:
         {where_clause}
         ORDER BY s.cantidad ASC, p.nombre;
     """)
-    return pd.read_sql(sql_query, engine)
+    return pd.read_sql(sql_query, conn)
 
-def _get_clientes_nuevos(params: dict, date_range: dict) -> pd.DataFrame:
-    # CORRECCIÓN: Usamos :start_date y :end_date
+# Métricas de clientes. pedidos_resumencliente (mantenida por Django) solo
+# guarda datos de TODA la historia: primera y última compra y acumulados por
+# email. Sirve para lo que no depende del rango (la fecha de primera compra,
+# el valor de vida, quién no ha vuelto desde antes del rango). Lo que depende
+# del rango (quién compró en él y cuánto) se agrega sobre pedidos_pedido del
+# rango con el índice (estado, creado_en).
+# Emails con algún pedido pagado dentro del rango
+_COMPRADORES_EN_RANGO = """
+    SELECT DISTINCT email_cliente
+    FROM pedidos_pedido
+    WHERE
+        creado_en BETWEEN :start_date AND :end_date
+        AND estado IN ('PAGADO', 'ENVIADO', 'ENTREGADO')
+"""
+
+def _get_clientes_nuevos(params: dict, date_range: dict, conn) -> pd.DataFrame:
+    # La primera compra no cambia con compras posteriores: vale para cualquier rango
     sql_query = text("""
-        WITH PrimeraCompra AS (
-            SELECT 
-                email_cliente, 
-                MIN(creado_en) as fecha_primera_compra,
-                COUNT(id) as total_pedidos
-            FROM pedidos_pedido
-            WHERE estado IN ('PAGADO', 'ENVIADO', 'ENTREGADO')
-            GROUP BY email_cliente
-        )
         SELECT 
-            pc.email_cliente, 
-            pc.fecha_primera_compra,
-            pc.total_pedidos
-        FROM PrimeraCompra pc
-        WHERE pc.fecha_primera_compra BETWEEN :start_date AND :end_date
-        ORDER BY pc.fecha_primera_compra DESC;
+            email_cliente, 
+            fecha_primera_compra,
+            total_pedidos
+        FROM pedidos_resumencliente
+        WHERE fecha_primera_compra BETWEEN :start_date AND :end_date
+        ORDER BY fecha_primera_compra DESC;
     """)
-    return pd.read_sql(sql_query, engine, params=date_range)
+    return pd.read_sql(sql_query, conn, params=date_range)
 
-def _get_clientes_frecuentes(params: dict, date_range: dict) -> pd.DataFrame:
-    # CORRECCIÓN: Usamos :start_date y :end_date
+def _get_clientes_frecuentes(params: dict, date_range: dict, conn) -> pd.DataFrame:
+    # Clientes con más de un pedido dentro del rango
     sql_query = text("""
         SELECT 
             email_cliente, 
@@ -174,9 +212,55 @@ def _get_clientes_frecuentes(params: dict, date_range: dict) -> pd.DataFrame:
         HAVING COUNT(id) > 1
         ORDER BY total_pedidos DESC;
     """)
-    return pd.read_sql(sql_query, engine, params=date_range)
+    return pd.read_sql(sql_query, conn, params=date_range)
 
-def _not_implemented(params: dict, date_range: dict) -> pd.DataFrame:
+def _get_valor_vida_cliente(params: dict, date_range: dict, conn) -> pd.DataFrame:
+    # LTV (de toda la historia) de los clientes que compraron dentro del rango
+    sql_query = text(f"""
+        SELECT 
+            r.email_cliente,
+            r.fecha_primera_compra,
+            r.fecha_ultima_compra,
+            r.total_pedidos,
+            r.gasto_total as valor_vida_cliente,
+            r.gasto_total / NULLIF(r.total_pedidos, 0) as ticket_promedio
+        FROM pedidos_resumencliente AS r
+        JOIN ({_COMPRADORES_EN_RANGO}) AS en_rango ON en_rango.email_cliente = r.email_cliente
+        ORDER BY r.gasto_total DESC;
+    """)
+    return pd.read_sql(sql_query, conn, params=date_range)
+
+def _get_clientes_inactivos(params: dict, date_range: dict, conn) -> pd.DataFrame:
+    # Clientes cuya última compra es anterior al rango: no han vuelto desde
+    # entonces (quien volvió después del rango ya no es inactivo). Sale del
+    # resumen con el índice de fecha_ultima_compra, sin recorrer pedidos_pedido.
+    sql_query = text("""
+        SELECT 
+            email_cliente,
+            fecha_ultima_compra,
+            total_pedidos,
+            gasto_total
+        FROM pedidos_resumencliente
+        WHERE fecha_ultima_compra < :start_date
+        ORDER BY fecha_ultima_compra DESC;
+    """)
+    return pd.read_sql(sql_query, conn, params=date_range)
+
+def _get_retencion_clientes(params: dict, date_range: dict, conn) -> pd.DataFrame:
+    # De los clientes que ya existían antes del rango (primera compra anterior),
+    # cuántos volvieron a comprar dentro de él
+    sql_query = text(f"""
+        SELECT 
+            COUNT(*) as clientes_previos,
+            COUNT(en_rango.email_cliente) as clientes_retenidos,
+            ROUND(100.0 * COUNT(en_rango.email_cliente) / NULLIF(COUNT(*), 0), 2) as tasa_retencion
+        FROM pedidos_resumencliente AS r
+        LEFT JOIN ({_COMPRADORES_EN_RANGO}) AS en_rango ON en_rango.email_cliente = r.email_cliente
+        WHERE r.fecha_primera_compra < :start_date;
+    """)
+    return pd.read_sql(sql_query, conn, params=date_range)
+
+def _not_implemented(params: dict, date_range: dict, conn) -> pd.DataFrame:
     metric = params.get('metric')
     if metric in ['costos_totales', 'margen_beneficio', 'rotacion_inventario']:
         raise NotImplementedError(f"Métrica '{metric}' no implementable. Faltan datos de 'costo'.")
@@ -205,6 +289,9 @@ METRIC_HANDLERS = {
     'devoluciones': _get_pedidos_por_estado,
     'clientes_nuevos': _get_clientes_nuevos,
     'clientes_frecuentes': _get_clientes_frecuentes,
+    'valor_vida_cliente': _get_valor_vida_cliente,
+    'clientes_inactivos': _get_clientes_inactivos,
+    'retencion_clientes': _get_retencion_clientes,
     
     # No implementados
     'ingresos_brutos': _not_implemented,
@@ -219,10 +306,31 @@ METRIC_HANDLERS = {
     'cupones_mas_usados': _not_implemented,
 }
 
-def get_report_dataframe(parametros: dict) -> pd.DataFrame:
-    if engine is None:
-        raise Exception("Error crítico: El motor de la base de datos no está inicializado.")
+def _a_datetime(valor) -> datetime:
+    """Convierte 'AAAA-MM-DD' (o un date/datetime) al inicio de ese día."""
+    if isinstance(valor, datetime):
+        return valor
+    if isinstance(valor, date):
+        return datetime.combine(valor, time.min)
+    return datetime.fromisoformat(str(valor))
 
+def _normalizar_rango(date_range: dict) -> dict:
+    """
+    Pasa las fechas del rango a datetime para que los drivers estrictos
+    (asyncpg) y psycopg2 reciban el mismo tipo de parámetro.
+    """
+    if not date_range:
+        return date_range
+    try:
+        return {
+            "start_date": _a_datetime(date_range["start_date"]),
+            "end_date": _a_datetime(date_range["end_date"]),
+        }
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"Rango de fechas inválido: {date_range}")
+
+def _resolver_handler(parametros: dict):
+    """Valida los parámetros de la IA y devuelve (métrica, rango, handler)."""
     metric = parametros.get('metric')
     date_range = parametros.get('date_range')
     
@@ -235,16 +343,175 @@ def get_report_dataframe(parametros: dict) -> pd.DataFrame:
     handler_function = METRIC_HANDLERS.get(metric, _not_implemented)
     
     print(f"Generando reporte para métrica: {metric} usando {handler_function.__name__}")
+    return metric, _normalizar_rango(date_range), handler_function
 
-    df = handler_function(parametros, date_range)
-    
+def _resultado_o_mensaje(df: pd.DataFrame, metric: str) -> pd.DataFrame:
     if df is None or (isinstance(df, pd.DataFrame) and df.empty):
         print(f"Advertencia: La consulta para '{metric}' no devolvió datos.")
         return pd.DataFrame({"mensaje": ["La consulta no devolvió resultados para este rango de fechas."]})
-
     return df
 
+def get_report_dataframe(parametros: dict) -> pd.DataFrame:
+    if engine is None:
+        raise Exception("Error crítico: El motor de la base de datos no está inicializado.")
+
+    metric, date_range, handler_function = _resolver_handler(parametros)
+
+    with engine.connect() as conn:
+        df = handler_function(parametros, date_range, conn)
+    
+    return _resultado_o_mensaje(df, metric)
+
+async def get_report_dataframe_async(parametros: dict) -> pd.DataFrame:
+    """
+    Versión async de get_report_dataframe.
+    Usa el motor async si está disponible y, si no, ejecuta la versión
+    síncrona en el threadpool. En ambos casos la consulta se cancela
+    si excede DB_STATEMENT_TIMEOUT_MS.
+    """
+    timeout = DB_STATEMENT_TIMEOUT_MS / 1000
+
+    if async_engine is None:
+        return await asyncio.wait_for(run_in_threadpool(get_report_dataframe, parametros), timeout)
+
+    metric, date_range, handler_function = _resolver_handler(parametros)
+
+    async with async_engine.connect() as conn:
+        df = await asyncio.wait_for(
+            conn.run_sync(lambda sync_conn: handler_function(parametros, date_range, sync_conn)),
+            timeout
+        )
+
+    return _resultado_o_mensaje(df, metric)
+
+# ==============================================================================
+# --- PAGINACIÓN POR CURSOR ---
+# ==============================================================================
+# Métricas fila-a-fila que aceptan page_size/cursor (ordenadas por creado_en, id)
+METRICAS_PAGINABLES = {
+    'pedidos_pendientes',
+    'pedidos_enviados',
+    'pedidos_entregados',
+    'devoluciones',
+}
+
+def codificar_cursor(parametros: dict, ultima_fila) -> str:
+    """
+    Cursor opaco: la métrica y el rango ya resueltos por la IA + la posición
+    (creado_en, id) de la última fila entregada.
+    """
+    estado = {
+        "metric": parametros.get('metric'),
+        "date_range": parametros.get('date_range'),
+        "page_size": parametros.get('page_size'),
+        "after": {
+            "creado_en": pd.Timestamp(ultima_fila['creado_en']).isoformat(),
+            "id": str(ultima_fila['id']),
+        },
+    }
+    return base64.urlsafe_b64encode(json.dumps(estado).encode()).decode()
+
+def decodificar_cursor(cursor: str) -> dict:
+    """Devuelve los parámetros de reporte guardados en el cursor."""
+    try:
+        estado = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        estado["after"]["creado_en"] = datetime.fromisoformat(estado["after"]["creado_en"])
+        estado["after"]["id"] = uuid.UUID(estado["after"]["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor de paginación inválido.")
+    if estado.get("metric") not in METRICAS_PAGINABLES:
+        raise HTTPException(status_code=400, detail="Cursor de paginación inválido.")
+    # El cursor lo manda el cliente: page_size con los mismos límites que ReportRequest
+    page_size = estado.get("page_size")
+    if type(page_size) is not int or not 1 <= page_size <= PAGE_SIZE_MAX:
+        raise HTTPException(status_code=400, detail="Cursor de paginación inválido.")
+    estado["format"] = "json"
+    return estado
+
+def separar_pagina(df: pd.DataFrame, parametros: dict):
+    """
+    Recorta la fila extra pedida por el handler y devuelve (df, next_cursor).
+    next_cursor es None si no hay más páginas.
+    """
+    page_size = parametros.get('page_size')
+    if not page_size or 'id' not in df.columns or len(df) <= page_size:
+        return df, None
+    df = df.iloc[:page_size]
+    return df, codificar_cursor(parametros, df.iloc[-1])
+
+
 # --- FUNCIONES DE CONVERSIÓN DE FORMATO ---
+def _decimal_a_texto(valor):
+    """Texto exacto de un Decimal (válido como número JSON); NaN/Infinity -> None."""
+    return str(valor) if valor.is_finite() else None
+
+def _preparar_columnas_json(df: pd.DataFrame) -> tuple[pd.DataFrame, list]:
+    """
+    Ajusta SOLO las columnas object que to_json no serializa como espera el
+    frontend: Decimal -> su texto exacto y date -> 'AAAA-MM-DD'. El resto de
+    columnas (numéricas, datetime64, texto) se serializan tal cual, sin
+    copiar el frame. Devuelve también las columnas Decimal: to_json las
+    escribe entre comillas y convert_df_to_json_bytes las deja como número.
+    """
+    conversiones = {}
+    decimales = []
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        idx = df[col].first_valid_index()
+        if idx is None:
+            continue
+        valor = df[col].at[idx]
+        if isinstance(valor, Decimal):
+            # Pasar a float y dejar que to_json lo redondee (double_precision)
+            # alteraba importes: el texto del Decimal es exacto
+            conversiones[col] = df[col].map(_decimal_a_texto, na_action='ignore')
+            decimales.append(col)
+        elif isinstance(valor, date) and not isinstance(valor, datetime):
+            conversiones[col] = df[col].map(date.isoformat, na_action='ignore')
+    return (df.assign(**conversiones) if conversiones else df), decimales
+
+def convert_df_to_json_bytes(df: pd.DataFrame, metadata: dict) -> bytes:
+    """
+    Serializa {**metadata, "data": [filas]} directamente a bytes JSON.
+    Los datos van de las columnas del DataFrame a JSON en una sola pasada
+    (encoder en C de pandas): sin df.replace(), sin un dict por fila y sin
+    que FastAPI vuelva a codificar la respuesta. NaN/NaT/None -> null.
+    """
+    df_json, decimales = _preparar_columnas_json(df)
+    data = df_json.to_json(
+        orient='records',
+        date_format='iso',
+        force_ascii=False,
+        default_handler=str,
+    )
+    for col in decimales:
+        # "col":"12.50" -> "col":12.50. Dentro de un string las comillas van
+        # escapadas (\"), así que el patrón solo casa con la clave real
+        clave = re.escape(json.dumps(str(col), ensure_ascii=False))
+        data = re.sub(f'({clave}:)"([^"]*)"', r'\1\2', data)
+    encabezado = json.dumps(metadata, default=str, ensure_ascii=False)
+    return f'{encabezado[:-1]}, "data": {data}}}'.encode('utf-8')
+
+def arrow_disponible() -> bool:
+    return pa is not None
+
+def convert_df_to_arrow_bytes(df: pd.DataFrame, metadata: dict) -> bytes:
+    """
+    Serializa el DataFrame como un Arrow IPC stream (columnar, binario).
+    La metadata del reporte (metric, date_range, count, cursor...) viaja
+    como JSON en la metadata del schema, clave b"reporte".
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        b"reporte": json.dumps(metadata, default=str).encode("utf-8"),
+    })
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
 def convert_df_to_excel_bytes(df: pd.DataFrame, metric_name: str) -> bytes:
     """
     Toma un DataFrame y lo convierte en los bytes de un archivo Excel.
@@ -1,6 +1,22 @@
-from pydantic import BaseModel
+from typing import Optional
+from pydantic import BaseModel, Field, model_validator
+
+# Filas máximas por página en los reportes paginados (también para los cursores)
+PAGE_SIZE_MAX = 1000
 
 # Este es el modelo de datos que ESPERAMOS recibir
 # en nuestro endpoint. FastAPI lo usará para validar.
 class ReportRequest(BaseModel):
-    prompt: str
\ No newline at end of file
+    prompt: Optional[str] = None
+
+    # Paginación por cursor (solo reportes JSON fila-a-fila, ej. pedidos_pendientes).
+    # La primera página se pide con prompt + page_size; las siguientes con el
+    # next_cursor devuelto (sin prompt: el cursor ya lleva la métrica y el rango).
+    page_size: Optional[int] = Field(default=None, ge=1, le=PAGE_SIZE_MAX)
+    cursor: Optional[str] = None
+
+    @model_validator(mode='after')
+    def prompt_o_cursor(self):
+        if not self.prompt and not self.cursor:
+            raise ValueError("Se requiere un 'prompt' o un 'cursor'.")
+        return self
@@ -0,0 +1,270 @@
+# benchmarks/esquema_sintetico.py
+"""
+Esquema sintético con las tablas de Django que lee reporting.py
+(mismos nombres, columnas, tipos e índices que las migraciones) y su
+siembra masiva en SQL puro, para PostgreSQL o SQLite.
+
+En PostgreSQL todo vive en un schema propio (ESQUEMA_PG), así que no toca
+las tablas reales de Django aunque se use la misma base de datos.
+Las claves foráneas se omiten: solo frenarían la siembra.
+"""
+import time
+
+from sqlalchemy import event, text
+
+ESQUEMA_PG = "bench_reportes"
+
+TIPOS = {
+    "postgresql": {
+        "pk": "BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY",
+        "uuid": "UUID",
+        "ts": "TIMESTAMP WITH TIME ZONE",
+        "dec": "NUMERIC(10, 2)",
+        "dec14": "NUMERIC(14, 2)",
+        "bool": "BOOLEAN",
+    },
+    "sqlite": {
+        "pk": "INTEGER PRIMARY KEY AUTOINCREMENT",
+        "uuid": "CHAR(32)",
+        "ts": "DATETIME",
+        "dec": "DECIMAL",
+        "dec14": "DECIMAL",
+        "bool": "BOOL",
+    },
+}
+
+TABLAS = {
+    "productos_categoria": """
+        id {pk}, nombre VARCHAR(255) NOT NULL UNIQUE, slug VARCHAR(255) NOT NULL UNIQUE,
+        descripcion TEXT NOT NULL, imagen VARCHAR(255), padre_id BIGINT
+    """,
+    "productos_producto": """
+        id {pk}, nombre VARCHAR(255) NOT NULL, slug VARCHAR(255) NOT NULL UNIQUE,
+        descripcion TEXT NOT NULL, activo {bool} NOT NULL, creado_en {ts} NOT NULL,
+        actualizado_en {ts} NOT NULL, categoria_id BIGINT NOT NULL
+    """,
+    "productos_productovariante": """
+        id {pk}, sku VARCHAR(100) NOT NULL UNIQUE, precio {dec} NOT NULL, precio_oferta {dec},
+        activo {bool} NOT NULL, producto_id BIGINT NOT NULL, imagen_variante VARCHAR(255)
+    """,
+    "inventario_almacen": """
+        id {pk}, nombre VARCHAR(100) NOT NULL UNIQUE, direccion TEXT NOT NULL,
+        activo {bool} NOT NULL, capacidad INTEGER NOT NULL
+    """,
+    "inventario_stock": """
+        id {pk}, cantidad INTEGER NOT NULL, almacen_id BIGINT NOT NULL, variante_id BIGINT NOT NULL,
+        UNIQUE (variante_id, almacen_id)
+    """,
+    "pedidos_pedido": """
+        id {uuid} NOT NULL PRIMARY KEY, email_cliente VARCHAR(254) NOT NULL, total_pedido {dec} NOT NULL,
+        estado VARCHAR(20) NOT NULL, creado_en {ts} NOT NULL, actualizado_en {ts} NOT NULL, usuario_id BIGINT
+    """,
+    "pedidos_itempedido": """
+        id {pk}, cantidad INTEGER NOT NULL, precio_unitario {dec} NOT NULL,
+        variante_id BIGINT NOT NULL, pedido_id {uuid} NOT NULL
+    """,
+    "pedidos_resumencliente": """
+        id {pk}, email_cliente VARCHAR(254) NOT NULL UNIQUE, fecha_primera_compra {ts} NOT NULL,
+        fecha_ultima_compra {ts} NOT NULL, total_pedidos INTEGER NOT NULL, gasto_total {dec14} NOT NULL,
+        actualizado_en {ts} NOT NULL
+    """,
+}
+
+# Índices de las migraciones (pedidos 0003/0004, inventario 0003, productos 0001)
+INDICES = [
+    "CREATE INDEX bench_stock_cantidad ON inventario_stock (cantidad)",
+    "CREATE INDEX bench_stock_variante ON inventario_stock (variante_id)",
+    "CREATE INDEX bench_pedido_estado_creado ON pedidos_pedido (estado, creado_en)",
+    "CREATE INDEX bench_pedido_pagado_creado ON pedidos_pedido (creado_en) "
+    "WHERE estado IN ('PAGADO', 'ENVIADO', 'ENTREGADO')",
+    "CREATE INDEX bench_pedido_email_creado ON pedidos_pedido (email_cliente, creado_en)",
+    "CREATE INDEX bench_pedido_creado ON pedidos_pedido (creado_en DESC)",
+    "CREATE INDEX bench_item_variante ON pedidos_itempedido (variante_id)",
+    "CREATE INDEX bench_resumen_primera ON pedidos_resumencliente (fecha_primera_compra)",
+    "CREATE INDEX bench_resumen_ultima ON pedidos_resumencliente (fecha_ultima_compra)",
+    "CREATE INDEX bench_producto_categoria ON productos_producto (categoria_id, activo)",
+    "CREATE INDEX bench_variante_producto ON productos_productovariante (producto_id, activo)",
+]
+INDICE_ITEMS = {
+    # Índice cubriente de ItemPedido; SQLite no tiene INCLUDE
+    "postgresql": "CREATE INDEX bench_item_pedido_cov ON pedidos_itempedido (pedido_id) "
+                  "INCLUDE (variante_id, cantidad, precio_unitario)",
+    "sqlite": "CREATE INDEX bench_item_pedido_cov ON pedidos_itempedido "
+              "(pedido_id, variante_id, cantidad, precio_unitario)",
+}
+
+ESTADOS = "'PENDIENTE', 'EN_VERIFICACION', 'PAGADO', 'ENVIADO', 'ENTREGADO', 'CANCELADO'"
+
+SEMILLA_PG = [
+    """
+    INSERT INTO productos_categoria (nombre, slug, descripcion)
+    SELECT 'Categoría ' || g, 'categoria-' || g, '' FROM generate_series(1, :categorias) g
+    """,
+    """
+    INSERT INTO productos_producto (categoria_id, nombre, slug, descripcion, activo, creado_en, actualizado_en)
+    SELECT 1 + g % :categorias, 'Producto ' || g, 'producto-' || g, '', true, now(), now()
+    FROM generate_series(1, :productos) g
+    """,
+    """
+    INSERT INTO productos_productovariante (producto_id, sku, precio, activo)
+    SELECT p, 'SKU-' || p || '-' || v, round((10 + random() * 190)::numeric, 2), true
+    FROM generate_series(1, :productos) p, generate_series(1, :variantes_por_producto) v
+    """,
+    """
+    INSERT INTO inventario_almacen (nombre, direccion, capacidad, activo)
+    SELECT 'Almacén ' || g, '', 0, true FROM generate_series(1, :almacenes) g
+    """,
+    """
+    INSERT INTO inventario_stock (variante_id, almacen_id, cantidad)
+    SELECT v, a, floor(random() * 200)::int
+    FROM generate_series(1, :variantes) v, generate_series(1, :almacenes) a
+    """,
+    f"""
+    INSERT INTO pedidos_pedido (id, email_cliente, total_pedido, estado, creado_en, actualizado_en)
+    SELECT gen_random_uuid(), 'cliente' || (g % :clientes) || '@bench.local',
+           round((20 + random() * 480)::numeric, 2),
+           (ARRAY[{ESTADOS}])[1 + floor(random() * 6)::int],
+           now() - random() * make_interval(days => :dias_historia), now()
+    FROM generate_series(1, :pedidos) g
+    """,
+    """
+    INSERT INTO pedidos_itempedido (pedido_id, variante_id, cantidad, precio_unitario)
+    SELECT pe.id, 1 + floor(random() * :variantes)::bigint, 1 + floor(random() * 3)::int,
+           round((10 + random() * 190)::numeric, 2)
+    FROM pedidos_pedido pe, generate_series(1, :items_por_pedido) n
+    """,
+]
+
+# SQLite: generate_series con un CTE recursivo; fechas con el formato de Django
+_SERIE = "WITH RECURSIVE g(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM g WHERE x < {n})"
+_ALEATORIO = "(abs(random()) % 1000000) / 1000000.0"
+
+SEMILLA_SQLITE = [
+    f"""
+    {_SERIE.format(n=':categorias')}
+    INSERT INTO productos_categoria (nombre, slug, descripcion)
+    SELECT 'Categoría ' || x, 'categoria-' || x, '' FROM g
+    """,
+    f"""
+    {_SERIE.format(n=':productos')}
+    INSERT INTO productos_producto (categoria_id, nombre, slug, descripcion, activo, creado_en, actualizado_en)
+    SELECT 1 + x % :categorias, 'Producto ' || x, 'producto-' || x, '', 1,
+           strftime('%Y-%m-%d %H:%M:%f', 'now'), strftime('%Y-%m-%d %H:%M:%f', 'now')
+    FROM g
+    """,
+    f"""
+    {_SERIE.format(n=':variantes')}
+    INSERT INTO productos_productovariante (producto_id, sku, precio, activo)
+    SELECT 1 + (x - 1) / :variantes_por_producto, 'SKU-' || x, round(10 + {_ALEATORIO} * 190, 2), 1
+    FROM g
+    """,
+    f"""
+    {_SERIE.format(n=':almacenes')}
+    INSERT INTO inventario_almacen (nombre, direccion, capacidad, activo)
+    SELECT 'Almacén ' || x, '', 0, 1 FROM g
+    """,
+    """
+    INSERT INTO inventario_stock (variante_id, almacen_id, cantidad)
+    SELECT v.id, a.id, abs(random()) % 200
+    FROM productos_productovariante v, inventario_almacen a
+    """,
+    f"""
+    {_SERIE.format(n=':pedidos')}
+    INSERT INTO pedidos_pedido (id, email_cliente, total_pedido, estado, creado_en, actualizado_en)
+    SELECT lower(hex(randomblob(16))), 'cliente' || (x % :clientes) || '@bench.local',
+           round(20 + {_ALEATORIO} * 480, 2),
+           json_extract('[{ESTADOS.replace("'", '"')}]', '$[' || (abs(random()) % 6) || ']'),
+           strftime('%Y-%m-%d %H:%M:%f', 'now', '-' || (abs(random()) % (:dias_historia * 86400)) || ' seconds'),
+           strftime('%Y-%m-%d %H:%M:%f', 'now')
+    FROM g
+    """,
+    f"""
+    {_SERIE.format(n=':items_por_pedido')}
+    INSERT INTO pedidos_itempedido (pedido_id, variante_id, cantidad, precio_unitario)
+    SELECT pe.id, 1 + abs(random()) % :variantes, 1 + abs(random()) % 3, round(10 + {_ALEATORIO} * 190, 2)
+    FROM pedidos_pedido pe, g
+    """,
+]
+
+# Lo que mantiene ResumenCliente en Django, recalculado en bloque
+SEMILLA_RESUMEN = """
+    INSERT INTO pedidos_resumencliente
+        (email_cliente, fecha_primera_compra, fecha_ultima_compra, total_pedidos, gasto_total, actualizado_en)
+    SELECT email_cliente, MIN(creado_en), MAX(creado_en), COUNT(id), SUM(total_pedido), MAX(creado_en)
+    FROM pedidos_pedido
+    WHERE estado IN ('PAGADO', 'ENVIADO', 'ENTREGADO')
+    GROUP BY email_cliente
+"""
+
+
+def parametros_escala(pedidos: int) -> dict:
+    """Proporciones del catálogo y los clientes en función del número de pedidos."""
+    productos = max(pedidos // 100, 100)
+    return {
+        "categorias": 50,
+        "productos": productos,
+        "variantes_por_producto": 5,
+        "variantes": productos * 5,
+        "almacenes": 3,
+        "clientes": max(pedidos // 10, 100),
+        "pedidos": pedidos,
+        "items_por_pedido": 2,
+        "dias_historia": 3 * 365,
+    }
+
+
+def usar_esquema(engine):
+    """En PostgreSQL, fija el search_path de cada conexión nueva al schema sintético."""
+    if engine is None or engine.dialect.name != "postgresql":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _search_path(dbapi_connection, connection_record):
+        autocommit = dbapi_connection.autocommit
+        dbapi_connection.autocommit = True
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"SET SESSION search_path TO {ESQUEMA_PG}")
+        cursor.close()
+        dbapi_connection.autocommit = autocommit
+
+
+def pedidos_sembrados(conn):
+    """Número de pedidos de la última siembra, o None si el esquema no existe."""
+    try:
+        return conn.execute(text("SELECT pedidos FROM bench_meta")).scalar()
+    except Exception:
+        conn.rollback()
+        return None
+
+
+def crear_y_sembrar(conn, pedidos: int):
+    """Recrea el esquema y lo siembra. `conn` debe estar en el search_path correcto."""
+    dialecto = conn.dialect.name
+    tipos = TIPOS[dialecto]
+    parametros = parametros_escala(pedidos)
+
+    if dialecto == "postgresql":
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {ESQUEMA_PG} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {ESQUEMA_PG}"))
+        conn.execute(text(f"SET LOCAL search_path TO {ESQUEMA_PG}"))
+        conn.execute(text("SET LOCAL statement_timeout = 0"))
+    else:
+        for tabla in [*TABLAS, "bench_meta"]:
+            conn.execute(text(f"DROP TABLE IF EXISTS {tabla}"))
+
+    for tabla, columnas in TABLAS.items():
+        conn.execute(text(f"CREATE TABLE {tabla} ({columnas.format(**tipos)})"))
+    conn.execute(text("CREATE TABLE bench_meta (pedidos BIGINT NOT NULL)"))
+
+    semilla = SEMILLA_PG if dialecto == "postgresql" else SEMILLA_SQLITE
+    for sql in [*semilla, SEMILLA_RESUMEN]:
+        inicio = time.perf_counter()
+        conn.execute(text(sql), {k: v for k, v in parametros.items() if f":{k}" in sql})
+        tabla = sql.split("INSERT INTO")[1].split()[0]
+        print(f"   {tabla:<28} {time.perf_counter() - inicio:>7.1f} s")
+
+    # Índices después de la carga: mucho más rápido que mantenerlos fila a fila
+    for sql in [*INDICES, INDICE_ITEMS[dialecto]]:
+        conn.execute(text(sql))
+    conn.execute(text("INSERT INTO bench_meta (pedidos) VALUES (:pedidos)"), {"pedidos": pedidos})
+    conn.execute(text("ANALYZE"))
@@ -0,0 +1,93 @@
+# benchmarks/json_payload.py
+"""
+Benchmark de construcción del payload JSON de un reporte.
+
+Compara el camino anterior (df.replace + to_dict(orient='records') +
+jsonable_encoder + json.dumps, que es lo que hacía FastAPI) contra
+convert_df_to_json_bytes, midiendo tiempo y pico de memoria (tracemalloc).
+
+Uso (desde microservicio_reportes/):
+    python -m benchmarks.json_payload
+    python -m benchmarks.json_payload --filas 10000 100000 --repeticiones 5
+"""
+import argparse
+import json
+import os
+import time
+import tracemalloc
+import uuid
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+
+# reporting.py lee la configuración al importarse; el benchmark no toca la BD
+os.environ.setdefault("COHERE_API_KEY", "benchmark")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from app.reporting import convert_df_to_json_bytes  # noqa: E402
+
+
+def generar_df(filas: int) -> pd.DataFrame:
+    """DataFrame con la forma de un reporte fila-a-fila (pedidos_pendientes)."""
+    rng = np.random.default_rng(42)
+    estados = np.array(['PENDIENTE', 'EN_VERIFICACION'])
+    return pd.DataFrame({
+        'id': [str(uuid.UUID(int=int(i))) for i in rng.integers(0, 2**63, filas)],
+        'creado_en': pd.Timestamp('2025-01-01', tz='UTC') + pd.to_timedelta(rng.integers(0, 3 * 10**7, filas), unit='s'),
+        'email_cliente': [f'cliente{i}@mail.com' for i in rng.integers(0, filas // 5 + 1, filas)],
+        'total_pedido': [Decimal(f'{v:.2f}') for v in rng.uniform(20, 500, filas)],
+        'estado': estados[rng.integers(0, 2, filas)],
+    })
+
+
+def camino_anterior(df: pd.DataFrame, metadata: dict) -> bytes:
+    df_cleaned = df.replace({pd.NA: None, pd.NaT: None, float('nan'): None})
+    data_json = df_cleaned.to_dict(orient='records')
+    contenido = jsonable_encoder({**metadata, "data": data_json})
+    return json.dumps(contenido, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def camino_nuevo(df: pd.DataFrame, metadata: dict) -> bytes:
+    return convert_df_to_json_bytes(df, metadata)
+
+
+def medir(funcion, df: pd.DataFrame, metadata: dict, repeticiones: int) -> dict:
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        payload = funcion(df, metadata)
+        tiempos.append(time.perf_counter() - inicio)
+
+    tracemalloc.start()
+    funcion(df, metadata)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "ms_min": min(tiempos) * 1000,
+        "ms_mediana": sorted(tiempos)[len(tiempos) // 2] * 1000,
+        "pico_mb": pico / 2**20,
+        "bytes": len(payload),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print(f"{'filas':>8} {'camino':<9} {'ms_min':>9} {'ms_med':>9} {'pico_MB':>9} {'bytes':>11}")
+    for filas in args.filas:
+        df = generar_df(filas)
+        metadata = {"metric": "pedidos_pendientes", "group_by": None,
+                    "date_range": {"start_date": "2025-01-01", "end_date": "2025-12-31"}, "count": filas}
+        for nombre, funcion in (("anterior", camino_anterior), ("nuevo", camino_nuevo)):
+            r = medir(funcion, df, metadata, args.repeticiones)
+            print(f"{filas:>8} {nombre:<9} {r['ms_min']:>9.1f} {r['ms_mediana']:>9.1f} {r['pico_mb']:>9.1f} {r['bytes']:>11}")
+
+
+if __name__ == '__main__':
+    main()
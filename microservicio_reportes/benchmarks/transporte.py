@@ -0,0 +1,113 @@
+# benchmarks/transporte.py
+"""
+Benchmark de latencia extremo a extremo de un reporte grande según el
+transporte entre el microservicio y el puente de Django.
+
+Cada camino mide: codificación en el microservicio + salto HTTP local
+(requests con stream=True, como el puente) + trabajo del puente +
+decodificación en el cliente final.
+
+    json+recodificar  JSON; el puente hace response.json() + JsonResponse (camino anterior)
+    json+relay        JSON; el puente retransmite los bytes sin decodificar
+    arrow+relay       Arrow IPC stream; el puente retransmite los bytes
+
+Uso (desde microservicio_reportes/):
+    python -m benchmarks.transporte
+    python -m benchmarks.transporte --filas 10000 100000 500000 --repeticiones 5
+"""
+import argparse
+import io
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pyarrow as pa
+import requests
+
+os.environ.setdefault("COHERE_API_KEY", "benchmark")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.reporting import convert_df_to_arrow_bytes, convert_df_to_json_bytes  # noqa: E402
+from benchmarks.json_payload import generar_df  # noqa: E402
+
+
+class _Servidor(BaseHTTPRequestHandler):
+    """Devuelve el payload que el benchmark deja en server.payload."""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        payload, content_type = self.server.payload
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def _relay(response) -> bytes:
+    # Lo que hace StreamingHttpResponse con iter_content
+    return b''.join(response.iter_content(chunk_size=64 * 1024))
+
+
+def camino_json_recodificar(servidor, url, df, metadata):
+    servidor.payload = (convert_df_to_json_bytes(df, metadata), 'application/json')
+    response = requests.post(url, json={}, stream=True)
+    cuerpo = json.dumps(response.json()).encode('utf-8')  # JsonResponse(response.json())
+    return cuerpo, json.loads(cuerpo)
+
+
+def camino_json_relay(servidor, url, df, metadata):
+    servidor.payload = (convert_df_to_json_bytes(df, metadata), 'application/json')
+    cuerpo = _relay(requests.post(url, json={}, stream=True))
+    return cuerpo, json.loads(cuerpo)
+
+
+def camino_arrow_relay(servidor, url, df, metadata):
+    servidor.payload = (convert_df_to_arrow_bytes(df, metadata), 'application/vnd.apache.arrow.stream')
+    cuerpo = _relay(requests.post(url, json={}, stream=True))
+    tabla = pa.ipc.open_stream(io.BytesIO(cuerpo)).read_all()
+    return cuerpo, (json.loads(tabla.schema.metadata[b'reporte']), tabla.to_pandas())
+
+
+CAMINOS = (
+    ("json+recodificar", camino_json_recodificar),
+    ("json+relay", camino_json_relay),
+    ("arrow+relay", camino_arrow_relay),
+)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), _Servidor)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{servidor.server_address[1]}/generar-reporte-ia'
+
+    print(f"{'filas':>8} {'camino':<17} {'ms_min':>9} {'ms_med':>9} {'bytes':>11}")
+    try:
+        for filas in args.filas:
+            df = generar_df(filas)
+            metadata = {"metric": "pedidos_pendientes", "group_by": None,
+                        "date_range": {"start_date": "2025-01-01", "end_date": "2025-12-31"}, "count": filas}
+            for nombre, camino in CAMINOS:
+                tiempos = []
+                for _ in range(args.repeticiones):
+                    inicio = time.perf_counter()
+                    cuerpo, _ = camino(servidor, url, df, metadata)
+                    tiempos.append(time.perf_counter() - inicio)
+                print(f"{filas:>8} {nombre:<17} {min(tiempos) * 1000:>9.1f} "
+                      f"{sorted(tiempos)[len(tiempos) // 2] * 1000:>9.1f} {len(cuerpo):>11}")
+    finally:
+        servidor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
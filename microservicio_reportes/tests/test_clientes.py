@@ -0,0 +1,97 @@
+# tests/test_clientes.py
+"""
+Métricas de clientes de reporting.py con un rango PASADO: los clientes que
+volvieron a comprar después del rango no deben desaparecer de frecuentes,
+valor de vida ni retenidos. Inactivos son los que no han vuelto desde antes
+del rango (última compra del resumen anterior al inicio).
+"""
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import text
+
+from app.reporting import (
+    _get_clientes_frecuentes,
+    _get_clientes_inactivos,
+    _get_clientes_nuevos,
+    _get_retencion_clientes,
+    _get_valor_vida_cliente,
+    _normalizar_rango,
+)
+from benchmarks.esquema_sintetico import SEMILLA_RESUMEN
+
+RANGO = {"start_date": "2024-03-01", "end_date": "2024-03-31"}
+
+PEDIDOS = [
+    # ana: compró antes, dos veces en el rango y otra vez después
+    ("ana@ejemplo.com", "2024-01-10", "10.00", "ENTREGADO"),
+    ("ana@ejemplo.com", "2024-03-05", "20.00", "PAGADO"),
+    ("ana@ejemplo.com", "2024-03-20", "30.00", "ENVIADO"),
+    ("ana@ejemplo.com", "2024-06-01", "40.00", "PAGADO"),
+    # beto: compró antes, nada en el rango y volvió después
+    ("beto@ejemplo.com", "2024-02-01", "15.00", "PAGADO"),
+    ("beto@ejemplo.com", "2024-05-01", "25.00", "PAGADO"),
+    # carla: primera compra dentro del rango
+    ("carla@ejemplo.com", "2024-03-10", "50.00", "PAGADO"),
+    # eva: compró antes del rango y no ha vuelto
+    ("eva@ejemplo.com", "2023-12-15", "12.00", "PAGADO"),
+    ("eva@ejemplo.com", "2024-01-20", "8.00", "ENTREGADO"),
+    # dani: un pedido pagado y uno cancelado en el rango
+    ("dani@ejemplo.com", "2024-03-02", "5.00", "PAGADO"),
+    ("dani@ejemplo.com", "2024-03-03", "5.00", "CANCELADO"),
+]
+
+
+@pytest.fixture
+def conn(conn_sqlite):
+    for email, fecha, total, estado in PEDIDOS:
+        creado_en = datetime.fromisoformat(fecha)
+        conn_sqlite.execute(text("""
+            INSERT INTO pedidos_pedido (id, email_cliente, total_pedido, estado, creado_en, actualizado_en)
+            VALUES (:id, :email, :total, :estado, :creado_en, :creado_en)
+        """), {"id": uuid.uuid4().hex, "email": email, "total": total, "estado": estado, "creado_en": creado_en})
+    # Lo que mantiene ResumenCliente en Django (toda la historia)
+    conn_sqlite.execute(text(SEMILLA_RESUMEN))
+    return conn_sqlite
+
+
+def _consultar(handler, conn):
+    return handler({}, _normalizar_rango(RANGO), conn)
+
+
+def test_clientes_nuevos(conn):
+    df = _consultar(_get_clientes_nuevos, conn)
+    assert set(df["email_cliente"]) == {"carla@ejemplo.com", "dani@ejemplo.com"}
+
+
+def test_clientes_frecuentes_cuenta_solo_pedidos_del_rango(conn):
+    df = _consultar(_get_clientes_frecuentes, conn)
+    assert df["email_cliente"].tolist() == ["ana@ejemplo.com"]
+    assert df["total_pedidos"].tolist() == [2]
+    assert Decimal(str(df["gasto_total"].iloc[0])) == Decimal("50.00")
+
+
+def test_valor_vida_de_quien_compro_en_el_rango(conn):
+    df = _consultar(_get_valor_vida_cliente, conn).set_index("email_cliente")
+    assert set(df.index) == {"ana@ejemplo.com", "carla@ejemplo.com", "dani@ejemplo.com"}
+    # El valor de vida es de toda la historia, también lo posterior al rango
+    assert df.loc["ana@ejemplo.com", "total_pedidos"] == 4
+    assert Decimal(str(df.loc["ana@ejemplo.com", "valor_vida_cliente"])) == Decimal("100.00")
+
+
+def test_clientes_inactivos_sin_compras_desde_antes_del_rango(conn):
+    df = _consultar(_get_clientes_inactivos, conn)
+    # beto volvió después del rango: ya no es inactivo
+    assert df["email_cliente"].tolist() == ["eva@ejemplo.com"]
+    assert str(df["fecha_ultima_compra"].iloc[0]).startswith("2024-01-20")
+    assert df["total_pedidos"].tolist() == [2]
+    assert Decimal(str(df["gasto_total"].iloc[0])) == Decimal("20.00")
+
+
+def test_retencion_en_un_rango_pasado(conn):
+    fila = _consultar(_get_retencion_clientes, conn).iloc[0]
+    assert fila["clientes_previos"] == 3      # ana, beto y eva
+    assert fila["clientes_retenidos"] == 1    # ana
+    assert float(fila["tasa_retencion"]) == 33.33
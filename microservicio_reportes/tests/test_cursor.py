@@ -0,0 +1,47 @@
+# tests/test_cursor.py
+"""
+Cursores de paginación de reporting.py: lo que trae un cursor lo manda el
+cliente y se valida igual que los parámetros de ReportRequest.
+"""
+import base64
+import json
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from app.reporting import codificar_cursor, decodificar_cursor
+from app.schemas import PAGE_SIZE_MAX
+
+PARAMETROS = {"metric": "pedidos_pendientes", "date_range": "este_mes", "page_size": 50}
+FILA = {"creado_en": datetime(2024, 3, 1, 12, tzinfo=timezone.utc), "id": uuid.uuid4()}
+
+
+def _cursor_con(**cambios):
+    estado = json.loads(base64.urlsafe_b64decode(codificar_cursor(PARAMETROS, FILA)))
+    estado.update(cambios)
+    return base64.urlsafe_b64encode(json.dumps(estado).encode()).decode()
+
+
+def test_ida_y_vuelta():
+    parametros = decodificar_cursor(codificar_cursor(PARAMETROS, FILA))
+    assert parametros["metric"] == "pedidos_pendientes"
+    assert parametros["page_size"] == 50
+    assert parametros["after"] == {"creado_en": FILA["creado_en"], "id": FILA["id"]}
+
+
+@pytest.mark.parametrize("page_size", [0, -5, PAGE_SIZE_MAX + 1, 10 ** 9, "50", 2.5, True, None])
+def test_page_size_fuera_de_limites(page_size):
+    with pytest.raises(HTTPException) as error:
+        decodificar_cursor(_cursor_con(page_size=page_size))
+    assert error.value.status_code == 400
+
+
+def test_page_size_maximo_permitido():
+    assert decodificar_cursor(_cursor_con(page_size=PAGE_SIZE_MAX))["page_size"] == PAGE_SIZE_MAX
+
+
+def test_metrica_no_paginable():
+    with pytest.raises(HTTPException):
+        decodificar_cursor(_cursor_con(metric="ventas_totales"))
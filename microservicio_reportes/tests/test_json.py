@@ -0,0 +1,75 @@
+# tests/test_json.py
+"""
+convert_df_to_json_bytes frente al camino anterior (to_dict + jsonable_encoder
++ json.dumps): mismos datos y los Decimal sin perder dígitos.
+"""
+import json
+from datetime import date
+from decimal import Decimal
+
+import pandas as pd
+
+from app.reporting import convert_df_to_json_bytes
+from benchmarks.json_payload import camino_anterior, generar_df
+
+METADATA = {"metric": "prueba", "date_range": {"start_date": "2024-03-01", "end_date": "2024-03-31"}}
+
+DECIMALES = [
+    Decimal("19.90"),
+    Decimal("0.07"),
+    Decimal("12345678.91"),
+    Decimal("9999999999999.99"),   # SUM de importes: más de 15 cifras
+    Decimal("1234.5678901234"),    # Más de 10 decimales
+    Decimal("0.00000000005"),
+    Decimal("-3.50"),
+    None,
+]
+
+
+def _frame() -> pd.DataFrame:
+    return pd.DataFrame({
+        "producto": ['Camisa "slim"', "Falda", "Blusa", "Vestido", "Abrigo", "Bufanda", "Devolución", "Sin precio"],
+        "importe": DECIMALES,
+        "fecha": [date(2024, 3, d) for d in range(1, 9)],
+        "unidades": range(8),
+        "tasa": [12.5, 33.33, 0.1, 100.0, None, 66.67, 0.0, 50.0],
+    })
+
+
+def _datos(payload: bytes, fechas=()) -> list:
+    """Filas del payload; los datetime ISO ('Z' o '+00:00') se comparan como instantes."""
+    filas = json.loads(payload)["data"]
+    for fila in filas:
+        for col in fechas:
+            fila[col] = pd.Timestamp(fila[col])
+    return filas
+
+
+def test_mismos_datos_que_el_camino_anterior():
+    for df, fechas in ((_frame(), ()), (generar_df(500), ("creado_en",))):
+        anterior = _datos(camino_anterior(df, METADATA), fechas)
+        nuevo = _datos(convert_df_to_json_bytes(df, METADATA), fechas)
+        assert nuevo == anterior
+
+
+def test_decimales_exactos():
+    payload = convert_df_to_json_bytes(_frame(), METADATA)
+    filas = json.loads(payload, parse_float=Decimal)["data"]
+    assert [fila["importe"] for fila in filas] == DECIMALES
+    # Siguen siendo números JSON, no strings
+    assert b'"importe":19.90,' in payload
+
+
+def test_decimal_no_finito_es_null():
+    df = pd.DataFrame({"importe": [Decimal("1.5"), Decimal("NaN")]})
+    filas = json.loads(convert_df_to_json_bytes(df, METADATA))["data"]
+    assert filas == [{"importe": 1.5}, {"importe": None}]
+
+
+def test_clave_dentro_de_un_texto_no_se_toca():
+    df = pd.DataFrame({
+        "nota": ['{"importe":"7"}'],
+        "importe": [Decimal("7.00")],
+    })
+    filas = json.loads(convert_df_to_json_bytes(df, METADATA))["data"]
+    assert filas == [{"nota": '{"importe":"7"}', "importe": 7.0}]
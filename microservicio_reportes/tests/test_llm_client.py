@@ -0,0 +1,179 @@
+# tests/test_llm_client.py
+"""
+Cliente LLM resiliente contra el proveedor falso: deadline, límite de
+concurrencia, reintentos, circuit breaker y fallback al parser por reglas.
+El enfriamiento del circuito usa un reloj inyectado, sin esperas reales.
+"""
+import threading
+import time
+
+import pytest
+
+from app import llm_service
+from app.llm_client import (
+    CircuitBreaker,
+    CircuitoAbiertoError,
+    ClienteLLM,
+    ConcurrenciaAgotadaError,
+    ErrorProveedorLLM,
+    ProveedorFalso,
+    TiempoAgotadoLLMError,
+)
+
+PROMPT = "ventas totales del mes pasado en excel"
+
+
+class _Reloj:
+    def __init__(self):
+        self.ahora = 0.0
+
+    def __call__(self):
+        return self.ahora
+
+
+class _FallaLasPrimeras(ProveedorFalso):
+    """Falla las primeras `n` llamadas y luego responde bien."""
+
+    def __init__(self, n: int):
+        super().__init__()
+        self.restantes = n
+
+    def chat(self, *args):
+        if self.restantes > 0:
+            self.restantes -= 1
+            raise ErrorProveedorLLM("Error transitorio inyectado.")
+        return super().chat(*args)
+
+
+class _Bloqueado(ProveedorFalso):
+    """Responde solo cuando el test suelta `liberar`."""
+
+    def __init__(self):
+        super().__init__()
+        self.en_curso = threading.Event()
+        self.liberar = threading.Event()
+
+    def chat(self, *args):
+        self.en_curso.set()
+        self.liberar.wait(5)
+        return super().chat(*args)
+
+
+def _cliente(proveedor, reloj=time.monotonic, **opciones) -> ClienteLLM:
+    opciones = {"timeout_s": 1.0, "max_concurrencia": 4, "espera_cola_s": 0.05, "reintentos": 0, **opciones}
+    circuito = CircuitBreaker(opciones.pop("umbral", 3), opciones.pop("enfriamiento_s", 30), reloj=reloj)
+    return ClienteLLM(proveedor, circuito=circuito, **opciones)
+
+
+def test_proveedor_sano():
+    cliente = _cliente(ProveedorFalso())
+    assert '"ventas_totales"' in cliente.chat(PROMPT, "")
+    assert cliente.circuito.estado == CircuitBreaker.CERRADO
+
+
+def test_deadline():
+    cliente = _cliente(ProveedorFalso(retardo_s=1.0), timeout_s=0.1)
+    inicio = time.monotonic()
+    with pytest.raises(TiempoAgotadoLLMError):
+        cliente.chat(PROMPT, "")
+    assert time.monotonic() - inicio < 0.5
+    assert cliente.metricas.resumen()["timeouts"] == 1
+
+
+def test_timeout_tras_reintento_informa_el_presupuesto_restante():
+    class _FallaYSeCuelga(ProveedorFalso):
+        def __init__(self):
+            super().__init__(retardo_s=0.3)
+            self.llamadas = 0
+
+        def chat(self, *args):
+            self.llamadas += 1
+            if self.llamadas == 1:
+                time.sleep(self.retardo_s)
+                raise ErrorProveedorLLM("Error transitorio inyectado.")
+            time.sleep(1.0)
+
+    cliente = _cliente(_FallaYSeCuelga(), timeout_s=0.5, reintentos=1)
+    with pytest.raises(TiempoAgotadoLLMError) as error:
+        cliente.chat(PROMPT, "")
+    segundos = float(str(error.value).split(" en ")[1].rstrip("s."))
+    assert 0 < segundos < 0.3
+
+
+def test_sin_cupo_rechaza_sin_abrir_el_circuito():
+    proveedor = _Bloqueado()
+    cliente = _cliente(proveedor, max_concurrencia=1, umbral=2)
+    hilo = threading.Thread(target=cliente.chat, args=(PROMPT, ""))
+    hilo.start()
+    try:
+        assert proveedor.en_curso.wait(5)
+        for _ in range(3):
+            with pytest.raises(ConcurrenciaAgotadaError):
+                cliente.chat(PROMPT, "")
+        assert cliente.metricas.resumen()["rechazos_concurrencia"] == 3
+        assert cliente.circuito.estado == CircuitBreaker.CERRADO
+    finally:
+        proveedor.liberar.set()
+        hilo.join()
+    assert cliente.metricas.resumen()["exitos"] == 1
+
+
+def test_sin_cupo_en_semiabierto_no_consume_la_prueba():
+    reloj = _Reloj()
+    cliente = _cliente(_FallaLasPrimeras(1), reloj=reloj, max_concurrencia=1, umbral=1, enfriamiento_s=10)
+    with pytest.raises(ErrorProveedorLLM):
+        cliente.chat(PROMPT, "")
+    reloj.ahora = 10
+
+    cliente._semaforo.acquire()
+    with pytest.raises(ConcurrenciaAgotadaError):
+        cliente.chat(PROMPT, "")
+    cliente._semaforo.release()
+
+    # La prueba rechazada en local no deja el circuito bloqueado en semi-abierto
+    cliente.chat(PROMPT, "")
+    assert cliente.circuito.estado == CircuitBreaker.CERRADO
+
+
+def test_reintento_acotado():
+    cliente = _cliente(_FallaLasPrimeras(1), reintentos=1)
+    cliente.chat(PROMPT, "")
+    assert cliente.metricas.resumen()["reintentos"] == 1
+
+    cliente = _cliente(_FallaLasPrimeras(2), reintentos=1)
+    with pytest.raises(ErrorProveedorLLM):
+        cliente.chat(PROMPT, "")
+    assert cliente.metricas.resumen()["llamadas"] == 2
+
+
+def test_circuito_abre_falla_rapido_y_se_recupera():
+    reloj = _Reloj()
+    proveedor = ProveedorFalso(tasa_error=1.0)
+    cliente = _cliente(proveedor, reloj=reloj, umbral=3, enfriamiento_s=10)
+    for _ in range(3):
+        with pytest.raises(ErrorProveedorLLM):
+            cliente.chat(PROMPT, "")
+    assert cliente.circuito.estado == CircuitBreaker.ABIERTO
+
+    reloj.ahora = 9
+    with pytest.raises(CircuitoAbiertoError):
+        cliente.chat(PROMPT, "")
+    assert cliente.metricas.resumen()["llamadas"] == 3
+
+    # La prueba tras el enfriamiento falla: vuelve a abrirse sin esperar al umbral
+    reloj.ahora = 10
+    with pytest.raises(ErrorProveedorLLM):
+        cliente.chat(PROMPT, "")
+    assert cliente.circuito.estado == CircuitBreaker.ABIERTO
+
+    proveedor.tasa_error = 0.0
+    reloj.ahora = 20
+    cliente.chat(PROMPT, "")
+    assert cliente.circuito.estado == CircuitBreaker.CERRADO
+
+
+def test_fallback_al_parser_por_reglas(monkeypatch):
+    monkeypatch.setattr(llm_service, "cliente_llm", _cliente(ProveedorFalso(tasa_error=1.0)))
+    parametros = llm_service.analizar_prompt_usuario(PROMPT)
+    assert parametros.get("origen") == "reglas"
+    assert (parametros["metric"], parametros["format"]) == ("ventas_totales", "excel")
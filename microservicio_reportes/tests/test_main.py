@@ -0,0 +1,74 @@
+# tests/test_main.py
+"""
+Errores de la BD en /generar-reporte-ia y cierre de los pools al apagar.
+La cancelación real por statement_timeout solo se prueba con PostgreSQL.
+"""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app import main
+from app.core.database import consulta_cancelada, engine
+
+PARAMETROS = {"metric": "ventas_totales", "format": "json", "date_range": "este_mes"}
+
+
+class _ErrorDriver(Exception):
+    def __init__(self, pgcode):
+        super().__init__(f"pgcode {pgcode}")
+        self.pgcode = pgcode
+
+
+def _falla_con(error):
+    async def consultar(parametros):
+        raise error
+    return consultar
+
+
+@pytest.fixture
+def cliente(monkeypatch):
+    monkeypatch.setattr(main, "analizar_prompt_usuario", lambda prompt: dict(PARAMETROS))
+    return TestClient(main.app)
+
+
+def test_statement_timeout_responde_504(cliente, monkeypatch):
+    error = OperationalError("SELECT ...", {}, _ErrorDriver("57014"))
+    monkeypatch.setattr(main, "get_report_dataframe_async", _falla_con(error))
+    respuesta = cliente.post("/generar-reporte-ia", json={"prompt": "ventas"})
+    assert respuesta.status_code == 504
+    assert respuesta.json()["detail"] == main.TIMEOUT_CONSULTA
+
+
+def test_otros_errores_de_la_bd_siguen_siendo_500(cliente, monkeypatch):
+    error = OperationalError("SELECT ...", {}, _ErrorDriver("08006"))
+    monkeypatch.setattr(main, "get_report_dataframe_async", _falla_con(error))
+    assert cliente.post("/generar-reporte-ia", json={"prompt": "ventas"}).status_code == 500
+
+
+@pytest.mark.skipif(engine is None or engine.dialect.name != "postgresql", reason="Requiere PostgreSQL")
+def test_cancelacion_real_de_postgres():
+    with engine.connect() as conn:
+        conn.execute(text("SET statement_timeout = 10"))
+        with pytest.raises(OperationalError) as error:
+            conn.execute(text("SELECT pg_sleep(1)"))
+    assert consulta_cancelada(error.value)
+
+
+def test_apagar_cierra_los_pools(monkeypatch):
+    cerrados = []
+
+    class Motor:
+        def dispose(self):
+            cerrados.append("sync")
+
+    class MotorAsync:
+        async def dispose(self):
+            cerrados.append("async")
+
+    monkeypatch.setattr(main, "engine", Motor())
+    monkeypatch.setattr(main, "async_engine", MotorAsync())
+    with TestClient(main.app) as cliente:
+        assert cliente.get("/").status_code == 200
+        assert cerrados == []
+    assert cerrados == ["async", "sync"]